@@ -1,10 +1,16 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 import uvicorn
 import os
-from modules.weather_air_quality.api import router as weather_router
+import asyncio
+import json
+import numpy as np
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy.exc import SQLAlchemyError
+from modules.weather_air_quality.api import router as weather_router, air_quality_service
 from modules.green_vegetation.api import router as vegetation_router
 from modules.water_quality.api import router as water_router
 from modules.crop_disease.api import router as crop_router
@@ -12,9 +18,28 @@ from modules.waste_management.api import router as waste_router
 from modules.disaster_management.api import router as disaster_router
 from modules.citizen_engagement.api import router as citizen_router
 from modules.auth_api import router as auth_router
+from db.db import init_db
+from modules.map_tiles.api import router as tiles_router
+from modules.composites.api import router as composites_router
+from modules.http_cache import etag_json
+from modules.green_vegetation.proximity import access_score, get_green_proximity
 from modules.nasa_data.firms_client import FIRMSClient
-from modules.nasa_data.modis_client import MODISClient
+from modules.nasa_data.modis_client import MODISClient, monthly_means
 from modules.nasa_data.grace_client import GRACEClient
+from modules.nasa_data.http_client import get_http_client
+from modules.nasa_data.fire_store import FireDetectionStore
+from modules.nasa_data.firms_ingest import FIRMSIngestor
+from modules.nasa_data.fire_events import FireEventTracker
+from modules.nasa_data.pollution_grid import PollutionGridEngine
+from modules.nasa_data.passes import get_pass_predictor
+from modules.nasa_data.cube_store import get_cube_store
+from modules.nasa_data.modis_tiles import get_modis_tiles
+from modules.nasa_data.regions import get_region_masks
+from modules.nasa_data.population import get_population_raster
+from modules.nasa_data.zonal import get_city_zones
+from modules.green_vegetation.vegetation_rasters import get_vegetation_rasters
+from modules.nasa_data.simulation import as_day
+from config.nasa_apis import AQ_FORECAST, FIRMS_INGEST, GRACE_GRID, GREEN_PROXIMITY, MODIS_TILES, POLLUTION_MAP, ZONES
 
 app = FastAPI(
     title="Healthy City Intelligence Platform",
@@ -39,88 +64,480 @@ app.include_router(waste_router, prefix="/api/waste", tags=["Waste Management"])
 app.include_router(disaster_router, prefix="/api/disaster", tags=["Disaster Management"])
 app.include_router(citizen_router, prefix="/api/citizen", tags=["Citizen Engagement"])
 app.include_router(auth_router, prefix="/api/auth", tags=["Auth"])
+app.include_router(tiles_router, prefix="/api/tiles", tags=["Map Tiles"])
+app.include_router(composites_router, prefix="/api/composites", tags=["Composite Indices"])
 
 # Initialize NASA data clients
 firms_client = FIRMSClient()
 modis_client = MODISClient()
 grace_client = GRACEClient()
+pollution_engine = PollutionGridEngine()
+
+# FIRMS detections are ingested in the background and served from local disk
+fire_store = FireDetectionStore()
+fire_events = FireEventTracker()
+firms_ingestor = FIRMSIngestor(firms_client, fire_store, tracker=fire_events)
+
+@app.on_event("startup")
+async def init_database():
+    """Create the report and user tables once, before any request reaches them"""
+    try:
+        init_db()
+    except SQLAlchemyError as e:
+        print(f"Database unavailable, citizen reports stay in memory: {e}")
+
+@app.on_event("startup")
+async def start_firms_ingest():
+    """Start background FIRMS polling"""
+    if FIRMS_INGEST["enabled"]:
+        firms_ingestor.start()
+
+@app.on_event("startup")
+async def start_forecast_refresh():
+    """Start the scheduled air quality forecast refresh"""
+    if AQ_FORECAST["enabled"]:
+        air_quality_service.forecaster.start()
+
+@app.on_event("shutdown")
+async def close_http_client():
+    """Stop background jobs and release pooled upstream connections"""
+    await firms_ingestor.stop()
+    await air_quality_service.forecaster.stop()
+    await get_http_client().aclose()
+
+def parse_bbox(bbox: str) -> tuple:
+    """Parse "minLon,minLat,maxLon,maxLat"; minLon > maxLon means the box crosses the antimeridian"""
+    try:
+        box = tuple(float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be four numbers: minLon,minLat,maxLon,maxLat")
+    if len(box) != 4 or not (-180 <= box[0] <= 180 and -180 <= box[2] <= 180 and -90 <= box[1] <= box[3] <= 90):
+        raise HTTPException(status_code=400, detail="bbox must be minLon,minLat,maxLon,maxLat in degrees")
+    return box
+
+def parse_locations(body: Dict, limit: int) -> list:
+    """(lat, lon) pairs from {"locations": [{"lat": .., "lon": ..}, ...]}"""
+    try:
+        locations = [(float(loc["lat"]), float(loc["lon"])) for loc in body.get("locations", [])]
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="locations must be [{\"lat\": .., \"lon\": ..}, ...]")
+    if not locations or len(locations) > limit:
+        raise HTTPException(status_code=400, detail=f"between 1 and {limit} locations are required")
+    if not all(-90 <= lat <= 90 and -180 <= lon <= 180 for lat, lon in locations):
+        raise HTTPException(status_code=400, detail="lat must be in [-90, 90] and lon in [-180, 180]")
+    return locations
+
+def parse_geojson_points(collection: Dict, limit: int) -> tuple:
+    """Feature ids and (lat, lon) of Point features, or of Polygon/MultiPolygon centroids, in a FeatureCollection"""
+    ids, locations = [], []
+    try:
+        for i, feature in enumerate(collection.get("features", [])):
+            geometry = feature["geometry"]
+            if geometry["type"] == "Point":
+                lon, lat = geometry["coordinates"][:2]
+            elif geometry["type"] in ("Polygon", "MultiPolygon"):
+                polygons = [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+                # Area-weighted centroid of the outer rings
+                area = cx = cy = 0.0
+                for polygon in polygons:
+                    ring = np.asarray(polygon[0], dtype=np.float64)[:, :2]
+                    x, y = ring[:, 0], ring[:, 1]
+                    cross = x * np.roll(y, -1) - np.roll(x, -1) * y
+                    area += cross.sum() / 2
+                    cx += ((x + np.roll(x, -1)) * cross).sum() / 6
+                    cy += ((y + np.roll(y, -1)) * cross).sum() / 6
+                lon, lat = cx / area, cy / area
+            else:
+                continue
+            ids.append((feature.get("properties") or {}).get("id", feature.get("id", i)))
+            locations.append((float(lat), float(lon)))
+    except (AttributeError, KeyError, IndexError, TypeError, ValueError, ZeroDivisionError):
+        raise HTTPException(status_code=400, detail="geojson must be a FeatureCollection of Point or Polygon features")
+    return ids, parse_locations({"locations": [{"lat": lat, "lon": lon} for lat, lon in locations]}, limit)
 
 @app.get("/api/nasa/fires")
-async def get_nasa_fires():
-    """Get real-time fire data from NASA FIRMS"""
-    fires = await firms_client.get_active_fires()
-    stats = await firms_client.get_fire_statistics()
-    return {"fires": fires, "statistics": stats}
+async def get_nasa_fires(offset: int = Query(0, ge=0), limit: int = Query(1000, ge=1, le=10000),
+                         sensor: Optional[str] = None,
+                         bbox: Optional[str] = Query(None, description="minLon,minLat,maxLon,maxLat"),
+                         lat: Optional[float] = Query(None, ge=-90, le=90),
+                         lon: Optional[float] = Query(None, ge=-180, le=180),
+                         radius_km: Optional[float] = Query(None, gt=0, le=20000)):
+    """Get NASA FIRMS fire detections from the local store, one page at a time
+
+    Pass bbox for a map viewport, or lat/lon/radius_km for fires near a point (nearest first).
+    """
+    sensors = [sensor] if sensor else None
+    if bbox is not None:
+        fires = fire_store.query(sensors, bbox=parse_bbox(bbox))
+    elif lat is not None or lon is not None or radius_km is not None:
+        if lat is None or lon is None or radius_km is None:
+            raise HTTPException(status_code=400, detail="lat, lon and radius_km must be given together")
+        fires = fire_store.query(sensors, center=(lat, lon), radius_km=radius_km)
+    else:
+        fires = fire_store.read(sensors)
+    stats = firms_client.summarize_fires(fires)
+    next_offset = offset + limit if offset + limit < len(fires) else None
+    return {
+        "fires": fires.page(offset, limit),
+        "total": len(fires),
+        "offset": offset,
+        "limit": limit,
+        "next_offset": next_offset,
+        "statistics": stats
+    }
+
+@app.get("/api/nasa/fires/events")
+async def get_fire_events(status: Optional[str] = Query("active", pattern="^(active|closed|all)$"),
+                          bbox: Optional[str] = Query(None, description="minLon,minLat,maxLon,maxLat"),
+                          limit: int = Query(100, ge=1, le=5000)):
+    """Fire events (clustered detections), most intense first"""
+    box = parse_bbox(bbox) if bbox is not None else None
+    events = fire_events.list_events(None if status == "all" else status, box, limit)
+    return {"events": events, "count": len(events), "tracker": fire_events.stats()}
+
+@app.get("/api/nasa/fires/events/{event_id}")
+async def get_fire_event(event_id: str):
+    """One fire event with its per-pass growth history; merged IDs resolve to the surviving event"""
+    event = fire_events.get(event_id)
+    if event is None:
+        raise HTTPException(status_code=404, detail="Fire event not found")
+    return event
+
+@app.get("/api/nasa/fires/ingest-status")
+async def get_fire_ingest_status():
+    """FIRMS ingestion schedule, last poll results and store contents"""
+    return firms_ingestor.status()
 
 @app.get("/api/nasa/vegetation/{lat}/{lon}")
-async def get_nasa_vegetation(lat: float, lon: float):
+async def get_nasa_vegetation(lat: float, lon: float, request: Request):
     """Get vegetation data from NASA MODIS"""
     ndvi_data = await modis_client.get_ndvi_data(lat, lon)
     land_cover = await modis_client.get_land_cover_data(lat, lon)
-    return {"ndvi": ndvi_data, "land_cover": land_cover}
+    return etag_json(request, {"ndvi": ndvi_data, "land_cover": land_cover})
+
+@app.post("/api/nasa/vegetation/batch")
+async def get_nasa_vegetation_batch(body: Dict):
+    """NDVI/EVI series for many points as columnar arrays
+
+    Body: {"locations": [{"lat": .., "lon": ..}]} or {"geojson": FeatureCollection of points or field
+    polygons (their centroids)}, plus optional "start"/"end" dates and "interval": "composite" | "month".
+    """
+    limit = MODIS_TILES["max_batch_points"]
+    if "geojson" in body:
+        ids, locations = parse_geojson_points(body["geojson"], limit)
+    else:
+        locations = parse_locations(body, limit)
+        ids = list(range(len(locations)))
+    try:
+        end = date.fromisoformat(body["end"]) if body.get("end") else as_day(None)
+        start = date.fromisoformat(body["start"]) if body.get("start") else end - timedelta(days=MODIS_TILES["window_days"])
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="start and end must be YYYY-MM-DD dates")
+    if not 0 <= (end - start).days <= MODIS_TILES["max_batch_days"]:
+        raise HTTPException(status_code=400, detail=f"end must follow start by at most {MODIS_TILES['max_batch_days']} days")
+    interval = body.get("interval", "composite")
+    if interval not in ("composite", "month"):
+        raise HTTPException(status_code=400, detail="interval must be 'composite' or 'month'")
+
+    def build() -> Response:
+        lat, lon = np.array(locations).T
+        batch = modis_client.get_ndvi_batch(lat, lon, start, end)
+        dates, ndvi, evi = batch["dates"], batch["ndvi"], batch["evi"]
+        if interval == "month":
+            months, ndvi = monthly_means(dates, ndvi)
+            _, evi = monthly_means(dates, evi)
+            dates = months
+        # One row per point, NaN (masked or missing composites) as null
+        series = {}
+        for name, values in (("ndvi", ndvi), ("evi", evi)):
+            rows = values.T.round(4).astype(object)
+            rows[np.isnan(values.T)] = None
+            series[name] = rows.tolist()
+        payload = {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "interval": interval,
+            "dates": dates.astype(str).tolist(),
+            "points": {"id": ids, "lat": lat.tolist(), "lon": lon.tolist(), "source": batch["source"].tolist()},
+            **series
+        }
+        # Plain json.dumps; jsonable_encoder walks every value of the nested series
+        return Response(content=json.dumps(payload, separators=(",", ":")), media_type="application/json")
+
+    # One vectorized pass over all points, off the event loop
+    return await asyncio.to_thread(build)
+
+@app.post("/api/vegetation/proximity/batch")
+async def get_green_proximity_batch(body: Dict):
+    """Green space proximity for many addresses as columnar arrays, with a summary over all of them
+
+    Body: {"locations": [{"lat": .., "lon": ..}]} or {"geojson": FeatureCollection of address points},
+    e.g. every address in a ward.
+    """
+    limit = GREEN_PROXIMITY["max_batch_points"]
+    if "geojson" in body:
+        ids, locations = parse_geojson_points(body["geojson"], limit)
+    else:
+        locations = parse_locations(body, limit)
+        ids = list(range(len(locations)))
+
+    def build() -> Response:
+        lat, lon = np.array(locations).T
+        p = get_green_proximity().lookup(lat, lon)
+        access_m = GREEN_PROXIMITY["access_m"]
+        covered = p["covered"]
+        has_space = p["space"] >= 0
+        within = covered & has_space & (p["distance_m"] <= access_m)
+        score = access_score(np.where(has_space, p["distance_m"], np.inf), np.nan_to_num(p["green_share"]), access_m)
+
+        def column(values: np.ndarray, digits: int, mask: np.ndarray) -> list:
+            out = np.round(values, digits).astype(object)
+            out[~mask | ~np.isfinite(values)] = None
+            return out.tolist()
+
+        payload = {
+            "points": {"id": ids, "lat": lat.tolist(), "lon": lon.tolist(), "city": p["city"].tolist()},
+            "distance_to_green_space_m": column(p["distance_m"], 1, has_space),
+            "nearest_green_space": {
+                "id": np.where(has_space, p["space"] + 1, 0).tolist(),
+                "lat": column(p["space_lat"], 5, has_space),
+                "lon": column(p["space_lon"], 5, has_space),
+                "area_hectares": column(p["space_area_ha"], 2, has_space)
+            },
+            "green_area_hectares": column(p["green_ha"], 2, covered),
+            "green_share": column(p["green_share"], 4, covered),
+            f"within_{access_m}m": np.where(covered, within, None).tolist(),
+            "access_score": column(score, 3, covered),
+            "radius_m": GREEN_PROXIMITY["radius_m"],
+            "summary": {
+                "points": len(ids),
+                "covered": int(covered.sum()),
+                f"within_{access_m}m_percent": round(float(within.sum() / covered.sum() * 100), 1) if covered.any() else None,
+                "median_distance_m": round(float(np.median(p["distance_m"][covered & has_space])), 1)
+                if (covered & has_space).any() else None,
+                "mean_green_share": round(float(np.nanmean(p["green_share"][covered])), 4)
+                if np.isfinite(p["green_share"][covered]).any() else None
+            }
+        }
+        return Response(content=json.dumps(payload, separators=(",", ":")), media_type="application/json")
+
+    # Array lookups into the per-city proximity layers for all points, off the event loop
+    return await asyncio.to_thread(build)
+
+@app.get("/api/nasa/water/regions")
+async def get_nasa_water_regions():
+    """Regions available for water balance aggregation"""
+    return {"regions": await asyncio.to_thread(grace_client.regions)}
+
+@app.get("/api/nasa/water/regions/{region}")
+async def get_nasa_water_balance(region: str, request: Request):
+    """Area-weighted GRACE water balance over a region polygon"""
+    balance = await grace_client.get_regional_water_balance(region)
+    return etag_json(request, balance)
 
 @app.get("/api/nasa/water/{lat}/{lon}")
-async def get_nasa_water(lat: float, lon: float):
+async def get_nasa_water(lat: float, lon: float, request: Request):
     """Get groundwater data from NASA GRACE"""
     groundwater = await grace_client.get_groundwater_data(lat, lon)
-    return groundwater
+    return etag_json(request, groundwater)
+
+@app.post("/api/nasa/water/batch")
+async def get_nasa_water_batch(body: Dict):
+    """GRACE storage for many locations: {"locations": [{"lat": .., "lon": ..}], "include_series": false}"""
+    locations = parse_locations(body, GRACE_GRID["max_batch_points"])
+
+    def build() -> Dict:
+        lat, lon = np.array(locations).T
+        batch = grace_client.get_groundwater_batch(lat, lon)
+        return grace_client.batch_results(batch, lat, lon, bool(body.get("include_series", False)))
+
+    # One bilinear lookup over the memory-mapped grid for all points, off the event loop
+    return await asyncio.to_thread(build)
 
 @app.get("/api/nasa/pollution/{lat}/{lon}")
-async def get_nasa_pollution(lat: float, lon: float, radius: float = 0.5):
-    """Get pollution data from NASA OMI satellite"""
-    import numpy as np
-    from datetime import datetime
-    
-    # Generate realistic pollution data based on NASA OMI patterns
-    pollution_points = []
-    
-    # Create grid around location
-    for i in range(20):
-        for j in range(20):
-            point_lat = lat + (i - 10) * 0.01
-            point_lon = lon + (j - 10) * 0.01
-            
-            # Simulate NO2 levels from NASA OMI data
-            base_no2 = 15  # Background level
-            
-            # Higher pollution near urban centers
-            urban_factor = 1.0
-            if abs(point_lat - 28.6139) < 0.1 and abs(point_lon - 77.2090) < 0.1:  # Delhi
-                urban_factor = 3.5
-            elif abs(point_lat - 19.0760) < 0.1 and abs(point_lon - 72.8777) < 0.1:  # Mumbai
-                urban_factor = 2.8
-            
-            no2_level = base_no2 * urban_factor + np.random.uniform(-5, 15)
-            
-            # Convert to AQI equivalent
-            aqi = min(500, max(0, no2_level * 2.5))
-            
-            pollution_points.append({
-                "lat": point_lat,
-                "lon": point_lon,
-                "no2": max(0, no2_level),
-                "aqi": int(aqi),
-                "intensity": min(1.0, aqi / 200)
-            })
-    
-    return {
+async def get_nasa_pollution(lat: float, lon: float, request: Request,
+                             radius: float = Query(0.1, gt=0, le=20, description="half-width of the grid in degrees"),
+                             resolution: int = Query(20, ge=1, le=1000, description="cells per side"),
+                             bbox: Optional[str] = Query(None, description="minLon,minLat,maxLon,maxLat; overrides radius"),
+                             format: str = Query("json", pattern="^(json|npy)$"),
+                             layout: str = Query("points", pattern="^(points|columns)$")):
+    """Get pollution data from NASA OMI satellite
+
+    layout=columns returns "grid" as row lats, column lons and flat row-major values
+    instead of one dict per cell. format=npy returns the grid as an NPY structured
+    array (no2 float32, aqi uint16), north-west cell first, with its extent in the
+    X-Grid-Bounds header.
+    """
+    bounds = parse_bbox(bbox) if bbox is not None else (lon - radius, lat - radius, lon + radius, lat + radius)
+
+    def build() -> Response:
+        result = pollution_engine.compute(bounds, (resolution, resolution))
+        if format == "npy":
+            return Response(
+                content=pollution_engine.to_npy(result),
+                media_type="application/octet-stream",
+                headers={"X-Grid-Bounds": ",".join(f"{v:.6f}" for v in bounds),
+                         "X-Grid-Shape": f"{resolution},{resolution}"}
+            )
+        payload = {
+            "location": {"lat": lat, "lon": lon},
+            "timestamp": datetime.combine(as_day(), datetime.min.time()).isoformat(),
+            "data_source": "NASA OMI NO2 Satellite Data",
+            "bounds": list(bounds),
+            "shape": [resolution, resolution],
+            "monitoring_stations": pollution_engine.stations(lat, lon)
+        }
+        if layout == "columns":
+            payload["grid"] = pollution_engine.to_columns(result)
+        else:
+            payload["pollution_grid"] = pollution_engine.to_points(result)
+        return etag_json(request, payload)
+
+    # Large grids take long enough to stall other requests, so build off the event loop
+    return await asyncio.to_thread(build)
+
+@app.get("/api/nasa/passes/{lat}/{lon}")
+async def get_nasa_passes(lat: float, lon: float, request: Request,
+                          day: Optional[date] = Query(None, description="UTC day; default is the next passes from now"),
+                          count: int = Query(4, ge=1, le=50, description="number of passes when day is omitted")):
+    """Predicted overpasses of the configured NASA/NOAA satellites from the local TLE sets"""
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise HTTPException(status_code=400, detail="lat must be in [-90, 90] and lon in [-180, 180]")
+    predictor = get_pass_predictor()
+    if day is None:
+        passes = await asyncio.to_thread(predictor.next_passes, lat, lon, count)
+    else:
+        passes = (await asyncio.to_thread(predictor.passes, [(lat, lon)], day))[0]
+    return etag_json(request, {
         "location": {"lat": lat, "lon": lon},
-        "timestamp": datetime.now().isoformat(),
-        "data_source": "NASA OMI NO2 Satellite Data",
-        "pollution_grid": pollution_points,
-        "monitoring_stations": [
-            {"lat": lat + 0.02, "lon": lon + 0.02, "aqi": int(np.random.uniform(80, 180)), "type": "Industrial"},
-            {"lat": lat - 0.01, "lon": lon + 0.03, "aqi": int(np.random.uniform(50, 120)), "type": "Residential"},
-            {"lat": lat + 0.03, "lon": lon - 0.02, "aqi": int(np.random.uniform(100, 250)), "type": "Traffic"},
-            {"lat": lat - 0.02, "lon": lon - 0.01, "aqi": int(np.random.uniform(30, 80)), "type": "Park"}
-        ]
+        "day": day.isoformat() if day else None,
+        "passes": [predictor.describe(p) for p in passes]
+    })
+
+@app.post("/api/nasa/passes/batch")
+async def get_nasa_passes_batch(body: Dict):
+    """Passes on one UTC day for many locations: {"locations": [{"lat": .., "lon": ..}], "day": "YYYY-MM-DD"}"""
+    locations = parse_locations(body, 10000)
+    try:
+        day = date.fromisoformat(body["day"]) if body.get("day") else as_day()
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="day must be YYYY-MM-DD")
+    predictor = get_pass_predictor()
+    # Distinct grid cells are computed together in one batch off the event loop
+    passes = await asyncio.to_thread(predictor.passes, locations, day)
+    return {
+        "day": day.isoformat(),
+        "results": [{"location": {"lat": lat, "lon": lon}, "passes": [predictor.describe(p) for p in per_location]}
+                    for (lat, lon), per_location in zip(locations, passes)]
     }
 
+@app.get("/api/nasa/cubes")
+async def get_cube_status():
+    """Ingested gridded products (OMI, SMAP, GPM, GRACE, MODIS) and chunk cache usage"""
+    return await asyncio.to_thread(get_cube_store().status)
+
+@app.get("/api/nasa/modis/tiles")
+async def get_modis_tile_status():
+    """Ingested MOD13Q1/MYD13Q1 tiles and tile cache usage"""
+    return await asyncio.to_thread(get_modis_tiles().status)
+
+@app.get("/api/nasa/cubes/{product}/{variable}/{lat}/{lon}")
+async def get_cube_series(product: str, variable: str, lat: float, lon: float, request: Request,
+                          start: Optional[date] = None, end: Optional[date] = None):
+    """Time series of an ingested product variable at one location"""
+    try:
+        series = await asyncio.to_thread(get_cube_store().point, product, variable, lat, lon, start, end)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if series is None:
+        raise HTTPException(status_code=404, detail=f"no {product} {variable} data has been ingested")
+    return etag_json(request, {
+        "product": product,
+        "variable": variable,
+        "location": {"lat": lat, "lon": lon},
+        "series": [{"date": str(t), "value": None if np.isnan(v) else round(float(v), 6)}
+                   for t, v in zip(series["times"], series["values"])]
+    })
+
+@app.get("/api/nasa/cubes/{product}/{variable}/regions")
+async def get_cube_regions(product: str, variable: str, request: Request,
+                           start: Optional[date] = None, end: Optional[date] = None):
+    """Area-weighted mean of an ingested product variable over each region, for every time step"""
+    def build() -> Optional[Dict]:
+        cube = get_cube_store().cube(product, variable)
+        if cube is None:
+            return None
+        times, slots = cube.slots(start, end)
+        masks = get_region_masks(cube.manifest["grid"])
+        return {"times": times, "regions": masks.describe(), "values": masks.cube_means(cube, slots)}
+
+    try:
+        result = await asyncio.to_thread(build)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"no {product} {variable} data has been ingested")
+    dates = [str(t) for t in result["times"]]
+    return etag_json(request, {
+        "product": product,
+        "variable": variable,
+        "regions": [{**region, "series": [{"date": d, "value": None if np.isnan(v) else round(float(v), 6)}
+                                          for d, v in zip(dates, values)]}
+                    for region, values in zip(result["regions"], result["values"])]
+    })
+
 # Mount static files
 frontend_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend")
 if os.path.exists(frontend_path):
     app.mount("/static", StaticFiles(directory=frontend_path), name="static")
 
+@app.get("/api/nasa/zones/{city}")
+async def get_city_zone_stats(city: str, request: Request):
+    """Air quality and vegetation statistics for each ward/district of a city, from the hour's city grids"""
+    key = city.strip().lower()
+    if key not in POLLUTION_MAP["cities"]:
+        raise HTTPException(status_code=404, detail=f"unknown city '{city}'")
+    zones = await asyncio.to_thread(get_city_zones().get, key)
+    pollution = await air_quality_service.generate_pollution_map(key, grid_size=zones.shape[0])
+
+    def build() -> Dict:
+        layers = {"aqi": np.asarray(pollution["grid_data"], dtype=np.float64),
+                  "no2": np.asarray(pollution["pollutants"]["no2"], dtype=np.float64),
+                  "pm25": np.asarray(pollution["pollutants"]["pm25"], dtype=np.float64)}
+        rasters = get_vegetation_rasters()
+        scene = rasters.find(zones.bounds)
+        if scene is not None:
+            cells = rasters.sample_grid(scene["scene"], zones.bounds, zones.shape)
+            layers["ndvi"], layers["green_cover"] = cells["mean"], cells["green"]
+        stats = zones.stats(layers, ZONES["percentiles"])
+        population = get_population_raster()
+        people = population.grid(zones.bounds, zones.shape)
+        residents = {}
+        if people is not None:
+            # People per zone and the AQI they breathe on average, from one bincount each
+            count = np.bincount(zones.labels.ravel(), weights=people["people"].ravel(), minlength=len(zones.ids) + 1)[1:]
+            exposure = np.bincount(zones.labels.ravel(), weights=(people["people"] * layers["aqi"]).ravel(),
+                                   minlength=len(zones.ids) + 1)[1:]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                weighted = exposure / count
+            residents = {z: {"population": int(round(count[z])),
+                             "population_weighted_aqi": None if np.isnan(weighted[z]) else round(float(weighted[z]), 1)}
+                         for z in range(len(zones.ids))}
+        return {
+            "city": POLLUTION_MAP["cities"][key]["name"],
+            "timestamp": pollution["timestamp"],
+            "vegetation_scene": scene["scene"] if scene else None,
+            "population_raster": os.path.basename(population.meta()["source"]) if people is not None else None,
+            "grid": {"bounds": zones.bounds, "shape": list(zones.shape)},
+            "zones": [{**zone, **residents.get(z, {}),
+                       **{name: {k: None if np.isnan(v[z]) else round(float(v[z]), 4)
+                                 for k, v in layer.items() if k != "count"}
+                          for name, layer in stats.items()}}
+                      for z, zone in enumerate(zones.describe())]
+        }
+
+    return etag_json(request, await asyncio.to_thread(build))
+
 @app.get("/")
 async def root():
     """Serve the main frontend page"""
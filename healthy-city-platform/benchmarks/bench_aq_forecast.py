@@ -0,0 +1,70 @@
+"""
+Air quality forecasts: per-request computation vs the precomputed per-cell cache
+
+Times a full refresh (history backfill and Holt-Winters fit for every cell),
+a same-day refresh (nothing changed), and single-location requests served
+from the cache vs computed on the fly.
+
+    python benchmarks/bench_aq_forecast.py --requests 2000
+"""
+
+import argparse
+import asyncio
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.weather_air_quality.forecast import AirQualityForecaster
+from modules.weather_air_quality.services import AirQualityService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=7)
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix="aq_forecast_")
+    try:
+        service = AirQualityService()
+        forecaster = AirQualityForecaster(service.simulate_pollutants, {"cache_dir": cache_dir})
+        full = forecaster.refresh()
+        noop = forecaster.refresh()
+        print(f"grid {forecaster.shape[0]}x{forecaster.shape[1]}")
+        print(f"full refresh:     {full['seconds']:.3f} s, {full['cells_refit']:,} cells refit")
+        print(f"same-day refresh: {noop['seconds']:.3f} s, {noop['cells_refit']:,} cells refit")
+
+        rng = np.random.default_rng(0)
+        points = list(zip(rng.uniform(8, 35, args.requests), rng.uniform(70, 95, args.requests)))
+
+        # The uncached path, as get_forecast runs it outside the grid
+        service.forecaster = AirQualityForecaster(service.simulate_pollutants, {"cache_dir": cache_dir + "-none"})
+
+        async def computed():
+            for lat, lon in points:
+                await service.get_forecast(lat, lon, args.days)
+
+        start = time.perf_counter()
+        asyncio.run(computed())
+        computed_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for lat, lon in points:
+            forecaster.lookup(lat, lon, args.days)
+        cached_s = time.perf_counter() - start
+
+        print(f"{'request path':<14}{'us/request':>12}")
+        print(f"{'computed':<14}{computed_s / args.requests * 1e6:>12.1f}")
+        print(f"{'cached':<14}{cached_s / args.requests * 1e6:>12.1f}")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+EPA AQI over a pollutant grid: per-cell breakpoint lookup loop vs the vectorized engine
+
+Both apply the same tables in modules/weather_air_quality/aqi.py; the loop
+walks them cell by cell and pollutant by pollutant.
+
+    python benchmarks/bench_aqi.py --cells 1000000
+"""
+
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.weather_air_quality.aqi import BREAKPOINTS, DECIMALS, compute_aqi
+
+LOOP_MAX_CELLS = 200_000
+
+
+def loop_aqi(concentrations):
+    names = list(concentrations)
+    cells = len(concentrations[names[0]])
+    aqi = np.empty(cells, dtype=np.int64)
+    for i in range(cells):
+        best = -1.0
+        for name in names:
+            scale = 10 ** DECIMALS[name]
+            c = math.floor(max(float(concentrations[name][i]), 0) * scale + 1e-9) / scale
+            index = 500.0
+            for c_lo, c_hi, i_lo, i_hi in BREAKPOINTS[name]:
+                if c <= c_hi:
+                    index = (i_hi - i_lo) / (c_hi - c_lo) * (max(c, c_lo) - c_lo) + i_lo
+                    break
+            best = max(best, index)
+        aqi[i] = round(best)
+    return aqi
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--cells", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    concentrations = {
+        "pm25": rng.uniform(0, 250, args.cells), "pm10": rng.uniform(0, 400, args.cells),
+        "no2": rng.uniform(0, 300, args.cells), "so2": rng.uniform(0, 200, args.cells),
+        "co": rng.uniform(0, 15, args.cells), "o3": rng.uniform(0, 150, args.cells)
+    }
+    print(f"{args.cells:,} cells x {len(concentrations)} pollutants")
+    print(f"{'method':<12}{'time s':>10}{'cells/s':>14}")
+
+    start = time.perf_counter()
+    vectorized = compute_aqi(concentrations)["aqi"]
+    engine_s = time.perf_counter() - start
+
+    loop_cells = min(args.cells, LOOP_MAX_CELLS)
+    start = time.perf_counter()
+    looped = loop_aqi({name: values[:loop_cells] for name, values in concentrations.items()})
+    loop_s = time.perf_counter() - start
+
+    print(f"{'loop':<12}{loop_s:>10.3f}{loop_cells / loop_s:>14,.0f}  ({loop_cells:,} cells)")
+    print(f"{'vectorized':<12}{engine_s:>10.3f}{args.cells / engine_s:>14,.0f}")
+    print(f"loop and vectorized agree: {np.array_equal(looped, vectorized[:loop_cells])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Green corridors: patch labelling, gap graph and corridor extraction on a city-sized NDVI raster
+Generates a fragmented synthetic NDVI field and times each stage of the analysis; --check compares the
+gap graph against a brute-force pass over every pair of patches on a smaller crop.
+
+    python benchmarks/bench_corridors.py --size 6000
+    python benchmarks/bench_corridors.py --check --check-size 1500 --max-gap-m 150
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from scipy import ndimage
+from scipy.spatial import cKDTree
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.green_vegetation.corridors import corridor_network, green_patches, patch_graph
+
+
+def synthetic_ndvi(size: int) -> np.ndarray:
+    """Smoothed noise thresholded to ~20% cover gives parks, tree lines and small gardens at many scales"""
+    rng = np.random.default_rng(0)
+    field = ndimage.zoom(rng.normal(size=(size // 20, size // 20)), 20, order=1)[:size, :size]
+    return (0.15 + 0.25 * field + rng.normal(0, 0.05, field.shape)).astype(np.float32)
+
+
+def brute_force_gaps(ndvi: np.ndarray, pixel_m: float, max_gap_m: float) -> dict:
+    """{(i, j): gap_m} for every patch pair closer than max_gap_m, comparing all pixels of both patches"""
+    labels, pixels = green_patches(ndvi, pixel_m, 0.3, 0.5)
+    boxes = ndimage.find_objects(labels)
+    points = [np.argwhere(labels[box] == n + 1) + [box[0].start, box[1].start] for n, box in enumerate(boxes)]
+    trees = [cKDTree(p) for p in points]
+    reach = max_gap_m / pixel_m + 1
+    gaps = {}
+    for i, a in enumerate(boxes):
+        for j in range(i + 1, len(boxes)):
+            b = boxes[j]
+            # Bounding boxes further apart than the gap cannot hold a closer pixel pair
+            dr = max(0, max(a[0].start, b[0].start) - min(a[0].stop, b[0].stop) + 1)
+            dc = max(0, max(a[1].start, b[1].start) - min(a[1].stop, b[1].stop) + 1)
+            if np.hypot(dr, dc) > reach:
+                continue
+            distance, _ = trees[j].query(points[i])
+            gap = max(distance.min() - 1, 0) * pixel_m
+            if gap <= max_gap_m:
+                gaps[(i, j)] = gap
+    return gaps
+
+
+def check(size: int, pixel_m: float, max_gap_m: float):
+    ndvi = synthetic_ndvi(size)
+    graph = patch_graph(ndvi, pixel_m, 0.3, {"max_gap_m": max_gap_m})
+    found = {(int(i), int(j)): float(g) for (i, j), g in zip(graph["edges"], graph["gap_m"])}
+    expected = brute_force_gaps(ndvi, pixel_m, max_gap_m)
+    missing = sorted(set(expected) - set(found))
+    extra = sorted(set(found) - set(expected))
+    wrong = [k for k in set(found) & set(expected) if abs(found[k] - expected[k]) > 1e-6]
+    print(f"check on {size}x{size} at max gap {max_gap_m:g} m: {graph['patches']:,} patches, "
+          f"{len(expected):,} brute-force links, {len(found):,} found")
+    for i, j in missing[:5]:
+        print(f"  missing link {i}-{j}, gap {expected[(i, j)]:.0f} m")
+    for i, j in extra[:5]:
+        print(f"  extra link {i}-{j}, gap {found[(i, j)]:.0f} m")
+    for i, j in wrong[:5]:
+        print(f"  link {i}-{j} gap {found[(i, j)]:.1f} m, brute force {expected[(i, j)]:.1f} m")
+    if missing or extra or wrong:
+        raise SystemExit(f"{len(missing)} missing, {len(extra)} extra, {len(wrong)} wrong gaps")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--size", type=int, default=6000, help="raster pixels per side")
+    parser.add_argument("--pixel-m", type=float, default=10.0)
+    parser.add_argument("--max-gap-m", type=float, default=250.0)
+    parser.add_argument("--check", action="store_true", help="compare the gap graph with a brute-force pass first")
+    parser.add_argument("--check-size", type=int, default=1500, help="raster pixels per side for --check")
+    args = parser.parse_args()
+
+    if args.check:
+        check(args.check_size, args.pixel_m, args.max_gap_m)
+
+    ndvi = synthetic_ndvi(args.size)
+    print(f"{args.size}x{args.size} raster ({args.size ** 2 / 1e6:.0f}M pixels) at {args.pixel_m:g} m, "
+          f"{(ndvi >= 0.3).mean() * 100:.1f}% green")
+
+    start = time.perf_counter()
+    graph = patch_graph(ndvi, args.pixel_m, 0.3, {"max_gap_m": args.max_gap_m})
+    graph_s = time.perf_counter() - start
+    start = time.perf_counter()
+    network = corridor_network(graph, 10)
+    network_s = time.perf_counter() - start
+
+    print(f"{'stage':<34}{'seconds':>10}")
+    print(f"{'label + k-d tree gap graph':<34}{graph_s:>10.2f}")
+    print(f"{'components, MST, backbones':<34}{network_s:>10.2f}")
+    print(f"{graph['patches']:,} patches, {len(graph['edges']):,} gap links, "
+          f"{len(network['network_area_m2']):,} networks, connectivity {network['connectivity']:.3f}")
+    for c in network["corridors"][:3]:
+        print(f"  corridor over {len(c['path'])} patches, {c['length_m'] / 1000:.1f} km, "
+              f"network of {c['patches']} patches")
+
+
+if __name__ == "__main__":
+    main()
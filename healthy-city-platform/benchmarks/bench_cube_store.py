@@ -0,0 +1,121 @@
+"""
+Gridded cube reads: point/bbox/time-slice from per-day granules vs the chunked cube store
+
+Writes synthetic daily NetCDF-style granules (one HDF5 file per day, as OMI,
+SMAP and GPM are distributed), ingests them, and times the same reads against
+the granule files and against the store, cold and with warm chunks.
+
+    python benchmarks/bench_cube_store.py --days 64 --cell 0.25 --points 200
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.nasa_data.cube_store import CubeStore
+
+INDIA = (68.0, 6.0, 98.0, 37.0)
+
+
+def write_granules(directory: str, days: int, cell: float):
+    lat = np.arange(-90 + cell / 2, 90, cell)
+    lon = np.arange(-180 + cell / 2, 180, cell)
+    rng = np.random.default_rng(0)
+    # Smooth field plus noise, missing over part of the globe, like a daily L3 product
+    base = (np.sin(np.radians(lat))[:, None] * np.cos(np.radians(lon))[None, :] * 50 + 100).astype(np.float32)
+    paths = []
+    for i in range(days):
+        values = base + rng.normal(0, 5, base.shape).astype(np.float32)
+        values[rng.random(base.shape) < 0.3] = -9999
+        path = f"{directory}/granule_{i:04d}.nc"
+        with h5py.File(path, "w") as f:
+            f["lat"], f["lon"] = lat, lon
+            time_ = f.create_dataset("time", data=[i])
+            time_.attrs["units"] = "days since 2024-01-01"
+            data = f.create_dataset("value", data=values)
+            data.attrs["_FillValue"] = np.float32(-9999)
+        paths.append(path)
+    return paths, lat, lon
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--days", type=int, default=64)
+    parser.add_argument("--cell", type=float, default=0.25)
+    parser.add_argument("--points", type=int, default=200)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="cube_bench_")
+    try:
+        paths, lat, lon = write_granules(directory, args.days, args.cell)
+        settings = {"products": {"BENCH": {"grid": (-180.0, -90.0, 180.0, 90.0, args.cell), "variables": {"value": "value"},
+                                           "lat": "lat", "lon": "lon", "time": "time"}}}
+        start = time.perf_counter()
+        store = CubeStore(f"{directory}/store", settings)
+        store.ingest("BENCH", paths)
+        ingest_s = time.perf_counter() - start
+        info = store.cube("BENCH", "value").info()
+        raw = args.days * len(lat) * len(lon) * 4
+        print(f"{args.days} days of {len(lat)}x{len(lon)}: ingest {ingest_s:.2f} s, "
+              f"{info['bytes_on_disk'] / 2 ** 20:.1f} MB on disk ({raw / 2 ** 20:.1f} MB raw)")
+
+        rng = np.random.default_rng(1)
+        points = list(zip(rng.uniform(-60, 60, args.points), rng.uniform(-180, 180, args.points)))
+        last = (date(2024, 1, 1) + timedelta(days=args.days - 1)).isoformat()
+        rows = np.flatnonzero((lat >= INDIA[1]) & (lat <= INDIA[3]))
+        cols = np.flatnonzero((lon >= INDIA[0]) & (lon <= INDIA[2]))
+
+        def granule_point(p_lat, p_lon):
+            i, j = int((p_lat + 90) // args.cell), int((p_lon + 180) // args.cell)
+            series = []
+            for path in paths:
+                with h5py.File(path, "r") as f:
+                    series.append(f["value"][i, j])
+            return series
+
+        def granule_bbox():
+            with h5py.File(paths[-1], "r") as f:
+                return f["value"][rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+        def granule_slice():
+            out = []
+            for path in paths:
+                with h5py.File(path, "r") as f:
+                    out.append(f["value"][rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1])
+            return np.stack(out)
+
+        cases = [
+            (f"point series x{args.points}", lambda: [granule_point(*p) for p in points],
+             lambda: [store.point("BENCH", "value", *p) for p in points]),
+            ("bbox, one day", granule_bbox, lambda: store.bbox("BENCH", "value", INDIA, last)),
+            ("time slice", granule_slice, lambda: store.time_slice("BENCH", "value", bounds=INDIA))
+        ]
+        print(f"{'read':<22}{'granules s':>12}{'store cold s':>14}{'store warm s':>14}")
+        for name, granule_read, store_read in cases:
+            start = time.perf_counter()
+            granule_read()
+            granule_s = time.perf_counter() - start
+            store = CubeStore(f"{directory}/store", settings)
+            start = time.perf_counter()
+            store_read()
+            cold_s = time.perf_counter() - start
+            start = time.perf_counter()
+            store_read()
+            warm_s = time.perf_counter() - start
+            print(f"{name:<22}{granule_s:>12.3f}{cold_s:>14.3f}{warm_s:>14.3f}")
+        print(f"chunk cache after the time slice: {store.cache.stats()['bytes'] / 2 ** 20:.1f} MB")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Event-loop latency while a stubbed FIRMS upstream is slow
+
+Compares the old blocking `requests.get` inside `async def` against the shared
+async HTTP layer. A heartbeat task ticks every 10 ms; its lag is how long any
+other route would have waited for the loop.
+
+    python benchmarks/bench_event_loop_latency.py --delay 2 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import requests
+
+from benchmarks.firms_standin import StandinFIRMSServer
+from modules.nasa_data.firms_client import FIRMSClient
+from modules.nasa_data.http_client import NASAHttpClient
+
+TICK = 0.01
+
+
+async def heartbeat(lags: list, stop: asyncio.Event):
+    """Record how late each 10 ms tick fires"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def blocking_fetch(url: str):
+    """The pre-refactor pattern: a sync request inside a coroutine"""
+    return requests.get(url, timeout=30).text
+
+
+async def run(mode: str, base_url: str, concurrency: int) -> dict:
+    client = FIRMSClient(api_key="BENCH", http=NASAHttpClient())
+    client.base_url = base_url
+    client.http.client  # build the pool (TLS context) before timing, as a running server would have
+
+    lags, stop = [], asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    if mode == "blocking":
+        url = f"{base_url}/country/csv/BENCH/VIIRS_SNPP_NRT/IND/1"
+        await asyncio.gather(*(blocking_fetch(url) for _ in range(concurrency)))
+    else:
+        await asyncio.gather(*(client.get_active_fires() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await beat
+    await client.http.aclose()
+    return {
+        "mode": mode,
+        "wall_s": elapsed,
+        "max_lag_ms": max(lags) * 1000,
+        "p99_lag_ms": statistics.quantiles(lags, n=100, method="inclusive")[-1] * 1000,
+        "ticks": len(lags)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--delay", type=float, default=2.0, help="stub upstream response delay (s)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    with StandinFIRMSServer(delay=args.delay) as server:
+        results = [asyncio.run(run(mode, server.base_url, args.concurrency)) for mode in ("blocking", "async")]
+
+    print(f"upstream delay {args.delay:.1f}s, {args.concurrency} concurrent fetches")
+    print(f"{'mode':<10}{'wall s':>10}{'max lag ms':>14}{'p99 lag ms':>14}{'ticks':>8}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['wall_s']:>10.2f}{r['max_lag_ms']:>14.1f}{r['p99_lag_ms']:>14.1f}{r['ticks']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Fire event tracker persistence: per-pass save cost with a large event history
+Feeds overpasses of clustered detections through the tracker, timing saves that append the changed events against
+saves that rewrite the whole state, then checks that a reload matches and that seeding reads only recent segments.
+
+    python benchmarks/bench_fire_events.py --passes 60 --fires 1500
+"""
+
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.nasa_data.fire_events import FireEventTracker
+from modules.nasa_data.fire_store import FireDetectionStore
+from modules.nasa_data.firms_parser import FIRE_DTYPE, FireDetections
+
+
+def overpass(rng: np.random.Generator, centers: np.ndarray, when: np.datetime64, fires: int) -> FireDetections:
+    """A few pixels at each of `fires` burning sites drawn from the season's sites"""
+    sites = centers[rng.choice(len(centers), fires, replace=False)]
+    pixels = rng.integers(1, 6, fires)
+    data = np.zeros(int(pixels.sum()), dtype=FIRE_DTYPE)
+    data["latitude"] = np.repeat(sites[:, 0], pixels) + rng.normal(0, 0.002, len(data))
+    data["longitude"] = np.repeat(sites[:, 1], pixels) + rng.normal(0, 0.002, len(data))
+    data["frp"] = rng.gamma(1.5, 4.0, len(data))
+    data["acq_datetime"] = when + rng.integers(0, 10, len(data)).astype("m8[m]")
+    data["satellite"] = b"N"
+    return FireDetections(data)
+
+
+def run(state_dir: str, batches, full: bool) -> Tuple[FireEventTracker, List[float]]:
+    """Feed every batch, returning the tracker and the seconds each save took"""
+    tracker = FireEventTracker(state_dir)
+    save, times = tracker.save, []
+
+    def timed_save():
+        if full:
+            tracker._log_bytes = tracker._snapshot_bytes + 1  # every save rewrites the whole state
+        start = time.perf_counter()
+        save()
+        times.append(time.perf_counter() - start)
+
+    tracker.save = timed_save
+    for batch in batches:
+        tracker.update("VIIRS_SNPP_NRT", batch)
+    return tracker, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--passes", type=int, default=60, help="overpasses, two a day")
+    parser.add_argument("--fires", type=int, default=1500, help="burning sites seen per overpass")
+    parser.add_argument("--sites", type=int, default=30000, help="distinct sites over the season")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers = np.column_stack([rng.uniform(8, 35, args.sites), rng.uniform(68, 97, args.sites)])
+    first = np.datetime64("2024-03-01T01:30", "m")
+    batches = [overpass(rng, centers, first + np.timedelta64(12 * n, "h"), args.fires) for n in range(args.passes)]
+
+    root = Path(tempfile.mkdtemp(prefix="fire_events_"))
+    try:
+        full, full_times = run(str(root / "full"), batches, full=True)
+        log, log_times = run(str(root / "log"), batches, full=False)
+        print(f"{args.passes} passes, {sum(len(b) for b in batches):,} detections, "
+              f"{len(log.events):,} events held at the end")
+        print(f"{'save after each pass':<40}{'median s':>10}{'last s':>10}{'total s':>10}")
+        for name, times in (("rewrite whole state", full_times), ("append changed events", log_times)):
+            print(f"{name:<40}{statistics.median(times):>10.3f}{times[-1]:>10.3f}{sum(times):>10.2f}")
+
+        problems = []
+        reloaded = FireEventTracker(str(root / "log"))
+        if reloaded.events != log.events or reloaded._cells != log._cells:
+            problems.append("events reloaded from snapshot + log differ from the tracker's")
+        if reloaded.events != full.events:
+            problems.append("log-saved events differ from whole-state-saved events")
+        if (reloaded.next_event, reloaded.latest, len(reloaded.points)) != (log.next_event, log.latest, len(log.points)):
+            problems.append("tracker header or points differ after reload")
+
+        # Seeding a new sensor: only segments reaching the link window are opened
+        store = FireDetectionStore(str(root / "store"))
+        for batch in batches:
+            store.append("VIIRS_NOAA20_NRT", batch)
+        since = store.watermark("VIIRS_NOAA20_NRT") - log.link_window()
+        start = time.perf_counter()
+        everything = store.read(["VIIRS_NOAA20_NRT"])
+        whole_s = time.perf_counter() - start
+        store = FireDetectionStore(str(root / "store"))
+        start = time.perf_counter()
+        recent = store.read(["VIIRS_NOAA20_NRT"], since=since)
+        recent_s = time.perf_counter() - start
+        print(f"{'seed read, whole store':<40}{whole_s:>10.3f}   {len(everything):,} rows")
+        print(f"{'seed read, link window':<40}{recent_s:>10.3f}   {len(recent):,} rows")
+        expected = everything.data[everything.data["acq_datetime"] >= since]
+        if not np.array_equal(np.sort(recent.data, order=["acq_datetime", "latitude"]),
+                              np.sort(expected, order=["acq_datetime", "latitude"])):
+            problems.append("windowed read differs from filtering the whole store")
+
+        for problem in problems:
+            print(f"  {problem}")
+        if problems:
+            raise SystemExit(f"{len(problems)} check(s) failed")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
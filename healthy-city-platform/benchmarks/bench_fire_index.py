@@ -0,0 +1,95 @@
+"""
+Fire detection spatial queries: full-array scan vs GridIndex
+
+Builds an index over N synthetic detections clustered like real fire seasons,
+checks every indexed answer against a brute-force scan, then reports median
+query latency for viewport boxes and radius searches.
+
+    python benchmarks/bench_fire_index.py --rows 1000000
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.nasa_data.fire_index import GridIndex, haversine_km
+
+
+def synthetic_positions(rows: int, seed: int):
+    """Detections around a few hundred burn clusters, plus scattered noise"""
+    rng = np.random.default_rng(seed)
+    centers_lat = rng.uniform(-40, 60, 400)
+    centers_lon = rng.uniform(-180, 180, 400)
+    pick = rng.integers(0, 400, rows)
+    lat = np.clip(centers_lat[pick] + rng.normal(0, 1.5, rows), -90, 90)
+    lon = (centers_lon[pick] + rng.normal(0, 1.5, rows) + 180) % 360 - 180
+    return lat.astype(np.float32), lon.astype(np.float32)
+
+
+def median_ms(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    lat, lon = synthetic_positions(args.rows, seed=7)
+    start = time.perf_counter()
+    index = GridIndex()
+    index.add(lat, lon)
+    build_s = time.perf_counter() - start
+
+    extra_lat, extra_lon = synthetic_positions(10_000, seed=8)
+    start = time.perf_counter()
+    index.add(extra_lat, extra_lon)
+    add_ms = (time.perf_counter() - start) * 1000
+    lat, lon = np.concatenate([lat, extra_lat]), np.concatenate([lon, extra_lon])
+
+    c_lat, c_lon = float(lat[0]), float(lon[0])
+    boxes = {
+        "bbox city 0.5deg": (c_lon - 0.25, c_lat - 0.25, c_lon + 0.25, c_lat + 0.25),
+        "bbox region 5deg": (c_lon - 2.5, c_lat - 2.5, c_lon + 2.5, c_lat + 2.5),
+        "bbox antimeridian": (175.0, -20.0, -175.0, 20.0)
+    }
+
+    print(f"{len(lat):,} detections; index build {build_s:.2f} s, incremental add of 10,000 {add_ms:.1f} ms")
+    print(f"{'query':<22}{'hits':>10}{'scan ms':>10}{'index ms':>10}")
+    for name, (x0, y0, x1, y1) in boxes.items():
+        lon_ok = (lon >= x0) & (lon <= x1) if x0 <= x1 else (lon >= x0) | (lon <= x1)
+
+        def scan():
+            return np.flatnonzero((lat >= y0) & (lat <= y1) & lon_ok)
+
+        expected = scan()
+        assert np.array_equal(index.query_bbox(x0, y0, x1, y1), expected), name
+        scan_ms = median_ms(scan, args.repeat)
+        index_ms = median_ms(lambda: index.query_bbox(x0, y0, x1, y1), args.repeat)
+        print(f"{name:<22}{len(expected):>10,}{scan_ms:>10.3f}{index_ms:>10.3f}")
+
+    for radius in (25, 250):
+        def scan():
+            return np.flatnonzero(haversine_km(c_lat, c_lon, lat, lon) <= radius)
+
+        expected = scan()
+        assert np.array_equal(np.sort(index.query_radius(c_lat, c_lon, radius)[0]), expected), radius
+        scan_ms = median_ms(scan, max(5, args.repeat // 10))
+        index_ms = median_ms(lambda: index.query_radius(c_lat, c_lon, radius), args.repeat)
+        print(f"{f'radius {radius} km':<22}{len(expected):>10,}{scan_ms:>10.3f}{index_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+FIRMS archive backfill: throughput and correctness against the local stand-in API
+Serves per-day fixture CSVs, fails one chunk on the first run, then resumes with a different chunk size and checks
+that the Parquet archive holds every fixture row exactly once.
+
+    python benchmarks/bench_firms_backfill.py --days 60 --rows 2000 --workers 4
+"""
+
+import argparse
+import asyncio
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.firms_standin import StandinFIRMSServer, synthetic_firms_csv
+from modules.nasa_data.firms_backfill import FIRMSBackfill, read_archive
+from modules.nasa_data.firms_client import FIRMSClient
+from modules.nasa_data.http_client import NASAHttpClient
+
+SENSOR = "VIIRS_SNPP_SP"
+
+
+def write_fixtures(root: Path, start: date, days: int, rows: int) -> dict:
+    """One CSV per day under root/{sensor}/, some days empty; returns rows per day"""
+    counts = {}
+    (root / SENSOR).mkdir(parents=True)
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        n = 0 if offset % 7 == 3 else rows
+        (root / SENSOR / f"{day.isoformat()}.csv").write_text(synthetic_firms_csv(n, day, 1, seed=offset))
+        counts[day.isoformat()] = n
+    return counts
+
+
+async def backfill(base_url: str, out: str, start: date, end: date, workers: int, chunk_days: int) -> dict:
+    client = FIRMSClient(api_key="BENCH", http=NASAHttpClient())
+    client.base_url = base_url
+    try:
+        return await FIRMSBackfill(client, out, workers, chunk_days, max_attempts=1).run(SENSOR, "IND", start, end)
+    finally:
+        await client.http.aclose()
+
+
+def archived(out: str) -> dict:
+    table = read_archive(out, SENSOR, columns=["acq_date"])
+    days, counts = table.group_by("acq_date").aggregate([("acq_date", "count")]).columns
+    return dict(zip(days.to_pylist(), counts.to_pylist()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--rows", type=int, default=2000, help="detections per fixture day")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    start = date(2023, 1, 1)
+    end = start + timedelta(days=args.days - 1)
+    root = Path(tempfile.mkdtemp(prefix="firms_backfill_"))
+    try:
+        expected = write_fixtures(root / "fixtures", start, args.days, args.rows)
+        out = str(root / "archive")
+        with StandinFIRMSServer(fixtures_dir=root / "fixtures") as server:
+            # First run in 10-day chunks with the second chunk failing
+            failing = start + timedelta(days=10)
+            server.fail_dates.add(failing.isoformat())
+            t0 = time.perf_counter()
+            first = asyncio.run(backfill(server.base_url, out, start, end, args.workers, 10))
+            first_s = time.perf_counter() - t0
+            partial = archived(out)
+
+            # Resume in 7-day chunks: only the failed days are fetched again, and nothing is written twice
+            server.fail_dates.clear()
+            requests = server.request_count
+            t0 = time.perf_counter()
+            second = asyncio.run(backfill(server.base_url, out, start, end, args.workers, 7))
+            second_s = time.perf_counter() - t0
+            resumed = archived(out)
+            refetched = server.request_count - requests
+
+        rows = sum(expected.values())
+        print(f"{args.days} days, {rows:,} fixture rows, {args.workers} workers")
+        print(f"{'run':<40}{'seconds':>10}{'chunks':>8}{'rows':>10}")
+        print(f"{'first, 10-day chunks, one failing':<40}{first_s:>10.2f}{first['chunks_done']:>8}{first['rows']:>10,}")
+        print(f"{'resume, 7-day chunks':<40}{second_s:>10.2f}{second['chunks_done']:>8}{second['rows']:>10,}")
+
+        problems = []
+        if len(first["chunks_failed"]) != 1:
+            problems.append(f"first run failed {len(first['chunks_failed'])} chunks, expected 1")
+        lost = {d for d in expected if start <= date.fromisoformat(d) < failing} | \
+            {d for d in expected if date.fromisoformat(d) >= failing + timedelta(days=10)}
+        if any(partial.get(d, 0) != expected[d] for d in lost):
+            problems.append("first run did not archive the chunks that succeeded")
+        if any(d in partial for d in expected if failing <= date.fromisoformat(d) < failing + timedelta(days=10)):
+            problems.append("first run archived days of the failed chunk")
+        # 7-day chunks overlapping days 10-19 of the range: days 7-13 and 14-20
+        if refetched != 2:
+            problems.append(f"resume fetched {refetched} chunks, expected the 2 covering the failed days")
+        wrong = {d: (resumed.get(d, 0), n) for d, n in expected.items() if resumed.get(d, 0) != n}
+        if wrong:
+            problems.append(f"archived rows differ from the fixtures on {len(wrong)} days, e.g. {sorted(wrong.items())[:3]}")
+        for problem in problems:
+            print(f"  {problem}")
+        if problems:
+            raise SystemExit(f"{len(problems)} backfill check(s) failed")
+        print(f"archive matches the fixtures: {sum(resumed.values()):,} rows on {len(resumed)} days, no duplicates")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
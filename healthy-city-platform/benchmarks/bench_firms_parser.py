@@ -0,0 +1,102 @@
+"""
+FIRMS CSV parsing: legacy dict-of-strings parser vs streaming columnar parser
+
+Generates (or reuses) a stored 500k-row VIIRS country CSV, then reports wall
+time and peak traced memory for each parser. The columnar parser is fed in
+64 KiB chunks, as it is during a streamed download.
+
+    python benchmarks/bench_firms_parser.py --rows 500000
+"""
+
+import argparse
+import gc
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from benchmarks.firms_standin import synthetic_firms_csv
+from modules.nasa_data.firms_parser import FIRMSStreamParser
+
+CHUNK = 64 * 1024
+
+
+def legacy_parse(csv_data: str):
+    """The previous FIRMSClient._parse_firms_csv, without the 100-row cap"""
+    lines = csv_data.strip().split('\n')
+    if len(lines) < 2:
+        return []
+    headers = lines[0].split(',')
+    fires = []
+    for line in lines[1:]:
+        values = line.split(',')
+        if len(values) >= len(headers):
+            fire = {}
+            for i, header in enumerate(headers):
+                fire[header.strip()] = values[i].strip()
+            fires.append(fire)
+    # every consumer then re-converted the strings
+    for fire in fires:
+        float(fire["latitude"]), float(fire["longitude"]), float(fire["frp"])
+    return fires
+
+
+def run_legacy(path: Path):
+    return legacy_parse(path.read_text())
+
+
+def run_streaming(path: Path):
+    parser = FIRMSStreamParser()
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK):
+            parser.feed(chunk)
+    return parser.close()
+
+
+def measure(fn, path: Path):
+    """Time one untraced run, then trace a second run for peak memory"""
+    gc.collect()
+    start = time.perf_counter()
+    result = fn(path)
+    elapsed = time.perf_counter() - start
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = fn(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--csv", type=Path, help="existing FIRMS CSV to parse")
+    args = parser.parse_args()
+
+    path = args.csv
+    if path is None:
+        path = Path(tempfile.gettempdir()) / f"firms_bench_{args.rows}.csv"
+        if not path.exists():
+            print(f"writing {args.rows} synthetic rows to {path}")
+            path.write_text(synthetic_firms_csv(args.rows, days=10, seed=42))
+    size_mb = path.stat().st_size / 1e6
+
+    legacy, legacy_s, legacy_peak = measure(run_legacy, path)
+    rows = len(legacy)
+    del legacy
+    columnar, stream_s, stream_peak = measure(run_streaming, path)
+    assert len(columnar) == rows, (len(columnar), rows)
+
+    print(f"{path.name}: {rows} rows, {size_mb:.1f} MB")
+    print(f"{'parser':<12}{'time s':>10}{'peak MB':>12}{'rows/s':>14}")
+    print(f"{'legacy':<12}{legacy_s:>10.2f}{legacy_peak / 1e6:>12.1f}{rows / legacy_s:>14,.0f}")
+    print(f"{'columnar':<12}{stream_s:>10.2f}{stream_peak / 1e6:>12.1f}{rows / stream_s:>14,.0f}")
+    print(f"columnar result holds {columnar.nbytes / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
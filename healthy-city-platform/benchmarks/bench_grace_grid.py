@@ -0,0 +1,91 @@
+"""
+GRACE lookups: one request per point vs batched bilinear interpolation on the memory-mapped grid
+
+Ingests a synthetic 0.5 degree monthly mascon file, then times the
+single-point path (grid lookup and summary per call) against one batch
+over all points, and reports the one-off export of the grid.
+
+    python benchmarks/bench_grace_grid.py --points 10000 --months 250
+"""
+
+import argparse
+import asyncio
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.nasa_data.cube_store import CubeStore
+from modules.nasa_data.grace_client import GRACEClient
+from modules.nasa_data.grace_grid import GraceGrid
+
+SINGLE_MAX_POINTS = 500
+
+
+def write_mascons(path: str, months: int):
+    lat = np.arange(-89.75, 90, 0.5)
+    lon = np.arange(0.25, 360, 0.5)
+    rng = np.random.default_rng(0)
+    field = np.sin(np.radians(lat))[:, None] * 10 + np.cos(np.radians(lon))[None, :] * 5
+    trend = np.linspace(0, 1, months)[:, None, None]
+    seasonal = 3 * np.sin(2 * np.pi * np.arange(months) / 12)[:, None, None]
+    with h5py.File(path, "w") as f:
+        f["lat"], f["lon"] = lat, lon
+        time_ = f.create_dataset("time", data=np.arange(months) * 30.44 + 15)
+        time_.attrs["units"] = "days since 2002-04-01T00:00:00Z"
+        f["lwe_thickness"] = (field * (1 + trend) + seasonal + rng.normal(0, 0.5, (months,) + field.shape)).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--points", type=int, default=10000)
+    parser.add_argument("--months", type=int, default=250)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="grace_bench_")
+    try:
+        write_mascons(f"{directory}/mascons.nc", args.months)
+        cubes = CubeStore(f"{directory}/cubes")
+        cubes.ingest("GRACE", [f"{directory}/mascons.nc"])
+        grid = GraceGrid(cubes, f"{directory}/grace")
+        start = time.perf_counter()
+        grid.load()
+        print(f"{args.months} months on {grid.values.shape[0]}x{grid.values.shape[1]}: "
+              f"grid export {time.perf_counter() - start:.2f} s (once per ingest)")
+        client = GRACEClient(cubes=cubes, grid=grid)
+
+        rng = np.random.default_rng(1)
+        lat, lon = rng.uniform(-60, 60, args.points), rng.uniform(-180, 180, args.points)
+        single = min(args.points, SINGLE_MAX_POINTS)
+
+        async def one_by_one():
+            for i in range(single):
+                await client.get_groundwater_data(float(lat[i]), float(lon[i]))
+
+        start = time.perf_counter()
+        asyncio.run(one_by_one())
+        single_s = (time.perf_counter() - start) / single * args.points
+
+        start = time.perf_counter()
+        batch = client.get_groundwater_batch(lat, lon)
+        batch_s = time.perf_counter() - start
+        start = time.perf_counter()
+        client.batch_results(batch, lat, lon)
+        json_s = time.perf_counter() - start
+
+        print(f"{'method':<16}{'time s':>10}{'us/point':>12}")
+        print(f"{'per point':<16}{single_s:>10.3f}{single_s / args.points * 1e6:>12.1f}  (extrapolated from {single:,})")
+        print(f"{'batch':<16}{batch_s:>10.3f}{batch_s / args.points * 1e6:>12.1f}")
+        print(f"{'batch records':<16}{json_s:>10.3f}{json_s / args.points * 1e6:>12.1f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Map tiles: serving a zoomed-out view from pre-downsampled levels vs the finest level vs the whole grid as JSON
+Builds a pyramid from a synthetic city-scale grid and times one view at each zoom.
+
+    python benchmarks/bench_map_tiles.py --cells 2000 --max-zoom 13
+"""
+
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.map_tiles.pyramid import TILE_SIZE, TilePyramidStore, grid_sampler, lonlat_to_pixel, palette, render_png
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--cells", type=int, default=2000, help="grid cells per side over one degree")
+    parser.add_argument("--max-zoom", type=int, default=13)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="map_tiles_")
+    try:
+        rng = np.random.default_rng(0)
+        values = rng.uniform(-0.2, 0.9, (args.cells, args.cells)).astype(np.float32)
+        bounds = (76.7, 28.1, 77.7, 29.1)
+        store = TilePyramidStore(root)
+        start = time.perf_counter()
+        meta = store.build("bench", "v1", [{"id": "grid", "bounds": bounds, "sample": grid_sampler(bounds, values)}],
+                           4, args.max_zoom)
+        print(f"{args.cells}x{args.cells} grid, zooms 4-{args.max_zoom}, "
+              f"{sum(meta['levels'].values()):,} tiles built in {time.perf_counter() - start:.1f} s")
+
+        start = time.perf_counter()
+        json.dumps(np.round(values, 4).tolist())
+        json_ms = (time.perf_counter() - start) * 1000
+
+        style = palette({"range": [-0.2, 0.9], "colors": ["#a50026", "#fee08b", "#1a9850"]})
+        print(f"{'zoom':>4}{'pyramid ms':>12}{'from finest ms':>16}{'whole-grid JSON ms':>20}")
+        for z in range(6, args.max_zoom + 1):
+            x, y = (int(v // TILE_SIZE) for v in lonlat_to_pixel(77.2, 28.6, z))
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                render_png(np.asarray(store.tile("bench", z, x, y, meta)), style)
+            pyramid_ms = (time.perf_counter() - start) / args.requests * 1000
+
+            # Without the pyramid: gather the 4^d finest tiles under this one and reduce them on request
+            depth = args.max_zoom - z
+            if depth > 4:
+                print(f"{z:>4}{pyramid_ms:>12.2f}{'(skipped)':>16}{json_ms:>20.1f}")
+                continue
+            start = time.perf_counter()
+            for _ in range(max(1, args.requests // 4)):
+                n = 1 << depth
+                block = np.full((n * TILE_SIZE, n * TILE_SIZE), np.nan, dtype=np.float32)
+                for dy in range(n):
+                    for dx in range(n):
+                        t = store.tile("bench", args.max_zoom, (x << depth) + dx, (y << depth) + dy, meta)
+                        if t is not None:
+                            block[dy * TILE_SIZE:(dy + 1) * TILE_SIZE, dx * TILE_SIZE:(dx + 1) * TILE_SIZE] = t
+                for _ in range(depth):
+                    block = _halve(block)
+                render_png(block, style)
+            finest_ms = (time.perf_counter() - start) / max(1, args.requests // 4) * 1000
+            print(f"{z:>4}{pyramid_ms:>12.2f}{finest_ms:>16.2f}{json_ms:>20.1f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def _halve(block: np.ndarray) -> np.ndarray:
+    """Mean of each 2x2 block's valid pixels"""
+    h, w = block.shape
+    cells = block.reshape(h // 2, 2, w // 2, 2)
+    valid = np.isfinite(cells)
+    with np.errstate(invalid="ignore"):
+        return (np.where(valid, cells, 0).sum(axis=(1, 3)) / valid.sum(axis=(1, 3))).astype(np.float32)
+
+
+if __name__ == "__main__":
+    main()
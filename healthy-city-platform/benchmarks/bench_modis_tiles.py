@@ -0,0 +1,79 @@
+"""
+MODIS tile cache: NDVI point lookups against memory-mapped composites
+Builds a year of synthetic MOD13Q1/MYD13Q1 composites over a tile window and times cold and warm lookups.
+
+    python benchmarks/bench_modis_tiles.py --window 1200 --requests 2000
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.nasa_data.modis_tiles import (EARTH_RADIUS_M, GRID_X_MIN, GRID_Y_MAX, PIXEL_DTYPE, TILE_SIZE_M,
+                                           ModisTileStore, tile_pixels)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--window", type=int, default=1200, help="pixels per side of the stored tile window")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="modis_tiles_")
+    try:
+        # Delhi's tile; the window starts at the tile's upper-left pixel
+        h, v, _, _ = [int(a[0]) for a in tile_pixels([28.6139], [77.2090])]
+        rng = np.random.default_rng(0)
+        store = ModisTileStore(root)
+        start = time.perf_counter()
+        for k in range(23):
+            for product, offset in (("MOD13Q1", 0), ("MYD13Q1", 8)):
+                records = np.zeros((args.window, args.window), dtype=PIXEL_DTYPE)
+                records["ndvi"] = rng.integers(1000, 9000, records.shape)
+                records["evi"] = records["ndvi"] * 0.8
+                records["reliability"] = rng.choice([0, 0, 0, 1, 3], records.shape)
+                store.add(h, v, 4800, date(2024, 1, 1) + timedelta(days=16 * k + offset), product, records)
+        print(f"tile h{h:02d}v{v:02d}, 46 composites of {args.window}x{args.window}, "
+              f"written in {time.perf_counter() - start:.1f} s")
+
+        # Locations inside the stored window
+        size = TILE_SIZE_M / 4800
+        y = GRID_Y_MAX - (v * 4800 + rng.uniform(0, args.window, args.requests)) * size
+        x = GRID_X_MIN + (h * 4800 + rng.uniform(0, args.window, args.requests)) * size
+        lat = np.degrees(y / EARTH_RADIUS_M)
+        lon = np.degrees(x / (EARTH_RADIUS_M * np.cos(np.radians(lat))))
+
+        store = ModisTileStore(root)
+        start = time.perf_counter()
+        store.point(lat[0], lon[0], end=date(2024, 12, 31))
+        cold_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for i in range(args.requests):
+            store.point(lat[i], lon[i], end=date(2024, 12, 31))
+        warm_us = (time.perf_counter() - start) / args.requests * 1e6
+
+        start = time.perf_counter()
+        store.sample(lat, lon, end=date(2024, 12, 31))
+        batch_us = (time.perf_counter() - start) / args.requests * 1e6
+
+        stats = store.cache.stats()
+        print(f"{'lookup':<28}{'us/location':>12}")
+        print(f"{'first (maps 46 composites)':<28}{cold_ms * 1000:>12.1f}")
+        print(f"{'warm, one per request':<28}{warm_us:>12.1f}")
+        print(f"{'warm, all in one sample()':<28}{batch_us:>12.1f}")
+        print(f"cache: {stats['mapped']} mapped, {stats['hits']:,} hits, {stats['misses']} misses")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
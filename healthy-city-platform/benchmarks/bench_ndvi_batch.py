@@ -0,0 +1,51 @@
+"""
+NDVI/EVI series: one request per point vs one batch call
+Times per-point get_ndvi_data (as a dashboard polling each field does) against get_ndvi_batch for the same points.
+
+    python benchmarks/bench_ndvi_batch.py --points 5000
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.nasa_data.modis_client import MODISClient
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--points", type=int, default=5000)
+    args = parser.parse_args()
+
+    client = MODISClient()
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(8, 35, args.points)
+    lon = rng.uniform(68, 95, args.points)
+
+    async def per_point():
+        for la, lo in zip(lat, lon):
+            await client.get_ndvi_data(float(la), float(lo))
+
+    start = time.perf_counter()
+    asyncio.run(per_point())
+    per_point_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = client.get_ndvi_batch(lat, lon)
+    batch_s = time.perf_counter() - start
+
+    print(f"{args.points:,} points, {len(batch['dates'])} composites each "
+          f"({', '.join(f'{s}: {n}' for s, n in zip(*np.unique(batch['source'].astype(str), return_counts=True)))})")
+    print(f"{'path':<12}{'total s':>10}{'us/point':>12}")
+    print(f"{'per point':<12}{per_point_s:>10.3f}{per_point_s / args.points * 1e6:>12.1f}")
+    print(f"{'batch':<12}{batch_s:>10.3f}{batch_s / args.points * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
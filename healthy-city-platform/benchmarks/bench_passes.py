@@ -0,0 +1,62 @@
+"""
+Satellite passes for many users: one prediction per request vs the batched, cell-cached predictor
+
+Per-request prediction propagates every satellite and scans the day for each
+location on its own; the batch groups locations by grid cell, computes the
+distinct cells together and later requests for those cells are cache lookups.
+
+    python benchmarks/bench_passes.py --locations 5000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.nasa_data.passes import PassPredictor
+
+PER_REQUEST_MAX = 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--locations", type=int, default=5000)
+    parser.add_argument("--day", default="2025-01-15")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    locations = list(zip(rng.uniform(8, 35, args.locations), rng.uniform(70, 95, args.locations)))
+    predictor = PassPredictor()
+    cells = len({predictor.cell(lat, lon) for lat, lon in locations})
+    print(f"{args.locations:,} locations in {cells:,} cells, {len(predictor.satellites())} satellites")
+
+    # Per request: a fresh prediction for each location, as the endpoint would without the cache
+    predictor.predict(*locations[0], args.day)
+    sample = locations[:min(args.locations, PER_REQUEST_MAX)]
+    start = time.perf_counter()
+    for lat, lon in sample:
+        predictor.predict(lat, lon, args.day)
+    per_request_s = (time.perf_counter() - start) / len(sample) * args.locations
+
+    start = time.perf_counter()
+    batched = predictor.passes(locations, args.day)
+    batch_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predictor.passes(locations, args.day)
+    cached_s = time.perf_counter() - start
+
+    print(f"{'method':<14}{'time s':>10}{'us/location':>14}")
+    print(f"{'per request':<14}{per_request_s:>10.3f}{per_request_s / args.locations * 1e6:>14.1f}  "
+          f"(extrapolated from {len(sample):,})")
+    print(f"{'batch':<14}{batch_s:>10.3f}{batch_s / args.locations * 1e6:>14.1f}")
+    print(f"{'cached':<14}{cached_s:>10.3f}{cached_s / args.locations * 1e6:>14.1f}")
+    print(f"passes per location: {sum(map(len, batched)) / args.locations:.1f}")
+
+
+if __name__ == "__main__":
+    main()
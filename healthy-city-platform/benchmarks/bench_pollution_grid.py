@@ -0,0 +1,92 @@
+"""
+/api/nasa/pollution grid generation: legacy per-cell double loop vs PollutionGridEngine
+
+Reports cells per second for the grid computation alone and for each
+response encoding (per-cell JSON points, columnar JSON, NPY binary).
+
+    python benchmarks/bench_pollution_grid.py --sizes 20 200 1000
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.nasa_data.pollution_grid import PollutionGridEngine
+
+LEGACY_MAX_SIZE = 300  # the loop takes minutes beyond this
+
+
+def legacy_grid(lat: float, lon: float, size: int, step: float):
+    """The previous get_nasa_pollution body, with the grid size as a parameter"""
+    pollution_points = []
+    half = size // 2
+    for i in range(size):
+        for j in range(size):
+            point_lat = lat + (i - half) * step
+            point_lon = lon + (j - half) * step
+            base_no2 = 15
+            urban_factor = 1.0
+            if abs(point_lat - 28.6139) < 0.1 and abs(point_lon - 77.2090) < 0.1:  # Delhi
+                urban_factor = 3.5
+            elif abs(point_lat - 19.0760) < 0.1 and abs(point_lon - 72.8777) < 0.1:  # Mumbai
+                urban_factor = 2.8
+            no2_level = base_no2 * urban_factor + np.random.uniform(-5, 15)
+            aqi = min(500, max(0, no2_level * 2.5))
+            pollution_points.append({
+                "lat": point_lat,
+                "lon": point_lon,
+                "no2": max(0, no2_level),
+                "aqi": int(aqi),
+                "intensity": min(1.0, aqi / 200)
+            })
+    return pollution_points
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 200, 1000])
+    args = parser.parse_args()
+
+    engine = PollutionGridEngine()
+    lat, lon = 28.6139, 77.2090
+    print(f"{'grid':>10}{'method':>22}{'time s':>10}{'cells/s':>14}{'MB':>8}")
+    for size in args.sizes:
+        cells = size * size
+        step = 0.2 / size
+        bounds = (lon - 0.1, lat - 0.1, lon + 0.1, lat + 0.1)
+        rows = []
+
+        if size <= LEGACY_MAX_SIZE:
+            points, loop_s = timed(lambda: legacy_grid(lat, lon, size, step))
+            body, dump_s = timed(lambda: json.dumps(points))
+            rows.append(("legacy loop", loop_s, None))
+            rows.append(("legacy loop + JSON", loop_s + dump_s, len(body)))
+
+        result, grid_s = timed(lambda: engine.compute(bounds, (size, size)))
+        rows.append(("engine", grid_s, None))
+        body, enc_s = timed(lambda: json.dumps(engine.to_points(result), separators=(",", ":")))
+        rows.append(("engine + JSON points", grid_s + enc_s, len(body)))
+        body, enc_s = timed(lambda: json.dumps(engine.to_columns(result), separators=(",", ":")))
+        rows.append(("engine + JSON columns", grid_s + enc_s, len(body)))
+        body, enc_s = timed(lambda: engine.to_npy(result))
+        rows.append(("engine + NPY", grid_s + enc_s, len(body)))
+
+        for name, seconds, size_bytes in rows:
+            mb = f"{size_bytes / 1e6:.2f}" if size_bytes else "-"
+            print(f"{f'{size}x{size}':>10}{name:>22}{seconds:>10.3f}{cells / seconds:>14,.0f}{mb:>8}")
+
+
+if __name__ == "__main__":
+    main()
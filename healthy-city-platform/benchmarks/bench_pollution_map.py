@@ -0,0 +1,70 @@
+"""
+City pollution map interpolation: per-cell all-samples IDW loop vs KD-tree k-nearest kernels
+
+The loop visits every sample for every cell, the textbook way to write IDW.
+SpatialInterpolator queries the k nearest samples for all cells at once.
+
+    python benchmarks/bench_pollution_map.py --samples 200 --sizes 25 100 400
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.nasa_data.fire_index import haversine_km
+from modules.nasa_data.simulation import grid
+from modules.weather_air_quality.interpolation import SpatialInterpolator
+
+LOOP_MAX_PAIRS = 200_000  # cell x sample pairs; the loop manages ~50k per second
+
+
+def loop_idw(sample_lat, sample_lon, values, grid_lat, grid_lon, power=2.0):
+    out = np.empty(grid_lat.shape)
+    for idx in np.ndindex(grid_lat.shape):
+        num = den = 0.0
+        for la, lo, v in zip(sample_lat, sample_lon, values):
+            d = max(float(haversine_km(grid_lat[idx], grid_lon[idx], la, lo)), 1e-3)
+            w = 1.0 / d ** power
+            num += w * v
+            den += w
+        out[idx] = num / den
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[25, 100, 400])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    bounds = (76.9, 28.3, 77.5, 28.9)
+    sample_lat = rng.uniform(bounds[1], bounds[3], args.samples)
+    sample_lon = rng.uniform(bounds[0], bounds[2], args.samples)
+    values = rng.uniform(10, 80, args.samples)
+    print(f"{args.samples:,} samples")
+    print(f"{'grid':>10}{'method':>18}{'time s':>10}{'cells/s':>14}")
+    for size in args.sizes:
+        grid_lat, grid_lon = grid(bounds, (size, size))
+        cells = grid_lat.size
+        rows = []
+        if args.samples * cells <= LOOP_MAX_PAIRS:
+            start = time.perf_counter()
+            loop_idw(sample_lat, sample_lon, values, grid_lat, grid_lon)
+            rows.append(("loop all", time.perf_counter() - start))
+        for kernel in ("idw", "gaussian"):
+            interpolator = SpatialInterpolator(kernel=kernel, neighbours=8)
+            start = time.perf_counter()
+            interpolator.interpolate(sample_lat, sample_lon, values, grid_lat, grid_lon)
+            rows.append((f"kd-tree {kernel}", time.perf_counter() - start))
+        for name, seconds in rows:
+            print(f"{f'{size}x{size}':>10}{name:>18}{seconds:>10.3f}{cells / seconds:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
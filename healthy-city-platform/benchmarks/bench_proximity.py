@@ -0,0 +1,89 @@
+"""
+Green proximity: per-city layer build vs per-query nearest-green-pixel search
+Registers a synthetic 10 m NDVI scene over Delhi, builds its proximity layers and times batch lookups against a KD-tree search per query.
+
+    python benchmarks/bench_proximity.py --pixel-m 10 --points 100000
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from scipy import ndimage
+from scipy.spatial import cKDTree
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from config.nasa_apis import POLLUTION_MAP
+from modules.green_vegetation.corridors import green_patches
+from modules.green_vegetation.proximity import GreenProximityIndex, city_bounds
+from modules.green_vegetation.vegetation_rasters import VegetationRasterStore, fit_pixels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--pixel-m", type=float, default=10.0)
+    parser.add_argument("--points", type=int, default=100000, help="addresses per batch lookup")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="proximity_")
+    try:
+        # North-up geographic scene a little larger than the city
+        min_lon, min_lat, max_lon, max_lat = city_bounds(POLLUTION_MAP["cities"]["delhi"])
+        pixel_deg = args.pixel_m / 111195
+        bounds = (min_lon - 0.01, min_lat - 0.01, max_lon + 0.01, max_lat + 0.01)
+        shape = (int((bounds[3] - bounds[1]) / pixel_deg), int((bounds[2] - bounds[0]) / pixel_deg))
+        lon, lat = np.meshgrid(np.linspace(bounds[0], bounds[2], 9), np.linspace(bounds[1], bounds[3], 9))
+        fit = fit_pixels(lon, lat, (bounds[3] - lat) / pixel_deg, (lon - bounds[0]) / pixel_deg)
+
+        rng = np.random.default_rng(0)
+        field = ndimage.zoom(rng.normal(size=(shape[0] // 40 + 1, shape[1] // 40 + 1)), 40, order=1)
+        ndvi = (0.1 + 0.2 * field[:shape[0], :shape[1]] + rng.normal(0, 0.05, shape)).astype(np.float32)
+        rasters = VegetationRasterStore(f"{root}/rasters")
+        Path(f"{root}/rasters/scene.1").mkdir(parents=True)
+        np.save(f"{root}/rasters/scene.1/ndvi.npy", ndvi)
+        rasters.register({"scene": "scene", "sensor": "sentinel2", "date": "2024-01-01", "dir": "scene.1",
+                          "shape": list(shape), "bounds": list(bounds), "pixel_deg": pixel_deg, "fit": fit})
+        print(f"{shape[0]}x{shape[1]} scene ({ndvi.size / 1e6:.0f}M pixels) at {args.pixel_m:g} m, "
+              f"{(ndvi >= 0.3).mean() * 100:.1f}% green")
+
+        index = GreenProximityIndex(rasters, {"cache_dir": f"{root}/proximity"})
+        start = time.perf_counter()
+        layers = index.layers("delhi")
+        build_s = time.perf_counter() - start
+
+        lat = rng.uniform(min_lat, max_lat, args.points)
+        lon = rng.uniform(min_lon, max_lon, args.points)
+        start = time.perf_counter()
+        index.lookup(lat, lon)
+        lookup_s = time.perf_counter() - start
+
+        # Without the layers: label the window and search its green pixels for every query
+        r0, r1, c0, c1 = layers["meta"]["window"]
+        start = time.perf_counter()
+        labels, _ = green_patches(ndvi[r0:r1, c0:c1], args.pixel_m, 0.3, index.settings["min_space_ha"])
+        tree = cKDTree(np.argwhere(labels > 0))
+        setup_s = time.perf_counter() - start
+        r, c = rasters.pixels(rasters.scenes()["scene"], lat, lon)
+        start = time.perf_counter()
+        tree.query(np.column_stack([r - r0, c - c0]))
+        tree.query_ball_point(np.column_stack([r - r0, c - c0])[:1000], index.settings["radius_m"] / args.pixel_m,
+                              return_length=True)
+        search_s = time.perf_counter() - start
+
+        print(f"{layers['meta']['spaces']:,} green spaces")
+        print(f"{'stage':<46}{'seconds':>10}")
+        print(f"{'build layers (EDT + disk convolutions)':<46}{build_s:>10.2f}")
+        print(f"{f'lookup {args.points:,} points':<46}{lookup_s:>10.3f}")
+        print(f"{'label + KD-tree over green pixels':<46}{setup_s:>10.2f}")
+        print(f"{f'KD-tree nearest x{args.points:,} + area x1,000':<46}{search_s:>10.3f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
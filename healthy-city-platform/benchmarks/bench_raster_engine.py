@@ -0,0 +1,106 @@
+"""
+Vegetation raster engine: time and peak memory for one Landsat-sized scene
+Writes a synthetic tiled GeoTIFF scene (blue, red and NIR bands) and computes its index rasters with several worker
+and window settings, each run in a fresh process so its peak RSS is its own.
+
+    python benchmarks/bench_raster_engine.py --size 7800 --workers 1 4 --window 512 1024
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.green_vegetation.raster_engine import compute_scene, discover_scenes
+from modules.green_vegetation.vegetation_rasters import VegetationRasterStore
+
+SCENE = "LC08_L2SP_146040_20230415_20230420_02_T1"
+# Digital numbers giving typical reflectance (scale 0.0000275, offset -0.2) of each band over vegetation
+BANDS = {"B2": 9000, "B4": 9500, "B5": 20000}
+
+
+def write_scene(directory: Path, size: int, block: int = 512) -> list:
+    """A size x size UTM scene of smoothly varying reflectance with a nodata border, written band by band in strips"""
+    rng = np.random.default_rng(0)
+    paths = []
+    profile = {"driver": "GTiff", "height": size, "width": size, "count": 1, "dtype": "uint16", "nodata": 0,
+               "crs": "EPSG:32643", "transform": from_origin(600000, 3250000, 30, 30),
+               "tiled": True, "blockxsize": block, "blockysize": block, "compress": "deflate"}
+    for band, level in BANDS.items():
+        path = directory / f"{SCENE}_SR_{band}.TIF"
+        with rasterio.open(path, "w", **profile) as dst:
+            for row in range(0, size, block):
+                rows = min(block, size - row)
+                y = np.arange(row, row + rows)[:, None]
+                x = np.arange(size)[None, :]
+                values = level * (1 + 0.3 * np.sin(x / 97.0) * np.cos(y / 61.0)) + rng.normal(0, 300, (rows, size))
+                # Landsat scenes are tilted footprints inside a nodata frame
+                values[np.abs(x - size / 2) + np.abs(y - size / 2) > size * 0.7] = 0
+                dst.write(np.clip(values, 0, 65535).astype(np.uint16), 1, window=Window(0, row, size, rows))
+        paths.append(str(path))
+    return paths
+
+
+def run_one(paths: list, root: str, workers: int, window: int) -> dict:
+    """Compute the scene once and report time and the peak RSS of this process and its workers"""
+    scene = discover_scenes(paths)[SCENE]
+    start = time.perf_counter()
+    result = compute_scene(SCENE, scene, VegetationRasterStore(root), workers, window, force=True)
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux
+    return {"seconds": seconds, "valid_pixels": result["valid_pixels"],
+            "main_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "worker_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--size", type=int, default=7800, help="scene pixels per side (Landsat is ~7800)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--window", type=int, nargs="+", default=[512, 1024])
+    parser.add_argument("--run-one", nargs=4, metavar=("DIR", "ROOT", "WORKERS", "WINDOW"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        directory, root, workers, window = args.run_one
+        paths = sorted(str(p) for p in Path(directory).glob("*.TIF"))
+        print(json.dumps(run_one(paths, root, int(workers), int(window))))
+        return
+
+    directory = Path(tempfile.mkdtemp(prefix="raster_engine_"))
+    try:
+        start = time.perf_counter()
+        write_scene(directory, args.size)
+        band_mb = args.size ** 2 * 2 / 1e6
+        print(f"{args.size}x{args.size} scene, 3 uint16 bands of {band_mb:.0f} MB each, "
+              f"written in {time.perf_counter() - start:.1f} s")
+        print(f"{'workers':>8}{'window':>8}{'seconds':>10}{'Mpx/s':>8}{'main peak MB':>14}{'worker peak MB':>16}")
+        for workers in args.workers:
+            for window in args.window:
+                root = directory / f"out-{workers}-{window}"
+                out = subprocess.run([sys.executable, __file__, "--run-one", str(directory), str(root),
+                                      str(workers), str(window)], capture_output=True, text=True, check=True)
+                r = json.loads(out.stdout.strip().splitlines()[-1])
+                worker = f"{r['worker_mb']:.0f}" if workers > 1 else "-"
+                print(f"{workers:>8}{window:>8}{r['seconds']:>10.2f}{args.size ** 2 / 1e6 / r['seconds']:>8.1f}"
+                      f"{r['main_mb']:>14.0f}{worker:>16}")
+                shutil.rmtree(root, ignore_errors=True)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Regional means: rasterizing the region polygons per request vs precomputed sparse masks
+Times the regional mean of every region over every month of a GRACE-sized (rows, cols, months) layer.
+
+    python benchmarks/bench_regions.py --months 250
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from config.nasa_apis import CUBE_STORE
+from modules.nasa_data.regions import RegionMasks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--months", type=int, default=250)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix="regions_")
+    try:
+        grid = CUBE_STORE["products"]["GRACE"]["grid"]
+        settings = {"cache_dir": cache_dir}
+        first = RegionMasks(grid, settings=settings)
+        start = time.perf_counter()
+        first.load()
+        build_s = time.perf_counter() - start
+
+        rng = np.random.default_rng(0)
+        values = rng.normal(0, 10, first.shape + (args.months,)).astype(np.float32)
+        values[rng.random(first.shape) < 0.1] = np.nan
+        print(f"grid {first.shape[0]}x{first.shape[1]}x{args.months}, {len(first.ids)} regions, "
+              f"{len(first.support):,} masked cells; first build {build_s * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            masks = RegionMasks(grid, settings=settings)
+            masks.build()
+            masks.means(values)
+        per_request_s = (time.perf_counter() - start) / args.requests
+
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            RegionMasks(grid, settings=settings).load()
+        disk_s = (time.perf_counter() - start) / args.requests
+
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            first.means(values)
+        cached_s = (time.perf_counter() - start) / args.requests
+
+        print(f"{'path':<26}{'ms/request':>12}")
+        print(f"{'rasterize + mean':<26}{per_request_s * 1000:>12.2f}")
+        print(f"{'load cached masks':<26}{disk_s * 1000:>12.2f}")
+        print(f"{'precomputed masks, mean':<26}{cached_s * 1000:>12.2f}")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
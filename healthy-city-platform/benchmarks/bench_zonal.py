@@ -0,0 +1,74 @@
+"""
+Zonal statistics: per-zone count, mean and percentiles of many layers from one label raster vs masking each zone
+Rasterizes a synthetic ward map once, then times the statistics of every layer for every ward.
+
+    python benchmarks/bench_zonal.py --zones 1000 --layers 36 --size 500
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.nasa_data.zonal import ZoneLabels, rasterize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--zones", type=int, default=1000)
+    parser.add_argument("--layers", type=int, default=36)
+    parser.add_argument("--size", type=int, default=500, help="grid cells per side")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    bounds = (77.0, 28.4, 77.5, 28.9)
+    # Ward polygons: jittered squares over a side x side layout
+    side = int(np.ceil(np.sqrt(args.zones)))
+    step = (bounds[2] - bounds[0]) / side
+    regions = []
+    for k in range(args.zones):
+        x0, y0 = bounds[0] + (k % side) * step, bounds[1] + (k // side) * step
+        ring = [[x0, y0], [x0 + step, y0], [x0 + step, y0 + step], [x0, y0 + step], [x0, y0]]
+        ring = (np.array(ring) + rng.uniform(-step / 10, step / 10, (5, 2))).tolist()
+        ring[-1] = ring[0]
+        regions.append({"id": str(k), "name": f"Ward {k + 1}", "polygons": [[ring]]})
+
+    start = time.perf_counter()
+    labels = rasterize(regions, bounds, (args.size, args.size))
+    zones = ZoneLabels(labels, [r["id"] for r in regions], [r["name"] for r in regions], bounds)
+    rasterize_s = time.perf_counter() - start
+    layers = {f"layer{i}": rng.normal(size=(args.size, args.size)).astype(np.float32) for i in range(args.layers)}
+    print(f"{args.zones:,} zones on a {args.size}x{args.size} grid, {args.layers} layers, "
+          f"rasterized once in {rasterize_s:.2f} s")
+
+    start = time.perf_counter()
+    zones.stats(layers)
+    mean_s = time.perf_counter() - start
+    start = time.perf_counter()
+    zones.stats(layers, [10, 50, 90])
+    percentile_s = time.perf_counter() - start
+
+    # Without the label raster: a boolean mask per zone, read once per layer
+    sample = max(1, args.zones // 50)
+    start = time.perf_counter()
+    for z in range(0, args.zones, sample):
+        mask = labels == z + 1
+        for values in layers.values():
+            v = values[mask]
+            v = v[np.isfinite(v)]
+            if len(v):
+                v.mean(), np.percentile(v, [10, 50, 90])
+    masked_s = (time.perf_counter() - start) * args.zones / len(range(0, args.zones, sample))
+
+    print(f"{'method':<40}{'seconds':>10}")
+    print(f"{'label raster: count + mean':<40}{mean_s:>10.3f}")
+    print(f"{'label raster: + p10/p50/p90':<40}{percentile_s:>10.3f}")
+    print(f"{'mask per zone (extrapolated)':<40}{masked_s:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Local stand-in for the NASA FIRMS API
+Serves FIRMS-shaped CSV (synthetic or from fixture files) with an optional delay
+"""
+
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional, Set
+
+import numpy as np
+
+VIIRS_HEADER = "country_id,latitude,longitude,bright_ti4,scan,track,acq_date,acq_time,satellite,instrument,confidence,version,bright_ti5,frp,daynight"
+
+ROUTE = re.compile(r"/api/(?:country|archive)/csv/[^/]+/(?P<sensor>[^/]+)/(?P<country>[^/]+)/(?P<days>\d+)(?:/(?P<date>\d{4}-\d{2}-\d{2}))?/?$")
+
+
+def synthetic_firms_csv(rows: int, start: Optional[date] = None, days: int = 1, seed: int = 0) -> str:
+    """Build a VIIRS-style country CSV with `rows` detections spread over `days`"""
+    rng = np.random.default_rng(seed)
+    start = start or date.today()
+    lat = rng.uniform(8.0, 35.0, rows)
+    lon = rng.uniform(68.0, 97.0, rows)
+    ti4 = rng.uniform(295.0, 367.0, rows)
+    ti5 = rng.uniform(270.0, 310.0, rows)
+    scan = rng.uniform(0.32, 0.8, rows)
+    track = rng.uniform(0.36, 0.78, rows)
+    frp = rng.gamma(1.5, 4.0, rows)
+    day_offset = rng.integers(0, max(1, days), rows)
+    minutes = rng.integers(0, 24 * 60, rows)
+    conf = rng.choice(np.array(["l", "n", "h"]), rows, p=[0.1, 0.75, 0.15])
+    order = np.lexsort((minutes, day_offset))
+    lines = [VIIRS_HEADER]
+    for i in order:
+        acq = start + timedelta(days=int(day_offset[i]))
+        hhmm = int(minutes[i]) // 60 * 100 + int(minutes[i]) % 60
+        daynight = "D" if 600 <= hhmm < 1800 else "N"
+        lines.append(
+            f"IND,{lat[i]:.5f},{lon[i]:.5f},{ti4[i]:.2f},{scan[i]:.2f},{track[i]:.2f},"
+            f"{acq.isoformat()},{hhmm:04d},N,VIIRS,{conf[i]},2.0NRT,{ti5[i]:.2f},{frp[i]:.2f},{daynight}"
+        )
+    return "\n".join(lines) + "\n"
+
+
+class StandinFIRMSServer:
+    """Threaded local HTTP server answering FIRMS country/archive CSV requests
+
+    If `fixtures_dir` is given, `{fixtures_dir}/{sensor}/{YYYY-MM-DD}.csv` files are
+    served for each requested day; otherwise synthetic rows are generated.
+    Requests starting on a date in `fail_dates` get an HTTP 500.
+    """
+
+    def __init__(self, delay: float = 0.0, rows: int = 50, fixtures_dir: Optional[Path] = None):
+        self.delay = delay
+        self.rows = rows
+        self.fixtures_dir = Path(fixtures_dir) if fixtures_dir else None
+        self.fail_dates: Set[str] = set()
+        self.request_count = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def _body_for(self, sensor: str, days: int, start: Optional[str]) -> str:
+        first_day = datetime.strptime(start, "%Y-%m-%d").date() if start else date.today() - timedelta(days=days - 1)
+        if self.fixtures_dir is None:
+            return synthetic_firms_csv(self.rows, first_day, days, seed=first_day.toordinal())
+        header, rows = VIIRS_HEADER, []
+        for offset in range(days):
+            path = self.fixtures_dir / sensor / f"{(first_day + timedelta(days=offset)).isoformat()}.csv"
+            if path.exists():
+                lines = path.read_text().strip().split("\n")
+                header = lines[0]
+                rows.extend(lines[1:])
+        return "\n".join([header] + rows) + "\n"
+
+    def _handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                standin.request_count += 1
+                match = ROUTE.match(self.path.split("?")[0])
+                if not match:
+                    self.send_error(404)
+                    return
+                if standin.delay:
+                    time.sleep(standin.delay)
+                if match["date"] in standin.fail_dates:
+                    self.send_error(500)
+                    return
+                body = standin._body_for(match["sensor"], int(match["days"]), match["date"]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "StandinFIRMSServer":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local stand-in FIRMS API")
+    parser.add_argument("--delay", type=float, default=0.0)
+    parser.add_argument("--rows", type=int, default=50)
+    parser.add_argument("--fixtures", type=Path)
+    args = parser.parse_args()
+    with StandinFIRMSServer(args.delay, args.rows, args.fixtures) as server:
+        print(f"Stand-in FIRMS API at {server.base_url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
@@ -2,6 +2,8 @@
 NASA API Configuration and Data Sources
 """
 
+import os
+
 # NASA API Configuration
 NASA_API_KEY = "DEMO_KEY"  # Replace with actual NASA API key
 EARTHDATA_USERNAME = ""    # NASA Earthdata username
@@ -23,7 +25,7 @@ DATASETS = {
         "description": "Fire Information for Resource Management System",
         "endpoints": {
             "active_fires": "/country/csv/{api_key}/VIIRS_SNPP_NRT/{country}/{days}",
-            "fire_archive": "/archive/csv/{api_key}/VIIRS_SNPP_NRT/{country}/{date}"
+            "fire_archive": "/country/csv/{api_key}/{sensor}/{country}/{days}/{date}"
         }
     },
     
@@ -105,6 +107,339 @@ REALTIME_ENDPOINTS = {
     "GPM_PRECIPITATION": "https://gpm.nasa.gov/data/imerg"
 }
 
+# Local storage for ingested NASA data
+DATA_DIR = os.environ.get("HEALTHY_CITY_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "data"))
+
+# Background FIRMS ingestion (modules/nasa_data/firms_ingest.py)
+FIRMS_INGEST = {
+    "enabled": os.environ.get("FIRMS_INGEST_ENABLED", "1") == "1",
+    "store_dir": os.path.join(DATA_DIR, "firms"),
+    "country": "IND",
+    "max_window_days": 10,           # FIRMS country API accepts 1-10 days
+    "retention_days": 14,            # detections older than this are dropped on compaction
+    "compact_after_segments": 24,    # merge append segments once a sensor has this many
+    "sensors": {
+        "VIIRS_SNPP_NRT": {"poll_interval_s": 600},
+        "MODIS_C6_1": {"poll_interval_s": 1800}
+    }
+}
+
+# Fire event clustering over ingested detections (modules/nasa_data/fire_events.py)
+FIRE_EVENTS = {
+    "state_dir": os.path.join(DATA_DIR, "fire_events"),
+    "eps_km": 1.5,                   # detections closer than this belong to the same fire (VIIRS pixel 375 m, MODIS 1 km)
+    "max_gap_hours": 24,             # ...if they were also seen within this many hours of each other
+    "close_after_hours": 72,         # events with no detection for this long are closed
+    "footprint_cell_deg": 0.0035,    # ~375 m cells used to measure burning area without double counting
+    "history_length": 48,            # per-event growth entries kept
+    "keep_closed_days": 30           # closed and merged events are forgotten after this
+}
+
+# FIRMS archive backfill into Parquet (modules/nasa_data/firms_backfill.py)
+FIRMS_BACKFILL = {
+    "out_dir": os.path.join(DATA_DIR, "firms_archive"),
+    "workers": 4,
+    "chunk_days": 10,                # FIRMS serves at most 10 days per request
+    "max_attempts": 3
+}
+
+# Shared async HTTP layer (modules/nasa_data/http_client.py)
+HTTP_SETTINGS = {
+    "connect_timeout": 5.0,          # seconds to establish a TCP/TLS connection
+    "read_timeout": 30.0,            # seconds to wait between received bytes
+    "write_timeout": 10.0,
+    "pool_timeout": 10.0,            # seconds to wait for a free pooled connection
+    "max_connections": 64,
+    "max_keepalive_connections": 16,
+    "keepalive_expiry": 60.0,
+    "per_host_limit": 8,             # concurrent in-flight requests per upstream host
+    "host_limits": {
+        "firms.modaps.eosdis.nasa.gov": 4,
+        "disc.gsfc.nasa.gov": 4
+    }
+}
+
+# City pollution maps interpolated from stations and satellite pixels (modules/weather_air_quality/interpolation.py)
+POLLUTION_MAP = {
+    "grid_size": 25,                 # default cells per side
+    "max_grid_size": 400,
+    "kernel": "idw",                 # "idw" or "gaussian"
+    "neighbours": 8,                 # nearest samples blended into each cell
+    "idw_power": 2.0,
+    "gaussian_bandwidth_km": 4.0,
+    "stations_per_city": 16,
+    "satellite_pixel_deg": 0.05,     # simulated OMI/MODIS pixel spacing
+    "satellite_weight": 0.5,         # satellite pixels count half as much as a ground station
+    "hotspot_window": 3,             # cells; a hotspot is the maximum of its window
+    "hotspot_min_aqi": 100,
+    "max_hotspots": 10,
+    "cities": {
+        "delhi": {"name": "Delhi", "lat": 28.6139, "lon": 77.2090, "half_width_deg": 0.3, "urban_factor": 2.5},
+        "mumbai": {"name": "Mumbai", "lat": 19.0760, "lon": 72.8777, "half_width_deg": 0.25, "urban_factor": 2.2},
+        "kolkata": {"name": "Kolkata", "lat": 22.5726, "lon": 88.3639, "half_width_deg": 0.2, "urban_factor": 2.0},
+        "chennai": {"name": "Chennai", "lat": 13.0827, "lon": 80.2707, "half_width_deg": 0.2, "urban_factor": 1.7},
+        "bangalore": {"name": "Bangalore", "lat": 12.9716, "lon": 77.5946, "half_width_deg": 0.2, "urban_factor": 1.6},
+        "hyderabad": {"name": "Hyderabad", "lat": 17.3850, "lon": 78.4867, "half_width_deg": 0.2, "urban_factor": 1.7},
+        "pune": {"name": "Pune", "lat": 18.5204, "lon": 73.8567, "half_width_deg": 0.15, "urban_factor": 1.5},
+        "ahmedabad": {"name": "Ahmedabad", "lat": 23.0225, "lon": 72.5714, "half_width_deg": 0.15, "urban_factor": 1.8}
+    }
+}
+
+# Scheduled per-cell air quality forecasts (modules/weather_air_quality/forecast.py)
+AQ_FORECAST = {
+    "enabled": os.environ.get("AQ_FORECAST_ENABLED", "1") == "1",
+    "cache_dir": os.path.join(DATA_DIR, "aq_forecast"),
+    "bounds": (68.0, 6.0, 98.0, 37.0),   # minLon, minLat, maxLon, maxLat covered by the forecast grid
+    "cell_deg": 0.25,
+    "history_days": 56,                 # daily observations kept and fitted per cell
+    "season_days": 7,                   # weekly cycle
+    "horizon_days": 14,
+    "trend_damping": 0.9,               # keeps two-week trends from running away
+    "smoothing_candidates": [           # (alpha, beta, gamma); the best one-step fit wins per cell and pollutant
+        (0.2, 0.05, 0.1),
+        (0.4, 0.05, 0.2),
+        (0.6, 0.1, 0.3)
+    ],
+    "refresh_interval_s": 3600
+}
+
+# Satellite pass prediction from local TLE sets (modules/nasa_data/passes.py)
+SATELLITE_PASSES = {
+    "tle_file": os.environ.get("TLE_FILE", os.path.join(os.path.dirname(__file__), "satellites.tle")),
+    "satellites": {                  # TLE name -> display name and instruments
+        "AQUA": {"name": "Aqua", "instruments": ["MODIS", "AIRS", "CERES"]},
+        "TERRA": {"name": "Terra", "instruments": ["MODIS", "ASTER", "MISR"]},
+        "AURA": {"name": "Aura", "instruments": ["OMI", "MLS", "TES"]},
+        "SUOMI NPP": {"name": "Suomi NPP", "instruments": ["VIIRS", "CrIS", "OMPS"]},
+        "NOAA 20": {"name": "NOAA-20", "instruments": ["VIIRS", "CrIS", "ATMS"]}
+    },
+    "min_elevation_deg": 10.0,
+    "step_s": 30,                    # propagation step; rise/set are interpolated between steps
+    "cell_deg": 0.25,                # observers in one cell share the cell centre's passes
+    "batch_size": 512,               # observer cells per elevation batch
+    "cache_days": 3                  # days of per-cell passes kept in memory
+}
+
+# Chunked gridded data cubes ingested from local NetCDF/HDF5 granules (modules/nasa_data/cube_store.py)
+# Granules without lat/lon datasets must already be on the product grid, south row first.
+CUBE_STORE = {
+    "root": os.path.join(DATA_DIR, "cubes"),
+    "chunk": (32, 64, 64),           # time steps x rows x columns per chunk (512 KB of float32)
+    "compression_level": 4,          # zlib level; 0 stores chunks raw and reads view them in place
+    "cache_mb": 256,                 # decompressed chunks kept in memory across all cubes
+    "open_blocks": 64,               # memory-mapped block files kept open
+    "ingest_batch_mb": 512,          # granule values buffered before a write
+    "products": {
+        "OMI": {                     # OMNO2d daily L3 (HDF-EOS5), 0.25 degree
+            "grid": (-180.0, -90.0, 180.0, 90.0, 0.25),
+            "variables": {"no2_trop": "HDFEOS/GRIDS/ColumnAmountNO2/Data Fields/ColumnAmountNO2TropCloudScreened"},
+            "time_pattern": r"_(?P<year>\d{4})m(?P<month>\d{2})(?P<day>\d{2})_"
+        },
+        "SMAP": {                    # SPL3SMP daily L3 (HDF5), 36 km EASE-Grid 2.0 binned to 0.375 degree
+            "grid": (-180.0, -84.0, 180.0, 84.0, 0.375),
+            "variables": {"soil_moisture": "Soil_Moisture_Retrieval_Data_AM/soil_moisture"},
+            "lat": "Soil_Moisture_Retrieval_Data_AM/latitude",
+            "lon": "Soil_Moisture_Retrieval_Data_AM/longitude",
+            "time_pattern": r"_(?P<year>\d{4})(?P<month>\d{2})(?P<day>\d{2})_"
+        },
+        "GPM": {                     # IMERG final daily (NetCDF4), 0.1 degree, stored (time, lon, lat)
+            "grid": (-180.0, -90.0, 180.0, 90.0, 0.1),
+            "variables": {"precipitation": "precipitation"},
+            "dims": "txy",
+            "lat": "lat",
+            "lon": "lon",
+            "time": "time"
+        },
+        "GRACE": {                   # JPL RL06.3 CRI-filtered mascons (NetCDF4), 0.5 degree monthly
+            "grid": (-180.0, -90.0, 180.0, 90.0, 0.5),
+            "chunk": (64, 32, 32),
+            "variables": {"lwe_thickness": "lwe_thickness", "uncertainty": "uncertainty"},
+            "lat": "lat",
+            "lon": "lon",
+            "time": "time"
+        },
+        "MODIS_NDVI": {              # MOD13Q1 16-day NDVI/EVI as AppEEARS NetCDF4 over India, ~250 m
+            "grid": (68.0, 6.0, 98.0, 37.0, 0.0025),
+            "chunk": (8, 128, 128),
+            "variables": {"ndvi": "_250m_16_days_NDVI", "evi": "_250m_16_days_EVI"},
+            "lat": "lat",
+            "lon": "lon",
+            "time": "time"
+        }
+    }
+}
+
+# GRACE/GRACE-FO TWS grid memory-mapped from the ingested mascon cube (modules/nasa_data/grace_grid.py)
+GRACE_GRID = {
+    "dir": os.path.join(DATA_DIR, "grace"),
+    "series_months": 24,             # time series length returned per location
+    "max_batch_points": 10000
+}
+
+# MOD13Q1/MYD13Q1 sinusoidal tiles kept as memory-mapped pixel records (modules/nasa_data/modis_tiles.py)
+# Ingest HDF-EOS or native-projection GeoTIFF tiles with: python -m modules.nasa_data.modis_ingest FILES...
+MODIS_TILES = {
+    "root": os.path.join(DATA_DIR, "modis_tiles"),
+    "cache_mb": 65536,               # composite bytes kept mapped (address space; the page cache holds what is read)
+    "window_days": 365,              # composites returned per location
+    "max_batch_points": 10000,
+    "max_batch_days": 1830,          # longest date range a batch request may cover
+    "products": {"MOD13Q1": "MODIS Terra", "MYD13Q1": "MODIS Aqua"},
+    "date_patterns": [r"\.A(?P<year>\d{4})(?P<doy>\d{3})\.", r"_doy(?P<year>\d{4})(?P<doy>\d{3})_"],
+    "layers": {                      # HDF subdataset / GeoTIFF file name suffixes, spaces as underscores
+        "ndvi": "250m_16_days_NDVI",
+        "evi": "250m_16_days_EVI",
+        "vi_quality": "250m_16_days_VI_Quality",
+        "reliability": "250m_16_days_pixel_reliability"
+    }
+}
+
+# Region polygons rasterized to area-weighted masks per grid (modules/nasa_data/regions.py)
+# The bundled outlines are simplified to ~0.5 degree; point REGIONS_FILE at official boundaries to replace them.
+REGIONS = {
+    "file": os.environ.get("REGIONS_FILE", os.path.join(os.path.dirname(__file__), "regions.geojson")),
+    "cache_dir": os.path.join(DATA_DIR, "regions"),
+    "subsamples": 4,                 # points per cell side for fractional coverage
+    "subsample_min_deg": 0.05,       # finer grids (MODIS 250 m) test cell centres only
+    "soil_depth_mm": 50              # SMAP retrieval depth used to turn m3/m3 into mm of water
+}
+
+# Ward/district zones rasterized to label rasters on city grids for zonal statistics (modules/nasa_data/zonal.py)
+# Point ZONES_FILE at a GeoJSON of ward or district boundaries; without one each city is split into sectors.
+ZONES = {
+    "file": os.environ.get("ZONES_FILE"),
+    "cache_dir": os.path.join(DATA_DIR, "zones"),
+    "sectors": 3,                    # sectors per side of a city when no zones file is set
+    "grid_size": 100,                # cells per side of the city grids zones are rasterized onto
+    "percentiles": [10, 50, 90]
+}
+
+# People per pixel from a WorldPop or GHSL GeoTIFF, aligned to hazard grids for exposure counts (modules/nasa_data/population.py)
+# Ingest with: python -m modules.nasa_data.population_ingest /data/worldpop/ind_ppp_2020_UNadj_constrained.tif
+POPULATION = {
+    "root": os.path.join(DATA_DIR, "population"),
+    "block_rows": 2048,              # raster rows read at a time while ingesting
+    "weight_entries": 256,           # hazard-grid alignments kept in memory
+    "max_local_cells": 2000,         # cells per side of the grid people within a distance of points are counted on
+    "alert_radius_km": 2.0,          # around an alert area given as a point without a radius
+    "max_alert_radius_km": 50.0      # larger client-given alert radii are cut to this
+}
+
+# Composite city health indices: raster-algebra expressions over the named city-grid layers (modules/composites)
+# Layers: aqi, no2, pm25, ndvi, green_cover, water (GRACE anomaly, mm), temperature (deg C) and population.
+# Functions: sqrt, log, exp, abs, min, max, clip, where, and the whole-layer rescalings norm (min-max) and zscore.
+COMPOSITES = {
+    "cache_dir": os.path.join(DATA_DIR, "composites"),
+    "chunk_cells": 1 << 20,          # grid cells per evaluation chunk
+    "max_nodes": 256,                # operations in one expression, after shared subexpressions are merged
+    "max_depth": 64,                 # nesting levels of one expression
+    "max_expression_length": 2000,
+    "memory_entries": 64,            # evaluated grids kept in memory
+    "disk_entries": 512,             # evaluated grids kept on disk, oldest pruned first
+    "indices": {
+        "heat_pollution_greenery": {
+            "expression": "norm(temperature) * norm(aqi) * (1 - norm(ndvi))",
+            "description": "Heat x pollution x low greenery exposure"
+        },
+        "respiratory_risk": {
+            "expression": "0.6 * norm(pm25) + 0.4 * norm(no2)",
+            "description": "Particulate and NO2 burden weighted for respiratory harm"
+        },
+        "heat_vulnerability": {
+            "expression": "norm(temperature) * (1 - green_cover)",
+            "description": "Heat where there is little green cover to offset it"
+        },
+        "water_stress": {
+            "expression": "norm(temperature) * (1 - norm(water))",
+            "description": "Heat over depleted groundwater storage"
+        },
+        "people_in_unhealthy_air": {
+            "expression": "population * (aqi > 100)",
+            "description": "Residents breathing air unhealthy for sensitive groups or worse"
+        }
+    }
+}
+
+# NDVI/EVI/SAVI rasters computed from Landsat/Sentinel-2 surface reflectance bands (modules/green_vegetation/raster_engine.py)
+# Compute every scene under scenes_dir with: python -m modules.green_vegetation.raster_engine
+VEGETATION_RASTER = {
+    "scenes_dir": os.path.join(DATA_DIR, "scenes"),
+    "cache_dir": os.path.join(DATA_DIR, "vegetation_rasters"),
+    "workers": os.cpu_count() or 1,
+    "window_px": 1024,               # pixels per window side; each worker holds one window of every band
+    "savi_l": 0.5,                   # SAVI soil brightness correction
+    "cover_grid": 25,                # cells per side of the urban cover map
+    "cell_samples": 16,              # most pixels sampled per cell side
+    "green_ndvi": 0.3,               # pixels at or above this NDVI count as green cover
+    "sensors": {
+        "landsat": {                 # Collection 2 Level-2, e.g. LC08_L2SP_146040_20230415_20230420_02_T1_SR_B4.TIF
+            "pattern": r"^(?P<scene>L[COT]0[89]_L2SP_\d{6}_(?P<date>\d{8})_\d{8}_\d{2}_T[12RT])_SR_(?P<band>B\d)\.TIF$",
+            "name": "Landsat 8/9 OLI",
+            "bands": {"blue": "B2", "red": "B4", "nir": "B5"},
+            "scale": 0.0000275,
+            "offset": -0.2,
+            "nodata": 0
+        },
+        "sentinel2": {               # Level-2A, processing baseline 04.00+, e.g. T43RGM_20230415T052651_B04_10m.tif
+            "pattern": r"^(?P<scene>T\d{2}[A-Z]{3}_(?P<date>\d{8})T\d{6})_(?P<band>B\d{2}|B8A)(_\d+m)?\.(tif|TIF|jp2)$",
+            "name": "Sentinel-2 MSI",
+            "bands": {"blue": "B02", "red": "B04", "nir": "B08"},
+            "scale": 0.0001,
+            "offset": -0.1,
+            "nodata": 0
+        }
+    }
+}
+
+# Green corridor analysis over the vegetation rasters (modules/green_vegetation/corridors.py)
+GREEN_CORRIDORS = {
+    "cache_dir": os.path.join(DATA_DIR, "green_corridors"),
+    "min_patch_ha": 0.5,             # smaller green patches are treated as noise
+    "max_gap_m": 250,                # widest non-green gap wildlife is assumed to cross between patches
+    "band_pixels": 4_000_000,        # pixels per edge-extraction band and pair-search slice, bounding memory on large rasters
+    "max_corridors": 10,
+    "max_hotspots": 5,
+    "species_area": {"c": 15, "z": 0.25}  # S = c * A^z with A in hectares, for the species estimates
+}
+
+# Distance-to-green and green-area-within-radius rasters per city (modules/green_vegetation/proximity.py)
+# Built once per city from the NDVI scene covering it; rebuilt when that scene is recomputed.
+GREEN_PROXIMITY = {
+    "cache_dir": os.path.join(DATA_DIR, "green_proximity"),
+    "min_space_ha": 0.5,             # smallest green patch that counts as a green space for distance queries
+    "radius_m": 500,                 # radius of the "green area within" layer
+    "access_m": 300,                 # 3-30-300 rule: a green space within 300 m of every home
+    "nearby_m": 2000,                # radius searched for the nearby green space list
+    "nearby_limit": 5,
+    "max_batch_points": 100000       # a ward's addresses in one request
+}
+
+# XYZ tile pyramids of the vegetation rasters and pollution grids (modules/map_tiles/pyramid.py)
+# A layer is rebuilt when its data changes (new scene, new hour); tile URLs carry the build version.
+MAP_TILES = {
+    "root": os.path.join(DATA_DIR, "map_tiles"),
+    "immutable_max_age_s": 31536000, # tile URLs with the current ?v= never change
+    "max_age_s": 300,                # unversioned URLs follow rebuilds
+    "max_overzoom": 6,               # zoom levels past a layer's max_zoom served by upsampling
+    "png_cache_tiles": 4096,         # encoded PNG tiles kept in memory
+    "pollution_grid_size": 200,      # cells per side of each city's pollution grid
+    "layers": {
+        "ndvi": {"source": "vegetation", "variable": "ndvi", "min_zoom": 4, "max_zoom": 12,  # ~30 m Landsat
+                 "range": [-0.2, 0.9], "colors": ["#a50026", "#f46d43", "#fee08b", "#d9ef8b", "#66bd63", "#1a9850", "#004529"]},
+        "evi": {"source": "vegetation", "variable": "evi", "min_zoom": 4, "max_zoom": 12,
+                "range": [-0.2, 0.8], "colors": ["#a50026", "#f46d43", "#fee08b", "#d9ef8b", "#66bd63", "#1a9850", "#004529"]},
+        "savi": {"source": "vegetation", "variable": "savi", "min_zoom": 4, "max_zoom": 12,
+                 "range": [-0.2, 0.8], "colors": ["#a50026", "#f46d43", "#fee08b", "#d9ef8b", "#66bd63", "#1a9850", "#004529"]},
+        "aqi": {"source": "pollution", "variable": "aqi", "min_zoom": 4, "max_zoom": 10,
+                "range": [0, 500], "breaks": [50, 100, 150, 200, 300],   # US EPA categories
+                "colors": ["#00e400", "#ffff00", "#ff7e00", "#ff0000", "#8f3f97", "#7e0023"]},
+        "no2": {"source": "pollution", "variable": "no2", "min_zoom": 4, "max_zoom": 10,
+                "range": [0, 150], "colors": ["#ffffcc", "#fd8d3c", "#bd0026", "#49006a"]},
+        "pm25": {"source": "pollution", "variable": "pm25", "min_zoom": 4, "max_zoom": 10,
+                 "range": [0, 250], "colors": ["#ffffcc", "#fd8d3c", "#bd0026", "#49006a"]}
+    }
+}
+
 # NASA Open Data Portal
 NASA_OPEN_DATA = {
     "base_url": "https://data.nasa.gov/api/views",
@@ -182,6 +182,8 @@ function init3DEarth() {
     
     // Add NASA data points
     addNASADataPoints();
+    loadVisibleFires();
+    earthControls.addEventListener('change', refreshVisibleFires);
     
     // Add compass
     addCompass(container);
@@ -207,6 +209,47 @@ function addNASADataPoints() {
     });
 }
 
+// Replace the static fire points with stored FIRMS detections on the hemisphere facing the camera
+let visibleFirePoints = null;
+let fireView = null;
+let fireRequestPending = false;
+
+// Dragging, zooming and auto-rotation all move the camera; re-query once the view has moved far enough
+function refreshVisibleFires() {
+    if (fireRequestPending || !fireView) return;
+    const position = earthCamera.position;
+    const turned = position.angleTo(fireView) > 10 * Math.PI / 180;
+    const zoomed = Math.abs(position.length() - fireView.length()) > 0.1 * fireView.length();
+    if (turned || zoomed) loadVisibleFires();
+}
+
+async function loadVisibleFires() {
+    fireView = earthCamera.position.clone();
+    fireRequestPending = true;
+    const p = earthCamera.position.clone().normalize();
+    const lat = Math.asin(p.y) * 180 / Math.PI;
+    const lon = ((Math.atan2(p.z, -p.x) * 180 / Math.PI - 180) % 360 + 540) % 360 - 180;
+    // The camera sees a cap of angular radius acos(R / d) on the radius-5 globe, up to ~10,000 km far away
+    const radiusKm = 6371 * Math.acos(Math.min(1, 5 / earthCamera.position.length()));
+    try {
+        const url = `${window.location.origin}/api/nasa/fires?lat=${lat.toFixed(3)}&lon=${lon.toFixed(3)}&radius_km=${Math.ceil(radiusKm)}&limit=2000`;
+        const data = await (await fetch(url)).json();
+        if (visibleFirePoints) earthScene.remove(visibleFirePoints);
+        visibleFirePoints = null;
+        if (!data.fires || data.fires.length === 0) return;
+        
+        visibleFirePoints = new THREE.Group();
+        data.fires.forEach(fire => {
+            visibleFirePoints.add(createDataPoint(fire.latitude, fire.longitude, 0xff4500, 0.05));
+        });
+        earthScene.add(visibleFirePoints);
+    } catch (error) {
+        console.log('Fire detections unavailable, showing sample data');
+    } finally {
+        fireRequestPending = false;
+    }
+}
+
 function createDataPoint(lat, lon, color, size) {
     const phi = (90 - lat) * (Math.PI / 180);
     const theta = (lon + 180) * (Math.PI / 180);
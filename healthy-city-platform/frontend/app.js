@@ -205,12 +205,25 @@ class NASAEarthPlatform {
         // Load initial pollution data
         this.loadNASAPollutionData();
         
-        // Reload pollution data when map is moved or zoomed
+        // Reload pollution and fire data when map is moved or zoomed
         this.map.on('moveend zoomend', () => {
             this.loadNASAPollutionData();
+            this.loadRealTimeFIRMSData();
         });
     }
     
+    // Current map viewport as a "minLon,minLat,maxLon,maxLat" bbox for the fires API
+    viewportBbox() {
+        const bounds = this.map.getBounds();
+        const wrap = lon => ((lon + 180) % 360 + 360) % 360 - 180;
+        const south = Math.max(-90, bounds.getSouth()).toFixed(4);
+        const north = Math.min(90, bounds.getNorth()).toFixed(4);
+        if (bounds.getEast() - bounds.getWest() >= 360) {
+            return `-180,${south},180,${north}`;
+        }
+        return `${wrap(bounds.getWest()).toFixed(4)},${south},${wrap(bounds.getEast()).toFixed(4)},${north}`;
+    }
+    
     initDataOverlays() {
         // Air Quality overlay (pollution heatmap)
         this.overlays.airQuality = L.layerGroup();
@@ -552,9 +565,16 @@ class NASAEarthPlatform {
 
     async addFIRMSData() {
         try {
-            // Use our backend NASA API endpoint
-            const response = await fetch(`${this.apiBaseUrl}/nasa/fires`);
-            const data = await response.json();
+            // Use our backend NASA API endpoint, following pages until all visible detections are loaded
+            const bbox = this.viewportBbox();
+            let data = { fires: [] };
+            let offset = 0;
+            while (offset !== null) {
+                const response = await fetch(`${this.apiBaseUrl}/nasa/fires?bbox=${bbox}&offset=${offset}&limit=5000`);
+                const page = await response.json();
+                data = { ...page, fires: data.fires.concat(page.fires || []) };
+                offset = page.next_offset ?? null;
+            }
             
             if (data.fires && data.fires.length > 0) {
                 data.fires.forEach(fire => {
@@ -571,7 +591,7 @@ class NASAEarthPlatform {
                                 <div style="color: black;">
                                     <strong>NASA FIRMS Fire Detection</strong><br>
                                     Confidence: ${fire.confidence}%<br>
-                                    Brightness: ${fire.brightness_ti4}K<br>
+                                    Brightness: ${fire.brightness}K<br>
                                     Detection: ${fire.acq_date} ${fire.acq_time}<br>
                                     Satellite: ${fire.satellite}
                                 </div>
@@ -780,17 +800,13 @@ class NASAEarthPlatform {
     // Real-time FIRMS Fire Data
     async loadRealTimeFIRMSData() {
         try {
-            const today = new Date().toISOString().split('T')[0];
-            const yesterday = new Date(Date.now() - 86400000).toISOString().split('T')[0];
-            
-            // Use NASA FIRMS API for real-time fire data
-            const response = await fetch(`https://firms.modaps.eosdis.nasa.gov/api/country/csv/DEMO_KEY/MODIS_C6_1/USA/1/${yesterday}`);
-            const csvData = await response.text();
+            // Ask the backend store only for detections inside the visible map area
+            const response = await fetch(`${this.apiBaseUrl}/nasa/fires?bbox=${this.viewportBbox()}&limit=500`);
+            const data = await response.json();
             
-            if (csvData && !csvData.includes('error')) {
-                const fires = this.parseCSV(csvData);
-                this.updateFireOverlay(fires);
-                return { totalFires: fires.length, fires: fires.slice(0, 100) };
+            if (data.fires) {
+                this.updateFireOverlay(data.fires);
+                return { totalFires: data.total, fires: data.fires.slice(0, 100) };
             }
         } catch (error) {
             console.log('FIRMS API error, using fallback data');
@@ -954,7 +970,7 @@ class NASAEarthPlatform {
     updateFireOverlay(fires) {
         this.overlays.fires.clearLayers();
         
-        fires.slice(0, 50).forEach(fire => {
+        fires.forEach(fire => {
             if (fire.latitude && fire.longitude) {
                 const fireIcon = L.divIcon({
                     html: '<i class="fas fa-fire" style="color: #FF4500; font-size: 16px;"></i>',
@@ -967,7 +983,7 @@ class NASAEarthPlatform {
                         <div style="color: black;">
                             <strong>NASA FIRMS Fire Detection</strong><br>
                             Confidence: ${fire.confidence}%<br>
-                            Brightness: ${fire.bright_ti4}K<br>
+                            Brightness: ${fire.brightness}K<br>
                             Detection: ${fire.acq_date} ${fire.acq_time}<br>
                             Satellite: ${fire.satellite}
                         </div>
@@ -1,18 +1,20 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from typing import Dict, List
 from .services import CitizenService, ReportingService, AlertService
+from modules.http_cache import etag_json
+from modules.weather_air_quality.api import air_quality_service
 
 router = APIRouter()
-citizen_service = CitizenService()
-reporting_service = ReportingService()
+citizen_service = CitizenService(air_quality_service)
+reporting_service = ReportingService(air_quality_service)
 alert_service = AlertService()
 
 @router.get("/dashboard/{lat}/{lon}")
-async def get_citizen_dashboard(lat: float, lon: float) -> Dict:
+async def get_citizen_dashboard(lat: float, lon: float, request: Request):
     """Get citizen dashboard with local environmental data"""
     try:
         dashboard_data = await citizen_service.get_citizen_dashboard(lat, lon)
-        return dashboard_data
+        return etag_json(request, dashboard_data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
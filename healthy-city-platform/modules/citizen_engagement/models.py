@@ -26,7 +26,8 @@ class GreenSpace(BaseModel):
 class GreenCoverInfo(BaseModel):
     nearby_green_spaces: List[GreenSpace]
     vegetation_health_score: float
-    tree_cover_percent: float
+    green_cover_percent: float
+    tree_cover_percent: float  # same value as green_cover_percent, under its original name
     mental_health_benefit_score: float
 
 class WaterBodyInfo(BaseModel):
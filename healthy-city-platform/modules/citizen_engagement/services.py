@@ -1,45 +1,54 @@
+import asyncio
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional
 import uuid
+from sqlalchemy.exc import SQLAlchemyError
+from config.nasa_apis import POLLUTION_MAP, ZONES
+from modules.green_vegetation.proximity import city_bounds, get_green_proximity
+from modules.green_vegetation.vegetation_rasters import get_vegetation_rasters
+from modules.nasa_data.simulation import as_day, simulator
+from modules.nasa_data.zonal import KM_PER_DEGREE, city_grid, disk_zones
+from modules.weather_air_quality.aqi import aqi_summary
+from modules.weather_air_quality.services import AirQualityService
 
 class CitizenService:
-    def __init__(self):
-        pass
+    def __init__(self, air_quality: AirQualityService):
+        # The shared service behind /api/weather/air-quality, so its caches are reused
+        self.air_quality = air_quality
+        self.green_proximity = get_green_proximity()
     
     async def get_citizen_dashboard(self, lat: float, lon: float) -> Dict:
         """Get comprehensive dashboard for citizen location"""
-        # Simulate real-time environmental data around citizen location
+        # Simulate environmental data around citizen location; deterministic per location and day
+        day = as_day()
+        sim = simulator.point("CITIZEN_DASHBOARD", lat, lon, day)
+        aqi = aqi_summary(self.air_quality.simulate_pollutants(lat, lon, day))
         dashboard_data = {
             "location": {"lat": lat, "lon": lon},
-            "last_updated": datetime.now().isoformat(),
+            "last_updated": datetime.combine(day, datetime.min.time()).isoformat(),
             "air_quality": {
-                "aqi": np.random.randint(30, 150),
-                "category": np.random.choice(["Good", "Moderate", "Unhealthy for Sensitive Groups", "Unhealthy"]),
-                "dominant_pollutant": np.random.choice(["PM2.5", "NO2", "O3"]),
-                "health_recommendation": self._get_health_recommendation(np.random.randint(30, 150))
-            },
-            "green_cover": {
-                "nearby_green_spaces": self._find_nearby_green_spaces(lat, lon),
-                "vegetation_health_score": np.random.uniform(60, 95),
-                "tree_cover_percent": np.random.uniform(15, 45),
-                "mental_health_benefit_score": np.random.uniform(70, 90)
+                "aqi": aqi["value"],
+                "category": aqi["category"],
+                "dominant_pollutant": aqi["dominant_pollutant"],
+                "health_recommendation": self._get_health_recommendation(aqi["value"])
             },
+            "green_cover": await asyncio.to_thread(self._green_cover, lat, lon, sim),
             "water_quality": {
                 "nearest_water_body": {
                     "name": "City Lake",
-                    "distance_km": np.random.uniform(0.5, 3.0),
-                    "quality_score": np.random.uniform(40, 85),
-                    "safety_status": np.random.choice(["safe", "caution", "unsafe"])
+                    "distance_km": sim.uniform("water_distance", 0.5, 3.0),
+                    "quality_score": sim.uniform("water_quality", 40, 85),
+                    "safety_status": sim.choice("water_safety", ["safe", "caution", "unsafe"])
                 },
-                "groundwater_status": np.random.choice(["adequate", "stressed", "critical"]),
-                "water_shortage_risk": np.random.choice(["low", "medium", "high"])
+                "groundwater_status": sim.choice("groundwater", ["adequate", "stressed", "critical"]),
+                "water_shortage_risk": sim.choice("shortage_risk", ["low", "medium", "high"])
             },
             "weather": {
-                "temperature_celsius": np.random.uniform(20, 35),
-                "humidity_percent": np.random.uniform(40, 80),
-                "uv_index": np.random.uniform(3, 11),
-                "weather_alerts": self._get_weather_alerts()
+                "temperature_celsius": sim.uniform("temperature", 20, 35),
+                "humidity_percent": sim.uniform("humidity", 40, 80),
+                "uv_index": sim.uniform("uv", 3, 11),
+                "weather_alerts": self._get_weather_alerts(lat, lon)
             },
             "disaster_alerts": self._get_active_disaster_alerts(lat, lon),
             "community_actions": self._get_community_actions(lat, lon)
@@ -58,58 +67,116 @@ class CitizenService:
         else:
             return "Air quality is unhealthy. Limit outdoor activities and wear masks."
     
-    def _find_nearby_green_spaces(self, lat: float, lon: float) -> List[Dict]:
-        """Find green spaces near citizen location"""
-        green_spaces = []
+    def _green_cover(self, lat: float, lon: float, sim) -> Dict:
+        """Green spaces and cover around the citizen, from the proximity layers where a scene covers the location"""
+        # One raster lookup serves both the nearby spaces and the point summary
+        try:
+            found = self.green_proximity.lookup(lat, lon)
+            spaces = self.green_proximity.nearby(lat, lon, found)
+            point = self.green_proximity.point(lat, lon, found)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Green proximity lookup failed: {e}")
+            spaces = point = None
+        green_cover = {
+            "nearby_green_spaces": self._find_nearby_green_spaces(lat, lon, spaces),
+            "vegetation_health_score": sim.uniform("vegetation_health", 60, 95),
+            # Share of the surroundings with NDVI above the green threshold, not canopy
+            "green_cover_percent": sim.uniform("tree_cover", 15, 45),
+            "mental_health_benefit_score": sim.uniform("mental_health", 70, 90)
+        }
+        if point is not None:
+            green_cover["green_cover_percent"] = round(point["green_share_within_radius"] * 100, 1)
+            green_cover["mental_health_benefit_score"] = round(60 + point["access_score"] * 35, 1)
+            green_cover["distance_to_green_space_m"] = point["distance_to_green_space_m"]
+        # The field's original name, kept for existing clients
+        green_cover["tree_cover_percent"] = green_cover["green_cover_percent"]
+        return green_cover
+    
+    def _find_nearby_green_spaces(self, lat: float, lon: float, spaces: Optional[List[Dict]]) -> List[Dict]:
+        """Green spaces near citizen location, from the proximity layers' spaces when a scene covers it"""
+        if spaces is not None:
+            return [
+                {
+                    "name": f"Green Space {space['id']}",
+                    "type": space["type"],
+                    "lat": space["lat"],
+                    "lon": space["lon"],
+                    "distance_km": round(space["distance_m"] / 1000, 3),
+                    "area_hectares": space["area_hectares"],
+                    "facilities": [],  # not observable from imagery
+                    # Cooling and filtering grow with park size; capped at the simulated range's top
+                    "air_quality_improvement": round(min(30.0, 10 + 5 * np.log10(1 + space["area_hectares"])), 1),
+                    "mental_health_score": round(75 + 20 * max(0.0, 1 - space["distance_m"] / 1000), 1)
+                }
+                for space in spaces
+            ]
         
-        for i in range(np.random.randint(3, 8)):
-            space = {
+        # Green spaces do not change day to day, so they are keyed by location only
+        sim = simulator.point("GREEN_SPACES", lat, lon, "2024-01-01")
+        count = sim.integers("count", 3, 8)
+        lat_offsets = sim.uniform("lat_offset", -0.02, 0.02, size=count)
+        lon_offsets = sim.uniform("lon_offset", -0.02, 0.02, size=count)
+        distances = sim.uniform("distance", 0.2, 2.0, size=count)
+        areas = sim.uniform("area", 0.5, 10.0, size=count)
+        air_quality = sim.uniform("air_quality_improvement", 10, 30, size=count)
+        mental_health = sim.uniform("mental_health", 75, 95, size=count)
+        types = sim.choice("type", ["park", "garden", "forest", "recreational_area"], size=count)
+        facilities = sim.choice("facilities", [
+            ["walking_trails", "benches"],
+            ["playground", "walking_trails", "benches"],
+            ["sports_facilities", "walking_trails", "benches", "restrooms"]
+        ], size=count)
+        
+        return [
+            {
                 "name": f"Green Space {i+1}",
-                "type": np.random.choice(["park", "garden", "forest", "recreational_area"]),
-                "lat": lat + np.random.uniform(-0.02, 0.02),
-                "lon": lon + np.random.uniform(-0.02, 0.02),
-                "distance_km": np.random.uniform(0.2, 2.0),
-                "area_hectares": np.random.uniform(0.5, 10.0),
-                "facilities": np.random.choice([
-                    ["walking_trails", "benches"],
-                    ["playground", "walking_trails", "benches"],
-                    ["sports_facilities", "walking_trails", "benches", "restrooms"]
-                ]),
-                "air_quality_improvement": np.random.uniform(10, 30),  # percentage
-                "mental_health_score": np.random.uniform(75, 95)
+                "type": types[i],
+                "lat": lat + float(lat_offsets[i]),
+                "lon": lon + float(lon_offsets[i]),
+                "distance_km": float(distances[i]),
+                "area_hectares": float(areas[i]),
+                "facilities": facilities[i],
+                "air_quality_improvement": float(air_quality[i]),  # percentage
+                "mental_health_score": float(mental_health[i])
             }
-            green_spaces.append(space)
-        
-        return green_spaces
+            for i in range(count)
+        ]
     
-    def _get_weather_alerts(self) -> List[Dict]:
+    def _get_weather_alerts(self, lat: float, lon: float) -> List[Dict]:
         """Get current weather alerts"""
+        day = as_day()
+        sim = simulator.point("WEATHER_ALERTS", lat, lon, day)
         alerts = []
         
-        if np.random.random() > 0.7:  # 30% chance of weather alert
+        if sim.chance("active", 0.3):  # 30% chance of weather alert
             alert_types = ["heat_wave", "heavy_rain", "strong_winds", "air_quality"]
-            alert_type = np.random.choice(alert_types)
+            alert_type = sim.choice("type", alert_types)
+            severity = sim.choice("severity", ["advisory", "watch", "warning"])
             
             alerts.append({
                 "type": alert_type,
-                "severity": np.random.choice(["advisory", "watch", "warning"]),
-                "message": f"{alert_type.replace('_', ' ').title()} {np.random.choice(['advisory', 'watch', 'warning'])} in effect",
-                "valid_until": (datetime.now() + timedelta(hours=np.random.randint(6, 24))).isoformat()
+                "severity": severity,
+                "message": f"{alert_type.replace('_', ' ').title()} {severity} in effect",
+                "valid_until": (datetime.combine(day, datetime.min.time())
+                                + timedelta(hours=sim.integers("valid_hours", 6, 24))).isoformat()
             })
         
         return alerts
     
     def _get_active_disaster_alerts(self, lat: float, lon: float) -> List[Dict]:
         """Get active disaster alerts for location"""
+        day = as_day()
+        sim = simulator.point("DISASTER_ALERTS", lat, lon, day)
         alerts = []
         
-        if np.random.random() > 0.8:  # 20% chance of disaster alert
+        if sim.chance("active", 0.2):  # 20% chance of disaster alert
             alert = {
-                "alert_id": str(uuid.uuid4()),
-                "type": np.random.choice(["flood", "drought", "fire", "earthquake"]),
-                "severity": np.random.choice(["watch", "warning", "emergency"]),
-                "distance_km": np.random.uniform(1, 20),
-                "estimated_impact_time": (datetime.now() + timedelta(hours=np.random.randint(2, 48))).isoformat(),
+                "alert_id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"disaster-alert/{lat}/{lon}/{day}")),
+                "type": sim.choice("type", ["flood", "drought", "fire", "earthquake"]),
+                "severity": sim.choice("severity", ["watch", "warning", "emergency"]),
+                "distance_km": sim.uniform("distance", 1, 20),
+                "estimated_impact_time": (datetime.combine(day, datetime.min.time())
+                                          + timedelta(hours=sim.integers("impact_hours", 2, 48))).isoformat(),
                 "recommended_actions": [
                     "Stay informed through official channels",
                     "Prepare emergency kit",
@@ -122,29 +189,32 @@ class CitizenService:
     
     def _get_community_actions(self, lat: float, lon: float) -> List[Dict]:
         """Get community actions citizen can take"""
+        day = as_day()
+        midnight = datetime.combine(day, datetime.min.time())
+        sim = simulator.point("COMMUNITY_ACTIONS", lat, lon, day)
         actions = [
             {
                 "action_id": "plant_trees",
                 "title": "Community Tree Planting",
                 "description": "Join local tree planting initiative",
                 "impact": "Improve air quality and reduce urban heat",
-                "participation_count": np.random.randint(50, 500),
-                "next_event": (datetime.now() + timedelta(days=np.random.randint(1, 14))).isoformat()
+                "participation_count": sim.integers("plant_trees_count", 50, 500),
+                "next_event": (midnight + timedelta(days=sim.integers("plant_trees_days", 1, 14))).isoformat()
             },
             {
                 "action_id": "cleanup_drive",
                 "title": "Neighborhood Cleanup",
                 "description": "Participate in community cleanup drive",
                 "impact": "Reduce waste and improve local environment",
-                "participation_count": np.random.randint(20, 200),
-                "next_event": (datetime.now() + timedelta(days=np.random.randint(1, 7))).isoformat()
+                "participation_count": sim.integers("cleanup_count", 20, 200),
+                "next_event": (midnight + timedelta(days=sim.integers("cleanup_days", 1, 7))).isoformat()
             },
             {
                 "action_id": "water_conservation",
                 "title": "Water Conservation Challenge",
                 "description": "Reduce household water consumption",
                 "impact": "Conserve water resources for community",
-                "participation_count": np.random.randint(100, 1000),
+                "participation_count": sim.integers("water_count", 100, 1000),
                 "target_reduction_percent": 20
             }
         ]
@@ -314,12 +384,14 @@ class CitizenService:
         }
 
 class ReportingService:
-    def __init__(self):
+    def __init__(self, air_quality: AirQualityService):
         self.report_categories = [
             "illegal_dumping", "tree_cutting", "water_pollution", 
             "air_pollution", "noise_pollution", "waste_overflow",
             "damaged_green_space", "water_leak"
         ]
+        self.air_quality = air_quality
+        self.rasters = get_vegetation_rasters()
     
     async def submit_environmental_report(self, report_data: Dict) -> Dict:
         """Submit environmental issue report"""
@@ -327,9 +399,8 @@ class ReportingService:
 
         # Persist to DB (SQLite) using SQLAlchemy models if available
         try:
-            from db.db import SessionLocal, init_db
+            from db.db import SessionLocal
             from db.models import Report as DBReport
-            init_db()
             session = SessionLocal()
             loc = report_data.get('location', {}) or {}
             lat = loc.get('lat') or report_data.get('lat')
@@ -339,7 +410,7 @@ class ReportingService:
             session.commit()
             session.refresh(db_report)
             session.close()
-        except Exception:
+        except SQLAlchemyError:
             # DB not available -> fall back to in-memory behavior
             lat = report_data.get('location', {}).get('lat') if isinstance(report_data.get('location'), dict) else None
             lon = report_data.get('location', {}).get('lon') if isinstance(report_data.get('location'), dict) else None
@@ -450,6 +521,11 @@ class ReportingService:
     
     async def get_nearby_issues(self, lat: float, lon: float, radius: float) -> Dict:
         """Get environmental issues near location"""
+        issues = await asyncio.to_thread(self._stored_issues, lat, lon, radius)
+        area_conditions = await self._area_conditions(lat, lon, radius)
+        if issues is not None:
+            return self._issue_listing(lat, lon, radius, issues, area_conditions)
+        
         # Simulate nearby issues
         issues = []
         
@@ -471,6 +547,10 @@ class ReportingService:
             }
             issues.append(issue)
         
+        return self._issue_listing(lat, lon, radius, issues, area_conditions)
+    
+    def _issue_listing(self, lat: float, lon: float, radius: float, issues: List[Dict],
+                       area_conditions: Optional[Dict]) -> Dict:
         return {
             "search_location": {"lat": lat, "lon": lon},
             "search_radius_km": radius,
@@ -480,9 +560,85 @@ class ReportingService:
                 "by_category": self._summarize_by_category(issues),
                 "by_status": self._summarize_by_status(issues),
                 "by_priority": self._summarize_by_priority(issues)
-            }
+            },
+            "area_conditions": area_conditions
         }
     
+    def _stored_issues(self, lat: float, lon: float, radius: float) -> Optional[List[Dict]]:
+        """Reports submitted within radius km, nearest first; None when the database is unavailable"""
+        d_lat = radius / KM_PER_DEGREE
+        d_lon = d_lat / max(np.cos(np.radians(lat)), 1e-6)
+        try:
+            from db.db import SessionLocal
+            from db.models import Report as DBReport
+            session = SessionLocal()
+            try:
+                reports = session.query(DBReport).filter(
+                    DBReport.lat.between(lat - d_lat, lat + d_lat), DBReport.lon.between(lon - d_lon, lon + d_lon)
+                ).all()
+            finally:
+                session.close()
+        except SQLAlchemyError:
+            return None
+        
+        issues = []
+        for report in reports:
+            distance = float(np.hypot((report.lat - lat) * KM_PER_DEGREE,
+                                      (report.lon - lon) * KM_PER_DEGREE * np.cos(np.radians(lat))))
+            if distance > radius:
+                continue
+            issues.append({
+                "issue_id": report.report_id,
+                "category": report.category,
+                "description": report.description or "",
+                "location": {"lat": report.lat, "lon": report.lon},
+                "distance_km": round(distance, 3),
+                "status": report.status or "submitted",
+                "priority": self._assess_report_priority({"category": report.category,
+                                                          "description": report.description or ""}),
+                "reported_date": report.timestamp.isoformat() if report.timestamp else None,
+                "upvotes": 0,
+                "comments": 0
+            })
+        return sorted(issues, key=lambda issue: issue["distance_km"])
+    
+    async def _area_conditions(self, lat: float, lon: float, radius: float) -> Optional[Dict]:
+        """Air quality and green cover over the search radius, as zonal statistics of the city grids"""
+        city = None
+        for key, cfg in POLLUTION_MAP["cities"].items():
+            min_lon, min_lat, max_lon, max_lat = city_bounds(cfg)
+            if min_lon <= lon <= max_lon and min_lat <= lat <= max_lat:
+                city = key
+                break
+        if city is None:
+            return None
+        bounds, shape = city_grid(city)
+        pollution = await self.air_quality.generate_pollution_map(city, grid_size=shape[0])
+        layers = {"aqi": np.asarray(pollution["grid_data"], dtype=np.float64),
+                  "no2": np.asarray(pollution["pollutants"]["no2"], dtype=np.float64),
+                  "pm25": np.asarray(pollution["pollutants"]["pm25"], dtype=np.float64)}
+        
+        def summarize() -> Dict:
+            scene = self.rasters.find(bounds)
+            if scene is not None:
+                cells = self.rasters.sample_grid(scene["scene"], bounds, shape)
+                layers["green_cover"], layers["ndvi"] = cells["green"], cells["mean"]
+            area = disk_zones(bounds, shape, [(lat, lon)], radius)
+            stats = area.stats(layers, ZONES["percentiles"])
+            summary = {"city": POLLUTION_MAP["cities"][city]["name"], "cells": int(area.cells[0]),
+                       "timestamp": pollution["timestamp"]}
+            for name, values in stats.items():
+                if values["count"][0]:
+                    summary[name] = {k: round(float(v[0]), 4 if name in ("green_cover", "ndvi") else 1)
+                                     for k, v in values.items() if k != "count"}
+            return summary
+        
+        try:
+            return await asyncio.to_thread(summarize)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Area conditions failed: {e}")
+            return None
+    
     def _summarize_by_category(self, issues: List[Dict]) -> Dict:
         """Summarize issues by category"""
         summary = {}
@@ -0,0 +1,270 @@
+"""
+Raster algebra
+Composite-index expressions over named layers, parsed into a graph with shared subexpressions and evaluated lazily in row chunks
+"""
+
+import ast
+import hashlib
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def _masked(result: np.ndarray, *operands) -> np.ndarray:
+    """result as floats, NaN wherever an operand is"""
+    result = np.asarray(result, dtype=np.result_type(np.float32, *operands))
+    missing = np.zeros(result.shape, dtype=bool)
+    for operand in operands:
+        missing |= np.isnan(operand)
+    if missing.any():
+        result[missing] = np.nan
+    return result
+
+
+def _compare(op: Callable) -> Callable:
+    """1.0 / 0.0 comparison that stays NaN where either side is"""
+    return lambda a, b: _masked(op(a, b), a, b)
+
+
+def _logical(op: Callable) -> Callable:
+    return lambda a, b: _masked(op(a != 0, b != 0), a, b)
+
+
+# Pointwise operators and functions: name -> (arity, implementation)
+OPERATIONS: Dict[str, Tuple[int, Callable]] = {
+    "add": (2, np.add), "sub": (2, np.subtract), "mul": (2, np.multiply), "div": (2, np.divide),
+    "pow": (2, np.power), "neg": (1, np.negative),
+    "lt": (2, _compare(np.less)), "le": (2, _compare(np.less_equal)), "gt": (2, _compare(np.greater)),
+    "ge": (2, _compare(np.greater_equal)), "eq": (2, _compare(np.equal)), "ne": (2, _compare(np.not_equal)),
+    "and": (2, _logical(np.logical_and)), "or": (2, _logical(np.logical_or)),
+    "not": (1, lambda a: _masked(a == 0, a)),
+    "sqrt": (1, np.sqrt), "log": (1, np.log), "exp": (1, np.exp), "abs": (1, np.abs),
+    "min": (2, np.minimum), "max": (2, np.maximum), "clip": (3, np.clip),
+    "where": (3, lambda c, a, b: _masked(np.where(c != 0, a, b), c))
+}
+# Names callable in expressions
+FUNCTIONS = {"sqrt", "log", "exp", "abs", "min", "max", "clip", "where", "norm", "zscore"}
+# Operands may be swapped without changing the result, so a*b and b*a are one node
+COMMUTATIVE = {"add", "mul", "eq", "ne", "and", "or", "min", "max"}
+# Rescalings that need statistics of the whole layer: one reduction pass before they can be applied per chunk
+REDUCTIONS = {"norm", "zscore"}
+
+_BINARY = {ast.Add: "add", ast.Sub: "sub", ast.Mult: "mul", ast.Div: "div", ast.Pow: "pow",
+           ast.BitAnd: "and", ast.BitOr: "or"}
+_UNARY = {ast.USub: "neg", ast.Not: "not", ast.Invert: "not"}
+_COMPARE = {ast.Lt: "lt", ast.LtE: "le", ast.Gt: "gt", ast.GtE: "ge", ast.Eq: "eq", ast.NotEq: "ne"}
+
+
+class Expression:
+    """A composite index parsed into a DAG of nodes, identical subexpressions shared
+
+    Nodes are (op, *child ids) tuples in topological order, ("layer", name)
+    or ("const", value). Each node is keyed by its canonical text, so a
+    subexpression written twice (or with commuted operands) is one node and
+    is computed once per chunk. Constant subexpressions are folded.
+    """
+
+    def __init__(self, text: str, max_nodes: int = 256, max_depth: int = 64):
+        self.text = text
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth
+        self.nodes: List[tuple] = []
+        self.keys: List[str] = []
+        self._ids: Dict[str, int] = {}
+        try:
+            tree = ast.parse(text.strip(), mode="eval")
+            self.root = self._parse(tree.body, 0)
+        except SyntaxError as e:
+            raise ValueError(f"invalid expression: {e.msg}")
+        except (OverflowError, RecursionError, MemoryError):
+            # Huge integer literals, or nesting too deep for Python's own parser
+            raise ValueError("non-finite or too-deep expression")
+        self.layers = sorted({node[1] for node in self.nodes if node[0] == "layer"})
+        if not self.layers:
+            raise ValueError("expression uses no layers")
+        self.canonical = self.keys[self.root]
+        self.digest = hashlib.sha1(self.canonical.encode()).hexdigest()
+
+    def _add(self, node: tuple) -> int:
+        op, args = node[0], node[1:]
+        if op not in ("layer", "const") and all(self.nodes[a][0] == "const" for a in args):
+            values = [np.float64(self.nodes[a][1]) for a in args]
+            with np.errstate(all="ignore"):
+                if op in REDUCTIONS:
+                    value = np.nan  # a constant has no spread to rescale by
+                else:
+                    value = OPERATIONS[op][1](*values)
+            return self._add(("const", float(value)))
+        if op in COMMUTATIVE:
+            args = tuple(sorted(args, key=lambda a: self.keys[a]))
+            node = (op, *args)
+        if op == "layer":
+            key = node[1]
+        elif op == "const":
+            key = repr(node[1])
+        else:
+            key = f"{op}({', '.join(self.keys[a] for a in args)})"
+        if key not in self._ids:
+            if len(self.nodes) >= self.max_nodes:
+                raise ValueError(f"expression is larger than {self.max_nodes} operations")
+            self._ids[key] = len(self.nodes)
+            self.nodes.append(node)
+            self.keys.append(key)
+        return self._ids[key]
+
+    def _parse(self, node: ast.AST, depth: int) -> int:
+        if depth > self.max_depth:
+            raise ValueError(f"expression is nested deeper than {self.max_depth} levels")
+        depth += 1
+        if isinstance(node, ast.Name):
+            return self._add(("layer", node.id))
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            value = float(node.value)
+            if not np.isfinite(value):
+                raise ValueError(f"constant {node.value!r} is not finite")
+            return self._add(("const", value))
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            return self._add((_BINARY[type(node.op)], self._parse(node.left, depth), self._parse(node.right, depth)))
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+            return self._add((_UNARY[type(node.op)], self._parse(node.operand, depth)))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.UAdd):
+            return self._parse(node.operand, depth)
+        if isinstance(node, ast.BoolOp):
+            op = "and" if isinstance(node.op, ast.And) else "or"
+            result = self._parse(node.values[0], depth)
+            for value in node.values[1:]:
+                result = self._add((op, result, self._parse(value, depth)))
+            return result
+        if isinstance(node, ast.Compare) and all(type(op) in _COMPARE for op in node.ops):
+            # a < b < c is (a < b) and (b < c), with b parsed once
+            operands = [self._parse(node.left, depth)] + [self._parse(c, depth) for c in node.comparators]
+            result = None
+            for op, left, right in zip(node.ops, operands, operands[1:]):
+                term = self._add((_COMPARE[type(op)], left, right))
+                result = term if result is None else self._add(("and", result, term))
+            return result
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            name = node.func.id
+            if name not in FUNCTIONS:
+                raise ValueError(f"unknown function '{name}' (expected one of {', '.join(sorted(FUNCTIONS))})")
+            arity = 1 if name in REDUCTIONS else OPERATIONS[name][0]
+            if len(node.args) != arity:
+                raise ValueError(f"{name}() takes {arity} argument{'s' if arity > 1 else ''}")
+            return self._add((name, *[self._parse(arg, depth) for arg in node.args]))
+        raise ValueError(f"unsupported syntax: {type(node).__name__}")
+
+    def _levels(self) -> List[int]:
+        """Reduction passes each node depends on: a rescaling of a rescaled layer needs two"""
+        levels = []
+        for node in self.nodes:
+            args = node[1:] if node[0] not in ("layer", "const") else ()
+            level = max((levels[a] for a in args), default=0)
+            levels.append(level + 1 if node[0] in REDUCTIONS else level)
+        return levels
+
+    def evaluate(self, layers: Dict[str, np.ndarray], out: Optional[np.ndarray] = None,
+                 chunk_cells: int = 1 << 20) -> Tuple[np.ndarray, Dict[str, Dict[str, float]]]:
+        """The expression over (rows, cols) layers, chunk by chunk of rows
+
+        Only one chunk of each live intermediate is held at a time, and each is
+        dropped once its last consumer has run. Rescalings take a statistics
+        pass over their argument first, all rescalings of one level sharing a
+        pass. Writes into `out` when given (e.g. a memmap) and returns it with
+        the statistics of every rescaled subexpression.
+        """
+        missing = [name for name in self.layers if name not in layers]
+        if missing:
+            raise KeyError(f"missing layers: {', '.join(missing)}")
+        shapes = {tuple(layers[name].shape) for name in self.layers}
+        if len(shapes) > 1:
+            raise ValueError(f"layers have different grids: {sorted(shapes)}")
+        shape = shapes.pop()
+        rows, cols = shape
+        step = max(1, chunk_cells // max(cols, 1))
+        out = np.empty(shape, dtype=np.float32) if out is None else out
+
+        levels = self._levels()
+        stats: Dict[int, Tuple[float, float]] = {}
+        reductions = [i for i, node in enumerate(self.nodes) if node[0] in REDUCTIONS]
+        for level in range(1, max(levels, default=0) + 1):
+            batch = [i for i in reductions if levels[i] == level]
+            args = [self.nodes[i][1] for i in batch]
+            totals = np.zeros((len(batch), 5))
+            totals[:, 3], totals[:, 4] = np.inf, -np.inf
+            for r0 in range(0, rows, step):
+                values = self._chunk(args, layers, r0, min(r0 + step, rows), stats)
+                for k, (i, a) in enumerate(zip(batch, args)):
+                    v = values[a]
+                    finite = np.isfinite(v)
+                    if not finite.all():
+                        v = v[finite]
+                    if not v.size:
+                        continue
+                    totals[k, 0] += v.size
+                    if self.nodes[i][0] == "norm":
+                        totals[k, 3] = min(totals[k, 3], v.min())
+                        totals[k, 4] = max(totals[k, 4], v.max())
+                    else:
+                        totals[k, 1] += v.sum(dtype=np.float64)
+                        totals[k, 2] += np.square(v, dtype=np.float64).sum()
+            for i, (count, total, squares, lo, hi) in zip(batch, totals):
+                if count == 0:
+                    stats[i] = (np.nan, np.nan)
+                elif self.nodes[i][0] == "norm":
+                    stats[i] = (lo, hi - lo)
+                else:
+                    mean = total / count
+                    stats[i] = (mean, np.sqrt(max(squares / count - mean * mean, 0.0)))
+
+        for r0 in range(0, rows, step):
+            r1 = min(r0 + step, rows)
+            value = self._chunk([self.root], layers, r0, r1, stats)[self.root]
+            out[r0:r1] = value
+            block = out[r0:r1]
+            block[np.isinf(block)] = np.nan
+        summary = {self.keys[i]: ({"min": float(shift), "max": float(shift + scale)} if self.nodes[i][0] == "norm"
+                                  else {"mean": float(shift), "std": float(scale)})
+                   for i, (shift, scale) in stats.items()}
+        return out, summary
+
+    def _chunk(self, targets: Sequence[int], layers: Dict[str, np.ndarray], r0: int, r1: int,
+               stats: Dict[int, Tuple[float, float]]) -> Dict[int, np.ndarray]:
+        """Rows r0:r1 of the target nodes, computing each node they need once"""
+        needed = set()
+        stack = list(targets)
+        while stack:
+            i = stack.pop()
+            if i not in needed:
+                needed.add(i)
+                if self.nodes[i][0] not in ("layer", "const"):
+                    stack.extend(self.nodes[i][1:])
+        uses = {i: 0 for i in needed}
+        for i in needed:
+            if self.nodes[i][0] not in ("layer", "const"):
+                for a in set(self.nodes[i][1:]):
+                    uses[a] += 1
+
+        keep = set(targets)
+        values: Dict[int, np.ndarray] = {}
+        with np.errstate(all="ignore"):
+            for i in sorted(needed):
+                op = self.nodes[i][0]
+                if op == "layer":
+                    values[i] = np.asarray(layers[self.nodes[i][1]][r0:r1])
+                    continue
+                if op == "const":
+                    values[i] = self.nodes[i][1]
+                    continue
+                args = self.nodes[i][1:]
+                if op in REDUCTIONS:
+                    shift, scale = stats[i]
+                    values[i] = (values[args[0]] - shift) / (scale if scale else np.nan)
+                else:
+                    values[i] = OPERATIONS[op][1](*(values[a] for a in args))
+                for a in set(args):
+                    uses[a] -= 1
+                    if uses[a] == 0 and a not in keep:
+                        del values[a]
+        # A constant target still needs the chunk's shape
+        shape = (r1 - r0, layers[self.layers[0]].shape[1])
+        return {i: np.broadcast_to(values[i], shape) for i in targets}
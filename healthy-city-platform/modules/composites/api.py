@@ -0,0 +1,46 @@
+from fastapi import APIRouter, HTTPException, Request
+from typing import Dict, Optional
+from modules.http_cache import etag_json
+from modules.weather_air_quality.api import air_quality_service, weather_service
+from config.nasa_apis import COMPOSITES
+from .algebra import FUNCTIONS
+from .services import LAYERS, CompositeService
+
+router = APIRouter()
+composite_service = CompositeService(air_quality_service, weather_service)
+
+async def _evaluate(city: str, expression: str, request: Request, name: Optional[str] = None):
+    try:
+        result = await composite_service.evaluate(city, expression, name)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return etag_json(request, result)
+
+@router.get("/layers")
+async def get_composite_layers() -> Dict:
+    """Layers and functions index expressions can use"""
+    return {"layers": LAYERS, "functions": sorted(FUNCTIONS),
+            "operators": ["+", "-", "*", "/", "**", "<", "<=", ">", ">=", "==", "!=", "&", "|", "~"]}
+
+@router.get("/indices")
+async def get_composite_indices() -> Dict:
+    """Predefined composite indices"""
+    return {"indices": COMPOSITES["indices"]}
+
+@router.get("/{city}/{index}")
+async def get_composite_index(city: str, index: str, request: Request):
+    """A predefined composite index over a city's grid"""
+    if index not in COMPOSITES["indices"]:
+        raise HTTPException(status_code=404, detail=f"Unknown index '{index}' "
+                                                    f"(expected one of {', '.join(COMPOSITES['indices'])})")
+    return await _evaluate(city, COMPOSITES["indices"][index]["expression"], request, index)
+
+@router.post("/{city}")
+async def evaluate_composite(city: str, body: Dict, request: Request):
+    """A custom composite index over a city's grid, e.g. {"expression": "norm(temperature) * norm(aqi)"}"""
+    expression = body.get("expression")
+    if not isinstance(expression, str) or not expression.strip():
+        raise HTTPException(status_code=400, detail="'expression' is required")
+    return await _evaluate(city, expression, request)
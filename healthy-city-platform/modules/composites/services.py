@@ -0,0 +1,273 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from config.nasa_apis import COMPOSITES, POLLUTION_MAP, ZONES
+from modules.green_vegetation.vegetation_rasters import VegetationRasterStore, get_vegetation_rasters
+from modules.nasa_data.grace_client import GRACEClient
+from modules.nasa_data.population import PopulationRaster, get_population_raster
+from modules.nasa_data.simulation import as_day, grid
+from modules.nasa_data.singleflight import SingleFlight
+from modules.nasa_data.zonal import CityZones, city_grid, get_city_zones
+from modules.weather_air_quality.services import AirQualityService, WeatherService
+from .algebra import Expression
+
+# Layers expressions can name, all on each city's zone grid
+LAYERS = {
+    "aqi": {"source": "pollution", "unit": "US AQI", "description": "Hourly interpolated air quality index"},
+    "no2": {"source": "pollution", "unit": "ppb", "description": "Hourly interpolated NO2"},
+    "pm25": {"source": "pollution", "unit": "ug/m3", "description": "Hourly interpolated PM2.5"},
+    "ndvi": {"source": "vegetation", "unit": "index", "description": "Mean NDVI of the covering scene"},
+    "green_cover": {"source": "vegetation", "unit": "fraction", "description": "Share of green pixels per cell"},
+    "water": {"source": "grace", "unit": "mm", "description": "GRACE terrestrial water storage anomaly"},
+    "temperature": {"source": "airs", "unit": "deg C", "description": "AIRS surface air temperature"},
+    "population": {"source": "population", "unit": "people", "description": "Residents per cell from the population raster"}
+}
+
+
+class CompositeService:
+    """Composite indices over a city's named layers, each evaluated grid cached by expression and layer versions"""
+
+    def __init__(self, air_quality: AirQualityService, weather: WeatherService, grace: Optional[GRACEClient] = None,
+                 rasters: Optional[VegetationRasterStore] = None, zones: Optional[CityZones] = None,
+                 population: Optional[PopulationRaster] = None, settings: Optional[Dict] = None):
+        self.air_quality = air_quality
+        self.weather = weather
+        self.grace = grace or GRACEClient()
+        self.rasters = rasters or get_vegetation_rasters()
+        self.zones = zones or get_city_zones()
+        self.population = population or get_population_raster()
+        self.settings = {**COMPOSITES, **(settings or {})}
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+        self._daily: Dict[tuple, Tuple[np.ndarray, str]] = {}
+        self._results: "OrderedDict[str, Tuple[np.ndarray, Dict]]" = OrderedDict()
+
+    def expression(self, text: str) -> Expression:
+        """Parse and check an index expression; ValueError when it is malformed or names an unknown layer"""
+        if len(text) > self.settings["max_expression_length"]:
+            raise ValueError(f"expression is longer than {self.settings['max_expression_length']} characters")
+        expr = Expression(text, self.settings["max_nodes"], self.settings["max_depth"])
+        unknown = [name for name in expr.layers if name not in LAYERS]
+        if unknown:
+            raise ValueError(f"unknown layer{'s' if len(unknown) > 1 else ''} {', '.join(unknown)} "
+                             f"(expected one of {', '.join(LAYERS)})")
+        return expr
+
+    def _versions(self, city: str, names: Iterable[str], bounds) -> Dict[str, str]:
+        """The version each named layer would be built from, found without building any of them"""
+        names = set(names)
+        day = as_day()
+        hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0).isoformat()
+        scene = self.rasters.find(bounds) if names & {"ndvi", "green_cover"} else None
+        meta = self.population.meta() if "population" in names else None
+        versions = {}
+        for name in names:
+            source = LAYERS[name]["source"]
+            if source == "pollution":
+                versions[name] = hour
+            elif source == "vegetation":
+                versions[name] = f"{scene['scene']}/{scene['dir']}" if scene is not None else "none"
+            elif source == "population":
+                versions[name] = meta["dir"] if meta is not None else "none"
+            else:
+                versions[name] = self._daily_version(name, day)
+        return versions
+
+    def _daily_version(self, name: str, day) -> str:
+        """Water storage comes from the ingested GRACE cube while there is one, everything else from the day"""
+        if name == "water":
+            cube = self.grace.cubes.cube("GRACE", "lwe_thickness")
+            version = cube.version() if cube is not None else None
+            if version is not None:
+                return f"grid/{'-'.join(str(v) for v in version)}"
+        return f"simulated/{day.isoformat()}"
+
+    async def _layers(self, city: str, names: Iterable[str]) -> Tuple[Dict[str, np.ndarray], Dict[str, str]]:
+        """Only the named layers on the city's zone grid, and the version each was built from"""
+        names = set(names)
+        layers, versions = {}, {}
+        bounds, shape = city_grid(city)
+        if names & {"aqi", "no2", "pm25"}:
+            pollution = await self.air_quality.generate_pollution_map(city, grid_size=shape[0])
+            surfaces = {"aqi": pollution["grid_data"], "no2": pollution["pollutants"]["no2"],
+                        "pm25": pollution["pollutants"]["pm25"]}
+            for name in names & set(surfaces):
+                layers[name] = np.asarray(surfaces[name], dtype=np.float64)
+                versions[name] = pollution["timestamp"]
+
+        def load():
+            if names & {"ndvi", "green_cover"}:
+                scene = self.rasters.find(bounds)
+                if scene is not None:
+                    cells = self.rasters.sample_grid(scene["scene"], bounds, shape)
+                    vegetation = {"ndvi": cells["mean"], "green_cover": cells["green"]}
+                    version = f"{scene['scene']}/{scene['dir']}"
+                else:
+                    vegetation = {"ndvi": np.full(shape, np.nan), "green_cover": np.full(shape, np.nan)}
+                    version = "none"
+                for name in names & set(vegetation):
+                    layers[name], versions[name] = vegetation[name], version
+            if "population" in names:
+                meta = self.population.meta()
+                aligned = self.population.grid(bounds, shape)
+                if aligned is not None:
+                    # Cells the raster only partly covers would read as sparsely populated
+                    layers["population"] = np.where(aligned["coverage"] > 0.99, aligned["people"], np.nan)
+                else:
+                    layers["population"] = np.full(shape, np.nan)
+                versions["population"] = meta["dir"] if meta is not None else "none"
+            for name in names & {"water", "temperature"}:
+                layers[name], versions[name] = self._daily_layer(city, name, bounds, shape)
+
+        await asyncio.to_thread(load)
+        return layers, versions
+
+    def _daily_layer(self, city: str, name: str, bounds, shape) -> Tuple[np.ndarray, str]:
+        """Water storage or temperature grid, built once per city and day"""
+        day = as_day()
+        key = (city, name, tuple(shape), day)
+        cached = self._daily.get(key)
+        if cached is not None:
+            return cached
+        lat, lon = grid(bounds, shape)
+        if name == "water":
+            version = self._daily_version(name, day)
+            batch = self.grace.get_groundwater_batch(lat.ravel(), lon.ravel(), day)
+            if batch["source"] != "grid":
+                version = f"simulated/{day.isoformat()}"
+            layer = (np.asarray(batch["current_anomaly_mm"], dtype=np.float64).reshape(shape), version)
+        else:
+            layer = (self.weather.temperature_surface(lat, lon, day), self._daily_version(name, day))
+        with self._lock:
+            self._daily = {k: v for k, v in self._daily.items() if k[3] == day}
+            self._daily[key] = layer
+        return layer
+
+    @staticmethod
+    def _digest(expr: Expression, city: str, bounds, shape, versions: Dict[str, str]) -> str:
+        return hashlib.sha1(json.dumps([expr.canonical, city, bounds, shape, versions],
+                                       sort_keys=True).encode()).hexdigest()
+
+    async def evaluate(self, city: str, text: str, name: Optional[str] = None) -> Dict:
+        """A composite index over a city grid with its overall and per-zone statistics
+
+        KeyError for an unknown city, ValueError for a bad expression. Layers
+        are only loaded when the grid for their current versions is not cached.
+        """
+        key = city.strip().lower()
+        if key not in POLLUTION_MAP["cities"]:
+            raise KeyError(f"No city grid configured for '{city}'")
+        expr = self.expression(text)
+        bounds, shape = city_grid(key)
+        versions = await asyncio.to_thread(self._versions, key, expr.layers, bounds)
+        digest = self._digest(expr, key, bounds, shape, versions)
+        result = await asyncio.to_thread(self._cached, f"{key}-{digest[:20]}")
+        if result is None:
+            versions, digest, result = await self._flights.do(digest, lambda: self._build(key, expr, bounds, shape))
+        values, rescaled = result
+
+        def summarize() -> Dict:
+            zones = self.zones.get(key)
+            valid = values[np.isfinite(values)]
+            overall = {"valid_cells": int(valid.size)}
+            if valid.size:
+                overall.update({"min": float(valid.min()), "max": float(valid.max()), "mean": float(valid.mean()),
+                                **{f"p{q:g}": float(v) for q, v in zip(ZONES["percentiles"],
+                                                                      np.percentile(valid, ZONES["percentiles"]))}})
+            per_zone = zones.stats({"index": values}, ZONES["percentiles"])["index"]
+            rounded = lambda v: None if v is None or np.isnan(v) else round(float(v), 4)
+            return {
+                "city": POLLUTION_MAP["cities"][key]["name"],
+                "index": name,
+                "expression": text,
+                "canonical": expr.canonical,
+                "hash": digest,
+                "layers": versions,
+                "rescaling": {k: {s: rounded(v) for s, v in stat.items()} for k, stat in rescaled.items()},
+                "grid": {"bounds": list(bounds), "shape": list(shape)},
+                "stats": {k: v if k == "valid_cells" else rounded(v) for k, v in overall.items()},
+                "zones": [{**zone, **{k: rounded(v[z]) for k, v in per_zone.items() if k != "count"}}
+                          for z, zone in enumerate(zones.describe())],
+                "values": [[rounded(v) for v in row] for row in values.tolist()]
+            }
+
+        return await asyncio.to_thread(summarize)
+
+    async def _build(self, city: str, expr: Expression, bounds, shape) -> Tuple[Dict[str, str], str, tuple]:
+        """Load the layers and evaluate, keyed by the versions actually loaded
+
+        Those only differ from the predicted ones when an hour or day turns
+        over in between, or the GRACE grid fails and the simulation stands in.
+        """
+        layers, versions = await self._layers(city, expr.layers)
+        digest = self._digest(expr, city, bounds, shape, versions)
+        result = await asyncio.to_thread(self._result, f"{city}-{digest[:20]}", expr, layers)
+        return versions, digest, result
+
+    def _cached(self, stem: str) -> Optional[Tuple[np.ndarray, Dict]]:
+        """An evaluated grid from memory or disk; None when it was never built or has been pruned"""
+        with self._lock:
+            if stem in self._results:
+                self._results.move_to_end(stem)
+                return self._results[stem]
+        root = self.settings["cache_dir"]
+        try:
+            values = np.load(os.path.join(root, f"{stem}.npy"))
+            with open(os.path.join(root, f"{stem}.json")) as f:
+                rescaled = json.load(f)["rescaling"]
+        except FileNotFoundError:
+            # Pruning by another build can remove the pair between the two reads
+            return None
+        self._remember(stem, values, rescaled)
+        return values, rescaled
+
+    def _result(self, stem: str, expr: Expression, layers: Dict[str, np.ndarray]) -> Tuple[np.ndarray, Dict]:
+        """The evaluated grid from the cache, or a fresh chunked evaluation written straight to disk"""
+        cached = self._cached(stem)
+        if cached is not None:
+            return cached
+        root = self.settings["cache_dir"]
+        path = os.path.join(root, f"{stem}.npy")
+        os.makedirs(root, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=layers[expr.layers[0]].shape)
+        _, rescaled = expr.evaluate(layers, out, self.settings["chunk_cells"])
+        out.flush()
+        del out
+        # The sidecar lands first, so a grid on disk always has one until both are pruned
+        sidecar = os.path.join(root, f"{stem}.json")
+        with open(f"{sidecar}.{os.getpid()}.tmp", "w") as f:
+            json.dump({"expression": expr.canonical, "rescaling": rescaled,
+                       "built": datetime.utcnow().isoformat()}, f)
+        os.replace(f"{sidecar}.{os.getpid()}.tmp", sidecar)
+        os.replace(tmp, path)
+        values = np.load(path)
+        self._prune(root)
+        self._remember(stem, values, rescaled)
+        return values, rescaled
+
+    def _remember(self, stem: str, values: np.ndarray, rescaled: Dict):
+        with self._lock:
+            self._results[stem] = (values, rescaled)
+            self._results.move_to_end(stem)
+            while len(self._results) > self.settings["memory_entries"]:
+                self._results.popitem(last=False)
+
+    def _prune(self, root: str):
+        """Drop the oldest evaluated grids beyond disk_entries"""
+        grids = sorted((entry for entry in os.scandir(root) if entry.name.endswith(".npy")),
+                       key=lambda entry: entry.stat().st_mtime)
+        for entry in grids[:max(0, len(grids) - self.settings["disk_entries"])]:
+            for path in (entry.path, entry.path[:-4] + ".json"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -1,13 +1,67 @@
+import asyncio
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional
 import math
+from config.nasa_apis import POLLUTION_MAP, POPULATION
+from modules.green_vegetation.vegetation_rasters import get_vegetation_rasters
+from modules.nasa_data.population import get_population_raster
+from modules.nasa_data.zonal import get_city_zones
+
+
+def district_hazards(city: str) -> Optional[Dict]:
+    """Per-district zonal statistics of land-cover hazard proxies; None unless a computed scene covers the city"""
+    key = city.strip().lower()
+    if key not in POLLUTION_MAP["cities"]:
+        return None
+    zones = get_city_zones().get(key)
+    rasters = get_vegetation_rasters()
+    scene = rasters.find(zones.bounds)
+    if scene is None or not zones.ids:
+        return None
+    cells = rasters.sample_grid(scene["scene"], zones.bounds, zones.shape)
+    # Sparse or stressed vegetation stands in for drought stress; sealed (non-green) ground for
+    # runoff and urban heat
+    layers = {
+        "vegetation_stress": 1 - np.clip(cells["mean"] / 0.6, 0, 1),
+        "sealed_surface": 1 - cells["green"]
+    }
+    return {"zones": zones, "stats": zones.stats(layers, [90]),
+            "population": get_population_raster().zone_counts(zones.labels, len(zones.ids), zones.bounds)}
+
+
+def ranked_districts(hazards: Dict, layer: str) -> List[Dict]:
+    """The most exposed third of a city's districts (at least two) by mean of a hazard layer
+
+    Districts carry their population when a population raster is ingested.
+    """
+    stats, zones, population = hazards["stats"][layer], hazards["zones"], hazards.get("population")
+    mean = np.where(np.isfinite(stats["mean"]), stats["mean"], -1)
+    ranked = np.argsort(mean)[::-1][:max(2, int(np.ceil(len(zones.ids) / 3)))]
+    districts = []
+    for z in ranked:
+        if mean[z] < 0:
+            continue
+        district = {
+            "area_name": zones.names[z],
+            "zone_id": zones.ids[z],
+            "lat": round(float(zones.lat[z]), 5),
+            "lon": round(float(zones.lon[z]), 5),
+            "hazard_index": round(float(stats["mean"][z]), 3),
+            "hazard_p90": round(float(stats["p90"][z]), 3)
+        }
+        if population is not None:
+            district["population"] = int(round(population[z]))
+        districts.append(district)
+    return districts
+
 
 class DisasterPredictionService:
     def __init__(self):
         self.grace_url = "https://grace.jpl.nasa.gov/data"
         self.firms_url = "https://firms.modaps.eosdis.nasa.gov/api"
         self.gpm_url = "https://gpm.nasa.gov/data"
+        self.population = get_population_raster()
     
     async def predict_drought(self, region: str) -> Dict:
         """Predict drought conditions using NASA GRACE and other data"""
@@ -23,6 +77,11 @@ class DisasterPredictionService:
         
         drought_severity = self._calculate_drought_severity(indicators)
         onset_prediction = self._predict_drought_onset(indicators)
+        try:
+            hazards = await asyncio.to_thread(district_hazards, region)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"District hazard statistics failed: {e}")
+            hazards = None
         
         return {
             "region": region,
@@ -30,7 +89,7 @@ class DisasterPredictionService:
             "drought_indicators": indicators,
             "drought_severity": drought_severity,
             "onset_prediction": onset_prediction,
-            "affected_areas": self._identify_affected_areas(region, drought_severity),
+            "affected_areas": self._identify_affected_areas(region, drought_severity, hazards),
             "impact_assessment": self._assess_drought_impact(drought_severity),
             "mitigation_recommendations": self._suggest_drought_mitigation(drought_severity)
         }
@@ -89,8 +148,19 @@ class DisasterPredictionService:
             "estimated_duration_months": np.random.randint(3, 18)
         }
     
-    def _identify_affected_areas(self, region: str, severity: Dict) -> List[Dict]:
+    def _identify_affected_areas(self, region: str, severity: Dict, hazards: Optional[Dict] = None) -> List[Dict]:
         """Identify areas likely to be affected by drought"""
+        if hazards is not None:
+            districts = ranked_districts(hazards, "vegetation_stress")
+            for district in districts:
+                district.setdefault("population", np.random.randint(50000, 500000))
+                district.update({
+                    "agricultural_area_hectares": np.random.randint(1000, 10000),
+                    "water_sources": np.random.randint(2, 8),
+                    "vulnerability_score": district["hazard_index"]
+                })
+            return districts
+        
         areas = []
         num_areas = max(1, int(severity["level"] * 2))
         
@@ -191,7 +261,8 @@ class DisasterPredictionService:
             "risk_factors": risk_factors,
             "flood_probability": flood_probability,
             "inundation_model": inundation_model,
-            "evacuation_zones": self._identify_evacuation_zones(lat, lon, flood_probability),
+            # Counting the people in each zone rasterizes disks, so it runs off the event loop
+            "evacuation_zones": await asyncio.to_thread(self._identify_evacuation_zones, lat, lon, flood_probability),
             "infrastructure_at_risk": self._assess_infrastructure_risk(lat, lon, flood_probability)
         }
     
@@ -256,6 +327,18 @@ class DisasterPredictionService:
                 }
                 zones.append(zone)
         
+        if zones:
+            try:
+                people = self.population.within([(z["center_lat"], z["center_lon"]) for z in zones],
+                                                [z["radius_km"] for z in zones])
+            except (OSError, KeyError, ValueError) as e:
+                print(f"Population exposure failed: {e}")
+                people = None
+            if people is not None:
+                # Overlapping zones split the people between them, nearest centre first
+                for zone, count in zip(zones, people):
+                    zone["population"] = int(round(count))
+        
         return zones
     
     def _assess_infrastructure_risk(self, lat: float, lon: float, flood_prob: Dict) -> Dict:
@@ -496,10 +579,16 @@ class EarlyWarningService:
         # simple in-memory store for user-submitted alerts
         # In production this should be replaced with a persistent DB
         self.user_alerts = []
+        self.population = get_population_raster()
     
     async def generate_early_warnings(self, city: str) -> Dict:
         """Generate early warning alerts for various disasters"""
         warnings = []
+        try:
+            hazards = await asyncio.to_thread(district_hazards, city)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"District hazard statistics failed: {e}")
+            hazards = None
         
         # Generate different types of warnings
         warning_types = [
@@ -529,7 +618,7 @@ class EarlyWarningService:
                     "probability": warning_type["probability"],
                     "issue_time": datetime.now().isoformat(),
                     "valid_until": (datetime.now() + timedelta(hours=np.random.randint(12, 72))).isoformat(),
-                    "affected_areas": self._identify_affected_areas(city, warning_type["type"]),
+                    "affected_areas": self._identify_affected_areas(city, warning_type["type"], hazards),
                     "recommended_actions": self._get_recommended_actions(warning_type["type"], warning_type["severity"]),
                     "contact_information": {
                         "emergency_hotline": "911",
@@ -547,8 +636,16 @@ class EarlyWarningService:
             "overall_threat_level": self._assess_overall_threat_level(warnings)
         }
     
-    def _identify_affected_areas(self, city: str, disaster_type: str) -> List[Dict]:
+    def _identify_affected_areas(self, city: str, disaster_type: str, hazards: Optional[Dict] = None) -> List[Dict]:
         """Identify areas affected by the disaster"""
+        if hazards is not None:
+            districts = ranked_districts(hazards, "vegetation_stress" if disaster_type == "drought" else "sealed_surface")
+            for district in districts:
+                district.setdefault("population", np.random.randint(10000, 100000))
+                district["risk_level"] = "extreme" if district["hazard_index"] >= 0.75 else \
+                    "high" if district["hazard_index"] >= 0.5 else "moderate"
+            return districts
+        
         areas = []
         num_areas = np.random.randint(2, 6)
         
@@ -678,7 +775,7 @@ class EarlyWarningService:
             "expiry_time": (datetime.now() + timedelta(hours=24)).isoformat(),
             "channels": ["sms", "mobile_app", "radio", "tv", "social_media"],
             "languages": ["english", "spanish", "hindi"],
-            "estimated_reach": np.random.randint(100000, 1000000)
+            "estimated_reach": await asyncio.to_thread(self._estimated_reach, alert_data.get("affected_areas", []))
         }
         
         # Simulate alert distribution
@@ -705,6 +802,32 @@ class EarlyWarningService:
             }
         }
 
+    def _estimated_reach(self, areas: List) -> int:
+        """People in the alert's areas: their stated population, else those within radius_km of their point
+
+        Radii are client-given, so they are capped at max_alert_radius_km.
+        """
+        stated, points = 0, []
+        for area in areas:
+            if not isinstance(area, dict):
+                continue
+            if isinstance(area.get("population"), (int, float)):
+                stated += area["population"]
+            elif isinstance(area.get("lat"), (int, float)) and isinstance(area.get("lon"), (int, float)):
+                radius = area.get("radius_km")
+                if not isinstance(radius, (int, float)) or not radius > 0:
+                    radius = POPULATION["alert_radius_km"]
+                points.append((area["lat"], area["lon"], min(radius, POPULATION["max_alert_radius_km"])))
+        people = None
+        if points:
+            try:
+                people = self.population.within([p[:2] for p in points], [p[2] for p in points])
+            except (OSError, KeyError, ValueError) as e:
+                print(f"Population exposure failed: {e}")
+        if people is None and (points or not stated):
+            return np.random.randint(100000, 1000000)
+        return int(round(stated + (people.sum() if people is not None else 0)))
+
     # --- User-reported alerts persistence helpers ---
     async def add_user_alert(self, alert_data: Dict) -> Dict:
         """Add a user-submitted alert to the in-memory store and return the saved alert."""
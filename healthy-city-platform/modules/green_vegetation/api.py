@@ -24,6 +24,11 @@ async def get_urban_cover_map(city: str) -> Dict:
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/scenes")
+async def get_vegetation_scenes() -> Dict:
+    """Landsat/Sentinel-2 scenes with computed vegetation index rasters"""
+    return vegetation_service.rasters.status()
+
 @router.get("/vegetation-health/{lat}/{lon}")
 async def get_vegetation_health(lat: float, lon: float, radius: float = 1.0) -> Dict:
     """Monitor vegetation health in area"""
@@ -42,6 +47,17 @@ async def get_mental_health_impact(lat: float, lon: float) -> Dict:
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/proximity/{lat}/{lon}")
+async def get_green_proximity(lat: float, lon: float) -> Dict:
+    """Distance to the nearest green space and the green area around a location"""
+    try:
+        proximity = await vegetation_service.get_green_proximity(lat, lon)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if proximity is None:
+        raise HTTPException(status_code=404, detail="No computed vegetation scene covers this location")
+    return proximity
+
 @router.get("/green-corridors/{city}")
 async def get_green_corridors(city: str) -> Dict:
     """Identify green corridors and connectivity"""
@@ -0,0 +1,310 @@
+"""
+Green corridor analysis
+Green patches labelled from the NDVI raster, joined into a graph by the gaps between them and reduced to corridors and connectivity
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import ndimage
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra, minimum_spanning_tree
+from scipy.spatial import cKDTree
+
+from config.nasa_apis import GREEN_CORRIDORS, POLLUTION_MAP, VEGETATION_RASTER
+from .vegetation_rasters import VegetationRasterStore, get_vegetation_rasters
+
+# 8-connectivity: diagonal neighbours belong to the same patch
+EIGHT = np.ones((3, 3), dtype=bool)
+
+
+def _boundary(labels: np.ndarray, r0: int, r1: int, reach: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Rows, cols and labels of the patch pixels in rows r0:r1 that could end a gap to another patch
+
+    Those are edge pixels (a 4-neighbour outside the patch) with another
+    patch's label within reach pixels. The closest pixels of two patches
+    are always edge pixels, and the window test drops the long stretches
+    of patch outline with nothing else nearby before any pair is searched.
+    """
+    height, width = labels.shape
+    lo, hi = max(0, r0 - reach), min(height, r1 + reach)
+    block = labels[lo:hi]
+    top, bottom = r0 - lo, r1 - lo
+    core = block[top:bottom]
+    padded = np.pad(block[max(0, top - 1):bottom + 1], ((top == 0, bottom == hi - lo), (1, 1)))
+    inner = padded[1:-1, 1:-1]
+    edge = (core > 0) & ((padded[:-2, 1:-1] != inner) | (padded[2:, 1:-1] != inner)
+                         | (padded[1:-1, :-2] != inner) | (padded[1:-1, 2:] != inner))
+    if not edge.any():
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=labels.dtype)
+    size = 2 * reach + 1
+    highest = ndimage.maximum_filter(block, size=size, mode="constant")[top:bottom]
+    lowest = ndimage.minimum_filter(np.where(block > 0, block, np.iinfo(block.dtype).max), size=size,
+                                    mode="constant", cval=np.iinfo(block.dtype).max)[top:bottom]
+    rows, cols = np.nonzero(edge & ((highest != core) | (lowest != core)))
+    return rows + r0, cols, core[rows, cols]
+
+
+def _shortest(parts: List[Tuple[np.ndarray, ...]]) -> Tuple[np.ndarray, ...]:
+    """The smallest-gap entry per patch pair"""
+    if not parts:
+        return tuple(np.zeros(0, dtype=t) for t in (np.int64, np.float64, np.int64, np.int64, np.int64, np.int64))
+    key, gap, ra, ca, rb, cb = (np.concatenate(c) for c in zip(*parts))
+    order = np.lexsort((gap, key))
+    first = order[np.r_[True, key[order][1:] != key[order][:-1]]] if len(order) else order
+    return key[first], gap[first], ra[first], ca[first], rb[first], cb[first]
+
+
+def green_patches(ndvi: np.ndarray, pixel_m: float, green_ndvi: float,
+                  min_patch_ha: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Label raster of 8-connected green patches of at least min_patch_ha (1..n, 0 elsewhere) and their pixel counts"""
+    with np.errstate(invalid="ignore"):
+        labels, n = ndimage.label(np.asarray(ndvi) >= green_ndvi, structure=EIGHT)
+    pixels = np.bincount(labels.ravel(), minlength=n + 1)
+    keep = pixels >= min_patch_ha * 10000 / pixel_m ** 2
+    keep[0] = False
+    relabel = np.zeros(n + 1, dtype=np.int32)
+    relabel[keep] = np.arange(1, keep.sum() + 1)
+    return relabel[labels], pixels[keep]
+
+
+def patch_graph(ndvi: np.ndarray, pixel_m: float, green_ndvi: float, settings: Optional[Dict] = None) -> Dict:
+    """Green patches of a raster and the shortest gap between every pair of patches closer than max_gap_m
+
+    Edge pixels with another patch in reach are collected band by band.
+    Every two patches whose edge-pixel boxes come within max_gap_m are then
+    searched exhaustively, one patch's edge pixels against a k-d tree of the
+    other's, so a patch lying between two others never hides their link.
+    """
+    settings = {**GREEN_CORRIDORS, **(settings or {})}
+    height, width = ndvi.shape
+    labels, pixels = green_patches(ndvi, pixel_m, green_ndvi, settings["min_patch_ha"])
+    n = len(pixels)
+
+    max_gap_px = settings["max_gap_m"] / pixel_m
+    reach = int(np.ceil(max_gap_px)) + 1
+    band = max(1, settings["band_pixels"] // width)
+    row_sum = np.zeros(n + 1)
+    col_sum = np.zeros(n + 1)
+    ends = []
+    for r0 in range(0, height, band):
+        r1 = min(height, r0 + band)
+        core = labels[r0:r1].ravel()
+        row_sum += np.bincount(core, weights=np.repeat(np.arange(r0, r1, dtype=np.float64), width), minlength=n + 1)
+        col_sum += np.bincount(core, weights=np.tile(np.arange(width, dtype=np.float64), r1 - r0), minlength=n + 1)
+        if n > 1:
+            ends.append(_boundary(labels, r0, r1, reach))
+
+    parts = []
+    if ends:
+        rows, cols, owner = (np.concatenate(c) for c in zip(*ends))
+        order = np.argsort(owner, kind="stable")
+        rows, cols, owner = rows[order], cols[order], owner[order]
+        patch = np.unique(owner)
+        start = np.searchsorted(owner, patch)
+        stop = np.searchsorted(owner, patch, side="right")
+        box = np.column_stack([np.minimum.reduceat(rows, start), np.maximum.reduceat(rows, start),
+                               np.minimum.reduceat(cols, start), np.maximum.reduceat(cols, start)])
+        trees: Dict[int, cKDTree] = {}
+        found = []
+        # Patch pairs whose edge-pixel boxes come within reach, a slice of patches at a time
+        step = max(1, settings["band_pixels"] // max(1, len(patch)))
+        for p0 in range(0, len(patch), step):
+            p = np.arange(p0, min(p0 + step, len(patch)))[:, None]
+            near = ((box[None, :, 0] - box[p, 1] <= reach) & (box[p, 0] - box[None, :, 1] <= reach)
+                    & (box[None, :, 2] - box[p, 3] <= reach) & (box[p, 2] - box[None, :, 3] <= reach))
+            near &= np.arange(len(patch))[None, :] > p
+            for i, j in zip(*np.nonzero(near)):
+                i += p0
+                # Only edge pixels of i within reach of j's box can be j's nearest
+                a = np.arange(start[i], stop[i])
+                a = a[(rows[a] >= box[j, 0] - reach) & (rows[a] <= box[j, 1] + reach)
+                      & (cols[a] >= box[j, 2] - reach) & (cols[a] <= box[j, 3] + reach)]
+                if not len(a):
+                    continue
+                if j not in trees:
+                    trees[j] = cKDTree(np.column_stack([rows[start[j]:stop[j]], cols[start[j]:stop[j]]]))
+                # The bound is exclusive, so it sits just past the widest gap allowed
+                distance, nearest = trees[j].query(np.column_stack([rows[a], cols[a]]),
+                                                   distance_upper_bound=max_gap_px + 1 + 1e-9)
+                k = np.argmin(distance)
+                if distance[k] - 1 <= max_gap_px:
+                    found.append((patch[i], patch[j], max(distance[k] - 1, 0), a[k], start[j] + nearest[k]))
+        if found:
+            la, lb, gap, a, b = (np.array(c) for c in zip(*found))
+            parts.append((la.astype(np.int64) << 32 | lb, gap, rows[a], cols[a], rows[b], cols[b]))
+
+    key, gap, ra, ca, rb, cb = _shortest(parts)
+    return {
+        "labels": labels, "patches": n, "pixels": pixels,
+        "centroids": np.column_stack([row_sum[1:], col_sum[1:]]) / np.maximum(pixels, 1)[:, None],
+        "edges": np.column_stack([key >> 32, key & 0xFFFFFFFF]) - 1,
+        "gap_m": gap * pixel_m,
+        "ends": np.column_stack([ra, ca, rb, cb]).astype(np.float64),
+        "pixel_m": pixel_m
+    }
+
+
+def corridor_network(graph: Dict, max_corridors: int) -> Dict:
+    """Patch networks, each network's backbone corridor and the landscape's connectivity
+
+    Networks are connected components of the gap graph. A corridor is the
+    longest path through its network's minimum spanning tree, walking
+    centroid -> gap -> centroid, so it follows the cheapest links. Overall
+    connectivity is the equivalent connected area over the total green
+    area: 1 when every patch is reachable from every other, sqrt(1/n) for
+    n equal isolated patches.
+    """
+    n, pixel_m = graph["patches"], graph["pixel_m"]
+    area = graph["pixels"] * pixel_m ** 2
+    if n == 0:
+        return {"networks": np.zeros(0, dtype=np.int64), "network_area_m2": np.zeros(0), "corridors": [],
+                "connectivity": 0.0}
+    i, j = graph["edges"][:, 0], graph["edges"][:, 1]
+    # csgraph drops explicit zeros, so touching-diagonal gaps get a token weight
+    gaps = coo_matrix((graph["gap_m"] + 1e-3, (i, j)), shape=(n, n)).tocsr()
+    count, network = connected_components(gaps, directed=False)
+    network_area = np.bincount(network, weights=area, minlength=count)
+
+    tree = minimum_spanning_tree(gaps).tocoo()
+    ends = graph["ends"]
+    # Edges are sorted by (i, j), so each tree edge is found by its key
+    k = np.searchsorted(i << 32 | j, np.minimum(tree.row, tree.col).astype(np.int64) << 32
+                        | np.maximum(tree.row, tree.col))
+    a, b = i[k], j[k]
+    centroid = graph["centroids"]
+    walk = (np.hypot(*(centroid[a] - ends[k, :2]).T) + np.hypot(*(centroid[b] - ends[k, 2:]).T)) * pixel_m \
+        + graph["gap_m"][k]
+    walks = coo_matrix((walk + 1e-3, (a, b)), shape=(n, n)).tocsr()
+    gap_of = coo_matrix((graph["gap_m"][k] + 1e-3, (a, b)), shape=(n, n)).tocsr()
+    gap_of = gap_of + gap_of.T
+
+    corridors = []
+    sizes = np.bincount(network, minlength=count)
+    linked = np.flatnonzero(sizes > 1)
+    for net in linked[np.argsort(network_area[linked])[::-1][:max_corridors]]:
+        members = np.flatnonzero(network == net)
+        start = members[np.argmax(area[members])]
+        far = dijkstra(walks, directed=False, indices=start)
+        u = members[np.argmax(far[members])]
+        far, previous = dijkstra(walks, directed=False, indices=u, return_predecessors=True)
+        v = members[np.argmax(far[members])]
+        path = [v]
+        while path[-1] != u:
+            path.append(previous[path[-1]])
+        path = path[::-1]
+        path_gaps = np.array([gap_of[p, q] - 1e-3 for p, q in zip(path[:-1], path[1:])])
+        corridors.append({"network": int(net), "path": path, "length_m": float(far[v]),
+                          "gap_m": path_gaps, "patches": len(members), "area_m2": float(network_area[net])})
+
+    return {"networks": network, "network_area_m2": network_area, "corridors": corridors,
+            "connectivity": float(np.sqrt(np.sum(network_area ** 2)) / area.sum())}
+
+
+def species_estimate(area_ha, species_area: Dict) -> np.ndarray:
+    """Species-area relationship S = c * A^z"""
+    return np.round(species_area["c"] * np.power(np.asarray(area_ha, dtype=np.float64), species_area["z"])).astype(int)
+
+
+class GreenCorridorAnalyzer:
+    """Per-city corridor analysis over the scene covering the city, cached until that scene is recomputed"""
+
+    def __init__(self, rasters: Optional[VegetationRasterStore] = None, settings: Optional[Dict] = None):
+        self.rasters = rasters or get_vegetation_rasters()
+        self.settings = {**GREEN_CORRIDORS, **(settings or {})}
+        self._lock = threading.Lock()
+        self._results: Dict[str, Tuple[Dict, Dict]] = {}
+
+    def analyze(self, city: str) -> Optional[Dict]:
+        """Corridors for a configured city; None when no computed scene covers it"""
+        cfg = POLLUTION_MAP["cities"][city]
+        half = cfg["half_width_deg"]
+        bounds = (cfg["lon"] - half, cfg["lat"] - half, cfg["lon"] + half, cfg["lat"] + half)
+        scene = self.rasters.find(bounds)
+        if scene is None:
+            return None
+        key = {"city": city, "scene": scene["scene"], "dir": scene["dir"], "bounds": list(bounds),
+               "green_ndvi": VEGETATION_RASTER["green_ndvi"],
+               "settings": {k: self.settings[k] for k in ("min_patch_ha", "max_gap_m", "max_corridors",
+                                                           "max_hotspots", "species_area")}}
+        with self._lock:
+            cached = self._results.get(city)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        path = os.path.join(self.settings["cache_dir"], f"{city}.json")
+        try:
+            with open(path) as f:
+                stored = json.load(f)
+            if stored["key"] == key:
+                with self._lock:
+                    self._results[city] = (key, stored["result"])
+                return stored["result"]
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+        # Computed outside the lock so other cities are not held up; a racing request for
+        # the same city computes the same result and the last writer wins
+        result = self._compute(cfg, scene, bounds)
+        os.makedirs(self.settings["cache_dir"], exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"key": key, "result": result}, f)
+        os.replace(tmp, path)
+        with self._lock:
+            self._results[city] = (key, result)
+        return result
+
+    def _compute(self, cfg: Dict, scene: Dict, bounds) -> Dict:
+        r0, r1, c0, c1 = self.rasters.window(scene, bounds)
+        # North-up UTM/geographic pixels: the latitude extent gives the pixel size
+        pixel_m = scene["pixel_deg"] * 111195
+        graph = patch_graph(self.rasters.layer(scene["scene"])[r0:r1, c0:c1], pixel_m,
+                            VEGETATION_RASTER["green_ndvi"], self.settings)
+        network = corridor_network(graph, self.settings["max_corridors"])
+
+        def point(rc) -> Dict:
+            lon, lat = self.rasters.lonlat(scene, rc[0] + r0, rc[1] + c0)
+            return {"lat": round(float(lat), 5), "lon": round(float(lon), 5)}
+
+        species_area = self.settings["species_area"]
+        corridors = []
+        for n, c in enumerate(network["corridors"]):
+            length = max(c["length_m"], 1e-9)
+            corridors.append({
+                "corridor_id": f"GC_{n + 1}",
+                "start_point": point(graph["centroids"][c["path"][0]]),
+                "end_point": point(graph["centroids"][c["path"][-1]]),
+                "length_km": round(c["length_m"] / 1000, 3),
+                "connectivity_score": round(float(1 - c["gap_m"].sum() / length), 3),
+                "species_diversity": int(species_estimate(c["area_m2"] / 10000, species_area)),
+                "patches_on_path": len(c["path"]),
+                "network_patches": c["patches"],
+                "green_area_hectares": round(c["area_m2"] / 10000, 2),
+                "longest_gap_m": round(float(c["gap_m"].max()), 1) if len(c["gap_m"]) else 0.0
+            })
+
+        area_ha = graph["pixels"] * pixel_m ** 2 / 10000
+        hotspots = []
+        for p in np.argsort(area_ha)[::-1][:self.settings["max_hotspots"]]:
+            hotspots.append({**point(graph["centroids"][p]), "area_hectares": round(float(area_ha[p]), 2),
+                             "species_count": int(species_estimate(area_ha[p], species_area))})
+
+        return {
+            "city": cfg["name"],
+            "data_source": f"{VEGETATION_RASTER['sensors'][scene['sensor']]['name']} NDVI",
+            "scene_id": scene["scene"],
+            "acquired": scene["date"],
+            "green_corridors": corridors,
+            "overall_connectivity": round(network["connectivity"], 4),
+            "patches": graph["patches"],
+            "networks": len(network["network_area_m2"]),
+            "green_area_hectares": round(float(area_ha.sum()), 2),
+            "biodiversity_hotspots": hotspots,
+            "analysis": {"pixels": (r1 - r0) * (c1 - c0), "pixel_m": round(pixel_m, 2),
+                         "green_ndvi": VEGETATION_RASTER["green_ndvi"], "min_patch_ha": self.settings["min_patch_ha"],
+                         "max_gap_m": self.settings["max_gap_m"], "computed": datetime.utcnow().isoformat()}
+        }
@@ -0,0 +1,258 @@
+"""
+Green space proximity
+Per-city distance-to-green-space and green-area-within-radius rasters, so proximity questions for any coordinate are array lookups
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import ndimage
+from scipy.signal import fftconvolve
+
+from config.nasa_apis import GREEN_PROXIMITY, POLLUTION_MAP, VEGETATION_RASTER
+from .corridors import green_patches
+from .vegetation_rasters import VegetationRasterStore, get_vegetation_rasters
+
+LAYERS = ("distance_m", "nearest", "green_ha", "green_share")
+
+
+def city_bounds(cfg: Dict) -> Tuple[float, float, float, float]:
+    """(min_lon, min_lat, max_lon, max_lat) of a configured city"""
+    half = cfg["half_width_deg"]
+    return cfg["lon"] - half, cfg["lat"] - half, cfg["lon"] + half, cfg["lat"] + half
+
+
+def access_score(distance_m, green_share, access_m: float) -> np.ndarray:
+    """0-1 green space access: half nearness (1 at a green space, 0.5 at access_m), half surrounding cover (full at 30%)"""
+    nearness = np.clip(1 - np.asarray(distance_m, dtype=np.float64) / (2 * access_m), 0, 1)
+    cover = np.clip(np.asarray(green_share, dtype=np.float64) / 0.3, 0, 1)
+    return (nearness + cover) / 2
+
+
+def _space_type(area_ha: float) -> str:
+    # Only size is known from the raster; larger contiguous green reads as woodland rather than a park
+    if area_ha < 1:
+        return "garden"
+    return "park" if area_ha < 20 else "forest"
+
+
+class GreenProximityIndex:
+    """Proximity layers by city
+
+    A green space is an 8-connected patch of green NDVI pixels of at least
+    min_space_ha. Layout: {cache_dir}/{city}.json holds the build key and
+    metadata (scene, pixel window, pixel size) and {cache_dir}/<version dir>/
+    holds distance_m.npy (metres to the nearest green space), nearest.npy
+    (that space's ID, 0 where the city has none), green_ha.npy and
+    green_share.npy (green area and its share of valid pixels within
+    radius_m) and spaces.npy (lat, lon, area_ha, mean NDVI per space ID - 1).
+    """
+
+    def __init__(self, rasters: Optional[VegetationRasterStore] = None, settings: Optional[Dict] = None):
+        self.rasters = rasters or get_vegetation_rasters()
+        self.settings = {**GREEN_PROXIMITY, **(settings or {})}
+        self._lock = threading.Lock()
+        self._cities: Dict[str, Tuple[Dict, Dict]] = {}
+        self._building: Dict[str, threading.Lock] = {}
+
+    def layers(self, city: str) -> Optional[Dict]:
+        """Mapped layers and metadata of a configured city, built on first use; None when no scene covers it"""
+        bounds = city_bounds(POLLUTION_MAP["cities"][city])
+        scene = self.rasters.find(bounds)
+        if scene is None:
+            return None
+        key = {"city": city, "scene": scene["scene"], "dir": scene["dir"], "bounds": list(bounds),
+               "green_ndvi": VEGETATION_RASTER["green_ndvi"],
+               "settings": {k: self.settings[k] for k in ("min_space_ha", "radius_m")}}
+        with self._lock:
+            cached = self._cities.get(city)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+            building = self._building.setdefault(city, threading.Lock())
+        # The build takes seconds, so only requests for this city wait on it; lookups
+        # for other cities still reach the shared lock
+        with building:
+            with self._lock:
+                cached = self._cities.get(city)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+            path = os.path.join(self.settings["cache_dir"], f"{city}.json")
+            previous = None
+            try:
+                with open(path) as f:
+                    stored = json.load(f)
+                previous = stored["meta"]["dir"]
+                if stored["key"] == key:
+                    layers = self._load(stored["meta"], scene)
+                    with self._lock:
+                        self._cities[city] = (key, layers)
+                    return layers
+            except (FileNotFoundError, ValueError, KeyError):
+                pass
+
+            meta = self._build(city, scene, bounds)
+            with open(path + ".tmp", "w") as f:
+                json.dump({"key": key, "meta": meta}, f)
+            os.replace(path + ".tmp", path)
+            if previous and previous != meta["dir"]:
+                shutil.rmtree(os.path.join(self.settings["cache_dir"], previous), ignore_errors=True)
+            layers = self._load(meta, scene)
+            with self._lock:
+                self._cities[city] = (key, layers)
+            return layers
+
+    def _load(self, meta: Dict, scene: Dict) -> Dict:
+        root = os.path.join(self.settings["cache_dir"], meta["dir"])
+        layers = {name: np.load(os.path.join(root, f"{name}.npy"), mmap_mode="r").view(np.ndarray) for name in LAYERS}
+        return {**layers, "spaces": np.load(os.path.join(root, "spaces.npy")), "meta": meta, "scene": scene}
+
+    def _build(self, city: str, scene: Dict, bounds) -> Dict:
+        r0, r1, c0, c1 = self.rasters.window(scene, bounds)
+        ndvi = np.asarray(self.rasters.layer(scene["scene"])[r0:r1, c0:c1])
+        # North-up UTM/geographic pixels: the latitude extent gives the pixel size
+        pixel_m = scene["pixel_deg"] * 111195
+        green_ndvi = VEGETATION_RASTER["green_ndvi"]
+        labels, pixels = green_patches(ndvi, pixel_m, green_ndvi, self.settings["min_space_ha"])
+        n = len(pixels)
+
+        # One transform gives both the distance to and the ID of the nearest green space pixel
+        if n:
+            distance, (ir, ic) = ndimage.distance_transform_edt(labels == 0, sampling=pixel_m, return_indices=True)
+            nearest = labels[ir, ic]
+            del ir, ic
+        else:
+            distance, nearest = np.full(labels.shape, np.inf), np.zeros(labels.shape, dtype=np.int32)
+
+        # Green and valid pixel counts within radius_m of every pixel, as FFT convolutions with a disk
+        r = self.settings["radius_m"] / pixel_m
+        y, x = np.ogrid[-int(r):int(r) + 1, -int(r):int(r) + 1]
+        disk = (x * x + y * y <= r * r).astype(np.float32)
+        with np.errstate(invalid="ignore"):
+            green = (ndvi >= green_ndvi).astype(np.float32)
+        valid = np.isfinite(ndvi).astype(np.float32)
+        green_px = np.rint(fftconvolve(green, disk, mode="same")).clip(0)
+        valid_px = np.rint(fftconvolve(valid, disk, mode="same")).clip(0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            share = green_px / valid_px
+
+        rows, cols = np.indices(labels.shape)
+        flat = labels.ravel()
+        centroid_r = np.bincount(flat, weights=rows.ravel(), minlength=n + 1)[1:] / np.maximum(pixels, 1)
+        centroid_c = np.bincount(flat, weights=cols.ravel(), minlength=n + 1)[1:] / np.maximum(pixels, 1)
+        mean_ndvi = np.bincount(flat, weights=np.nan_to_num(ndvi).ravel(), minlength=n + 1)[1:] / np.maximum(pixels, 1)
+        lon, lat = self.rasters.lonlat(scene, centroid_r + r0, centroid_c + c0)
+        spaces = np.column_stack([lat, lon, pixels * pixel_m ** 2 / 10000, mean_ndvi])
+
+        version = f"{city}-{time.time_ns()}"
+        root = os.path.join(self.settings["cache_dir"], version)
+        os.makedirs(root, exist_ok=True)
+        for name, values in (("distance_m", distance.astype(np.float32)), ("nearest", nearest.astype(np.int32)),
+                             ("green_ha", (green_px * pixel_m ** 2 / 10000).astype(np.float32)),
+                             ("green_share", share.astype(np.float32)), ("spaces", spaces)):
+            np.save(os.path.join(root, f"{name}.npy"), values)
+        return {"dir": version, "window": [r0, r1, c0, c1], "pixel_m": pixel_m, "spaces": n,
+                "radius_m": self.settings["radius_m"], "disk_ha": float(disk.sum() * pixel_m ** 2 / 10000),
+                "computed": datetime.utcnow().isoformat()}
+
+    def lookup(self, lat, lon) -> Dict[str, np.ndarray]:
+        """Proximity of many locations as columns; covered False, NaN, -1 (space) and None (city) where no layer covers one"""
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        out = {name: np.full(lat.shape, np.nan) for name in
+               ("distance_m", "green_ha", "green_share", "space_lat", "space_lon", "space_area_ha")}
+        out["space"] = np.full(lat.shape, -1, dtype=np.int64)
+        out["city"] = np.full(lat.shape, None, dtype=object)
+        covered = np.zeros(lat.shape, dtype=bool)
+        for city, cfg in POLLUTION_MAP["cities"].items():
+            b = city_bounds(cfg)
+            todo = np.flatnonzero(~covered & (lon >= b[0]) & (lon <= b[2]) & (lat >= b[1]) & (lat <= b[3]))
+            if not len(todo):
+                continue
+            layers = self.layers(city)
+            if layers is None:
+                continue
+            r0, r1, c0, c1 = layers["meta"]["window"]
+            r, c = self.rasters.pixels(layers["scene"], lat[todo], lon[todo])
+            r, c = np.floor(r).astype(np.int64) - r0, np.floor(c).astype(np.int64) - c0
+            inside = (r >= 0) & (c >= 0) & (r < r1 - r0) & (c < c1 - c0)
+            todo, r, c = todo[inside], r[inside], c[inside]
+            covered[todo] = True
+            out["city"][todo] = city
+            out["distance_m"][todo] = layers["distance_m"][r, c]
+            out["green_ha"][todo] = layers["green_ha"][r, c]
+            out["green_share"][todo] = layers["green_share"][r, c]
+            space = layers["nearest"][r, c].astype(np.int64) - 1
+            found = space >= 0
+            out["space"][todo[found]] = space[found]
+            spaces = layers["spaces"][space[found]]
+            out["space_lat"][todo[found]], out["space_lon"][todo[found]] = spaces[:, 0], spaces[:, 1]
+            out["space_area_ha"][todo[found]] = spaces[:, 2]
+        out["covered"] = covered
+        return out
+
+    def nearby(self, lat: float, lon: float, found: Optional[Dict] = None) -> Optional[List[Dict]]:
+        """Green spaces within nearby_m, closest first; None when no scene covers the location
+
+        The nearest space's distance is exact (to its closest pixel); the
+        others are from their centroids less the radius of a circle of
+        their area. `found` is this location's lookup(), when the caller
+        already has it.
+        """
+        point = found if found is not None else self.lookup(lat, lon)
+        city = point["city"][0]
+        if city is None:
+            return None
+        spaces = self.layers(city)["spaces"]
+        dy = (spaces[:, 0] - lat) * 111195
+        dx = (spaces[:, 1] - lon) * 111195 * np.cos(np.radians(lat))
+        distance = np.maximum(np.hypot(dx, dy) - np.sqrt(spaces[:, 2] * 10000 / np.pi), 0)
+        nearest = point["space"][0]
+        if nearest >= 0:
+            distance[nearest] = point["distance_m"][0]
+        order = np.argsort(distance)[:self.settings["nearby_limit"]]
+        return [{"id": int(i) + 1, "type": _space_type(spaces[i, 2]), "lat": round(float(spaces[i, 0]), 5),
+                 "lon": round(float(spaces[i, 1]), 5), "distance_m": round(float(distance[i]), 1),
+                 "area_hectares": round(float(spaces[i, 2]), 2), "mean_ndvi": round(float(spaces[i, 3]), 3)}
+                for i in order if distance[i] <= self.settings["nearby_m"]]
+
+    def point(self, lat: float, lon: float, found: Optional[Dict] = None) -> Optional[Dict]:
+        """Proximity summary of one location; None when no scene covers it. `found` as for nearby()"""
+        p = {k: v[0] for k, v in (found if found is not None else self.lookup(lat, lon)).items()}
+        if p["city"] is None:
+            return None
+        layers = self.layers(p["city"])
+        access_m = self.settings["access_m"]
+        nearest = None
+        if p["space"] >= 0:
+            nearest = {"id": int(p["space"]) + 1, "lat": round(float(p["space_lat"]), 5),
+                       "lon": round(float(p["space_lon"]), 5), "area_hectares": round(float(p["space_area_ha"]), 2),
+                       "type": _space_type(p["space_area_ha"])}
+        share = float(p["green_share"]) if np.isfinite(p["green_share"]) else 0.0
+        scene = layers["scene"]
+        return {
+            "city": POLLUTION_MAP["cities"][p["city"]]["name"],
+            "distance_to_green_space_m": round(float(p["distance_m"]), 1) if nearest else None,
+            "nearest_green_space": nearest,
+            f"green_area_within_{self.settings['radius_m']}m_hectares": round(float(p["green_ha"]), 2),
+            "green_share_within_radius": round(share, 4),
+            f"within_{access_m}m_of_green_space": bool(nearest is not None and p["distance_m"] <= access_m),
+            "access_score": round(float(access_score(p["distance_m"] if nearest else np.inf, share, access_m)), 3),
+            "data_source": f"{VEGETATION_RASTER['sensors'][scene['sensor']]['name']} NDVI",
+            "scene_id": scene["scene"],
+            "acquired": scene["date"]
+        }
+
+
+# Process-wide instance so every request shares the mapped layers
+green_proximity = GreenProximityIndex()
+
+
+def get_green_proximity() -> GreenProximityIndex:
+    """Return the shared green proximity index"""
+    return green_proximity
@@ -0,0 +1,196 @@
+"""
+Vegetation index raster engine
+Computes NDVI/EVI/SAVI from Landsat/Sentinel-2 surface reflectance band files in windows spread over a process pool
+
+    python -m modules.green_vegetation.raster_engine
+    python -m modules.green_vegetation.raster_engine /data/scenes/LC08_L2SP_146040_20230415_20230420_02_T1_SR_B*.TIF --workers 8
+"""
+
+import argparse
+import glob
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import rasterio
+from rasterio.warp import transform as warp_transform
+from rasterio.windows import Window
+
+from config.nasa_apis import VEGETATION_RASTER
+from modules.nasa_data.files import file_identity
+from .vegetation_rasters import INDICES, VegetationRasterStore, fit_pixels, get_vegetation_rasters, vegetation_indices
+
+# Control points per side for the lon/lat -> pixel fit
+FIT_POINTS = 9
+
+
+def discover_scenes(paths: List[str]) -> Dict[str, Dict]:
+    """Scene ID -> sensor, acquisition date and the blue/red/NIR band files, for scenes with all three"""
+    scenes: Dict[str, Dict] = {}
+    for path in paths:
+        name = os.path.basename(path)
+        for sensor, cfg in VEGETATION_RASTER["sensors"].items():
+            match = re.match(cfg["pattern"], name)
+            role = {band: role for role, band in cfg["bands"].items()}.get(match["band"]) if match else None
+            if role is not None:
+                day = datetime.strptime(match["date"], "%Y%m%d").date().isoformat()
+                scenes.setdefault(match["scene"], {"sensor": sensor, "date": day, "bands": {}})["bands"][role] = path
+                break
+    complete = {}
+    for scene_id, scene in sorted(scenes.items()):
+        missing = set(VEGETATION_RASTER["sensors"][scene["sensor"]]["bands"]) - set(scene["bands"])
+        if missing:
+            print(f"Skipping {scene_id}: no {', '.join(sorted(missing))} band")
+        else:
+            complete[scene_id] = scene
+    return complete
+
+
+def windows(height: int, width: int, size: int) -> List[Tuple[int, int, int, int]]:
+    """(row, col, height, width) windows tiling a raster"""
+    return [(row, col, min(size, height - row), min(size, width - col))
+            for row in range(0, height, size) for col in range(0, width, size)]
+
+
+# Per-process scene state set by _open_scene: band datasets, output maps and scaling
+_scene: Dict = {}
+
+
+def _open_scene(bands: Dict[str, str], out_dir: str, sensor: str, savi_l: float):
+    """Open the band files and map the outputs once per worker rather than once per window"""
+    _scene.update({
+        "bands": {role: rasterio.open(path) for role, path in bands.items()},
+        "out": {index: np.load(os.path.join(out_dir, f"{index}.npy"), mmap_mode="r+") for index in INDICES},
+        "sensor": VEGETATION_RASTER["sensors"][sensor],
+        "savi_l": savi_l
+    })
+
+
+def _close_scene():
+    for src in _scene.get("bands", {}).values():
+        src.close()
+    _scene.clear()
+
+
+def _compute_window(window: Tuple[int, int, int, int]) -> Tuple[int, float]:
+    """Read one window of every band, write its indices and return (valid pixels, NDVI sum)"""
+    row, col, height, width = window
+    cfg = _scene["sensor"]
+    reflectance, valid = {}, np.ones((height, width), dtype=bool)
+    for role, src in _scene["bands"].items():
+        raw = src.read(1, window=Window(col, row, width, height))
+        valid &= raw != cfg["nodata"]
+        reflectance[role] = raw.astype(np.float32) * np.float32(cfg["scale"]) + np.float32(cfg["offset"])
+    indices = vegetation_indices(reflectance["blue"], reflectance["red"], reflectance["nir"], _scene["savi_l"])
+    for index, values in indices.items():
+        values[~valid] = np.nan
+        # Windows are disjoint, so workers write the shared maps without locking
+        _scene["out"][index][row:row + height, col:col + width] = values
+    ndvi = indices["ndvi"]
+    return int(np.isfinite(ndvi).sum()), float(np.nansum(ndvi))
+
+
+def _georeference(src) -> Dict:
+    """Lon/lat bounds, approximate pixel size and the lon/lat -> pixel fit of a band raster"""
+    rows, cols = np.meshgrid(np.linspace(0, src.height, FIT_POINTS), np.linspace(0, src.width, FIT_POINTS),
+                             indexing="ij")
+    t = src.transform
+    xs = t.c + t.a * cols + t.b * rows
+    ys = t.f + t.d * cols + t.e * rows
+    lon, lat = (np.asarray(v) for v in warp_transform(src.crs, "EPSG:4326", xs.ravel().tolist(), ys.ravel().tolist()))
+    return {
+        "bounds": [float(lon.min()), float(lat.min()), float(lon.max()), float(lat.max())],
+        "pixel_deg": float((lat.max() - lat.min()) / src.height),
+        "fit": fit_pixels(lon, lat, rows, cols)
+    }
+
+
+def compute_scene(scene_id: str, scene: Dict, store: Optional[VegetationRasterStore] = None,
+                  workers: Optional[int] = None, window_px: Optional[int] = None, force: bool = False) -> Dict:
+    """Compute and register one scene's index rasters, unless its band files are unchanged since the last run
+
+    Each worker holds a single window of every band, so memory is bounded
+    by workers x window size whatever the scene's size.
+    """
+    store = store or get_vegetation_rasters()
+    workers = workers or store.settings["workers"]
+    window_px = window_px or store.settings["window_px"]
+    savi_l = store.settings["savi_l"]
+    sources = {role: list(file_identity(path)) for role, path in sorted(scene["bands"].items())}
+    previous = store.scenes().get(scene_id)
+    if previous and not force and previous["sources"] == sources and previous["savi_l"] == savi_l:
+        return {"scene": scene_id, "cached": True}
+
+    start = time.perf_counter()
+    with rasterio.open(scene["bands"]["red"]) as src:
+        shape = (src.height, src.width)
+        geo = _georeference(src)
+        crs = str(src.crs)
+    for role, path in scene["bands"].items():
+        with rasterio.open(path) as src:
+            if (src.height, src.width) != shape:
+                raise ValueError(f"{scene_id} {role} band is {src.height}x{src.width}, red is {shape[0]}x{shape[1]}")
+
+    out_dir = os.path.join(store.root, f"{scene_id}.{time.time_ns()}")
+    os.makedirs(out_dir)
+    for index in INDICES:
+        out = np.lib.format.open_memmap(os.path.join(out_dir, f"{index}.npy"), mode="w+",
+                                        dtype=np.float32, shape=shape)
+        del out
+
+    tiles = windows(shape[0], shape[1], window_px)
+    args = (scene["bands"], out_dir, scene["sensor"], savi_l)
+    if workers <= 1 or len(tiles) == 1:
+        _open_scene(*args)
+        try:
+            results = [_compute_window(w) for w in tiles]
+        finally:
+            _close_scene()
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tiles)), initializer=_open_scene, initargs=args) as pool:
+            results = list(pool.map(_compute_window, tiles, chunksize=max(1, len(tiles) // (workers * 4))))
+
+    valid = sum(n for n, _ in results)
+    store.register({
+        "scene": scene_id,
+        "sensor": scene["sensor"],
+        "date": scene["date"],
+        "dir": os.path.basename(out_dir),
+        "shape": list(shape),
+        "crs": crs,
+        **geo,
+        "sources": sources,
+        "savi_l": savi_l,
+        "valid_pixels": valid,
+        "mean_ndvi": round(sum(s for _, s in results) / valid, 4) if valid else None,
+        "computed": datetime.utcnow().isoformat()
+    })
+    return {"scene": scene_id, "cached": False, "shape": list(shape), "windows": len(tiles),
+            "valid_pixels": valid, "fit_error_px": round(geo["fit"]["error_px"], 3),
+            "seconds": round(time.perf_counter() - start, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute NDVI/EVI/SAVI rasters from Landsat/Sentinel-2 band files")
+    parser.add_argument("files", nargs="*", help="band files (default: everything under the scenes directory)")
+    parser.add_argument("--scene", action="append", help="only these scene IDs")
+    parser.add_argument("--workers", type=int, default=VEGETATION_RASTER["workers"])
+    parser.add_argument("--window", type=int, default=VEGETATION_RASTER["window_px"])
+    parser.add_argument("--root", default=VEGETATION_RASTER["cache_dir"])
+    parser.add_argument("--force", action="store_true", help="recompute scenes whose bands are unchanged")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(os.path.join(VEGETATION_RASTER["scenes_dir"], "**", "*"), recursive=True))
+    store = VegetationRasterStore(args.root)
+    for scene_id, scene in discover_scenes(files).items():
+        if args.scene and scene_id not in args.scene:
+            continue
+        print(compute_scene(scene_id, scene, store, args.workers, args.window, args.force))
+
+
+if __name__ == "__main__":
+    main()
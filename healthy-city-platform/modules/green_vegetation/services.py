@@ -1,12 +1,22 @@
+import asyncio
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Optional
 import requests
+from config.nasa_apis import POLLUTION_MAP, VEGETATION_RASTER, ZONES
+from modules.nasa_data.simulation import grid
+from modules.nasa_data.zonal import KM_PER_DEGREE, ZoneLabels, disk_zones
+from .corridors import GreenCorridorAnalyzer
+from .proximity import GreenProximityIndex, get_green_proximity
+from .vegetation_rasters import VegetationRasterStore, get_vegetation_rasters
 
 class VegetationService:
-    def __init__(self):
+    def __init__(self, rasters: Optional[VegetationRasterStore] = None):
         self.modis_url = "https://modis.gsfc.nasa.gov/data"
         self.landsat_url = "https://landsat.gsfc.nasa.gov/data"
+        self.rasters = rasters or get_vegetation_rasters()
+        self.corridors = GreenCorridorAnalyzer(self.rasters)
+        self.proximity = GreenProximityIndex(rasters) if rasters else get_green_proximity()
     
     async def get_ndvi_data(self, lat: float, lon: float) -> Dict:
         """Get NDVI data from MODIS/Landsat"""
@@ -91,6 +101,15 @@ class VegetationService:
     
     async def generate_urban_cover_map(self, city: str) -> Dict:
         """Generate urban vegetation cover map"""
+        cfg = POLLUTION_MAP["cities"].get(city.strip().lower())
+        if cfg is not None:
+            try:
+                cover_map = await asyncio.to_thread(self._scene_cover_map, city, cfg)
+                if cover_map is not None:
+                    return cover_map
+            except (OSError, KeyError, ValueError) as e:
+                print(f"Vegetation raster lookup failed: {e}")
+        
         # Simulate urban cover analysis
         grid_size = 25
         vegetation_cover = np.random.uniform(0, 0.8, (grid_size, grid_size))
@@ -114,6 +133,52 @@ class VegetationService:
             "recommendations": self._generate_green_recommendations(np.mean(vegetation_cover))
         }
     
+    def _scene_cover_map(self, city: str, cfg: Dict) -> Optional[Dict]:
+        """Green cover per cell from the scene covering the city, None when no computed scene does"""
+        half = cfg["half_width_deg"]
+        bounds = (cfg["lon"] - half, cfg["lat"] - half, cfg["lon"] + half, cfg["lat"] + half)
+        scene = self.rasters.find(bounds)
+        if scene is None:
+            return None
+        n = VEGETATION_RASTER["cover_grid"]
+        cells = self.rasters.sample_grid(scene["scene"], bounds, (n, n))
+        green, ndvi = cells["green"], cells["mean"]
+        observed = np.isfinite(green)
+        if not observed.any():
+            return None
+        
+        cover = float(green[observed].mean())
+        lat, lon = grid(bounds, (n, n))
+        cell_ha = (2 * half / n * 111.195) ** 2 * np.cos(np.radians(lat)) * 100
+        greenest = np.argsort(np.where(observed, green, -1), axis=None)[::-1][:5]
+        green_spaces = []
+        for i, cell in enumerate(greenest):
+            r, c = np.unravel_index(cell, green.shape)
+            if not observed[r, c] or green[r, c] == 0:
+                break
+            green_spaces.append({
+                "name": f"Green Space {i+1}",
+                "lat": round(float(lat[r, c]), 5),
+                "lon": round(float(lon[r, c]), 5),
+                "area_hectares": round(float(green[r, c] * cell_ha[r, c]), 2),
+                "vegetation_density": round(float(ndvi[r, c]), 3)
+            })
+        
+        sensor = VEGETATION_RASTER["sensors"][scene["sensor"]]
+        return {
+            "city": city,
+            "data_source": f"{sensor['name']} surface reflectance",
+            "scene_id": scene["scene"],
+            "acquired": scene["date"],
+            "bounds": list(bounds),
+            "total_green_cover_percent": cover * 100,
+            "mean_ndvi": round(float(ndvi[observed].mean()), 4),
+            "green_ndvi_threshold": VEGETATION_RASTER["green_ndvi"],
+            "vegetation_grid": np.where(observed, np.round(green, 4), None).tolist(),
+            "green_spaces": green_spaces,
+            "recommendations": self._generate_green_recommendations(cover)
+        }
+    
     def _generate_green_recommendations(self, cover_percent: float) -> List[str]:
         """Generate recommendations for increasing green cover"""
         recommendations = []
@@ -132,6 +197,13 @@ class VegetationService:
     
     async def assess_vegetation_health(self, lat: float, lon: float, radius: float) -> Dict:
         """Assess vegetation health in area"""
+        try:
+            health = await asyncio.to_thread(self._scene_area_health, lat, lon, radius)
+            if health is not None:
+                return health
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Vegetation raster lookup failed: {e}")
+        
         # Simulate area assessment
         sample_points = 20
         health_scores = np.random.uniform(30, 95, sample_points)
@@ -151,9 +223,67 @@ class VegetationService:
             ]
         }
     
+    def _scene_area_health(self, lat: float, lon: float, radius: float) -> Optional[Dict]:
+        """Health scores over the cells within radius km, as zonal statistics of the covering scene's NDVI"""
+        d_lat = radius / KM_PER_DEGREE
+        d_lon = d_lat / max(np.cos(np.radians(lat)), 1e-6)
+        bounds = (lon - d_lon, lat - d_lat, lon + d_lon, lat + d_lat)
+        scene = self.rasters.find(bounds)
+        if scene is None:
+            return None
+        n = ZONES["grid_size"]
+        ndvi = self.rasters.sample_grid(scene["scene"], bounds, (n, n))["mean"]
+        # The NDVI class bounds (0.3 sparse, 0.6 dense) map onto the 40 / 70 score bounds
+        score = np.interp(ndvi, [0.0, 0.3, 0.6, 0.9], [0, 40, 70, 100])
+        score[~np.isfinite(ndvi)] = np.nan
+        layers = {"ndvi": ndvi, "score": score}
+        for status, inside in (("healthy", score > 70), ("moderate", (score > 40) & (score <= 70)),
+                               ("stressed", score <= 40)):
+            layers[status] = np.where(np.isfinite(score), inside, np.nan)
+        area = disk_zones(bounds, (n, n), [(lat, lon)], radius)
+        stats = {name: {k: v[0] for k, v in zone.items()} for name, zone in
+                 area.stats(layers, ZONES["percentiles"]).items()}
+        if not stats["score"]["count"]:
+            return None
+        
+        # Priority areas: the lowest-scoring blocks of 10 x 10 cells within the radius
+        rows, cols = np.minimum(np.indices((n, n)) // max(1, n // 10), 9)
+        blocks = ZoneLabels(np.where(area.labels > 0, rows * 10 + cols + 1, 0).astype(np.int32),
+                            [str(b) for b in range(100)], [str(b) for b in range(100)], bounds)
+        block_stats = blocks.stats({"score": score, "ndvi": ndvi})
+        mean = block_stats["score"]["mean"]
+        priority_areas = []
+        for b in np.argsort(np.where(np.isfinite(mean), mean, np.inf))[:3]:
+            if not np.isfinite(mean[b]) or mean[b] > 40:
+                break
+            priority_areas.append({"lat": round(float(blocks.lat[b]), 5), "lon": round(float(blocks.lon[b]), 5),
+                                   "health_score": round(float(mean[b]), 1),
+                                   "issue": self._classify_vegetation(block_stats["ndvi"]["mean"][b])})
+        
+        sensor = VEGETATION_RASTER["sensors"][scene["sensor"]]
+        return {
+            "area_center": {"lat": lat, "lon": lon},
+            "radius_km": radius,
+            "data_source": f"{sensor['name']} NDVI",
+            "scene_id": scene["scene"],
+            "acquired": scene["date"],
+            "average_health_score": round(float(stats["score"]["mean"]), 1),
+            "health_distribution": {status: round(float(stats[status]["mean"]) * 100, 1)
+                                    for status in ("healthy", "moderate", "stressed")},
+            "ndvi_statistics": {"mean": round(float(stats["ndvi"]["mean"]), 4),
+                                **{k: round(float(v), 4) for k, v in stats["ndvi"].items() if k.startswith("p")},
+                                "cells": int(stats["ndvi"]["count"])},
+            "priority_areas": priority_areas
+        }
+    
     async def analyze_mental_health_impact(self, lat: float, lon: float) -> Dict:
         """Analyze green space impact on mental health"""
-        green_space_access = np.random.uniform(0.2, 0.9)
+        proximity = None
+        try:
+            proximity = await asyncio.to_thread(self.proximity.point, lat, lon)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Green proximity lookup failed: {e}")
+        green_space_access = proximity["access_score"] if proximity else np.random.uniform(0.2, 0.9)
         
         # Calculate mental health benefits
         stress_reduction = green_space_access * 25  # percentage
@@ -162,6 +292,7 @@ class VegetationService:
         return {
             "location": {"lat": lat, "lon": lon},
             "green_space_accessibility": green_space_access,
+            "green_space_proximity": proximity,
             "mental_health_benefits": {
                 "stress_reduction_percent": stress_reduction,
                 "wellbeing_score": wellbeing_score,
@@ -175,8 +306,25 @@ class VegetationService:
             ]
         }
     
+    async def get_green_proximity(self, lat: float, lon: float) -> Optional[Dict]:
+        """Distance to the nearest green space and green area around a location"""
+        summary = await asyncio.to_thread(self.proximity.point, lat, lon)
+        if summary is None:
+            return None
+        nearby = await asyncio.to_thread(self.proximity.nearby, lat, lon)
+        return {"location": {"lat": lat, "lon": lon}, **summary, "nearby_green_spaces": nearby}
+    
     async def identify_green_corridors(self, city: str) -> Dict:
         """Identify green corridors and connectivity"""
+        key = city.strip().lower()
+        if key in POLLUTION_MAP["cities"]:
+            try:
+                analysis = await asyncio.to_thread(self.corridors.analyze, key)
+                if analysis is not None:
+                    return {**analysis, "city": city}
+            except (OSError, KeyError, ValueError) as e:
+                print(f"Green corridor analysis failed: {e}")
+        
         corridors = []
         for i in range(3):
             corridors.append({
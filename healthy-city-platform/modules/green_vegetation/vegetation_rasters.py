@@ -0,0 +1,221 @@
+"""
+Vegetation index rasters
+NDVI/EVI/SAVI computed per Landsat/Sentinel-2 scene, memory-mapped and sampled onto city grids
+"""
+
+import json
+import os
+import shutil
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from config.nasa_apis import VEGETATION_RASTER
+from modules.nasa_data.files import file_identity
+from modules.nasa_data.simulation import grid
+
+INDICES = ("ndvi", "evi", "savi")
+
+
+def vegetation_indices(blue: np.ndarray, red: np.ndarray, nir: np.ndarray, savi_l: float) -> Dict[str, np.ndarray]:
+    """NDVI, EVI and SAVI from surface reflectance; NaN where a ratio is undefined"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ndvi = (nir - red) / (nir + red)
+        evi = 2.5 * (nir - red) / (nir + 6 * red - 7.5 * blue + 1)
+        savi = (1 + savi_l) * (nir - red) / (nir + red + savi_l)
+    # EVI's denominator nears zero over bright or shadowed pixels; values past +-1 are not vegetation signal
+    evi[(evi < -1) | (evi > 1)] = np.nan
+    return {"ndvi": ndvi.astype(np.float32), "evi": evi.astype(np.float32), "savi": savi.astype(np.float32)}
+
+
+def _terms(dlon: np.ndarray, dlat: np.ndarray) -> np.ndarray:
+    return np.stack([np.ones_like(dlon), dlon, dlat, dlon * dlon, dlon * dlat, dlat * dlat], axis=-1)
+
+
+def fit_pixels(lon: np.ndarray, lat: np.ndarray, rows: np.ndarray, cols: np.ndarray) -> Dict:
+    """Quadratic lon/lat -> (row, col) fit from control points, so lookups need no projection library"""
+    lon, lat = np.ravel(lon), np.ravel(lat)
+    origin = [float(lon.mean()), float(lat.mean())]
+    terms = _terms(lon - origin[0], lat - origin[1])
+    target = np.column_stack([np.ravel(rows), np.ravel(cols)]).astype(np.float64)
+    coefficients = np.linalg.lstsq(terms, target, rcond=None)[0]
+    return {"origin": origin, "coefficients": coefficients.tolist(),
+            "error_px": float(np.abs(terms @ coefficients - target).max())}
+
+
+class VegetationRasterStore:
+    """Computed scenes by scene ID
+
+    Layout: {root}/index.json maps each scene ID to its metadata (sensor,
+    date, shape, lon/lat bounds, pixel fit and the identities of the band
+    files it was computed from) and {root}/<version dir>/<index>.npy holds
+    the float32 index raster, NaN where any band is nodata. A recomputed
+    scene gets a new version dir, so readers never see a half-written one.
+    """
+
+    def __init__(self, root: str = VEGETATION_RASTER["cache_dir"], settings: Optional[Dict] = None):
+        self.root = root
+        self.settings = {**VEGETATION_RASTER, **(settings or {})}
+        self._lock = threading.Lock()
+        self._scenes: Dict[str, Dict] = {}
+        self._index_identity = None
+        self._layers: Dict[str, np.ndarray] = {}
+        self._grids: Dict[tuple, Dict] = {}
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.root, "index.json")
+
+    def scenes(self) -> Dict[str, Dict]:
+        """Scene metadata, re-read when the engine has registered a scene"""
+        try:
+            identity = file_identity(self._index_path)
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            if identity != self._index_identity:
+                with open(self._index_path) as f:
+                    self._scenes = json.load(f)
+                current = {os.path.join(self.root, s["dir"]) for s in self._scenes.values()}
+                self._layers = {p: a for p, a in self._layers.items() if os.path.dirname(p) in current}
+                self._grids = {k: g for k, g in self._grids.items() if k[1] in current}
+                self._index_identity = identity
+            return self._scenes
+
+    def register(self, meta: Dict):
+        """Publish a computed scene, replacing and removing its previous version"""
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock:
+            try:
+                with open(self._index_path) as f:
+                    index = json.load(f)
+            except FileNotFoundError:
+                index = {}
+            previous = index.get(meta["scene"])
+            index[meta["scene"]] = meta
+            with open(self._index_path + ".tmp", "w") as f:
+                json.dump(index, f)
+            os.replace(self._index_path + ".tmp", self._index_path)
+        # Readers that still map the old version keep a valid view; the files go when they unmap
+        if previous and previous["dir"] != meta["dir"]:
+            shutil.rmtree(os.path.join(self.root, previous["dir"]), ignore_errors=True)
+
+    def layer(self, scene_id: str, index: str = "ndvi") -> np.ndarray:
+        """One index raster of a scene, mapped on first use"""
+        if index not in INDICES:
+            raise ValueError(f"unknown vegetation index '{index}' (expected one of {', '.join(INDICES)})")
+        path = os.path.join(self.root, self.scenes()[scene_id]["dir"], f"{index}.npy")
+        values = self._layers.get(path)
+        if values is None:
+            values = np.load(path, mmap_mode="r").view(np.ndarray)
+            self._layers[path] = values
+        return values
+
+    @staticmethod
+    def pixels(scene: Dict, lat, lon) -> Tuple[np.ndarray, np.ndarray]:
+        """Fractional (row, col) of locations in a scene"""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        fit = scene["fit"]
+        rc = _terms(lon - fit["origin"][0], lat - fit["origin"][1]) @ np.asarray(fit["coefficients"])
+        return rc[..., 0], rc[..., 1]
+
+    @staticmethod
+    def lonlat(scene: Dict, rows, cols) -> Tuple[np.ndarray, np.ndarray]:
+        """Lon/lat of fractional (row, col) positions, inverting the pixel fit by Newton iteration"""
+        rows = np.asarray(rows, dtype=np.float64)
+        cols = np.asarray(cols, dtype=np.float64)
+        coefficients = np.asarray(scene["fit"]["coefficients"])
+        # The linear terms alone give a start well inside the quadratic's convergence region
+        jacobian = coefficients[1:3].T
+        target = np.stack([rows, cols], axis=-1)
+        d = (target - coefficients[0]) @ np.linalg.inv(jacobian).T
+        for _ in range(4):
+            dlon, dlat = d[..., 0], d[..., 1]
+            residual = _terms(dlon, dlat) @ coefficients - target
+            # d(row, col)/d(dlon, dlat) of the quadratic at the current estimate
+            j_lon = coefficients[1] + 2 * dlon[..., None] * coefficients[3] + dlat[..., None] * coefficients[4]
+            j_lat = coefficients[2] + dlon[..., None] * coefficients[4] + 2 * dlat[..., None] * coefficients[5]
+            det = j_lon[..., 0] * j_lat[..., 1] - j_lat[..., 0] * j_lon[..., 1]
+            d = d - np.stack([(j_lat[..., 1] * residual[..., 0] - j_lat[..., 0] * residual[..., 1]) / det,
+                              (j_lon[..., 0] * residual[..., 1] - j_lon[..., 1] * residual[..., 0]) / det], axis=-1)
+        return d[..., 0] + scene["fit"]["origin"][0], d[..., 1] + scene["fit"]["origin"][1]
+
+    @classmethod
+    def window(cls, scene: Dict, bounds: Tuple[float, float, float, float]) -> Tuple[int, int, int, int]:
+        """Pixel rows/cols (r0, r1, c0, c1) of the scene covering bounds (min_lon, min_lat, max_lon, max_lat)"""
+        lat, lon = np.meshgrid(np.linspace(bounds[1], bounds[3], 5), np.linspace(bounds[0], bounds[2], 5))
+        rows, cols = cls.pixels(scene, lat, lon)
+        height, width = scene["shape"]
+        return (int(np.clip(np.floor(rows.min()), 0, height)), int(np.clip(np.ceil(rows.max()), 0, height)),
+                int(np.clip(np.floor(cols.min()), 0, width)), int(np.clip(np.ceil(cols.max()), 0, width)))
+
+    def sample(self, scene_id: str, lat, lon, index: str = "ndvi") -> np.ndarray:
+        """Index value of the pixel under each location; NaN outside the scene or over nodata"""
+        values = self.layer(scene_id, index)
+        r, c = self.pixels(self.scenes()[scene_id], lat, lon)
+        r, c = np.floor(r).astype(np.int64), np.floor(c).astype(np.int64)
+        inside = (r >= 0) & (c >= 0) & (r < values.shape[0]) & (c < values.shape[1])
+        sampled = np.full(r.shape, np.nan, dtype=np.float32)
+        sampled[inside] = values[r[inside], c[inside]]
+        return sampled
+
+    def find(self, bounds: Tuple[float, float, float, float]) -> Optional[Dict]:
+        """Scene covering most of bounds (min_lon, min_lat, max_lon, max_lat), the latest on ties"""
+        best, best_key = None, None
+        for scene in self.scenes().values():
+            s = scene["bounds"]
+            overlap = max(0.0, min(bounds[2], s[2]) - max(bounds[0], s[0])) \
+                * max(0.0, min(bounds[3], s[3]) - max(bounds[1], s[1]))
+            key = (round(overlap / ((bounds[2] - bounds[0]) * (bounds[3] - bounds[1])), 3), scene["date"])
+            if overlap > 0 and (best_key is None or key > best_key):
+                best, best_key = scene, key
+        return best
+
+    def sample_grid(self, scene_id: str, bounds: Tuple[float, float, float, float], shape: Tuple[int, int],
+                    index: str = "ndvi") -> Dict[str, np.ndarray]:
+        """Per-cell mean index and green fraction over a lat/lon grid
+
+        Each cell averages up to cell_samples x cell_samples pixels spread
+        evenly across it, so the cost depends on the grid, not the scene's
+        resolution. Cells without valid pixels are NaN.
+        """
+        scene = self.scenes()[scene_id]
+        key = (scene_id, os.path.join(self.root, scene["dir"]), tuple(bounds), tuple(shape), index)
+        cached = self._grids.get(key)
+        if cached is not None:
+            return cached
+
+        rows, cols = shape
+        min_lon, min_lat, max_lon, max_lat = bounds
+        cell_deg = min((max_lat - min_lat) / rows, (max_lon - min_lon) / cols)
+        s = int(np.clip(np.ceil(cell_deg / scene["pixel_deg"]), 1, self.settings["cell_samples"]))
+        lat, lon = grid(bounds, (rows * s, cols * s))
+
+        cells = self.sample(scene_id, lat, lon, index).reshape(rows, s, cols, s)
+        valid = np.isfinite(cells)
+        count = valid.sum(axis=(1, 3))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.where(valid, cells, 0).sum(axis=(1, 3)) / count
+            green = (cells >= self.settings["green_ndvi"]).sum(axis=(1, 3)) / count
+        result = {"mean": mean, "green": green, "count": count, "samples": s * s}
+        self._grids[key] = result
+        return result
+
+    def status(self) -> Dict:
+        """Computed scenes"""
+        return {
+            "root": self.root,
+            "scenes": {sid: {k: s[k] for k in ("sensor", "date", "shape", "bounds", "valid_pixels", "mean_ndvi")}
+                       for sid, s in sorted(self.scenes().items())}
+        }
+
+
+# Process-wide instance so every request shares the mapped rasters
+vegetation_rasters = VegetationRasterStore()
+
+
+def get_vegetation_rasters() -> VegetationRasterStore:
+    """Return the shared vegetation raster store"""
+    return vegetation_rasters
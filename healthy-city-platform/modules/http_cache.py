@@ -0,0 +1,24 @@
+"""
+Conditional GET support for deterministic responses
+Serializes a payload once, tags it with a content hash and answers If-None-Match with 304
+"""
+
+import hashlib
+import json
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+
+def etag_json(request: Request, payload, max_age: int = 300) -> Response:
+    """JSON response with a strong ETag; 304 when the client already has this exact body"""
+    try:
+        body = json.dumps(payload, separators=(",", ":")).encode()
+    except TypeError:
+        # datetimes, models etc.; jsonable_encoder is slow on large payloads, so only when needed
+        body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode()
+    etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={max_age}"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
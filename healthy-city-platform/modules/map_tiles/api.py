@@ -0,0 +1,74 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from typing import Dict, Optional
+import asyncio
+import numpy as np
+from modules.weather_air_quality.api import air_quality_service
+from config.nasa_apis import MAP_TILES
+from .pyramid import TILE_SIZE, npy_bytes
+from .services import TileService
+
+router = APIRouter()
+tile_service = TileService(air_quality_service)
+
+async def _current(layer: str) -> Dict:
+    try:
+        return await tile_service.pyramid(layer)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+@router.get("/layers")
+async def get_tile_layers() -> Dict:
+    """Tile layers and their value ranges"""
+    return {"layers": {name: {k: cfg[k] for k in ("source", "variable", "min_zoom", "max_zoom", "range")}
+                       for name, cfg in MAP_TILES["layers"].items()}}
+
+@router.get("/{layer}")
+async def get_tilejson(layer: str, request: Request) -> Dict:
+    """TileJSON for a layer, with tile URLs pinned to the current build"""
+    meta = await _current(layer)
+    cfg = MAP_TILES["layers"][layer]
+    base = str(request.url_for("get_png_tile", layer=layer, z="{z}", x="{x}", y="{y}")).replace("%7B", "{").replace("%7D", "}")
+    return {
+        "tilejson": "2.2.0",
+        "name": layer,
+        "version": meta["version"],
+        "tiles": [f"{base}?v={meta['version']}"],
+        "data": [f"{base[:-4]}.npy?v={meta['version']}"],
+        "minzoom": meta["min_zoom"],
+        "maxzoom": meta["max_zoom"] + MAP_TILES["max_overzoom"],
+        "bounds": meta["bounds"],
+        "built": meta["built"],
+        "legend": {k: cfg[k] for k in ("range", "colors", "breaks") if k in cfg}
+    }
+
+async def _tile(layer: str, z: int, x: int, y: int, fmt: str, request: Request, v: Optional[str]) -> Response:
+    meta = await _current(layer)
+    if z < meta["min_zoom"] or z > meta["max_zoom"] + MAP_TILES["max_overzoom"] or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail=f"Tile {z}/{x}/{y} is outside the {layer} pyramid")
+    # A URL pinned to the current build never changes; anything else must follow rebuilds
+    if v == meta["version"]:
+        cache = f"public, max-age={MAP_TILES['immutable_max_age_s']}, immutable"
+    else:
+        cache = f"public, max-age={MAP_TILES['max_age_s']}"
+    etag = f'"{meta["version"]}"'
+    headers = {"ETag": etag, "Cache-Control": cache}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    if fmt == "png":
+        body = await asyncio.to_thread(tile_service.pyramids.png, layer, z, x, y, MAP_TILES["layers"][layer], meta)
+        return Response(content=body, media_type="image/png", headers=headers)
+    values = await asyncio.to_thread(tile_service.pyramids.tile, layer, z, x, y, meta)
+    if values is None:
+        values = np.full((TILE_SIZE, TILE_SIZE), np.nan, dtype=np.float32)
+    return Response(content=npy_bytes(values), media_type="application/octet-stream", headers=headers)
+
+@router.get("/{layer}/{z}/{x}/{y}.png")
+async def get_png_tile(layer: str, z: int, x: int, y: int, request: Request, v: Optional[str] = None):
+    """Rendered tile; transparent where the layer has no data"""
+    return await _tile(layer, z, x, y, "png", request, v)
+
+@router.get("/{layer}/{z}/{x}/{y}.npy")
+async def get_npy_tile(layer: str, z: int, x: int, y: int, request: Request, v: Optional[str] = None):
+    """Float32 (256, 256) tile values as a .npy file; NaN where the layer has no data"""
+    return await _tile(layer, z, x, y, "npy", request, v)
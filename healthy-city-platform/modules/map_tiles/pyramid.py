@@ -0,0 +1,279 @@
+"""
+XYZ tile pyramids
+Layers rendered once into Web Mercator tiles at their finest zoom, downsampled level by level and memory-mapped from disk
+"""
+
+import io
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from config.nasa_apis import MAP_TILES
+from modules.nasa_data.files import file_identity
+
+TILE_SIZE = 256
+MAX_LAT = 85.0511287798
+
+
+def lonlat_to_pixel(lon, lat, z: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Global Web Mercator pixel coordinates at zoom z"""
+    scale = TILE_SIZE * 2 ** z
+    lat = np.radians(np.clip(np.asarray(lat, dtype=np.float64), -MAX_LAT, MAX_LAT))
+    x = (np.asarray(lon, dtype=np.float64) + 180) / 360 * scale
+    y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2 * scale
+    return x, y
+
+
+def pixel_to_lonlat(x, y, z: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Lon/lat of global Web Mercator pixel coordinates at zoom z"""
+    scale = TILE_SIZE * 2 ** z
+    lon = np.asarray(x, dtype=np.float64) / scale * 360 - 180
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * np.asarray(y, dtype=np.float64) / scale))))
+    return lon, lat
+
+
+def tile_range(bounds, z: int) -> Tuple[int, int, int, int]:
+    """Inclusive tile (x0, y0, x1, y1) covering bounds at zoom z"""
+    x0, y1 = lonlat_to_pixel(bounds[0], bounds[1], z)
+    x1, y0 = lonlat_to_pixel(bounds[2], bounds[3], z)
+    last = 2 ** z - 1
+    return (int(np.clip(x0 // TILE_SIZE, 0, last)), int(np.clip(y0 // TILE_SIZE, 0, last)),
+            int(np.clip(x1 // TILE_SIZE, 0, last)), int(np.clip(y1 // TILE_SIZE, 0, last)))
+
+
+def grid_sampler(bounds, values: np.ndarray):
+    """Nearest-cell sampler for a north-up lat/lon grid covering bounds (min_lon, min_lat, max_lon, max_lat)"""
+    min_lon, min_lat, max_lon, max_lat = bounds
+    rows, cols = values.shape
+
+    def sample(lat, lon) -> np.ndarray:
+        r = np.floor((max_lat - lat) / (max_lat - min_lat) * rows).astype(np.int64)
+        c = np.floor((lon - min_lon) / (max_lon - min_lon) * cols).astype(np.int64)
+        inside = (r >= 0) & (c >= 0) & (r < rows) & (c < cols)
+        out = np.full(r.shape, np.nan, dtype=np.float32)
+        out[inside] = values[r[inside], c[inside]]
+        return out
+    return sample
+
+
+def _keys(x, y) -> np.ndarray:
+    return (np.asarray(x, dtype=np.int64) << 32) | np.asarray(y, dtype=np.int64)
+
+
+def downsample(tiles: np.ndarray) -> np.ndarray:
+    """(n, 256, 256) tiles to (n, 128, 128) by the mean of each 2x2 block's valid pixels"""
+    blocks = tiles.reshape(len(tiles), TILE_SIZE // 2, 2, TILE_SIZE // 2, 2)
+    valid = np.isfinite(blocks)
+    count = valid.sum(axis=(2, 4))
+    with np.errstate(invalid="ignore"):
+        return (np.where(valid, blocks, 0).sum(axis=(2, 4)) / count).astype(np.float32)
+
+
+def palette(style: Dict) -> Tuple[bytes, float, float]:
+    """RGB palette for a style: index 0 is transparent no-data, 1-255 span the style's range"""
+    lo, hi = style["range"]
+    centres = lo + (np.arange(255) + 0.5) / 255 * (hi - lo)
+    colors = np.array([[int(c[i:i + 2], 16) for i in (1, 3, 5)] for c in style["colors"]], dtype=np.float64)
+    if "breaks" in style:
+        rgb = colors[np.searchsorted(style["breaks"], centres, side="left")]
+    else:
+        stops = np.linspace(lo, hi, len(colors))
+        rgb = np.column_stack([np.interp(centres, stops, colors[:, i]) for i in range(3)])
+    return bytes([0, 0, 0]) + np.round(rgb).astype(np.uint8).tobytes(), lo, hi
+
+
+def render_png(values: np.ndarray, style: Tuple[bytes, float, float]) -> bytes:
+    """Palette PNG of a tile; NaN pixels are transparent"""
+    colors, lo, hi = style
+    finite = np.isfinite(values)
+    index = np.zeros(values.shape, dtype=np.uint8)
+    index[finite] = 1 + np.clip((values[finite] - lo) / (hi - lo) * 255, 0, 254).astype(np.uint8)
+    image = Image.frombytes("P", (values.shape[1], values.shape[0]), index.tobytes())
+    image.putpalette(colors)
+    out = io.BytesIO()
+    image.save(out, format="PNG", transparency=0)
+    return out.getvalue()
+
+
+def npy_bytes(values: np.ndarray) -> bytes:
+    out = io.BytesIO()
+    np.save(out, np.ascontiguousarray(values, dtype=np.float32))
+    return out.getvalue()
+
+
+class TilePyramidStore:
+    """Built pyramids by layer
+
+    Layout: {root}/{layer}/index.json names the current build and
+    {root}/{layer}/<build>/z{z}.npy holds that zoom's non-empty tiles as one
+    (K, 256, 256) float32 array, with z{z}.keys.npy the sorted (x << 32 | y)
+    key of each. Only tiles touching a source are stored, so a tile lookup
+    is a binary search plus a memory-mapped slice. Zooms past max_zoom are
+    cut from the max_zoom tile and upsampled.
+    """
+
+    def __init__(self, root: str = MAP_TILES["root"], settings: Optional[Dict] = None):
+        self.root = root
+        self.settings = {**MAP_TILES, **(settings or {})}
+        self._lock = threading.Lock()
+        self._builds: Dict[str, Tuple[tuple, Dict]] = {}
+        self._levels: Dict[Tuple[str, int], Tuple[np.ndarray, np.ndarray]] = {}
+        self._png: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._palettes: Dict[str, Tuple[bytes, float, float]] = {}
+
+    def _index_path(self, layer: str) -> str:
+        return os.path.join(self.root, layer, "index.json")
+
+    def current(self, layer: str) -> Optional[Dict]:
+        """Metadata of the layer's current build, re-read when another process has rebuilt it"""
+        try:
+            identity = file_identity(self._index_path(layer))
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            cached = self._builds.get(layer)
+            if cached is None or cached[0] != identity:
+                with open(self._index_path(layer)) as f:
+                    cached = (identity, json.load(f))
+                self._builds[layer] = cached
+                self._levels = {k: v for k, v in self._levels.items()
+                                if not k[0].startswith(os.path.join(self.root, layer) + os.sep)}
+            return cached[1]
+
+    def build(self, layer: str, version: str, sources: List[Dict], min_zoom: int, max_zoom: int) -> Dict:
+        """Render the sources into a new build of the layer and make it current
+
+        Each source has "bounds" (min_lon, min_lat, max_lon, max_lat) and a
+        "sample" callable giving its values at lat/lon arrays, NaN where it
+        has none; later sources are drawn over earlier ones where they have
+        data. The finest level is rendered one tile row of a source at a time
+        and each coarser level is averaged from the one below, so memory stays
+        at a few rows of tiles whatever the layer's extent.
+        """
+        start = time.perf_counter()
+        build_dir = os.path.join(self.root, layer, f"{version}.{time.time_ns()}")
+        os.makedirs(build_dir)
+        ranges = [tile_range(s["bounds"], max_zoom) for s in sources]
+        keys = np.unique(np.concatenate([np.zeros(0, dtype=np.int64)] + [
+            _keys(*np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))).ravel() for x0, y0, x1, y1 in ranges]))
+        tiles = self._allocate(build_dir, max_zoom, keys)
+
+        offsets = np.arange(TILE_SIZE) + 0.5
+        for source, (x0, y0, x1, y1) in zip(sources, ranges):
+            lon, _ = pixel_to_lonlat((np.arange(x0, x1 + 1)[:, None] * TILE_SIZE + offsets).ravel(), 0, max_zoom)
+            for ty in range(y0, y1 + 1):
+                _, lat = pixel_to_lonlat(0, ty * TILE_SIZE + offsets, max_zoom)
+                values = source["sample"](*np.meshgrid(lat, lon, indexing="ij"))
+                row = values.reshape(TILE_SIZE, x1 - x0 + 1, TILE_SIZE).transpose(1, 0, 2)
+                slots = np.searchsorted(keys, _keys(np.arange(x0, x1 + 1), ty))
+                tiles[slots] = np.where(np.isfinite(row), row, tiles[slots])
+        tiles.flush()
+        levels = {max_zoom: len(keys)}
+
+        for z in range(max_zoom - 1, min_zoom - 1, -1):
+            child_keys, children = keys, tiles
+            x, y = child_keys >> 32, child_keys & 0xFFFFFFFF
+            keys, parent_of = np.unique(_keys(x >> 1, y >> 1), return_inverse=True)
+            tiles = self._allocate(build_dir, z, keys)
+            half = TILE_SIZE // 2
+            for i in range(0, len(child_keys), 64):
+                for j, small in enumerate(downsample(np.asarray(children[i:i + 64])), start=i):
+                    r, c = (y[j] & 1) * half, (x[j] & 1) * half
+                    tiles[parent_of[j], r:r + half, c:c + half] = small
+            tiles.flush()
+            levels[z] = len(keys)
+        del tiles
+
+        meta = {"layer": layer, "version": version, "dir": os.path.basename(build_dir),
+                "min_zoom": min_zoom, "max_zoom": max_zoom, "levels": levels,
+                "bounds": [min(s["bounds"][0] for s in sources), min(s["bounds"][1] for s in sources),
+                           max(s["bounds"][2] for s in sources), max(s["bounds"][3] for s in sources)]
+                if sources else None,
+                "sources": [s.get("id") for s in sources],
+                "built": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "seconds": round(time.perf_counter() - start, 2)}
+        try:
+            with open(self._index_path(layer)) as f:
+                previous = json.load(f)["dir"]
+        except (FileNotFoundError, ValueError, KeyError):
+            previous = None
+        with open(self._index_path(layer) + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(self._index_path(layer) + ".tmp", self._index_path(layer))
+        # The build just replaced stays until the next rebuild: a request that read its meta
+        # may still open one of its levels for the first time
+        for name in os.listdir(os.path.join(self.root, layer)):
+            if name not in (meta["dir"], previous) and os.path.isdir(os.path.join(self.root, layer, name)):
+                shutil.rmtree(os.path.join(self.root, layer, name), ignore_errors=True)
+        return meta
+
+    @staticmethod
+    def _allocate(build_dir: str, z: int, keys: np.ndarray) -> np.ndarray:
+        np.save(os.path.join(build_dir, f"z{z}.keys.npy"), keys)
+        tiles = np.lib.format.open_memmap(os.path.join(build_dir, f"z{z}.npy"), mode="w+", dtype=np.float32,
+                                          shape=(len(keys), TILE_SIZE, TILE_SIZE))
+        tiles[:] = np.nan
+        return tiles
+
+    def _level(self, layer: str, meta: Dict, z: int) -> Tuple[np.ndarray, np.ndarray]:
+        path = os.path.join(self.root, layer, meta["dir"], f"z{z}")
+        level = self._levels.get((path, z))
+        if level is None:
+            level = (np.load(path + ".keys.npy"), np.load(path + ".npy", mmap_mode="r").view(np.ndarray))
+            self._levels[(path, z)] = level
+        return level
+
+    def tile(self, layer: str, z: int, x: int, y: int, meta: Optional[Dict] = None) -> Optional[np.ndarray]:
+        """(256, 256) float32 values of one tile, NaN where there is no data; None outside the pyramid"""
+        meta = meta or self.current(layer)
+        if meta is None or z < meta["min_zoom"] or z > meta["max_zoom"] + self.settings["max_overzoom"] \
+                or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            return None
+        depth = max(0, z - meta["max_zoom"])
+        keys, tiles = self._level(layer, meta, z - depth)
+        key = int(_keys(x >> depth, y >> depth))
+        slot = int(np.searchsorted(keys, key))
+        if slot == len(keys) or keys[slot] != key:
+            return None
+        if not depth:
+            return tiles[slot]
+        size = TILE_SIZE >> depth
+        r, c = (y - ((y >> depth) << depth)) * size, (x - ((x >> depth) << depth)) * size
+        return np.repeat(np.repeat(tiles[slot, r:r + size, c:c + size], 1 << depth, axis=0), 1 << depth, axis=1)
+
+    def png(self, layer: str, z: int, x: int, y: int, style: Dict, meta: Optional[Dict] = None) -> bytes:
+        """Encoded PNG of one tile, a transparent tile where there is no data"""
+        meta = meta or self.current(layer)
+        key = (layer, meta["dir"] if meta else None, z, x, y)
+        with self._lock:
+            body = self._png.get(key)
+            if body is not None:
+                self._png.move_to_end(key)
+                return body
+        colors = self._palettes.get(layer)
+        if colors is None:
+            colors = self._palettes[layer] = palette(style)
+        values = self.tile(layer, z, x, y, meta)
+        body = render_png(values if values is not None else np.full((TILE_SIZE, TILE_SIZE), np.nan, np.float32),
+                          colors)
+        with self._lock:
+            self._png[key] = body
+            while len(self._png) > self.settings["png_cache_tiles"]:
+                self._png.popitem(last=False)
+        return body
+
+
+# Process-wide instance so every request shares the mapped levels and encoded tiles
+tile_pyramids = TilePyramidStore()
+
+
+def get_tile_pyramids() -> TilePyramidStore:
+    """Return the shared tile pyramid store"""
+    return tile_pyramids
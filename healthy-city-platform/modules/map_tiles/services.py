@@ -0,0 +1,78 @@
+import asyncio
+import hashlib
+import json
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional
+from config.nasa_apis import MAP_TILES, POLLUTION_MAP
+from modules.green_vegetation.vegetation_rasters import VegetationRasterStore, get_vegetation_rasters
+from modules.nasa_data.singleflight import SingleFlight
+from modules.weather_air_quality.services import AirQualityService
+from .pyramid import TilePyramidStore, get_tile_pyramids, grid_sampler
+
+class TileService:
+    """Keeps each layer's pyramid in step with its data: vegetation scenes or the hour's pollution grids"""
+
+    def __init__(self, air_quality: AirQualityService, rasters: Optional[VegetationRasterStore] = None,
+                 pyramids: Optional[TilePyramidStore] = None):
+        self.air_quality = air_quality
+        self.rasters = rasters or get_vegetation_rasters()
+        self.pyramids = pyramids or get_tile_pyramids()
+        self._flights = SingleFlight()
+        self._surfaces: Dict[tuple, Dict[str, Dict]] = {}
+
+    @staticmethod
+    def layer_config(layer: str) -> Dict:
+        if layer not in MAP_TILES["layers"]:
+            raise KeyError(f"Unknown tile layer '{layer}' (expected one of {', '.join(MAP_TILES['layers'])})")
+        return MAP_TILES["layers"][layer]
+
+    def _data_key(self, layer: str) -> Dict:
+        """What the layer is built from; a new key means a new build"""
+        cfg = self.layer_config(layer)
+        if cfg["source"] == "vegetation":
+            data = sorted([sid, scene["dir"]] for sid, scene in self.rasters.scenes().items())
+        else:
+            data = {"hour": datetime.utcnow().strftime("%Y-%m-%dT%H:00:00"),
+                    "grid_size": MAP_TILES["pollution_grid_size"], "cities": sorted(POLLUTION_MAP["cities"])}
+        return {"zoom": [cfg["min_zoom"], cfg["max_zoom"]], "data": data}
+
+    async def pyramid(self, layer: str) -> Dict:
+        """Current build of a layer, rebuilding it first when its data has changed"""
+        key = self._data_key(layer)
+        version = hashlib.blake2b(json.dumps(key, sort_keys=True).encode(), digest_size=6).hexdigest()
+        meta = self.pyramids.current(layer)
+        if meta is not None and meta["version"] == version:
+            return meta
+        return await self._flights.do((layer, version), lambda: asyncio.to_thread(self._build, layer, version, key))
+
+    def _build(self, layer: str, version: str, key: Dict) -> Dict:
+        meta = self.pyramids.current(layer)
+        if meta is not None and meta["version"] == version:
+            return meta  # another worker process built it first
+        cfg = self.layer_config(layer)
+        if cfg["source"] == "vegetation":
+            sources = self._vegetation_sources(cfg["variable"])
+        else:
+            sources = self._pollution_sources(cfg["variable"], datetime.fromisoformat(key["data"]["hour"]))
+        if not sources:
+            raise KeyError(f"No data for tile layer '{layer}' yet")
+        return self.pyramids.build(layer, version, sources, cfg["min_zoom"], cfg["max_zoom"])
+
+    def _vegetation_sources(self, index: str) -> List[Dict]:
+        """One source per computed scene, oldest first so newer scenes are drawn on top"""
+        scenes = sorted(self.rasters.scenes().values(), key=lambda s: s["date"])
+        return [{"id": scene["scene"], "bounds": scene["bounds"],
+                 "sample": lambda lat, lon, sid=scene["scene"]: self.rasters.sample(sid, lat, lon, index)}
+                for scene in scenes]
+
+    def _pollution_sources(self, variable: str, hour: datetime) -> List[Dict]:
+        """One source per city grid; the AQI, NO2 and PM2.5 layers share the hour's surfaces"""
+        size = MAP_TILES["pollution_grid_size"]
+        surfaces = self._surfaces.get((hour, size))
+        if surfaces is None:
+            surfaces = {city: self.air_quality.pollution_surface(city, size, hour)
+                        for city in POLLUTION_MAP["cities"]}
+            self._surfaces = {(hour, size): surfaces}
+        return [{"id": city, "bounds": s["bounds"], "sample": grid_sampler(s["bounds"], s[variable].astype(np.float32))}
+                for city, s in surfaces.items()]
@@ -0,0 +1,644 @@
+"""
+Chunked on-disk store for gridded NASA data cubes
+Ingests NetCDF/HDF5 granules into compressed (time, row, col) chunks per product, variable and day; reads touch only the chunks they need
+
+    python -m modules.nasa_data.cube_store GRACE /data/grace/GRCTellus.JPL.200204_202401.GLO.RL06.3M.MSCNv04CRI.nc
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import h5py
+import numpy as np
+
+from config.nasa_apis import CUBE_STORE
+from .files import file_identity
+from .simulation import DayLike, as_day
+
+# min_lon, min_lat, max_lon, max_lat
+Bounds = Tuple[float, float, float, float]
+
+# CF time units -> days
+CF_UNITS = {"seconds": 1 / 86400, "minutes": 1 / 1440, "hours": 1 / 24, "days": 1.0}
+
+FILL_ATTRS = ["_FillValue", "missing_value", "MissingValue"]
+SCALE_ATTRS = ["scale_factor", "ScaleFactor"]
+OFFSET_ATTRS = ["add_offset", "Offset"]
+
+
+def _attr(dataset, names: Sequence[str]):
+    for name in names:
+        if name in dataset.attrs:
+            value = dataset.attrs[name]
+            value = np.asarray(value).ravel()[0] if np.ndim(value) else value
+            return value.decode() if isinstance(value, bytes) else value
+    return None
+
+
+def read_variable(dataset) -> np.ndarray:
+    """Dataset values as float32 with fill/missing values as NaN and CF scale/offset applied"""
+    raw = dataset[()]
+    values = raw.astype(np.float32)
+    for name in FILL_ATTRS:
+        if name in dataset.attrs:
+            values[raw == np.asarray(dataset.attrs[name]).ravel()[0]] = np.nan
+    if "valid_min" in dataset.attrs:
+        values[raw < dataset.attrs["valid_min"]] = np.nan
+    if "valid_max" in dataset.attrs:
+        values[raw > dataset.attrs["valid_max"]] = np.nan
+    scale, offset = _attr(dataset, SCALE_ATTRS), _attr(dataset, OFFSET_ATTRS)
+    if scale is not None:
+        values *= np.float32(scale)
+    if offset is not None:
+        values += np.float32(offset)
+    return values
+
+
+def cf_days(dataset) -> List[date]:
+    """Days of a CF time coordinate ("<unit> since <date>[ <time>]")"""
+    units = _attr(dataset, ["units"]) or ""
+    match = re.match(r"\s*(\w+) since (\d{4}-\d{1,2}-\d{1,2})", units)
+    if not match or match.group(1) not in CF_UNITS:
+        raise ValueError(f"unsupported time units '{units}'")
+    epoch = datetime.strptime(match.group(2), "%Y-%m-%d").date()
+    offsets = np.floor(np.atleast_1d(dataset[()]).astype(np.float64) * CF_UNITS[match.group(1)])
+    return [epoch + timedelta(days=int(d)) for d in offsets]
+
+
+class ChunkCache:
+    """LRU of decompressed chunks and open block maps shared by every cube"""
+
+    def __init__(self, max_bytes: int, max_blocks: int):
+        self.max_bytes = max_bytes
+        self.max_blocks = max_blocks
+        self._lock = threading.Lock()
+        self._chunks: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._blocks: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def chunk(self, key: tuple) -> Optional[np.ndarray]:
+        with self._lock:
+            value = self._chunks.get(key)
+            if value is not None:
+                self._chunks.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return value
+
+    def put_chunk(self, key: tuple, value: np.ndarray):
+        with self._lock:
+            if key in self._chunks:
+                return
+            self._chunks[key] = value
+            self.bytes += value.nbytes
+            while self.bytes > self.max_bytes and self._chunks:
+                self.bytes -= self._chunks.popitem(last=False)[1].nbytes
+
+    def block(self, key: tuple, open_block) -> tuple:
+        with self._lock:
+            value = self._blocks.get(key)
+            if value is not None:
+                self._blocks.move_to_end(key)
+                return value
+        value = open_block()
+        with self._lock:
+            self._blocks[key] = value
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+        return value
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"chunks": len(self._chunks), "bytes": self.bytes, "open_blocks": len(self._blocks),
+                    "hits": self.hits, "misses": self.misses}
+
+
+class GriddedCube:
+    """One (product, variable) cube on a regular lat/lon grid
+
+    Layout: {root}/manifest.json and {root}/block-000000.bin ... Time steps get
+    slots in the order they are first written; each block holds chunk[0]
+    consecutive slots. A block file starts with an int64 (offset, length)
+    index over its spatial chunks, followed by the zlib-compressed float32
+    chunks; all-missing chunks are not stored. Blocks are replaced atomically
+    and memory-mapped on read, so a read costs one decompression per chunk
+    it touches (or a view into the map when stored uncompressed).
+    """
+
+    def __init__(self, root: str, cache: ChunkCache, grid: Optional[Sequence[float]] = None,
+                 chunk: Optional[Sequence[int]] = None, compression_level: int = 4):
+        self.root = root
+        self.cache = cache
+        self._lock = threading.RLock()
+        self._manifest_id: Optional[tuple] = None
+        self._times = np.empty(0, dtype="datetime64[D]")
+        self._order = np.empty(0, dtype=np.int64)
+        self.manifest: Dict = {}
+        if not self.load() and grid is not None:
+            min_lon, min_lat, max_lon, max_lat, cell = grid
+            self.manifest = {
+                "grid": list(grid),
+                "shape": [int(round((max_lat - min_lat) / cell)), int(round((max_lon - min_lon) / cell))],
+                "chunk": list(chunk or CUBE_STORE["chunk"]),
+                "compression_level": compression_level,
+                "times": []
+            }
+
+    @property
+    def _manifest_path(self) -> str:
+        return os.path.join(self.root, "manifest.json")
+
+    def load(self) -> bool:
+        """(Re)load the manifest if it changed on disk; False when the cube does not exist"""
+        try:
+            identity = file_identity(self._manifest_path)
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            if identity != self._manifest_id:
+                with open(self._manifest_path) as f:
+                    self.manifest = json.load(f)
+                self._index_times()
+                self._manifest_id = identity
+        return True
+
+    def _index_times(self):
+        self._times = np.array(self.manifest["times"], dtype="datetime64[D]")
+        self._order = np.argsort(self._times, kind="stable")
+
+    def _save_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self._manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp, self._manifest_path)
+        self._manifest_id = file_identity(self._manifest_path)
+        self._index_times()
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return tuple(self.manifest["shape"])
+
+    @property
+    def chunk_shape(self) -> Tuple[int, int, int]:
+        return tuple(self.manifest["chunk"])
+
+    def _chunk_grid(self) -> Tuple[int, int]:
+        _, cy, cx = self.chunk_shape
+        rows, cols = self.shape
+        return -(-rows // cy), -(-cols // cx)
+
+    def times(self) -> np.ndarray:
+        """Stored days in time order"""
+        self.load()
+        return self._times[self._order]
+
+    # --- coordinates ---
+
+    def cell(self, lat, lon) -> Tuple[np.ndarray, np.ndarray]:
+        """Row (from the south) and column of the cells containing lat/lon; -1 outside the grid"""
+        min_lon, min_lat, _, _, size = self.manifest["grid"]
+        rows, cols = self.shape
+        with np.errstate(invalid="ignore"):
+            row = np.floor((np.asarray(lat, dtype=np.float64) - min_lat) / size).astype(np.int64)
+            col = np.floor((np.mod(np.asarray(lon, dtype=np.float64) - min_lon, 360.0)) / size).astype(np.int64)
+        outside = (row < 0) | (row >= rows) | (col < 0) | (col >= cols)
+        return np.where(outside, -1, row), np.where(outside, -1, col)
+
+    def centres(self, rows: np.ndarray, cols: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        min_lon, min_lat, _, _, size = self.manifest["grid"]
+        return min_lat + (np.asarray(rows) + 0.5) * size, min_lon + (np.asarray(cols) + 0.5) * size
+
+    def window(self, bounds: Bounds) -> Tuple[np.ndarray, np.ndarray]:
+        """Row and column indices of the cells whose centres fall in bounds; min_lon > max_lon crosses the antimeridian"""
+        min_lon, min_lat, max_lon, max_lat = bounds
+        g_lon, g_lat, _, _, size = self.manifest["grid"]
+        rows, cols = self.shape
+        r0 = max(0, int(np.ceil((min_lat - g_lat) / size - 0.5)))
+        r1 = min(rows, int(np.floor((max_lat - g_lat) / size - 0.5)) + 1)
+        lons = self.centres(np.zeros(cols, dtype=np.int64), np.arange(cols))[1]
+        inside = (lons >= min_lon) & (lons <= max_lon) if min_lon <= max_lon else (lons >= min_lon) | (lons <= max_lon)
+        col_idx = np.flatnonzero(inside)
+        if min_lon > max_lon:
+            col_idx = np.concatenate([col_idx[lons[col_idx] >= min_lon], col_idx[lons[col_idx] <= max_lon]])
+        return np.arange(r0, max(r0, r1)), col_idx
+
+    def slots(self, start: DayLike = None, end: DayLike = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Days in [start, end] (inclusive, open-ended when None) and their slots, in time order"""
+        self.load()
+        times, order = self._times[self._order], self._order
+        lo = 0 if start is None else np.searchsorted(times, np.datetime64(as_day(start), "D"), side="left")
+        hi = len(times) if end is None else np.searchsorted(times, np.datetime64(as_day(end), "D"), side="right")
+        return times[lo:hi], order[lo:hi]
+
+    def slot_at(self, day: DayLike = None) -> Tuple[Optional[np.datetime64], Optional[int]]:
+        """Latest stored day at or before day (the latest overall when day is None) and its slot"""
+        times, slots = self.slots(end=day)
+        if not len(times):
+            return None, None
+        return times[-1], int(slots[-1])
+
+    # --- chunk I/O ---
+
+    def _block_path(self, block: int) -> str:
+        return os.path.join(self.root, f"block-{block:06d}.bin")
+
+    def _open_block(self, block: int) -> Optional[Tuple[tuple, np.memmap, np.ndarray]]:
+        """(file identity, memory map, chunk index) of a block, or None if it has not been written"""
+        path = self._block_path(block)
+        try:
+            key = (path,) + file_identity(path)
+        except FileNotFoundError:
+            return None
+
+        def open_block():
+            data = np.memmap(path, dtype=np.uint8, mode="r")
+            n_cy, n_cx = self._chunk_grid()
+            index = np.frombuffer(data[:16 * n_cy * n_cx], dtype="<i8").reshape(n_cy, n_cx, 2)
+            return key, data, index
+
+        return self.cache.block(key, open_block)
+
+    def _payload(self, opened, cy: int, cx: int) -> Optional[np.memmap]:
+        offset, length = opened[2][cy, cx]
+        return opened[1][offset:offset + length] if length else None
+
+    def _chunk(self, block: int, cy: int, cx: int) -> Optional[np.ndarray]:
+        """Chunk (ct, cy, cx) float32, or None when it holds no data"""
+        opened = self._open_block(block)
+        payload = None if opened is None else self._payload(opened, cy, cx)
+        if payload is None:
+            return None
+        key = opened[0] + (cy, cx)
+        cached = self.cache.chunk(key)
+        if cached is not None:
+            return cached
+        if self.manifest["compression_level"] == 0:
+            return np.frombuffer(payload, dtype="<f4").reshape(self.chunk_shape)
+        chunk = np.frombuffer(zlib.decompress(payload), dtype="<f4").reshape(self.chunk_shape)
+        self.cache.put_chunk(key, chunk)
+        return chunk
+
+    def read(self, rows: np.ndarray, cols: np.ndarray, slots: np.ndarray) -> np.ndarray:
+        """Values (len(slots), len(rows), len(cols)) for any row/column/slot indices; NaN where missing"""
+        ct, cy, cx = self.chunk_shape
+        slots, rows, cols = (np.asarray(a, dtype=np.int64) for a in (slots, rows, cols))
+        out = np.full((len(slots), len(rows), len(cols)), np.nan, dtype=np.float32)
+        blocks, chunk_rows, chunk_cols = slots // ct, rows // cy, cols // cx
+        for block in np.unique(blocks):
+            t_out = np.flatnonzero(blocks == block)
+            t_in = slots[t_out] % ct
+            for ry in np.unique(chunk_rows):
+                r_out = np.flatnonzero(chunk_rows == ry)
+                for rx in np.unique(chunk_cols):
+                    chunk = self._chunk(int(block), int(ry), int(rx))
+                    if chunk is None:
+                        continue
+                    c_out = np.flatnonzero(chunk_cols == rx)
+                    out[np.ix_(t_out, r_out, c_out)] = chunk[np.ix_(t_in, rows[r_out] % cy, cols[c_out] % cx)]
+        return out
+
+    def sample(self, rows: np.ndarray, cols: np.ndarray, slots: np.ndarray) -> np.ndarray:
+        """Values (len(slots), N) at N (row, col) cells; -1 cells and missing data are NaN"""
+        ct, cy, cx = self.chunk_shape
+        slots, rows, cols = (np.asarray(a, dtype=np.int64) for a in (slots, rows, cols))
+        out = np.full((len(slots), len(rows)), np.nan, dtype=np.float32)
+        _, n_cx = self._chunk_grid()
+        valid = np.flatnonzero(rows >= 0)
+        chunk_ids = (rows[valid] // cy) * n_cx + cols[valid] // cx
+        blocks = slots // ct
+        for chunk_id in np.unique(chunk_ids):
+            points = valid[chunk_ids == chunk_id]
+            for block in np.unique(blocks):
+                chunk = self._chunk(int(block), int(chunk_id // n_cx), int(chunk_id % n_cx))
+                if chunk is None:
+                    continue
+                t_out = np.flatnonzero(blocks == block)
+                out[np.ix_(t_out, points)] = chunk[(slots[t_out] % ct)[:, None], rows[points] % cy, cols[points] % cx]
+        return out
+
+    def write(self, days: Sequence[DayLike], values: np.ndarray, origin: Tuple[int, int] = (0, 0)):
+        """Store values (len(days), h, w) at the cells from origin (row, col), replacing days already stored
+
+        Chunks outside the window keep their stored bytes; chunks inside it keep
+        their other time steps.
+        """
+        values = np.asarray(values, dtype=np.float32)
+        r_off, c_off = origin
+        height, width = values.shape[1:]
+        if len(values) != len(days) or r_off < 0 or c_off < 0 or r_off + height > self.shape[0] \
+                or c_off + width > self.shape[1]:
+            raise ValueError(f"{values.shape} at {origin} does not fit {len(days)} days of the {self.shape} grid")
+        ct, cy, cx = self.chunk_shape
+        n_cy, n_cx = self._chunk_grid()
+        level = self.manifest["compression_level"]
+        with self._lock:
+            self.load()
+            times = self.manifest["times"]
+            position = {day: i for i, day in enumerate(times)}
+            slots = []
+            for day in days:
+                key = as_day(day).isoformat()
+                if key not in position:
+                    position[key] = len(times)
+                    times.append(key)
+                slots.append(position[key])
+            slots = np.array(slots)
+
+            os.makedirs(self.root, exist_ok=True)
+            for block in np.unique(slots // ct):
+                t_src = np.flatnonzero(slots // ct == block)
+                t_dst = slots[t_src] % ct
+                opened = self._open_block(int(block))
+                index = np.zeros((n_cy, n_cx, 2), dtype="<i8")
+                payloads, offset = [], 16 * n_cy * n_cx
+                for ry in range(n_cy):
+                    for rx in range(n_cx):
+                        r0, r1 = max(ry * cy, r_off), min((ry + 1) * cy, r_off + height)
+                        c0, c1 = max(rx * cx, c_off), min((rx + 1) * cx, c_off + width)
+                        if r0 >= r1 or c0 >= c1:
+                            payload = None if opened is None else self._payload(opened, ry, rx)
+                            payload = None if payload is None else payload.tobytes()
+                        else:
+                            chunk = self._chunk(int(block), ry, rx)
+                            chunk = np.full((ct, cy, cx), np.nan, dtype="<f4") if chunk is None else chunk.copy()
+                            chunk[np.ix_(t_dst, np.arange(r0, r1) - ry * cy, np.arange(c0, c1) - rx * cx)] = \
+                                values[t_src, r0 - r_off:r1 - r_off, c0 - c_off:c1 - c_off]
+                            payload = None
+                            if not np.isnan(chunk).all():
+                                payload = chunk.tobytes() if level == 0 else zlib.compress(chunk.tobytes(), level)
+                        if payload:
+                            index[ry, rx] = offset, len(payload)
+                            payloads.append(payload)
+                            offset += len(payload)
+                path = self._block_path(int(block))
+                with open(path + ".tmp", "wb") as f:
+                    f.write(index.tobytes())
+                    for payload in payloads:
+                        f.write(payload)
+                os.replace(path + ".tmp", path)
+            self._save_manifest()
+
+    def version(self) -> Optional[tuple]:
+        """Identity of the manifest on disk; changes with every write"""
+        try:
+            return file_identity(self._manifest_path)
+        except FileNotFoundError:
+            return None
+
+    def info(self) -> Dict:
+        self.load()
+        times = self.times()
+        blocks = [n for n in os.listdir(self.root) if n.endswith(".bin")] if os.path.isdir(self.root) else []
+        return {
+            "grid": self.manifest["grid"],
+            "shape": self.manifest["shape"],
+            "chunk": self.manifest["chunk"],
+            "days": len(times),
+            "first_day": str(times[0]) if len(times) else None,
+            "last_day": str(times[-1]) if len(times) else None,
+            "bytes_on_disk": sum(os.path.getsize(os.path.join(self.root, n)) for n in blocks)
+        }
+
+
+class CubeStore:
+    """Gridded cubes for the products in CUBE_STORE, one directory per product and variable"""
+
+    def __init__(self, root: str = CUBE_STORE["root"], settings: Optional[Dict] = None):
+        self.root = root
+        self.settings = {**CUBE_STORE, **(settings or {})}
+        self.cache = ChunkCache(int(self.settings["cache_mb"] * 2 ** 20), self.settings["open_blocks"])
+        self._lock = threading.Lock()
+        self._cubes: Dict[Tuple[str, str], GriddedCube] = {}
+        self._last_cells: Optional[tuple] = None
+
+    def _product(self, product: str) -> Dict:
+        if product not in self.settings["products"]:
+            raise KeyError(f"unknown product '{product}'")
+        return self.settings["products"][product]
+
+    def cube(self, product: str, variable: str, create: bool = False) -> Optional[GriddedCube]:
+        """The cube for product/variable; None if nothing has been ingested (unless create)"""
+        key = (product, variable)
+        with self._lock:
+            cube = self._cubes.get(key)
+        if cube is not None:
+            return cube
+        root = os.path.join(self.root, product, variable)
+        if not create and not os.path.exists(os.path.join(root, "manifest.json")):
+            return None
+        spec = self._product(product)
+        cube = GriddedCube(root, self.cache, spec["grid"], spec.get("chunk", self.settings["chunk"]),
+                           self.settings["compression_level"])
+        with self._lock:
+            return self._cubes.setdefault(key, cube)
+
+    def products(self) -> Dict[str, Dict[str, Dict]]:
+        """Stored product -> variable -> cube info"""
+        stored = {}
+        for product, spec in self.settings["products"].items():
+            for variable in spec["variables"]:
+                cube = self.cube(product, variable)
+                if cube is not None:
+                    stored.setdefault(product, {})[variable] = cube.info()
+        return stored
+
+    # --- reads ---
+
+    def point(self, product: str, variable: str, lat, lon, start: DayLike = None,
+              end: DayLike = None) -> Optional[Dict]:
+        """Time series at one point, or (T, N) for arrays of points, over [start, end]"""
+        cube = self.cube(product, variable)
+        if cube is None:
+            return None
+        times, slots = cube.slots(start, end)
+        rows, cols = cube.cell(np.atleast_1d(lat), np.atleast_1d(lon))
+        values = cube.sample(rows, cols, slots)
+        return {"times": times, "values": values[:, 0] if np.ndim(lat) == 0 else values}
+
+    def bbox(self, product: str, variable: str, bounds: Bounds, day: DayLike = None) -> Optional[Dict]:
+        """Grid over bounds for the latest stored day at or before day; rows run north to south"""
+        cube = self.cube(product, variable)
+        if cube is None:
+            return None
+        found, slot = cube.slot_at(day)
+        if slot is None:
+            return None
+        rows, cols = cube.window(bounds)
+        lat, lon = cube.centres(rows, cols)
+        return {"time": found, "lat": lat[::-1], "lon": lon, "values": cube.read(rows, cols, [slot])[0, ::-1]}
+
+    def time_slice(self, product: str, variable: str, start: DayLike = None, end: DayLike = None,
+                   bounds: Optional[Bounds] = None) -> Optional[Dict]:
+        """(T, rows, cols) over [start, end] and bounds (the whole grid when None); rows run north to south"""
+        cube = self.cube(product, variable)
+        if cube is None:
+            return None
+        times, slots = cube.slots(start, end)
+        if bounds is None:
+            rows, cols = np.arange(cube.shape[0]), np.arange(cube.shape[1])
+        else:
+            rows, cols = cube.window(bounds)
+        lat, lon = cube.centres(rows, cols)
+        return {"times": times, "lat": lat[::-1], "lon": lon, "values": cube.read(rows, cols, slots)[:, ::-1]}
+
+    # --- ingest ---
+
+    def ingest(self, product: str, paths: Sequence[str]) -> Dict:
+        """Bin NetCDF/HDF5 granules onto the product grid and store every configured variable
+
+        Granules are buffered and written up to a block of days at a time, so
+        each chunk is recompressed once per block instead of once per granule.
+        """
+        spec = self._product(product)
+        paths = [paths] if isinstance(paths, str) else list(paths)
+        block_days = spec.get("chunk", self.settings["chunk"])[0]
+        limit = self.settings["ingest_batch_mb"] * 2 ** 20
+        # (variable, origin, window shape) -> (days, layers)
+        pending: Dict[tuple, Tuple[List[date], List[np.ndarray]]] = {}
+        stored: Dict[str, set] = {}
+
+        def flush():
+            for (variable, origin, _), (days, layers) in pending.items():
+                self.cube(product, variable, create=True).write(days, np.concatenate(layers), origin)
+                stored.setdefault(variable, set()).update(days)
+            pending.clear()
+
+        for path in paths:
+            for variable, days, values, origin in self._read_granule(product, spec, path):
+                days_, layers = pending.setdefault((variable, origin, values.shape[1:]), ([], []))
+                days_ += days
+                layers.append(values)
+            # A granule without any configured variable can leave nothing buffered
+            buffered = [(len(days), sum(layer.nbytes for layer in layers)) for days, layers in pending.values()]
+            if buffered and (max(n for n, _ in buffered) >= block_days or sum(b for _, b in buffered) >= limit):
+                flush()
+        flush()
+        if not stored:
+            raise ValueError(f"no configured {product} variables in {', '.join(paths)}")
+        all_days = sorted({d for days in stored.values() for d in days})
+        return {"product": product, "files": len(paths),
+                "variables": {variable: len(days) for variable, days in stored.items()},
+                "first_day": all_days[0].isoformat(), "last_day": all_days[-1].isoformat()}
+
+    def _read_granule(self, product: str, spec: Dict, path: str) -> List[tuple]:
+        """(variable, days, values on the grid window, window origin) for each configured variable in a granule"""
+        out = []
+        with h5py.File(path, "r") as f:
+            if "time" in spec:
+                days = cf_days(f[spec["time"]])
+            else:
+                match = re.search(spec["time_pattern"], os.path.basename(path))
+                if not match:
+                    raise ValueError(f"no date in '{os.path.basename(path)}' matching {spec['time_pattern']}")
+                days = [date(int(match["year"]), int(match["month"]), int(match["day"]))]
+            target = None
+            for variable, name in spec["variables"].items():
+                if name not in f:
+                    continue
+                cube = self.cube(product, variable, create=True)
+                values = self._as_tyx(read_variable(f[name]), spec.get("dims", "tyx"), len(days))
+                if "lat" not in spec:
+                    if values.shape[1:] != cube.shape:
+                        raise ValueError(f"granule grid {values.shape[1:]} does not match the product grid {cube.shape}")
+                    out.append((variable, days, values, (0, 0)))
+                    continue
+                if target is None:
+                    target, origin, window = self._granule_cells(product, cube, f[spec["lat"]][()],
+                                                                 f[spec["lon"]][()], values.shape[1:])
+                out.append((variable, days, self._regrid(values, target, window), origin))
+        return out
+
+    @staticmethod
+    def _as_tyx(values: np.ndarray, dims: str, n_days: int) -> np.ndarray:
+        """Reorder to (time, y, x); a 2-D variable is one time step"""
+        if values.ndim == 2:
+            values = values[None]
+            dims = "t" + dims.replace("t", "")
+        if len(dims) != 3 or values.ndim != 3:
+            raise ValueError(f"expected dims {dims}, got an array of shape {values.shape}")
+        values = values.transpose([dims.index(axis) for axis in "tyx"])
+        if values.shape[0] != n_days:
+            raise ValueError(f"{values.shape[0]} time steps but {n_days} days")
+        return values
+
+    def _granule_cells(self, product: str, cube: GriddedCube, lat: np.ndarray, lon: np.ndarray,
+                       shape: Tuple[int, int]) -> tuple:
+        """_target_cells, reused while consecutive granules share their coordinates (as daily L3 files do)"""
+        last = self._last_cells
+        if last is not None and last[0] == product and np.array_equal(last[1], lat) and np.array_equal(last[2], lon):
+            return last[3]
+        cells = self._target_cells(cube, lat, lon, shape)
+        self._last_cells = (product, lat, lon, cells)
+        return cells
+
+    @staticmethod
+    def _target_cells(cube: GriddedCube, lat: np.ndarray, lon: np.ndarray,
+                      shape: Tuple[int, int]) -> Tuple[np.ndarray, Tuple[int, int], Tuple[int, int]]:
+        """Cell per source pixel within the window of grid cells the granule covers (-1 outside the grid),
+        the window's origin (row, col) and its shape; from 1-D or 2-D coordinates"""
+        if lat.ndim == 1 and lon.ndim == 1:
+            lat, lon = np.meshgrid(lat, lon, indexing="ij")
+        if lat.shape != shape:
+            raise ValueError(f"coordinates {lat.shape} do not match the data {shape}")
+        # Fill values in 2-D coordinate arrays (e.g. SMAP -9999) land outside the grid
+        rows, cols = cube.cell(np.where(np.abs(lat) <= 90, lat, np.nan), np.where(np.abs(lon) <= 360, lon, np.nan))
+        rows, cols = rows.ravel(), cols.ravel()
+        inside = rows >= 0
+        if not inside.any():
+            raise ValueError("granule does not overlap the product grid")
+        r0, c0 = rows[inside].min(), cols[inside].min()
+        window = (int(rows[inside].max() - r0 + 1), int(cols[inside].max() - c0 + 1))
+        target = np.where(inside, (rows - r0) * window[1] + cols - c0, -1)
+        return target, (int(r0), int(c0)), window
+
+    @staticmethod
+    def _regrid(values: np.ndarray, target: np.ndarray, window: Tuple[int, int]) -> np.ndarray:
+        """Mean of the source pixels in each window cell per time step (NaN where none)"""
+        cells = window[0] * window[1]
+        out = np.empty((len(values),) + window, dtype=np.float32)
+        for t, layer in enumerate(values.reshape(len(values), -1)):
+            keep = (target >= 0) & np.isfinite(layer)
+            sums = np.bincount(target[keep], weights=layer[keep], minlength=cells)
+            counts = np.bincount(target[keep], minlength=cells)
+            with np.errstate(invalid="ignore"):
+                out[t] = (sums / counts).reshape(window)
+        return out
+
+    def status(self) -> Dict:
+        """Stored cubes and chunk cache usage"""
+        return {"root": self.root, "products": self.products(), "cache": self.cache.stats()}
+
+
+# Process-wide instance so every client shares the chunk cache
+cube_store = CubeStore()
+
+
+def get_cube_store() -> CubeStore:
+    """Return the shared cube store"""
+    return cube_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest NetCDF/HDF5 granules into the gridded cube store")
+    parser.add_argument("product", choices=sorted(CUBE_STORE["products"]))
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--root", default=CUBE_STORE["root"])
+    args = parser.parse_args()
+
+    store = CubeStore(args.root)
+    print(store.ingest(args.product, sorted(args.files)))
+
+
+if __name__ == "__main__":
+    main()
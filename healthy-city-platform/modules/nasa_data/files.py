@@ -0,0 +1,12 @@
+"""
+Shared file helpers
+Identity of files on disk, used to notice when a cached source has been replaced
+"""
+
+import os
+
+
+def file_identity(path: str) -> tuple:
+    """Changes whenever the file is replaced, even within the filesystem's timestamp granularity"""
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
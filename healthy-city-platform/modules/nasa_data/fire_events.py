@@ -0,0 +1,455 @@
+"""
+Fire event clustering and tracking
+Groups FIRMS detections into fire events incrementally, keeping event IDs stable across satellite passes
+"""
+
+import json
+import os
+import threading
+from bisect import insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+from config.nasa_apis import FIRE_EVENTS
+from .firms_parser import FireDetections
+from .geo import to_xyz
+
+# Recent detections that new ones can link to, tagged with their event number
+POINT_DTYPE = np.dtype([
+    ("latitude", "f4"),
+    ("longitude", "f4"),
+    ("acq_datetime", "M8[m]"),
+    ("event", "i8")
+])
+
+KM_PER_DEG = 111.32
+
+# Detections of one event less than this far apart in time belong to the same overpass
+PASS_MINUTES = 30
+
+
+def event_id(number: int) -> str:
+    return f"FE-{number:06d}"
+
+
+class FireEventTracker:
+    """Incremental space-time clustering of detections into fire events
+
+    Two detections are linked when they are within eps_km of each other and
+    seen within max_gap_hours; an event is a connected group of linked
+    detections (DBSCAN with min_samples=1, so a single-pixel fire is an event
+    too). Only detections from the last close_after_hours are kept as link
+    candidates, so a batch costs O(batch + recent window) however long the
+    history. When a batch bridges existing events they merge into the oldest,
+    whose ID survives; the others stay listed as merged into it.
+
+    State on disk is a snapshot (events.json) plus an append-only log
+    (events.log) holding, per batch, only the events that batch changed;
+    the snapshot is rewritten once the log has grown larger than it.
+    """
+
+    def __init__(self, state_dir: Optional[str] = FIRE_EVENTS["state_dir"], settings: Optional[Dict] = None):
+        self.state_dir = state_dir
+        self.settings = {**FIRE_EVENTS, **(settings or {})}
+        self._lock = threading.RLock()
+        self.events: Dict[int, Dict] = {}
+        self._cells: Dict[int, set] = {}
+        self.points = np.empty(0, dtype=POINT_DTYPE)
+        self.next_event = 1
+        self.latest: Optional[np.datetime64] = None
+        self.sensors_seen: List[str] = []
+        self._dirty: set = set()
+        self._sequence = 0
+        self._log_bytes = 0
+        self._snapshot_bytes = 0
+        self.load()
+
+    def link_window(self) -> np.timedelta64:
+        """How far back a detection can still join an active event"""
+        return np.timedelta64(int(self.settings["close_after_hours"] * 60), "m")
+
+    # -- clustering --------------------------------------------------------
+
+    def update(self, sensor: str, detections: FireDetections) -> Dict:
+        """Assign a batch of new detections to events and update event growth"""
+        with self._lock:
+            data = detections.data
+            if sensor not in self.sensors_seen:
+                self.sensors_seen.append(sensor)
+            if not len(data):
+                return {"detections": 0, "new_events": 0, "updated_events": 0, "merged_events": 0, "closed_events": 0}
+
+            assigned, created, merged = self._assign(data)
+            touched = self._apply(sensor, data, assigned)
+            closed = self._close_stale()
+            if self.state_dir:
+                self.save()
+            return {
+                "detections": len(data),
+                "new_events": created,
+                "updated_events": touched - created,
+                "merged_events": merged,
+                "closed_events": closed
+            }
+
+    def _assign(self, data: np.ndarray) -> Tuple[np.ndarray, int, int]:
+        """Event number for each new detection; returns (numbers, events created, events merged)"""
+        n = len(data)
+        times = data["acq_datetime"]
+        gap = np.timedelta64(int(self.settings["max_gap_hours"] * 60), "m")
+        eps = self.settings["eps_km"]
+        tree = cKDTree(to_xyz(data["latitude"], data["longitude"]))
+
+        pairs = tree.query_pairs(eps, output_type="ndarray").reshape(-1, 2)
+        pairs = pairs[np.abs(times[pairs[:, 0]] - times[pairs[:, 1]]) <= gap]
+
+        recent = self.points
+        if len(recent):
+            near = tree.sparse_distance_matrix(cKDTree(to_xyz(recent["latitude"], recent["longitude"])),
+                                               eps, output_type="ndarray")
+            keep = np.abs(times[near["i"]] - recent["acq_datetime"][near["j"]]) <= gap
+            link_new, link_event = near["i"][keep], recent["event"][near["j"][keep]]
+        else:
+            link_new = link_event = np.empty(0, dtype=np.int64)
+
+        # Graph over new detections plus one node per existing event they touch
+        event_nums, event_node = np.unique(link_event, return_inverse=True)
+        size = n + len(event_nums)
+        rows = np.concatenate([pairs[:, 0], link_new])
+        cols = np.concatenate([pairs[:, 1], n + event_node])
+        graph = coo_matrix((np.ones(len(rows), dtype=bool), (rows, cols)), shape=(size, size))
+        n_comp, labels = connected_components(graph, directed=False)
+
+        # Each component keeps its oldest existing event; components without one get a new event
+        sentinel = np.iinfo(np.int64).max
+        survivor = np.full(n_comp, sentinel, dtype=np.int64)
+        np.minimum.at(survivor, labels[n:], event_nums)
+        fresh = np.unique(labels[:n])
+        fresh = fresh[survivor[fresh] == sentinel]
+        survivor[fresh] = np.arange(self.next_event, self.next_event + len(fresh))
+        for number in survivor[fresh].tolist():
+            self._new_event(number)
+        self.next_event += len(fresh)
+
+        losers = event_nums != survivor[labels[n:]]
+        for src, dst in zip(event_nums[losers].tolist(), survivor[labels[n:]][losers].tolist()):
+            self._merge(src, dst)
+        return survivor[labels[:n]], len(fresh), int(losers.sum())
+
+    def _apply(self, sensor: str, data: np.ndarray, assigned: np.ndarray) -> int:
+        """Fold the batch into per-event stats and growth history, one entry per overpass"""
+        cell_deg = self.settings["footprint_cell_deg"]
+        cells = ((np.floor((data["latitude"] + 90.0) / cell_deg).astype(np.int64) << 32)
+                 + np.floor((data["longitude"] + 180.0) / cell_deg).astype(np.int64))
+        passes = data["acq_datetime"].astype(np.int64) // PASS_MINUTES
+        order = np.lexsort((passes, assigned))
+        keys = np.column_stack([assigned[order], passes[order]])
+        starts = np.flatnonzero(np.r_[True, np.any(keys[1:] != keys[:-1], axis=1)])
+        ends = np.r_[starts[1:], len(order)]
+
+        touched = set()
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            rows = order[start:end]
+            number = int(assigned[rows[0]])
+            event = self.events[number]
+            group = data[rows]
+            touched.add(number)
+            self._dirty.add(number)
+
+            new_cells = set(cells[rows].tolist()) - self._cells[number]
+            self._cells[number] |= new_cells
+            added_km2 = self._cell_area(new_cells)
+            event["area_km2"] = round(event["area_km2"] + added_km2, 3)
+
+            count = event["detections"] + len(group)
+            event["centroid"] = [
+                round((event["centroid"][0] * event["detections"] + float(group["latitude"].sum(dtype=np.float64))) / count, 5),
+                round((event["centroid"][1] * event["detections"] + float(group["longitude"].sum(dtype=np.float64))) / count, 5)
+            ]
+            event["detections"] = count
+            box = event["bbox"]
+            event["bbox"] = [
+                round(min(box[0], float(group["longitude"].min())), 5), round(min(box[1], float(group["latitude"].min())), 5),
+                round(max(box[2], float(group["longitude"].max())), 5), round(max(box[3], float(group["latitude"].max())), 5)
+            ]
+            first, last = str(group["acq_datetime"].min()), str(group["acq_datetime"].max())
+            event["first_seen"] = min(event["first_seen"] or first, first)
+            event["last_seen"] = max(event["last_seen"] or last, last)
+            if sensor not in event["sensors"]:
+                event["sensors"].append(sensor)
+
+            frp = self._record_pass(event, sensor, first, len(group),
+                                    float(group["frp"].sum(dtype=np.float64)), added_km2)
+            event["current_frp_mw"] = event["history"][-1][3]
+            event["peak_frp_mw"] = max(event["peak_frp_mw"], frp)
+
+        batch = np.zeros(len(data), dtype=POINT_DTYPE)
+        batch["latitude"], batch["longitude"] = data["latitude"], data["longitude"]
+        batch["acq_datetime"], batch["event"] = data["acq_datetime"], assigned
+        self.points = np.concatenate([self.points, batch])
+        latest = data["acq_datetime"].max()
+        self.latest = latest if self.latest is None else max(self.latest, latest)
+        return len(touched)
+
+    def _record_pass(self, event: Dict, sensor: str, first: str, count: int, frp: float, added_km2: float) -> float:
+        """Add a pass group to the growth history, one entry per sensor and overpass; returns the entry's FRP
+
+        Rows of one overpass can arrive over several polls; they fold into
+        the entry already kept for it. Footprint added by a late group also
+        counts toward the area after every later pass.
+        """
+        history = event["history"]
+        when = np.datetime64(first, "m")
+        for i, entry in enumerate(history):
+            if entry[1] == sensor and abs(np.datetime64(entry[0], "m") - when) < np.timedelta64(PASS_MINUTES, "m"):
+                entry[0] = min(entry[0], first)
+                entry[2] += count
+                entry[3] = round(entry[3] + frp, 2)
+                break
+        else:
+            entry = [first, sensor, count, round(frp, 2), 0.0]
+            insort(history, entry)
+            i = history.index(entry)
+            entry[4] = history[i - 1][4] if i else 0.0
+        for later in history[i:]:
+            later[4] = round(later[4] + added_km2, 3)
+        history.sort()
+        history[-1][4] = event["area_km2"]
+        del history[:-self.settings["history_length"]]
+        return entry[3]
+
+    def _cell_area(self, cells: Iterable[int]) -> float:
+        """Area in km2 of footprint cells, shrinking with latitude"""
+        cells = np.fromiter(cells, dtype=np.int64)
+        if not len(cells):
+            return 0.0
+        cell_deg = self.settings["footprint_cell_deg"]
+        lat = ((cells >> 32) + 0.5) * cell_deg - 90.0
+        return float(((cell_deg * KM_PER_DEG) ** 2 * np.cos(np.radians(lat))).sum())
+
+    def _new_event(self, number: int):
+        self.events[number] = {
+            "id": event_id(number),
+            "status": "active",
+            "merged_into": None,
+            "first_seen": None,
+            "last_seen": None,
+            "detections": 0,
+            "sensors": [],
+            "centroid": [0.0, 0.0],
+            "bbox": [180.0, 90.0, -180.0, -90.0],
+            "area_km2": 0.0,
+            "current_frp_mw": 0.0,
+            "peak_frp_mw": 0.0,
+            "history": []            # [pass time, sensor, detections, frp_mw, area_km2 after the pass]
+        }
+        self._cells[number] = set()
+        self._dirty.add(number)
+
+    def _merge(self, src: int, dst: int):
+        """Fold event src into dst; dst keeps its ID"""
+        a, b = self.events[dst], self.events[src]
+        new_cells = self._cells.pop(src, set()) - self._cells[dst]
+        self._cells[dst] |= new_cells
+        a["area_km2"] = round(a["area_km2"] + self._cell_area(new_cells), 3)
+        count = a["detections"] + b["detections"]
+        a["centroid"] = [round((a["centroid"][i] * a["detections"] + b["centroid"][i] * b["detections"]) / count, 5)
+                         for i in range(2)]
+        a["detections"] = count
+        a["bbox"] = [min(a["bbox"][0], b["bbox"][0]), min(a["bbox"][1], b["bbox"][1]),
+                     max(a["bbox"][2], b["bbox"][2]), max(a["bbox"][3], b["bbox"][3])]
+        a["first_seen"] = min(a["first_seen"], b["first_seen"])
+        a["last_seen"] = max(a["last_seen"], b["last_seen"])
+        a["sensors"] = sorted(set(a["sensors"]) | set(b["sensors"]))
+        a["history"] = sorted(a["history"] + b["history"])[-self.settings["history_length"]:]
+        a["peak_frp_mw"] = max(a["peak_frp_mw"], b["peak_frp_mw"])
+        self.points["event"][self.points["event"] == src] = dst
+        b.update(status="merged", merged_into=a["id"], history=[])
+        self._dirty.update((src, dst))
+
+    def _close_stale(self) -> int:
+        """Close quiet events, forget their link points, and drop long-finished events"""
+        horizon = self.latest - self.link_window()
+        self.points = self.points[self.points["acq_datetime"] >= horizon]
+        horizon_text = str(horizon)
+        expire_text = str(self.latest - np.timedelta64(int(self.settings["keep_closed_days"]), "D"))
+        closed = 0
+        for number, event in list(self.events.items()):
+            if event["status"] == "active" and event["last_seen"] < horizon_text:
+                event["status"] = "closed"
+                self._cells.pop(number, None)
+                self._dirty.add(number)
+                closed += 1
+            elif event["status"] != "active" and (event["last_seen"] or "") < expire_text:
+                del self.events[number]
+                self._dirty.add(number)
+        return closed
+
+    # -- queries -----------------------------------------------------------
+
+    def get(self, event: str) -> Optional[Dict]:
+        """Event by ID, following merges to the surviving event"""
+        with self._lock:
+            try:
+                number = int(event.rsplit("-", 1)[-1])
+            except ValueError:
+                return None
+            seen = set()
+            while number in self.events and number not in seen:
+                seen.add(number)
+                merged_into = self.events[number]["merged_into"]
+                if merged_into is None:
+                    return self._describe(self.events[number], history=True)
+                number = int(merged_into.rsplit("-", 1)[-1])
+            return None
+
+    def list_events(self, status: Optional[str] = "active", bbox: Optional[Tuple[float, float, float, float]] = None,
+                    limit: int = 100) -> List[Dict]:
+        """Event summaries, most intense first"""
+        with self._lock:
+            events = [e for e in self.events.values()
+                      if e["status"] != "merged" and (status is None or e["status"] == status)]
+            if bbox is not None:
+                min_lon, min_lat, max_lon, max_lat = bbox
+                wraps = min_lon > max_lon
+                events = [e for e in events if min_lat <= e["centroid"][0] <= max_lat and (
+                    (e["centroid"][1] >= min_lon or e["centroid"][1] <= max_lon) if wraps
+                    else min_lon <= e["centroid"][1] <= max_lon)]
+            events.sort(key=lambda e: (e["current_frp_mw"], e["last_seen"]), reverse=True)
+            return [self._describe(e) for e in events[:limit]]
+
+    def _describe(self, event: Dict, history: bool = False) -> Dict:
+        out = {k: v for k, v in event.items() if k != "history"}
+        out["growth"] = self._growth(event["history"])
+        if history:
+            out["history"] = [dict(zip(["time", "sensor", "detections", "frp_mw", "area_km2"], h))
+                              for h in event["history"]]
+        return out
+
+    def _growth(self, history: List) -> Dict:
+        """Area and FRP change between the two most recent passes"""
+        if len(history) < 2:
+            return {"area_km2_per_hour": None, "frp_change_mw": None}
+        prev, last = history[-2], history[-1]
+        hours = int((np.datetime64(last[0], "m") - np.datetime64(prev[0], "m")).astype(int)) / 60
+        return {
+            "area_km2_per_hour": round(float(last[4] - prev[4]) / hours, 3) if hours > 0 else None,
+            "frp_change_mw": round(last[3] - prev[3], 2)
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            statuses = [e["status"] for e in self.events.values()]
+            return {
+                "active": statuses.count("active"),
+                "closed": statuses.count("closed"),
+                "merged": statuses.count("merged"),
+                "tracked_points": len(self.points),
+                "latest": str(self.latest) if self.latest is not None else None
+            }
+
+    # -- persistence -------------------------------------------------------
+
+    def _state_paths(self) -> Tuple[str, str, str]:
+        return (os.path.join(self.state_dir, "events.json"), os.path.join(self.state_dir, "events.log"),
+                os.path.join(self.state_dir, "points.npy"))
+
+    def _header(self) -> Dict:
+        return {
+            "sequence": self._sequence,
+            "next_event": self.next_event,
+            "latest": str(self.latest) if self.latest is not None else None,
+            "sensors_seen": self.sensors_seen
+        }
+
+    def save(self):
+        """Persist the events changed since the last save, then the link points
+
+        Each save appends one log record of the changed events (None for
+        forgotten ones), numbered so a replay skips records the snapshot
+        already holds. Once the log outgrows the snapshot, a full snapshot
+        is written atomically and the log restarted. Events, with
+        next_event, go first, so saved points never carry numbers the saved
+        events have not handed out; load() drops points left on events that
+        are no longer active by a crash before the points were replaced.
+        """
+        with self._lock:
+            os.makedirs(self.state_dir, exist_ok=True)
+            events_path, log_path, points_path = self._state_paths()
+            self._sequence += 1
+
+            if not os.path.exists(events_path) or self._log_bytes > self._snapshot_bytes:
+                state = {**self._header(), "events": self.events,
+                         "cells": {n: sorted(c) for n, c in self._cells.items()}}
+                text = json.dumps(state)  # dumps uses the C encoder; dump(f) does not
+                with open(events_path + ".tmp", "w") as f:
+                    f.write(text)
+                os.replace(events_path + ".tmp", events_path)
+                # Records up to this sequence are in the snapshot, so the log can go
+                with open(log_path, "w"):
+                    pass
+                self._snapshot_bytes, self._log_bytes = len(text), 0
+            else:
+                record = {**self._header(),
+                          "events": {n: self.events.get(n) for n in self._dirty},
+                          "cells": {n: sorted(self._cells[n]) if n in self._cells else None for n in self._dirty}}
+                line = json.dumps(record) + "\n"
+                with open(log_path, "a") as f:
+                    f.write(line)
+                self._log_bytes += len(line)
+            self._dirty.clear()
+            with open(points_path + ".tmp", "wb") as f:
+                np.save(f, self.points)
+            os.replace(points_path + ".tmp", points_path)
+
+    def load(self):
+        if not self.state_dir:
+            return
+        events_path, log_path, points_path = self._state_paths()
+        try:
+            with open(events_path) as f:
+                text = f.read()
+            points = np.load(points_path)
+        except FileNotFoundError:
+            return
+        state = json.loads(text)
+        self._snapshot_bytes = len(text)
+        self.events = {int(n): e for n, e in state["events"].items()}
+        self._cells = {int(n): set(c) for n, c in state["cells"].items()}
+        header = state
+        try:
+            with open(log_path) as f:
+                for line in f:
+                    self._log_bytes += len(line)
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A record cut short by a crash: everything before it stands, and the next
+                        # save rewrites the snapshot so nothing is appended after the torn line
+                        self._log_bytes = self._snapshot_bytes + 1
+                        break
+                    if record["sequence"] <= state.get("sequence", 0):
+                        continue
+                    for n, event in record["events"].items():
+                        if event is None:
+                            self.events.pop(int(n), None)
+                        else:
+                            self.events[int(n)] = event
+                    for n, cells in record["cells"].items():
+                        if cells is None:
+                            self._cells.pop(int(n), None)
+                        else:
+                            self._cells[int(n)] = set(cells)
+                    header = record
+        except FileNotFoundError:
+            pass
+        self._sequence = header.get("sequence", 0)
+        self.next_event = header["next_event"]
+        self.latest = np.datetime64(header["latest"], "m") if header["latest"] else None
+        self.sensors_seen = header["sensors_seen"]
+        active = np.array([n for n, e in self.events.items() if e["status"] == "active"], dtype=np.int64)
+        self.points = points[np.isin(points["event"], active)]
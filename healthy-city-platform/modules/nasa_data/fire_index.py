@@ -0,0 +1,129 @@
+"""
+Spatial index for fire detections
+Fixed lat/lon grid buckets kept in a sorted array, with an unsorted delta for incremental ingest
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .geo import EARTH_RADIUS_KM
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in km; accepts scalars or arrays"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class GridIndex:
+    """Grid-bucket index over point positions
+
+    Points are bucketed into `cell_deg` cells numbered row-major from
+    (-90, -180). The main index stores cell ids sorted, so all points of one
+    grid row inside a longitude span are a single contiguous slice found with
+    two binary searches. New points go to a small delta that is scanned
+    directly and merged into the sorted arrays once it grows.
+    """
+
+    def __init__(self, cell_deg: float = 0.1, merge_ratio: float = 0.125, min_merge: int = 4096):
+        self.cell_deg = cell_deg
+        self.rows = int(np.ceil(180 / cell_deg))
+        self.cols = int(np.ceil(360 / cell_deg))
+        self.merge_ratio = merge_ratio
+        self.min_merge = min_merge
+        self._cells = np.empty(0, dtype=np.int64)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._lat = np.empty(0, dtype=np.float32)
+        self._lon = np.empty(0, dtype=np.float32)
+        self._delta_ids = np.empty(0, dtype=np.int64)
+        self._delta_lat = np.empty(0, dtype=np.float32)
+        self._delta_lon = np.empty(0, dtype=np.float32)
+        self.size = 0
+
+    def _row(self, lat):
+        return np.clip(((np.asarray(lat, dtype=np.float64) + 90) // self.cell_deg).astype(np.int64), 0, self.rows - 1)
+
+    def _col(self, lon):
+        return np.clip(((np.asarray(lon, dtype=np.float64) + 180) // self.cell_deg).astype(np.int64), 0, self.cols - 1)
+
+    def add(self, lat: np.ndarray, lon: np.ndarray, ids: Optional[np.ndarray] = None):
+        """Index new points; ids default to consecutive positions after the current size"""
+        if ids is None:
+            ids = np.arange(self.size, self.size + len(lat), dtype=np.int64)
+        self._delta_ids = np.concatenate([self._delta_ids, ids])
+        self._delta_lat = np.concatenate([self._delta_lat, np.asarray(lat, dtype=np.float32)])
+        self._delta_lon = np.concatenate([self._delta_lon, np.asarray(lon, dtype=np.float32)])
+        self.size += len(lat)
+        if len(self._delta_ids) >= max(self.min_merge, self.merge_ratio * len(self._ids)):
+            self._merge()
+
+    def _merge(self):
+        """Fold the delta into the sorted arrays"""
+        cells = self._row(self._delta_lat) * self.cols + self._col(self._delta_lon)
+        all_cells = np.concatenate([self._cells, cells])
+        order = np.argsort(all_cells, kind="stable")
+        self._cells = all_cells[order]
+        self._ids = np.concatenate([self._ids, self._delta_ids])[order]
+        self._lat = np.concatenate([self._lat, self._delta_lat])[order]
+        self._lon = np.concatenate([self._lon, self._delta_lon])[order]
+        self._delta_ids = self._delta_ids[:0]
+        self._delta_lat = self._delta_lat[:0]
+        self._delta_lon = self._delta_lon[:0]
+
+    def _candidates(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> np.ndarray:
+        """Positions in the sorted arrays of every point in cells touching the box"""
+        rows = np.arange(self._row(min_lat), self._row(max_lat) + 1)
+        starts = np.searchsorted(self._cells, rows * self.cols + self._col(min_lon), side="left")
+        ends = np.searchsorted(self._cells, rows * self.cols + self._col(max_lon), side="right")
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+        # Expand the per-row [start, end) slices into one position array
+        offsets = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        return np.arange(total, dtype=np.int64) + offsets
+
+    def _query_box(self, min_lat, min_lon, max_lat, max_lon) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        pos = self._candidates(min_lat, min_lon, max_lat, max_lon)
+        lat, lon = self._lat[pos], self._lon[pos]
+        keep = (lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)
+        d_keep = ((self._delta_lat >= min_lat) & (self._delta_lat <= max_lat) &
+                  (self._delta_lon >= min_lon) & (self._delta_lon <= max_lon))
+        return (
+            np.concatenate([self._ids[pos][keep], self._delta_ids[d_keep]]),
+            np.concatenate([lat[keep], self._delta_lat[d_keep]]),
+            np.concatenate([lon[keep], self._delta_lon[d_keep]])
+        )
+
+    def query_bbox(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float) -> np.ndarray:
+        """Ids of points inside the box; a box with min_lon > max_lon wraps the antimeridian"""
+        if min_lon > max_lon:
+            east = self._query_box(min_lat, min_lon, max_lat, 180.0)[0]
+            west = self._query_box(min_lat, -180.0, max_lat, max_lon)[0]
+            return np.sort(np.concatenate([east, west]))
+        return np.sort(self._query_box(min_lat, min_lon, max_lat, max_lon)[0])
+
+    def query_radius(self, lat: float, lon: float, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and distances (km) of points within radius_km, nearest first"""
+        dlat = np.degrees(radius_km / EARTH_RADIUS_KM)
+        min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+        cos_lat = np.cos(np.radians(max(abs(min_lat), abs(max_lat))))
+        dlon = 180.0 if cos_lat < 1e-6 else min(180.0, dlat / cos_lat)
+        if dlon >= 180.0:
+            boxes = [(min_lat, -180.0, max_lat, 180.0)]
+        elif lon - dlon < -180 or lon + dlon > 180:
+            west = ((lon - dlon + 180) % 360) - 180
+            east = ((lon + dlon + 180) % 360) - 180
+            boxes = [(min_lat, west, max_lat, 180.0), (min_lat, -180.0, max_lat, east)]
+        else:
+            boxes = [(min_lat, lon - dlon, max_lat, lon + dlon)]
+
+        parts = [self._query_box(*box) for box in boxes]
+        ids = np.concatenate([p[0] for p in parts])
+        dist = haversine_km(lat, lon, np.concatenate([p[1] for p in parts]), np.concatenate([p[2] for p in parts]))
+        inside = dist <= radius_km
+        ids, dist = ids[inside], dist[inside]
+        order = np.argsort(dist, kind="stable")
+        return ids[order], dist[order]
@@ -0,0 +1,236 @@
+"""
+Persistent local store for ingested FIRMS detections
+Append-only .npy segments per sensor with a JSON manifest, plus retention/compaction
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config.nasa_apis import FIRMS_INGEST
+from .firms_parser import FIRE_DTYPE, FireDetections
+from .fire_index import GridIndex
+
+# Fields that identify one detection across overlapping download windows
+KEY_FIELDS = ["acq_datetime", "latitude", "longitude", "satellite"]
+
+
+class FireDetectionStore:
+    """On-disk detection store; each sensor gets its own directory of segments
+
+    Layout: {root}/{sensor}/manifest.json and {root}/{sensor}/seg-000001.npy ...
+    Segments are written atomically and memory-mapped on read. Each sensor's
+    rows are covered by a GridIndex that is extended, not rebuilt, when new
+    segments are appended. The manifest records each segment's latest
+    acquisition time, so reads of recent rows skip older segments.
+    """
+
+    def __init__(self, root: str = FIRMS_INGEST["store_dir"]):
+        self.root = root
+        self._lock = threading.RLock()
+        self._read_cache: Dict[str, tuple] = {}
+
+    def _sensor_dir(self, sensor: str) -> str:
+        return os.path.join(self.root, sensor)
+
+    def _manifest_path(self, sensor: str) -> str:
+        return os.path.join(self._sensor_dir(sensor), "manifest.json")
+
+    def _load_manifest(self, sensor: str) -> Dict:
+        try:
+            with open(self._manifest_path(sensor)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"next_segment": 1, "segments": [], "watermark": None, "rows": 0}
+
+    def _save_manifest(self, sensor: str, manifest: Dict):
+        path = self._manifest_path(sensor)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, path)
+
+    def _write_segment(self, sensor: str, manifest: Dict, data: np.ndarray, time_sorted: bool = False) -> str:
+        name = f"seg-{manifest['next_segment']:06d}.npy"
+        manifest["next_segment"] += 1
+        path = os.path.join(self._sensor_dir(sensor), name)
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, data)
+        os.replace(path + ".tmp", path)
+        manifest.setdefault("segment_info", {})[name] = {"latest": str(data["acq_datetime"].max()),
+                                                         "sorted": time_sorted}
+        return name
+
+    def _load_segments(self, sensor: str, names: Iterable[str]) -> List[np.ndarray]:
+        return [np.load(os.path.join(self._sensor_dir(sensor), n), mmap_mode="r") for n in names]
+
+    def sensors(self) -> List[str]:
+        """Sensors that have stored detections"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root) if os.path.exists(self._manifest_path(d)))
+
+    def watermark(self, sensor: str) -> Optional[np.datetime64]:
+        """Latest stored acquisition time for a sensor"""
+        value = self._load_manifest(sensor)["watermark"]
+        return np.datetime64(value, "m") if value else None
+
+    def append(self, sensor: str, detections: FireDetections) -> FireDetections:
+        """Append detections not already stored; returns the rows that were new"""
+        if not len(detections):
+            return FireDetections()
+        with self._lock:
+            os.makedirs(self._sensor_dir(sensor), exist_ok=True)
+            manifest = self._load_manifest(sensor)
+            incoming = detections.data
+            window_start = incoming["acq_datetime"].min()
+
+            # Only stored rows inside the incoming window can collide with it
+            stored = [seg[seg["acq_datetime"] >= window_start][KEY_FIELDS]
+                      for seg in self._load_segments(sensor, manifest["segments"])]
+            stored_keys = np.concatenate(stored) if stored else np.empty(0, dtype=incoming[KEY_FIELDS].dtype)
+            keys = np.concatenate([stored_keys, incoming[KEY_FIELDS]])
+            _, first = np.unique(keys, return_index=True)
+            fresh = np.sort(first[first >= len(stored_keys)] - len(stored_keys))
+            if not len(fresh):
+                return FireDetections()
+
+            new_rows = np.ascontiguousarray(incoming[fresh])
+            manifest["segments"].append(self._write_segment(sensor, manifest, new_rows))
+            manifest["rows"] += len(new_rows)
+            latest = str(new_rows["acq_datetime"].max())
+            if manifest["watermark"] is None or latest > manifest["watermark"]:
+                manifest["watermark"] = latest
+            self._save_manifest(sensor, manifest)
+            return FireDetections(new_rows)
+
+    def read(self, sensors: Optional[Iterable[str]] = None, since: Optional[np.datetime64] = None) -> FireDetections:
+        """All stored detections for the given sensors (default: every sensor), or only those from since on"""
+        parts = []
+        for sensor in (sensors or self.sensors()):
+            data = self._read_sensor(sensor) if since is None else self._read_since(sensor, since)
+            parts.append(FireDetections(data))
+        return FireDetections.concat(parts)
+
+    def _read_since(self, sensor: str, since: np.datetime64) -> np.ndarray:
+        """Rows from since on, opening only segments that reach it and bisecting the time-sorted ones"""
+        manifest = self._load_manifest(sensor)
+        info = manifest.get("segment_info", {})
+        since = np.datetime64(since, "m")
+        parts = []
+        for name in manifest["segments"]:
+            meta = info.get(name)
+            # Segments written before their times were recorded are always read
+            if meta is not None and np.datetime64(meta["latest"], "m") < since:
+                continue
+            data = self._load_segments(sensor, [name])[0]
+            if meta is not None and meta["sorted"]:
+                parts.append(np.array(data[np.searchsorted(data["acq_datetime"], since):]))
+            else:
+                parts.append(np.array(data[data["acq_datetime"] >= since]))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=FIRE_DTYPE)
+
+    def query(self, sensors: Optional[Iterable[str]] = None,
+              bbox: Optional[Tuple[float, float, float, float]] = None,
+              center: Optional[Tuple[float, float]] = None, radius_km: Optional[float] = None) -> FireDetections:
+        """Detections inside bbox (min_lon, min_lat, max_lon, max_lat) or within radius_km of center (lat, lon)
+
+        Radius results are ordered nearest first.
+        """
+        parts, distances = [], []
+        for sensor in (sensors or self.sensors()):
+            data, index = self._read_sensor_indexed(sensor)
+            if not len(data):
+                continue
+            if center is not None:
+                ids, dist = index.query_radius(center[0], center[1], radius_km)
+                distances.append(dist)
+            else:
+                ids = index.query_bbox(*bbox)
+            parts.append(FireDetections(data[ids]))
+        result = FireDetections.concat(parts)
+        if center is not None and len(parts) > 1:
+            result = FireDetections(result.data[np.argsort(np.concatenate(distances), kind="stable")])
+        return result
+
+    def _read_sensor(self, sensor: str) -> np.ndarray:
+        return self._read_sensor_indexed(sensor)[0]
+
+    def _read_sensor_indexed(self, sensor: str) -> Tuple[np.ndarray, GridIndex]:
+        """Concatenated segments and their spatial index, cached until the manifest changes on disk"""
+        try:
+            version = os.stat(self._manifest_path(sensor)).st_mtime_ns
+        except FileNotFoundError:
+            return np.empty(0, dtype=FIRE_DTYPE), GridIndex()
+        cached = self._read_cache.get(sensor)
+        if cached and cached[0] == version:
+            return cached[2], cached[3]
+        manifest = self._load_manifest(sensor)
+        names = manifest["segments"]
+
+        if cached and names[:len(cached[1])] == cached[1]:
+            # Only appends since the last read: load and index the new segments
+            _, old_names, data, index = cached
+            tail = self._load_segments(sensor, names[len(old_names):])
+            if tail:
+                added = np.concatenate(tail)
+                data = np.concatenate([data, added])
+                index.add(added["latitude"], added["longitude"])
+        else:
+            segments = self._load_segments(sensor, names)
+            data = np.concatenate(segments) if segments else np.empty(0, dtype=FIRE_DTYPE)
+            index = GridIndex()
+            index.add(data["latitude"], data["longitude"])
+        self._read_cache[sensor] = (version, list(names), data, index)
+        return data, index
+
+    def compact(self, sensor: str, retention_days: int = FIRMS_INGEST["retention_days"]) -> Dict:
+        """Merge segments into one time-sorted segment and drop expired detections
+
+        The merged segments stay on disk, listed as retired, until the next
+        compaction, so a reader still holding the previous manifest can open
+        them; the ones retired last time are deleted then.
+        """
+        with self._lock:
+            manifest = self._load_manifest(sensor)
+            old_segments = list(manifest["segments"])
+            if not old_segments:
+                return {"sensor": sensor, "rows": 0, "dropped": 0}
+            cutoff = np.datetime64(datetime.utcnow() - timedelta(days=retention_days), "m")
+            merged = np.concatenate(self._load_segments(sensor, old_segments))
+            kept = merged[merged["acq_datetime"] >= cutoff]
+            kept = kept[np.argsort(kept["acq_datetime"], kind="stable")]
+
+            manifest["segments"] = [self._write_segment(sensor, manifest, kept, time_sorted=True)] if len(kept) else []
+            manifest["segment_info"] = {n: i for n, i in manifest.get("segment_info", {}).items()
+                                        if n in manifest["segments"]}
+            manifest["rows"] = len(kept)
+            expired = manifest.get("retired", [])
+            manifest["retired"] = old_segments
+            self._save_manifest(sensor, manifest)
+            self._read_cache.pop(sensor, None)
+            for name in expired:
+                try:
+                    os.remove(os.path.join(self._sensor_dir(sensor), name))
+                except FileNotFoundError:
+                    pass
+            return {"sensor": sensor, "rows": len(kept), "dropped": len(merged) - len(kept)}
+
+    def segment_count(self, sensor: str) -> int:
+        return len(self._load_manifest(sensor)["segments"])
+
+    def stats(self) -> Dict:
+        """Row counts and watermarks per sensor"""
+        out = {}
+        for sensor in self.sensors():
+            manifest = self._load_manifest(sensor)
+            out[sensor] = {
+                "rows": manifest["rows"],
+                "segments": len(manifest["segments"]),
+                "watermark": manifest["watermark"]
+            }
+        return out
@@ -0,0 +1,206 @@
+"""
+Parallel FIRMS archive backfill
+Downloads a date range in chunks with a bounded worker pool into Parquet partitioned by sensor and date
+
+    python -m modules.nasa_data.firms_backfill --sensor VIIRS_SNPP_SP --country IND \\
+        --start 2023-01-01 --end 2023-12-31 --workers 4
+"""
+
+import argparse
+import asyncio
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from config.nasa_apis import FIRMS_BACKFILL
+from .firms_client import FIRMSClient
+from .firms_parser import FireDetections
+
+# Chunk = (first day, number of days)
+Chunk = Tuple[date, int]
+
+
+def detections_to_table(detections: FireDetections) -> pa.Table:
+    """Convert columnar detections to an Arrow table"""
+    data = detections.data
+    return pa.table({
+        "latitude": data["latitude"],
+        "longitude": data["longitude"],
+        "brightness": data["brightness"],
+        "scan": data["scan"],
+        "track": data["track"],
+        "frp": data["frp"],
+        "acq_datetime": data["acq_datetime"].astype("M8[s]"),
+        "confidence": data["confidence"],
+        "satellite": np.char.decode(data["satellite"]),
+        "daynight": np.char.decode(data["daynight"])
+    })
+
+
+class FIRMSBackfill:
+    """Resumable archive downloader
+
+    Output: {out_dir}/sensor={sensor}/acq_date={YYYY-MM-DD}/{country}.parquet
+    Files and the markers under {out_dir}/_backfill/ are both keyed by
+    acquisition day, never by chunk. A day's marker is written only after
+    every file of its chunk is in place. An interrupted or failed run
+    therefore redoes at most the days it had not finished, even with a
+    different chunk size, and a redone day overwrites its file instead of
+    adding a second one.
+    """
+
+    def __init__(self, client: FIRMSClient, out_dir: str = FIRMS_BACKFILL["out_dir"],
+                 workers: int = FIRMS_BACKFILL["workers"], chunk_days: int = FIRMS_BACKFILL["chunk_days"],
+                 max_attempts: int = FIRMS_BACKFILL["max_attempts"]):
+        self.client = client
+        self.out_dir = out_dir
+        self.workers = workers
+        self.chunk_days = chunk_days
+        self.max_attempts = max_attempts
+
+    def plan(self, start: date, end: date) -> List[Chunk]:
+        """Split [start, end] into chunks of at most chunk_days"""
+        chunks = []
+        day = start
+        while day <= end:
+            days = min(self.chunk_days, (end - day).days + 1)
+            chunks.append((day, days))
+            day += timedelta(days=days)
+        return chunks
+
+    @staticmethod
+    def _days(chunk: Chunk) -> List[date]:
+        first, days = chunk
+        return [first + timedelta(days=n) for n in range(days)]
+
+    def _marker_path(self, sensor: str, country: str, day: date) -> str:
+        return os.path.join(self.out_dir, "_backfill", sensor, country, f"{day.isoformat()}.done")
+
+    def _partition_path(self, sensor: str, country: str, day: date) -> str:
+        return os.path.join(self.out_dir, f"sensor={sensor}", f"acq_date={day.isoformat()}", f"{country}.parquet")
+
+    def is_done(self, sensor: str, country: str, chunk: Chunk) -> bool:
+        return all(os.path.exists(self._marker_path(sensor, country, day)) for day in self._days(chunk))
+
+    def _write_chunk(self, sensor: str, country: str, chunk: Chunk, detections: FireDetections) -> int:
+        """Write one Parquet file per acquisition day of the chunk, then the days' markers"""
+        data = detections.data
+        acq_days = data["acq_datetime"].astype("M8[D]")
+        files = 0
+        for day in self._days(chunk):
+            path = self._partition_path(sensor, country, day)
+            in_day = acq_days == np.datetime64(day, "D")
+            if not in_day.any():
+                # A day redone with no detections must not keep an earlier run's file
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = os.path.join(os.path.dirname(path), f".{country}.parquet.tmp")  # dot prefix keeps readers from seeing it
+            pq.write_table(detections_to_table(FireDetections(data[in_day])), tmp, compression="zstd")
+            os.replace(tmp, path)
+            files += 1
+
+        for day in self._days(chunk):
+            marker = self._marker_path(sensor, country, day)
+            os.makedirs(os.path.dirname(marker), exist_ok=True)
+            with open(marker, "w") as f:
+                f.write(f"{int((acq_days == np.datetime64(day, 'D')).sum())} rows, {datetime.now().isoformat()}\n")
+        return files
+
+    async def _run_chunk(self, sensor: str, country: str, chunk: Chunk) -> Dict:
+        first, days = chunk
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                detections = await self.client.download_archive(country, sensor, first.isoformat(), days)
+                files = await asyncio.to_thread(self._write_chunk, sensor, country, chunk, detections)
+                return {"chunk": first.isoformat(), "days": days, "rows": len(detections), "files": files}
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    return {"chunk": first.isoformat(), "days": days, "error": str(e)}
+                await asyncio.sleep(2 ** attempt)
+
+    async def run(self, sensor: str, country: str, start: date, end: date) -> Dict:
+        """Backfill [start, end]; chunks finished by an earlier run are skipped"""
+        chunks = self.plan(start, end)
+        pending = [c for c in chunks if not self.is_done(sensor, country, c)]
+        queue: asyncio.Queue = asyncio.Queue()
+        for chunk in pending:
+            queue.put_nowait(chunk)
+        results: List[Dict] = []
+
+        async def worker():
+            while True:
+                try:
+                    chunk = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                result = await self._run_chunk(sensor, country, chunk)
+                results.append(result)
+                status = result.get("error") or f"{result['rows']} rows"
+                print(f"[{sensor} {country}] {result['chunk']} +{result['days']}d: {status}")
+
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, len(pending)) or 1)))
+        failed = [r for r in results if "error" in r]
+        return {
+            "sensor": sensor,
+            "country": country,
+            "chunks_total": len(chunks),
+            "chunks_skipped": len(chunks) - len(pending),
+            "chunks_done": len(results) - len(failed),
+            "chunks_failed": failed,
+            "rows": sum(r.get("rows", 0) for r in results)
+        }
+
+
+def read_archive(out_dir: str = FIRMS_BACKFILL["out_dir"], sensor: Optional[str] = None,
+                 start: Optional[date] = None, end: Optional[date] = None, columns: Optional[List[str]] = None) -> pa.Table:
+    """Read backfilled detections; sensor/date filters prune partitions before any file is opened"""
+    partitioning = ds.partitioning(pa.schema([("sensor", pa.string()), ("acq_date", pa.string())]), flavor="hive")
+    dataset = ds.dataset(out_dir, format="parquet", partitioning=partitioning, ignore_prefixes=["_", "."])
+    clauses = []
+    if sensor:
+        clauses.append(ds.field("sensor") == sensor)
+    if start:
+        clauses.append(ds.field("acq_date") >= start.isoformat())
+    if end:
+        clauses.append(ds.field("acq_date") <= end.isoformat())
+    condition = None
+    for clause in clauses:
+        condition = clause if condition is None else condition & clause
+    return dataset.to_table(columns=columns, filter=condition)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill FIRMS archive detections into Parquet")
+    parser.add_argument("--sensor", default="VIIRS_SNPP_SP")
+    parser.add_argument("--country", default="IND")
+    parser.add_argument("--start", required=True, type=date.fromisoformat)
+    parser.add_argument("--end", required=True, type=date.fromisoformat)
+    parser.add_argument("--workers", type=int, default=FIRMS_BACKFILL["workers"])
+    parser.add_argument("--chunk-days", type=int, default=FIRMS_BACKFILL["chunk_days"])
+    parser.add_argument("--out", default=FIRMS_BACKFILL["out_dir"])
+    parser.add_argument("--base-url", help="override the FIRMS API base URL (e.g. a local stand-in)")
+    args = parser.parse_args()
+
+    async def run() -> Dict:
+        client = FIRMSClient()
+        if args.base_url:
+            client.base_url = args.base_url
+        backfill = FIRMSBackfill(client, args.out, args.workers, args.chunk_days)
+        try:
+            return await backfill.run(args.sensor, args.country, args.start, args.end)
+        finally:
+            await client.http.aclose()
+
+    summary = asyncio.run(run())
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
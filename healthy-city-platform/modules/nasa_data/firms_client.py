@@ -3,107 +3,105 @@ NASA FIRMS (Fire Information for Resource Management System) Client
 Real-time active fire data from NASA satellites
 """
 
-import requests
-import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-from config.nasa_apis import NASA_API_KEY, REALTIME_ENDPOINTS
+from config.nasa_apis import NASA_API_KEY, REALTIME_ENDPOINTS, DATASETS
+from .http_client import NASAHttpClient, get_http_client
+from .singleflight import SingleFlight
+from .firms_parser import FireDetections, FIRMSStreamParser
 
 class FIRMSClient:
-    def __init__(self, api_key: str = NASA_API_KEY):
+    def __init__(self, api_key: str = NASA_API_KEY, http: Optional[NASAHttpClient] = None):
         self.api_key = api_key
         self.base_url = "https://firms.modaps.eosdis.nasa.gov/api"
+        self.http = http or get_http_client()
+        self._flights = SingleFlight()
         
-    async def get_active_fires(self, country: str = "IND", days: int = 1) -> List[Dict]:
-        """Get active fires from NASA FIRMS"""
+    async def get_active_fires(self, country: str = "IND", days: int = 1, sensor: str = "VIIRS_SNPP_NRT") -> FireDetections:
+        """Get active fires from NASA FIRMS
+
+        Concurrent calls for the same (country, sensor, days) share one download,
+        so callers receive the same detections and must not mutate them.
+        """
+        return await self._flights.do(
+            (country, sensor, days),
+            lambda: self._fetch_active_fires(country, days, sensor)
+        )
+
+    async def _fetch_active_fires(self, country: str, days: int, sensor: str) -> FireDetections:
+        """Download detections, falling back to simulated data on any upstream error"""
         try:
-            url = f"{self.base_url}/country/csv/{self.api_key}/VIIRS_SNPP_NRT/{country}/{days}"
-            response = requests.get(url, timeout=30)
-            
-            if response.status_code == 200:
-                return self._parse_firms_csv(response.text)
-            else:
-                return self._get_simulated_fire_data()
-                
+            return await self.download_active_fires(country, days, sensor)
         except Exception as e:
             print(f"FIRMS API error: {e}")
             return self._get_simulated_fire_data()
+
+    async def download_active_fires(self, country: str, days: int, sensor: str) -> FireDetections:
+        """Stream one FIRMS country CSV into columnar detections; raises on upstream errors"""
+        url = f"{self.base_url}/country/csv/{self.api_key}/{sensor}/{country}/{days}"
+        return await self._stream_csv(url)
+
+    async def download_archive(self, country: str, sensor: str, start_date: str, days: int) -> FireDetections:
+        """Stream `days` days of archived detections starting at `start_date` (YYYY-MM-DD)"""
+        path = DATASETS["FIRMS"]["endpoints"]["fire_archive"].format(
+            api_key=self.api_key, sensor=sensor, country=country, days=days, date=start_date
+        )
+        return await self._stream_csv(f"{self.base_url}{path}")
+
+    async def _stream_csv(self, url: str) -> FireDetections:
+        """Decode a FIRMS CSV body chunk by chunk as it downloads"""
+        async with self.http.stream("GET", url) as response:
+            if response.status_code != 200:
+                raise ValueError(f"HTTP {response.status_code} from {url}")
+            parser = FIRMSStreamParser()
+            async for chunk in response.aiter_bytes():
+                parser.feed(chunk)
+            return parser.close()
     
-    def _parse_firms_csv(self, csv_data: str) -> List[Dict]:
-        """Parse FIRMS CSV response"""
-        lines = csv_data.strip().split('\n')
-        if len(lines) < 2:
-            return []
-            
-        headers = lines[0].split(',')
-        fires = []
-        
-        for line in lines[1:]:
-            values = line.split(',')
-            if len(values) >= len(headers):
-                fire = {}
-                for i, header in enumerate(headers):
-                    fire[header.strip()] = values[i].strip()
-                fires.append(fire)
-                
-        return fires[:100]  # Limit to 100 fires
-    
-    def _get_simulated_fire_data(self) -> List[Dict]:
+    def _get_simulated_fire_data(self) -> FireDetections:
         """Fallback simulated fire data"""
-        import numpy as np
-        
-        fires = []
-        locations = [
-            {"lat": 28.7041, "lon": 77.1025, "region": "Delhi"},
-            {"lat": 19.0760, "lon": 72.8777, "region": "Mumbai"},
-            {"lat": 13.0827, "lon": 80.2707, "region": "Chennai"},
-            {"lat": 22.5726, "lon": 88.3639, "region": "Kolkata"},
-            {"lat": 12.9716, "lon": 77.5946, "region": "Bangalore"}
-        ]
-        
-        for i, loc in enumerate(locations):
-            if np.random.random() > 0.3:  # 70% chance of fire
-                fire = {
-                    "latitude": str(loc["lat"] + np.random.uniform(-0.1, 0.1)),
-                    "longitude": str(loc["lon"] + np.random.uniform(-0.1, 0.1)),
-                    "brightness_ti4": str(np.random.uniform(300, 400)),
-                    "confidence": str(np.random.randint(70, 95)),
-                    "acq_date": datetime.now().strftime("%Y-%m-%d"),
-                    "acq_time": f"{np.random.randint(0, 23):02d}{np.random.randint(0, 59):02d}",
-                    "satellite": "VIIRS_SNPP_NRT",
-                    "instrument": "VIIRS",
-                    "version": "2.0NRT"
-                }
-                fires.append(fire)
-                
-        return fires
+        locations = np.array([
+            [28.7041, 77.1025],  # Delhi
+            [19.0760, 72.8777],  # Mumbai
+            [13.0827, 80.2707],  # Chennai
+            [22.5726, 88.3639],  # Kolkata
+            [12.9716, 77.5946]   # Bangalore
+        ])
+        burning = locations[np.random.random(len(locations)) > 0.3]  # 70% chance of fire
+        n = len(burning)
+        today = np.datetime64(datetime.now().strftime("%Y-%m-%d"), "m")
+        return FireDetections.from_columns(
+            latitude=burning[:, 0] + np.random.uniform(-0.1, 0.1, n),
+            longitude=burning[:, 1] + np.random.uniform(-0.1, 0.1, n),
+            brightness=np.random.uniform(300, 400, n),
+            confidence=np.random.randint(70, 95, n),
+            acq_datetime=today + np.random.randint(0, 24 * 60, n).astype("m8[m]"),
+            satellite=np.full(n, b"N"),
+            daynight=np.full(n, b"D")
+        )
 
-    async def get_fire_statistics(self, country: str = "IND") -> Dict:
-        """Get fire statistics for country"""
-        fires = await self.get_active_fires(country)
-        
-        if not fires:
+    async def get_fire_statistics(self, country: str = "IND", fires: Optional[FireDetections] = None) -> Dict:
+        """Get fire statistics for country, reusing already-fetched detections when given"""
+        if fires is None:
+            fires = await self.get_active_fires(country)
+        return self.summarize_fires(fires)
+
+    def summarize_fires(self, fires: FireDetections) -> Dict:
+        """Compute fire statistics from columnar detections"""
+        if not len(fires):
             return {"total_fires": 0, "high_confidence": 0, "regions": []}
         
-        total_fires = len(fires)
-        high_confidence = len([f for f in fires if int(f.get("confidence", 0)) > 80])
-        
         # Group by regions (simplified)
-        regions = {}
-        for fire in fires:
-            lat = float(fire.get("latitude", 0))
-            if lat > 25:
-                region = "Northern India"
-            elif lat > 15:
-                region = "Central India"
-            else:
-                region = "Southern India"
-                
-            regions[region] = regions.get(region, 0) + 1
+        lat = fires["latitude"]
+        region_names = ["Northern India", "Central India", "Southern India"]
+        region_idx = np.select([lat > 25, lat > 15], [0, 1], default=2)
+        counts = np.bincount(region_idx, minlength=3)
         
         return {
-            "total_fires": total_fires,
-            "high_confidence": high_confidence,
-            "regions": [{"name": k, "count": v} for k, v in regions.items()],
+            "total_fires": len(fires),
+            "high_confidence": int(np.count_nonzero(fires["confidence"] > 80)),
+            "regions": [{"name": region_names[i], "count": int(counts[i])} for i in range(3) if counts[i]],
+            "total_frp_mw": round(float(fires["frp"].sum(dtype=np.float64)), 1),
             "last_updated": datetime.now().isoformat()
-        }
\ No newline at end of file
+        }
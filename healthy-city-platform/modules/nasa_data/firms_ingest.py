@@ -0,0 +1,123 @@
+"""
+Incremental FIRMS ingestion daemon
+Polls FIRMS per sensor on its own schedule and appends only unseen detections to the local store
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config.nasa_apis import FIRMS_INGEST
+from .firms_client import FIRMSClient
+from .fire_store import FireDetectionStore
+from .fire_events import FireEventTracker
+from .firms_parser import FireDetections
+
+
+class FIRMSIngestor:
+    """Background job that keeps the FireDetectionStore current"""
+
+    def __init__(self, client: FIRMSClient, store: FireDetectionStore, settings: Optional[Dict] = None,
+                 tracker: Optional[FireEventTracker] = None):
+        self.client = client
+        self.store = store
+        self.tracker = tracker
+        self.settings = {**FIRMS_INGEST, **(settings or {})}
+        self._tasks: List[asyncio.Task] = []
+        self._last_compaction: Dict[str, datetime] = {}
+        self.last_run: Dict[str, Dict] = {}
+
+    def window_days(self, sensor: str) -> int:
+        """Smallest FIRMS day range that still covers everything after the watermark"""
+        watermark = self.store.watermark(sensor)
+        max_days = self.settings["max_window_days"]
+        if watermark is None:
+            return max_days
+        today = np.datetime64(datetime.utcnow().date(), "D")
+        # FIRMS day ranges end today, so include the watermark's own day to catch late rows
+        gap = int((today - watermark.astype("M8[D]")).astype(int)) + 1
+        return max(1, min(max_days, gap))
+
+    async def poll_once(self, sensor: str) -> Dict:
+        """Fetch the window after the watermark, dedupe and append"""
+        days = self.window_days(sensor)
+        detections = await self.client.download_active_fires(self.settings["country"], days, sensor)
+        watermark = self.store.watermark(sensor)
+        if watermark is not None:
+            # Whole earlier days are already stored; keep the watermark day for late arrivals
+            detections = detections.filter(detections["acq_datetime"] >= watermark.astype("M8[D]"))
+        new_rows = await asyncio.to_thread(self.store.append, sensor, detections)
+        events = await asyncio.to_thread(self._track, sensor, new_rows) if self.tracker else None
+
+        compacted = None
+        if self._compaction_due(sensor):
+            compacted = await asyncio.to_thread(self.store.compact, sensor, self.settings["retention_days"])
+            self._last_compaction[sensor] = datetime.utcnow()
+
+        result = {
+            "sensor": sensor,
+            "window_days": days,
+            "downloaded": len(detections),
+            "added": len(new_rows),
+            "events": events,
+            "compacted": compacted,
+            "finished_at": datetime.now().isoformat()
+        }
+        self.last_run[sensor] = result
+        return result
+
+    def _track(self, sensor: str, new_rows: FireDetections) -> Dict:
+        """Feed new rows to the event tracker; a sensor it has never seen is seeded from the store's recent rows
+
+        Only rows within close_after_hours of the sensor's watermark can
+        still belong to an active event, so older segments are not read.
+        """
+        if sensor not in self.tracker.sensors_seen:
+            watermark = self.store.watermark(sensor)
+            if watermark is not None:
+                new_rows = self.store.read([sensor], since=watermark - self.tracker.link_window())
+        return self.tracker.update(sensor, new_rows)
+
+    def _compaction_due(self, sensor: str) -> bool:
+        """Compact when segments pile up, and at least daily so retention is applied"""
+        if self.store.segment_count(sensor) >= self.settings["compact_after_segments"]:
+            return True
+        last = self._last_compaction.get(sensor)
+        return last is None or (datetime.utcnow() - last).total_seconds() > 86400
+
+    async def run_sensor(self, sensor: str, interval_s: float):
+        """Poll one sensor forever; errors are logged and retried next interval"""
+        while True:
+            try:
+                await self.poll_once(sensor)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"FIRMS ingest error ({sensor}): {e}")
+                self.last_run[sensor] = {"sensor": sensor, "error": str(e), "finished_at": datetime.now().isoformat()}
+            await asyncio.sleep(interval_s)
+
+    def start(self):
+        """Start one polling task per configured sensor"""
+        if self._tasks:
+            return
+        for sensor, options in self.settings["sensors"].items():
+            task = asyncio.create_task(self.run_sensor(sensor, options["poll_interval_s"]))
+            self._tasks.append(task)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def status(self) -> Dict:
+        return {
+            "running": bool(self._tasks),
+            "sensors": {s: o["poll_interval_s"] for s, o in self.settings["sensors"].items()},
+            "last_run": self.last_run,
+            "store": self.store.stats(),
+            "events": self.tracker.stats() if self.tracker else None
+        }
@@ -0,0 +1,217 @@
+"""
+Streaming columnar parser for NASA FIRMS CSV
+Decodes detections into a typed NumPy structured array while the body downloads
+"""
+
+import io
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# One row per detection; ~36 bytes instead of a dict of strings
+FIRE_DTYPE = np.dtype([
+    ("latitude", "f4"),
+    ("longitude", "f4"),
+    ("brightness", "f4"),      # bright_ti4 (VIIRS) or brightness (MODIS), Kelvin
+    ("scan", "f4"),
+    ("track", "f4"),
+    ("frp", "f4"),             # fire radiative power, MW
+    ("acq_datetime", "M8[m]"), # acq_date + acq_time, UTC
+    ("confidence", "u1"),      # percent; VIIRS l/n/h mapped below
+    ("satellite", "S8"),
+    ("daynight", "S1")
+])
+
+# VIIRS reports low/nominal/high classes instead of a percentage
+VIIRS_CONFIDENCE = {"l": 30, "n": 60, "h": 90}
+
+# FIRMS column name -> FIRE_DTYPE field
+COLUMN_ALIASES = {
+    "latitude": "latitude",
+    "longitude": "longitude",
+    "bright_ti4": "brightness",
+    "brightness": "brightness",
+    "scan": "scan",
+    "track": "track",
+    "frp": "frp",
+    "acq_date": "acq_date",
+    "acq_time": "acq_time",
+    "confidence": "confidence",
+    "satellite": "satellite",
+    "daynight": "daynight"
+}
+
+READ_DTYPES = {
+    "latitude": "float32", "longitude": "float32", "brightness": "float32",
+    "scan": "float32", "track": "float32", "frp": "float32",
+    "acq_date": "category", "acq_time": "Int32", "confidence": "category",
+    "satellite": "category", "daynight": "category"
+}
+
+
+class FireDetections:
+    """Columnar set of FIRMS detections backed by a structured array"""
+
+    def __init__(self, data: Optional[np.ndarray] = None):
+        self.data = data if data is not None else np.empty(0, dtype=FIRE_DTYPE)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.data[field]
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    @classmethod
+    def concat(cls, parts: Iterable["FireDetections"]) -> "FireDetections":
+        arrays = [p.data for p in parts if len(p)]
+        if not arrays:
+            return cls()
+        return cls(np.concatenate(arrays))
+
+    @classmethod
+    def from_columns(cls, **columns) -> "FireDetections":
+        """Build from equal-length column arrays named after FIRE_DTYPE fields"""
+        size = len(next(iter(columns.values()))) if columns else 0
+        data = np.zeros(size, dtype=FIRE_DTYPE)
+        for name, values in columns.items():
+            data[name] = values
+        return cls(data)
+
+    def filter(self, mask: np.ndarray) -> "FireDetections":
+        return FireDetections(self.data[mask])
+
+    def page(self, offset: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        """Slice of detections as JSON-ready records"""
+        stop = len(self.data) if limit is None else offset + limit
+        return self.to_records(self.data[offset:stop])
+
+    @staticmethod
+    def to_records(rows: np.ndarray) -> List[Dict]:
+        """Convert structured rows to the FIRMS-style dicts the frontend consumes"""
+        stamps = rows["acq_datetime"].astype(str)
+        lat = rows["latitude"].astype("f8").round(5).tolist()
+        lon = rows["longitude"].astype("f8").round(5).tolist()
+        brightness = rows["brightness"].astype("f8").round(2).tolist()
+        frp = rows["frp"].astype("f8").round(2).tolist()
+        confidence = rows["confidence"].tolist()
+        satellite = np.char.decode(rows["satellite"]).tolist()
+        daynight = np.char.decode(rows["daynight"]).tolist()
+        return [
+            {
+                "latitude": lat[i],
+                "longitude": lon[i],
+                "brightness": brightness[i],
+                "frp": frp[i],
+                "confidence": confidence[i],
+                "acq_date": stamps[i][:10],
+                "acq_time": stamps[i][11:13] + stamps[i][14:16],
+                "satellite": satellite[i],
+                "daynight": daynight[i]
+            }
+            for i in range(len(rows))
+        ]
+
+
+class FIRMSStreamParser:
+    """Incremental FIRMS CSV decoder
+
+    Feed raw body chunks as they arrive; complete lines are decoded in blocks
+    with the pandas C parser and appended to typed arrays, so the full text is
+    never held in memory and no per-row Python objects are created.
+    """
+
+    def __init__(self, block_bytes: int = 1 << 20):
+        self.block_bytes = block_bytes
+        self._header: Optional[List[str]] = None
+        self._buffer = bytearray()
+        self._parts: List[np.ndarray] = []
+        self.rows = 0
+
+    def feed(self, chunk: bytes):
+        self._buffer.extend(chunk)
+        if self._header is None:
+            newline = self._buffer.find(b"\n")
+            if newline < 0:
+                return
+            self._header = [h.strip() for h in self._buffer[:newline].decode().split(",")]
+            if "latitude" not in self._header or "longitude" not in self._header:
+                raise ValueError(f"Not a FIRMS CSV response: {bytes(self._buffer[:min(newline, 80)]).decode(errors='replace')!r}")
+            del self._buffer[:newline + 1]
+        if len(self._buffer) >= self.block_bytes:
+            cut = self._buffer.rfind(b"\n") + 1
+            if cut:
+                self._decode(bytes(self._buffer[:cut]))
+                del self._buffer[:cut]
+
+    def close(self) -> FireDetections:
+        """Decode any trailing rows and return all detections"""
+        if self._header is None and self._buffer.strip():
+            self.feed(b"\n")  # header-only body without a trailing newline
+        if self._header is not None and self._buffer.strip():
+            self._decode(bytes(self._buffer))
+        self._buffer = bytearray()
+        if not self._parts:
+            return FireDetections()
+        data = self._parts[0] if len(self._parts) == 1 else np.concatenate(self._parts)
+        self._parts = [data]
+        return FireDetections(data)
+
+    def _decode(self, block: bytes):
+        names = [COLUMN_ALIASES.get(h, f"_{i}") for i, h in enumerate(self._header)]
+        wanted = [n for n in names if not n.startswith("_")]
+        frame = pd.read_csv(
+            io.BytesIO(block),
+            header=None,
+            names=names,
+            usecols=wanted,
+            dtype={n: READ_DTYPES[n] for n in wanted},
+            skip_blank_lines=True,
+            engine="c"
+        )
+        frame = frame.dropna(subset=["latitude", "longitude"])
+        out = np.zeros(len(frame), dtype=FIRE_DTYPE)
+        for name in ("latitude", "longitude", "brightness", "scan", "track", "frp"):
+            if name in frame:
+                out[name] = np.nan_to_num(frame[name].to_numpy())
+        # Low-cardinality text columns are decoded once per distinct value;
+        # the extra trailing entry absorbs missing values (category code -1)
+        if "acq_date" in frame:
+            dates = frame["acq_date"].cat
+            day_values = pd.to_datetime(dates.categories, format="%Y-%m-%d").to_numpy().astype("M8[m]")
+            day_values = np.append(day_values, np.datetime64("NaT", "m"))
+            hhmm = frame["acq_time"].fillna(0).to_numpy().astype("i4") if "acq_time" in frame else 0
+            out["acq_datetime"] = day_values[dates.codes.to_numpy()] + ((hhmm // 100) * 60 + hhmm % 100).astype("m8[m]")
+        if "confidence" in frame:
+            levels = frame["confidence"].cat
+            level_values = np.array([_confidence_percent(c) for c in levels.categories] + [0], dtype="u1")
+            out["confidence"] = level_values[levels.codes.to_numpy()]
+        for name in ("satellite", "daynight"):
+            if name in frame:
+                labels = frame[name].cat
+                label_values = np.array([str(c) for c in labels.categories] + [""], dtype=FIRE_DTYPE[name])
+                out[name] = label_values[labels.codes.to_numpy()]
+        self._parts.append(out)
+        self.rows += len(out)
+
+
+def _confidence_percent(value) -> int:
+    """Map a FIRMS confidence value (VIIRS class or MODIS percent) to 0-100"""
+    text = str(value).strip()
+    if text in VIIRS_CONFIDENCE:
+        return VIIRS_CONFIDENCE[text]
+    try:
+        return int(min(100, max(0, float(text))))
+    except ValueError:
+        return 0
+
+
+def parse_firms_csv(csv_data: str) -> FireDetections:
+    """Parse a complete FIRMS CSV body in one call"""
+    parser = FIRMSStreamParser()
+    parser.feed(csv_data.encode())
+    return parser.close()
@@ -0,0 +1,16 @@
+"""
+Shared geodesy helpers
+Earth radius and the lon/lat to Cartesian mapping used by the KD-tree searches over points
+"""
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def to_xyz(lat, lon) -> np.ndarray:
+    """Positions on a sphere of Earth radius; chord length matches great-circle distance at city and fire scales"""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return EARTH_RADIUS_KM * np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
@@ -3,15 +3,38 @@ NASA GRACE (Gravity Recovery and Climate Experiment) Client
 Groundwater and water mass change monitoring
 """
 
-import requests
+import asyncio
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-from config.nasa_apis import NASA_API_KEY
+from config.nasa_apis import CUBE_STORE, GRACE_GRID, NASA_API_KEY, REGIONS
+from .cube_store import CubeStore, get_cube_store
+from .grace_grid import GraceGrid, get_grace_grid
+from .http_client import NASAHttpClient, get_http_client
+from .regions import get_region_masks
+from .simulation import DayLike, as_day, simulator
+
+# Regional groundwater trends in cm/year (based on real GRACE findings), used by the simulation
+REGIONAL_TRENDS = {
+    "north_india": -2.5,   # severe depletion
+    "central_india": -1.2,  # moderate depletion
+    "south_india": -0.8,   # mild depletion
+    "coastal": 0.2,        # slight increase
+    "himalayan": 0.5       # increase from glacial melt
+}
+
+DROUGHT_LEVELS = ["Extreme", "High", "Moderate", "Low"]
+DROUGHT_SCORES = [90, 75, 50, 25]
+NORMAL_STATUSES = ["Much above normal", "Above normal", "Near normal", "Below normal", "Much below normal"]
+
 
 class GRACEClient:
-    def __init__(self, api_key: str = NASA_API_KEY):
+    def __init__(self, api_key: str = NASA_API_KEY, http: Optional[NASAHttpClient] = None,
+                 cubes: Optional[CubeStore] = None, grid: Optional[GraceGrid] = None):
         self.api_key = api_key
+        self.http = http or get_http_client()
+        self.cubes = cubes or get_cube_store()
+        self.grid = grid or (get_grace_grid() if cubes is None else GraceGrid(cubes))
         self.base_url = "https://grace.jpl.nasa.gov/data"
         
     async def get_groundwater_data(self, lat: float, lon: float) -> Dict:
@@ -28,111 +51,208 @@ class GRACEClient:
         return self._simulate_grace_data(lat, lon)
     
     async def _fetch_real_grace_data(self, lat: float, lon: float) -> Optional[Dict]:
-        """Fetch real GRACE data from NASA JPL"""
-        # This would require NASA JPL GRACE data access
-        return None
+        """Interpolate the ingested GRACE/GRACE-FO mascon grid at the location"""
+        # The first lookup after an ingest exports the whole cube, so keep it off the event loop
+        batch = await asyncio.to_thread(self._grid_batch, np.array([lat]), np.array([lon]))
+        if batch is None or np.isnan(batch["current_anomaly_mm"][0]):
+            return None
+        return self._point_result(batch, 0, lat, lon)
     
-    def _simulate_grace_data(self, lat: float, lon: lon) -> Dict:
-        """Simulate GRACE groundwater data based on regional patterns"""
-        
-        # Regional groundwater trends (based on real GRACE findings)
-        regional_trends = {
-            "north_india": -2.5,  # cm/year (severe depletion)
-            "central_india": -1.2,  # cm/year (moderate depletion)
-            "south_india": -0.8,   # cm/year (mild depletion)
-            "coastal": 0.2,        # cm/year (slight increase)
-            "himalayan": 0.5       # cm/year (increase from glacial melt)
+    def get_groundwater_batch(self, lat, lon, day: DayLike = None) -> Dict:
+        """Columnar TWS summaries and series for many points; the grid when ingested, else the simulation"""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        try:
+            batch = self._grid_batch(lat, lon)
+            if batch is not None:
+                return batch
+        except Exception as e:
+            print(f"GRACE grid error: {e}")
+        return self._simulate_batch(lat, lon, day)
+    
+    def _grid_batch(self, lat: np.ndarray, lon: np.ndarray) -> Optional[Dict]:
+        """Trend, mean seasonal cycle and latest anomaly per point from the interpolated monthly series"""
+        tws = self.grid.interpolate(lat, lon)
+        if tws is None or not len(tws["times"]):
+            return None
+        times, series = tws["times"], tws["values"] * 10  # cm -> mm
+        years = (times - times[0]).astype(np.float64) / 365.25
+        months = times.astype("datetime64[M]").astype(np.int64) % 12
+
+        # Least-squares trend per point over the months it has data for
+        ok = np.isfinite(series)
+        count = np.maximum(ok.sum(axis=1), 1)
+        values = np.where(ok, series, 0.0)
+        year_mean = (ok * years).sum(axis=1) / count
+        value_mean = values.sum(axis=1) / count
+        dx = np.where(ok, years - year_mean[:, None], 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            slope = (dx * (values - value_mean[:, None])).sum(axis=1) / (dx ** 2).sum(axis=1)
+        slope = np.where(np.isfinite(slope), slope, 0.0)
+        trend = value_mean[:, None] + slope[:, None] * (years - year_mean[:, None])
+
+        # Mean departure from the trend for each calendar month
+        in_month = (months[:, None] == np.arange(12)).astype(np.float64)
+        climatology = (np.where(ok, series - trend, 0.0) @ in_month) / np.maximum(ok @ in_month, 1)
+        seasonal = climatology[:, months]
+
+        uncertainty = self.cubes.point("GRACE", "uncertainty", lat, lon, start=times[-1], end=times[-1])
+        uncertainty_mm = np.full(len(lat), np.nan)
+        if uncertainty is not None and len(uncertainty["values"]):
+            uncertainty_mm = uncertainty["values"][0].astype(np.float64) * 10
+        return {
+            "timestamp": datetime.combine(times[-1].item(), datetime.min.time()).isoformat(),
+            "mission": "GRACE/GRACE-FO",
+            "data_type": "Terrestrial Water Storage Anomaly (JPL mascon)",
+            "resolution": "0.5 degree grid (3 degree mascons)",
+            "source": "grid",
+            "dates": times.astype("datetime64[M]").astype(str),
+            "series_mm": series,
+            "trend_mm": trend,
+            "seasonal_mm": seasonal,
+            "current_anomaly_mm": series[:, -1],
+            "trend_cm_per_year": slope / 10,
+            "seasonal_component_mm": seasonal[:, -1],
+            "uncertainty_mm": uncertainty_mm,
+            "region": self._classify_region(lat, lon)
         }
+    
+    def _simulate_batch(self, lat: np.ndarray, lon: np.ndarray, day: DayLike = None) -> Dict:
+        """_simulate_grace_data for arrays of points, as whole-array operations"""
+        day = as_day(day)
+        codes = self._region_codes(lat, lon)
+        region = np.array(list(REGIONAL_TRENDS), dtype=object)[codes]
+        base_trend = np.array(list(REGIONAL_TRENDS.values()))[codes]
         
-        # Determine region
-        region = self._classify_region(lat, lon)
-        base_trend = regional_trends.get(region, -1.0)
-        
-        # Current anomaly (deviation from long-term average)
-        current_anomaly = base_trend * 5 + np.random.uniform(-10, 10)  # mm
-        
-        # Seasonal variation
-        month = datetime.now().month
-        seasonal_variation = 20 * np.sin(2 * np.pi * (month - 3) / 12)  # mm
-        
-        total_anomaly = current_anomaly + seasonal_variation
+        # Current anomaly (deviation from long-term average) plus the seasonal variation
+        seasonal_now = float(20 * np.sin(2 * np.pi * (day.month - 3) / 12))  # mm
+        current = base_trend * 5 + simulator.uniform("GRACE_TWS", "anomaly", lat, lon, day, -10, 10) + seasonal_now
         
+        # 24 months ending today: trend, seasonal cycle and noise
+        steps = np.arange(24)
+        dates = [day - timedelta(days=730) + timedelta(days=30 * int(i)) for i in steps]
+        months = np.array([d.month for d in dates])
+        trend_component = base_trend[..., None] * (steps / 12)  # cm over time
+        seasonal = np.broadcast_to(2 * np.sin(2 * np.pi * (months - 3) / 12), trend_component.shape)  # cm
+        noise = simulator.uniform("GRACE_TWS", "series_noise", lat[..., None], lon[..., None], day, -0.5, 0.5,
+                                  index=steps)  # cm
         return {
-            "location": {"lat": lat, "lon": lon},
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.combine(day, datetime.min.time()).isoformat(),
             "mission": "GRACE-FO",
             "data_type": "Groundwater Storage Anomaly",
             "resolution": "1 degree (~111 km)",
-            "current_anomaly_mm": round(total_anomaly, 1),
-            "trend_cm_per_year": round(base_trend, 2),
-            "region": region,
-            "seasonal_component_mm": round(seasonal_variation, 1),
+            "source": "simulated",
+            "dates": np.array([d.strftime("%Y-%m") for d in dates]),
+            "series_mm": (trend_component + seasonal + noise) * 10,  # Convert to mm
+            "trend_mm": trend_component * 10,
+            "seasonal_mm": seasonal * 10,
+            "current_anomaly_mm": current,
+            "trend_cm_per_year": base_trend,
+            "seasonal_component_mm": np.full(np.shape(lat), seasonal_now),
+            "uncertainty_mm": simulator.uniform("GRACE_TWS", "uncertainty", lat, lon, day, 5, 15),
+            "region": region
+        }
+    
+    def _simulate_grace_data(self, lat: float, lon: float, day: DayLike = None) -> Dict:
+        """Simulate GRACE groundwater data based on regional patterns; deterministic per location and day"""
+        return self._point_result(self._simulate_batch(np.array([lat]), np.array([lon]), day), 0, lat, lon)
+    
+    def batch_results(self, batch: Dict, lat: np.ndarray, lon: np.ndarray, include_series: bool = False) -> Dict:
+        """JSON form of a batch: shared metadata plus one compact record per point (None where no data)"""
+        column = lambda name, digits: [None if np.isnan(v) else v for v in np.round(batch[name], digits).tolist()]
+        anomaly, trend = batch["current_anomaly_mm"], batch["trend_cm_per_year"]
+        records = {
+            "current_anomaly_mm": column("current_anomaly_mm", 1),
+            "trend_cm_per_year": column("trend_cm_per_year", 2),
+            "seasonal_component_mm": column("seasonal_component_mm", 1),
+            "uncertainty_mm": column("uncertainty_mm", 1),
+            "region": batch["region"].tolist(),
+            "drought_risk": np.array(DROUGHT_LEVELS, dtype=object)[self.drought_levels(anomaly, trend)].tolist(),
+            "comparison_to_normal": np.array(NORMAL_STATUSES, dtype=object)[self.normal_status(anomaly)].tolist()
+        }
+        result = {
+            "timestamp": batch["timestamp"],
+            "mission": batch["mission"],
+            "data_type": batch["data_type"],
+            "resolution": batch["resolution"],
+            "source": batch["source"],
+            "count": len(lat)
+        }
+        if include_series:
+            recent = slice(-GRACE_GRID["series_months"], None)
+            result["dates"] = batch["dates"][recent].tolist()
+            series = np.round(batch["series_mm"][:, recent], 1)
+            records["anomaly_series_mm"] = [[None if np.isnan(v) else v for v in row] for row in series.tolist()]
+        names = list(records)
+        result["results"] = [
+            dict(location={"lat": la, "lon": lo}, **dict(zip(names, values)))
+            for la, lo, *values in zip(lat.tolist(), lon.tolist(), *records.values())
+        ]
+        return result
+    
+    def _point_result(self, batch: Dict, i: int, lat: float, lon: float) -> Dict:
+        """Single-location response from row i of a batch"""
+        anomaly = float(batch["current_anomaly_mm"][i])
+        trend = float(batch["trend_cm_per_year"][i])
+        uncertainty = float(batch["uncertainty_mm"][i])
+        recent = slice(-GRACE_GRID["series_months"], None)
+        return {
+            "location": {"lat": lat, "lon": lon},
+            "timestamp": batch["timestamp"],
+            "mission": batch["mission"],
+            "data_type": batch["data_type"],
+            "resolution": batch["resolution"],
+            "current_anomaly_mm": round(anomaly, 1),
+            "trend_cm_per_year": round(trend, 2),
+            "region": str(batch["region"][i]),
+            "seasonal_component_mm": round(float(batch["seasonal_component_mm"][i]), 1),
             "data_quality": "Good",
-            "uncertainty_mm": np.random.uniform(5, 15),
-            "time_series": self._generate_grace_time_series(base_trend, lat, lon),
-            "drought_indicator": self._assess_drought_risk(total_anomaly, base_trend),
-            "comparison_to_normal": self._compare_to_normal(total_anomaly)
+            "uncertainty_mm": None if np.isnan(uncertainty) else round(uncertainty, 1),
+            "time_series": [
+                {
+                    "date": str(d),
+                    "anomaly_mm": round(float(total), 1),
+                    "trend_component_mm": round(float(t), 1),
+                    "seasonal_component_mm": round(float(s), 1)
+                }
+                for d, total, t, s in zip(batch["dates"][recent], batch["series_mm"][i, recent],
+                                          batch["trend_mm"][i, recent], batch["seasonal_mm"][i, recent])
+            ],
+            "drought_indicator": self._assess_drought_risk(anomaly, trend),
+            "comparison_to_normal": self._compare_to_normal(anomaly)
         }
     
-    def _classify_region(self, lat: float, lon: float) -> str:
-        """Classify region for groundwater patterns"""
-        if lat > 28:
-            return "himalayan"
-        elif lat > 23 and 74 < lon < 80:
-            return "north_india"
-        elif 15 < lat < 23:
-            return "central_india"
-        elif abs(lon - 72.8) < 2 or abs(lon - 80.2) < 2:  # Near coasts
-            return "coastal"
-        else:
-            return "south_india"
-    
-    def _generate_grace_time_series(self, trend: float, lat: float, lon: float) -> List[Dict]:
-        """Generate 24-month GRACE time series"""
-        time_series = []
-        base_date = datetime.now() - timedelta(days=730)  # 2 years ago
-        
-        for i in range(24):
-            date = base_date + timedelta(days=30*i)
-            
-            # Trend component
-            trend_component = trend * (i / 12)  # cm over time
-            
-            # Seasonal component
-            seasonal = 2 * np.sin(2 * np.pi * (date.month - 3) / 12)  # cm
-            
-            # Random variation
-            noise = np.random.uniform(-0.5, 0.5)  # cm
-            
-            total_change = (trend_component + seasonal + noise) * 10  # Convert to mm
-            
-            time_series.append({
-                "date": date.strftime("%Y-%m"),
-                "anomaly_mm": round(total_change, 1),
-                "trend_component_mm": round(trend_component * 10, 1),
-                "seasonal_component_mm": round(seasonal * 10, 1)
-            })
-        
-        return time_series
+    def _region_codes(self, lat, lon) -> np.ndarray:
+        """Index into REGIONAL_TRENDS per point"""
+        lat, lon = np.asarray(lat), np.asarray(lon)
+        return np.select(
+            [lat > 28, (lat > 23) & (74 < lon) & (lon < 80), (15 < lat) & (lat < 23),
+             (np.abs(lon - 72.8) < 2) | (np.abs(lon - 80.2) < 2)],  # Near coasts
+            [4, 0, 1, 3],
+            default=2
+        )
+    
+    def _classify_region(self, lat, lon) -> np.ndarray:
+        """Classify region for groundwater patterns; lat/lon may be arrays"""
+        return np.array(list(REGIONAL_TRENDS), dtype=object)[self._region_codes(lat, lon)]
+    
+    def drought_levels(self, anomaly, trend) -> np.ndarray:
+        """Index into DROUGHT_LEVELS per point"""
+        anomaly, trend = np.asarray(anomaly), np.asarray(trend)
+        return np.select([(anomaly < -30) & (trend < -1.5), (anomaly < -20) & (trend < -1.0),
+                          (anomaly < -10) | (trend < -0.5)], [0, 1, 2], default=3)
+    
+    def normal_status(self, anomaly) -> np.ndarray:
+        """Index into NORMAL_STATUSES per point"""
+        anomaly = np.asarray(anomaly)
+        return np.select([anomaly > 20, anomaly > 10, anomaly > -10, anomaly > -20], [0, 1, 2, 3], default=4)
     
     def _assess_drought_risk(self, anomaly: float, trend: float) -> Dict:
         """Assess drought risk based on GRACE data"""
-        if anomaly < -30 and trend < -1.5:
-            risk_level = "Extreme"
-            risk_score = 90
-        elif anomaly < -20 and trend < -1.0:
-            risk_level = "High"
-            risk_score = 75
-        elif anomaly < -10 or trend < -0.5:
-            risk_level = "Moderate"
-            risk_score = 50
-        else:
-            risk_level = "Low"
-            risk_score = 25
-        
+        level = int(self.drought_levels(anomaly, trend))
         return {
-            "risk_level": risk_level,
-            "risk_score": risk_score,
+            "risk_level": DROUGHT_LEVELS[level],
+            "risk_score": DROUGHT_SCORES[level],
             "indicators": {
                 "groundwater_depletion": trend < -1.0,
                 "below_normal_storage": anomaly < -15,
@@ -142,20 +262,10 @@ class GRACEClient:
     
     def _compare_to_normal(self, anomaly: float) -> Dict:
         """Compare current conditions to normal"""
-        if anomaly > 20:
-            status = "Much above normal"
-        elif anomaly > 10:
-            status = "Above normal"
-        elif anomaly > -10:
-            status = "Near normal"
-        elif anomaly > -20:
-            status = "Below normal"
-        else:
-            status = "Much below normal"
-        
+        status = NORMAL_STATUSES[int(self.normal_status(anomaly))]
         return {
             "status": status,
-            "percentile": max(5, min(95, 50 + anomaly * 1.5)),
+            "percentile": round(max(5, min(95, 50 + anomaly * 1.5)), 1),
             "description": self._get_status_description(status)
         }
     
@@ -172,13 +282,93 @@ class GRACEClient:
     
     async def get_regional_water_balance(self, region: str) -> Dict:
         """Get regional water balance from GRACE"""
+        try:
+            # Rasterizes the region masks and reads the full grid on first use
+            balance = await asyncio.to_thread(self._grid_water_balance, region)
+            if balance:
+                return balance
+        except Exception as e:
+            print(f"GRACE regional balance error: {e}")
+        return self._simulate_water_balance(region)
+
+    def _grid_water_balance(self, region: str) -> Optional[Dict]:
+        """Storage trends from the area-weighted regional mean of the GRACE grid (and SMAP, when ingested)
+
+        Soil moisture is the SMAP top-layer trend; the rest of the storage
+        change (groundwater, surface water and snow/ice together) is reported
+        as groundwater, since GRACE alone cannot separate them.
+        """
+        if not self.grid.load():
+            return None
+        masks = get_region_masks(self.grid.grid)
+        k = masks.index(region)
+        if k is None:
+            return None
+        times = self.grid.times
+        tws = masks.means(self.grid.values)[k] * 10  # cm -> mm
+        ok = np.isfinite(tws)
+        if ok.sum() < 2:
+            return None
+        years = (times - times[0]).astype(np.float64) / 365.25
+        total = np.polyfit(years[ok], tws[ok], 1)[0]
+
+        components = {"groundwater_change": total, "total_water_storage_change": total}
+        soil = self._regional_soil_moisture_trend(region, times[0], times[-1])
+        if soil is not None:
+            components["soil_moisture_change"] = soil
+            components["groundwater_change"] = total - soil
+        components = {name: round(float(value), 2) for name, value in components.items()}
+        months = times.astype("datetime64[M]").astype(str)
+        recent = slice(-GRACE_GRID["series_months"], None)
+        return {
+            "region": region,
+            "region_name": masks.names[k],
+            "area_km2": round(float(masks.area_km2[k]), 1),
+            "time_period": f"{months[0]} to {months[-1]}",
+            "water_balance_components": components,
+            "dominant_signal": self._identify_dominant_signal(components),
+            "monthly_anomaly_mm": [{"month": m, "value": None if np.isnan(v) else round(float(v), 1)}
+                                   for m, v in zip(months[recent], tws[recent])],
+            "climate_drivers": [
+                "Monsoon variability",
+                "Temperature increase",
+                "Precipitation changes"
+            ],
+            "source": "grid"
+        }
+
+    def _regional_soil_moisture_trend(self, region: str, start, end) -> Optional[float]:
+        """SMAP soil water trend (mm/year) over the region's mask on the SMAP grid; None when not ingested"""
+        cube = self.cubes.cube("SMAP", "soil_moisture")
+        if cube is None:
+            return None
+        masks = get_region_masks(cube.manifest["grid"])
+        k = masks.index(region)
+        times, slots = cube.slots(start, end)
+        if k is None or len(slots) < 2:
+            return None
+        soil = masks.cube_means(cube, slots)[k] * REGIONS["soil_depth_mm"]
+        ok = np.isfinite(soil)
+        if ok.sum() < 2:
+            return None
+        years = (times - times[0]).astype(np.float64) / 365.25
+        return float(np.polyfit(years[ok], soil[ok], 1)[0])
+
+    def regions(self) -> List[Dict]:
+        """Regions with polygons and their area on the GRACE grid"""
+        return get_region_masks(CUBE_STORE["products"]["GRACE"]["grid"]).describe()
+
+    def _simulate_water_balance(self, region: str) -> Dict:
+        """Simulated water balance for a region name"""
+        # Keyed by region name instead of a location; fixed for the 2020-2024 period
+        sim = simulator.point(f"GRACE_BALANCE:{region}", 0.0, 0.0, "2024-01-01")
         
         # Simulate regional water balance components
         components = {
-            "groundwater_change": np.random.uniform(-50, 20),  # mm/year
-            "surface_water_change": np.random.uniform(-20, 30),  # mm/year
-            "soil_moisture_change": np.random.uniform(-10, 15),  # mm/year
-            "snow_ice_change": np.random.uniform(-5, 10) if region in ["himalayan", "north_india"] else 0,
+            "groundwater_change": sim.uniform("groundwater", -50, 20),  # mm/year
+            "surface_water_change": sim.uniform("surface_water", -20, 30),  # mm/year
+            "soil_moisture_change": sim.uniform("soil_moisture", -10, 15),  # mm/year
+            "snow_ice_change": sim.uniform("snow_ice", -5, 10) if region in ["himalayan", "north_india"] else 0,
             "total_water_storage_change": 0  # Will be calculated
         }
         
@@ -196,9 +386,9 @@ class GRACEClient:
             "water_balance_components": components,
             "dominant_signal": self._identify_dominant_signal(components),
             "human_impact": {
-                "irrigation_withdrawal": np.random.uniform(20, 100),  # mm/year
-                "urban_consumption": np.random.uniform(5, 30),  # mm/year
-                "industrial_use": np.random.uniform(2, 20)  # mm/year
+                "irrigation_withdrawal": sim.uniform("irrigation", 20, 100),  # mm/year
+                "urban_consumption": sim.uniform("urban", 5, 30),  # mm/year
+                "industrial_use": sim.uniform("industrial", 2, 20)  # mm/year
             },
             "climate_drivers": [
                 "Monsoon variability",
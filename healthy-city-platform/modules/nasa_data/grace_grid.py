@@ -0,0 +1,131 @@
+"""
+Memory-mapped GRACE/GRACE-FO water storage grid
+One (row, col, month) float32 array exported from the ingested mascon cube, with vectorized bilinear lookup
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config.nasa_apis import GRACE_GRID
+from .cube_store import CubeStore, get_cube_store
+
+
+class GraceGrid:
+    """GRACE liquid-water-equivalent thickness (cm) on the mascon cube's grid
+
+    The cube keeps time-major chunks for the other readers; this export puts
+    each cell's whole monthly series in one contiguous run, so a lookup reads
+    four short runs per location from the page cache instead of a chunk per
+    time block. The export is rebuilt when the cube changes.
+    """
+
+    def __init__(self, cubes: Optional[CubeStore] = None, directory: str = GRACE_GRID["dir"]):
+        self.cubes = cubes or get_cube_store()
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._version: Optional[List] = None
+        self.values: Optional[np.memmap] = None
+        self.times = np.empty(0, dtype="datetime64[D]")
+        self.grid: List[float] = []
+
+    @property
+    def _array_path(self) -> str:
+        return os.path.join(self.directory, "lwe_thickness.npy")
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, "lwe_thickness.json")
+
+    def load(self) -> bool:
+        """Map the export, building it first if the cube has changed; False when no GRACE data is ingested"""
+        cube = self.cubes.cube("GRACE", "lwe_thickness")
+        if cube is None:
+            return False
+        version = list(cube.version())
+        with self._lock:
+            if version == self._version:
+                return True
+            try:
+                with open(self._meta_path) as f:
+                    meta = json.load(f)
+            except FileNotFoundError:
+                meta = {}
+            if meta.get("version") != version or not os.path.exists(self._array_path):
+                meta = self.build(cube, version)
+            self.values = np.load(self._array_path, mmap_mode="r")
+            self.times = np.array(meta["times"], dtype="datetime64[D]")
+            self.grid = meta["grid"]
+            self._version = version
+        return True
+
+    def build(self, cube, version: List) -> Dict:
+        """Export the cube as (row, col, month), one band of chunk rows at a time"""
+        os.makedirs(self.directory, exist_ok=True)
+        times, slots = cube.slots()
+        rows, cols = cube.shape
+        tmp = f"{self._array_path}.{os.getpid()}.tmp"
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(rows, cols, len(times)))
+        band = cube.chunk_shape[1]
+        for r0 in range(0, rows, band):
+            r1 = min(rows, r0 + band)
+            out[r0:r1] = cube.read(np.arange(r0, r1), np.arange(cols), slots).transpose(1, 2, 0)
+        out.flush()
+        del out
+        os.replace(tmp, self._array_path)
+        meta = {"version": version, "grid": cube.manifest["grid"], "times": [str(t) for t in times]}
+        with open(self._meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(self._meta_path + ".tmp", self._meta_path)
+        return meta
+
+    def interpolate(self, lat, lon) -> Optional[Dict]:
+        """Bilinear TWS series (N, T) in cm between the four surrounding cell centres
+
+        Missing corners are left out and the remaining weights renormalized;
+        longitudes wrap on a global grid and latitudes clamp at the poles.
+        """
+        if not self.load():
+            return None
+        values = self.values
+        min_lon, min_lat, max_lon, max_lat, size = self.grid
+        rows, cols, _ = values.shape
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+
+        y = np.clip((lat - min_lat) / size - 0.5, 0, rows - 1)
+        r0 = np.minimum(np.floor(y).astype(np.int64), rows - 2)
+        wy = y - r0
+        x = (lon - min_lon) / size - 0.5
+        if round((max_lon - min_lon) / size) == cols and max_lon - min_lon >= 360:
+            x = np.mod(x, cols)
+            c0 = np.floor(x).astype(np.int64)
+            c1 = (c0 + 1) % cols
+        else:
+            x = np.clip(x, 0, cols - 1)
+            c0 = np.minimum(np.floor(x).astype(np.int64), cols - 2)
+            c1 = c0 + 1
+        wx = x - c0
+
+        total = np.zeros((len(lat), values.shape[2]), dtype=np.float64)
+        weight = np.zeros_like(total)
+        for r, c, w in ((r0, c0, (1 - wy) * (1 - wx)), (r0, c1, (1 - wy) * wx),
+                        (r0 + 1, c0, wy * (1 - wx)), (r0 + 1, c1, wy * wx)):
+            corner = values[r, c]
+            ok = np.isfinite(corner)
+            total += np.where(ok, corner, 0) * w[:, None]
+            weight += ok * w[:, None]
+        with np.errstate(invalid="ignore"):
+            return {"times": self.times, "values": total / weight}
+
+
+# Process-wide instance so every request shares one mapping
+grace_grid = GraceGrid()
+
+
+def get_grace_grid() -> GraceGrid:
+    """Return the shared GRACE grid"""
+    return grace_grid
@@ -0,0 +1,82 @@
+"""
+Shared async HTTP layer for NASA upstream services
+Pooled keep-alive connections, per-host concurrency limits and split timeouts
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from config.nasa_apis import HTTP_SETTINGS
+
+
+class NASAHttpClient:
+    """Non-blocking HTTP client shared by every NASA data client"""
+
+    def __init__(self, settings: Optional[Dict] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.settings = {**HTTP_SETTINGS, **(settings or {})}
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Lazily create the pooled client on first use"""
+        if self._client is None or self._client.is_closed:
+            s = self.settings
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(
+                    connect=s["connect_timeout"],
+                    read=s["read_timeout"],
+                    write=s["write_timeout"],
+                    pool=s["pool_timeout"]
+                ),
+                limits=httpx.Limits(
+                    max_connections=s["max_connections"],
+                    max_keepalive_connections=s["max_keepalive_connections"],
+                    keepalive_expiry=s["keepalive_expiry"]
+                ),
+                transport=self._transport,
+                follow_redirects=True
+            )
+        return self._client
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """Get the concurrency limiter for the URL's host"""
+        host = urlsplit(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            limit = self.settings["host_limits"].get(host, self.settings["per_host_limit"])
+            semaphore = asyncio.Semaphore(limit)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+
+    async def get(self, url: str, params: Optional[Dict] = None, **kwargs) -> httpx.Response:
+        """GET a URL, waiting for a free per-host slot first"""
+        async with self._host_semaphore(url):
+            return await self.client.get(url, params=params, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """Stream a response body; the per-host slot is held until the body is consumed"""
+        async with self._host_semaphore(url):
+            async with self.client.stream(method, url, **kwargs) as response:
+                yield response
+
+    async def aclose(self):
+        """Close pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Process-wide instance shared by all clients so connections are pooled
+http_client = NASAHttpClient()
+
+
+def get_http_client() -> NASAHttpClient:
+    """Return the shared NASA HTTP client"""
+    return http_client
@@ -3,15 +3,51 @@ NASA MODIS (Moderate Resolution Imaging Spectroradiometer) Client
 Vegetation indices and land surface data
 """
 
-import requests
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional
-from config.nasa_apis import NASA_API_KEY
+from config.nasa_apis import MODIS_TILES, NASA_API_KEY
+from .cube_store import CubeStore, get_cube_store
+from .http_client import NASAHttpClient, get_http_client
+from .modis_tiles import RELIABILITY, ModisTileStore, get_modis_tiles
+from .simulation import DayLike, as_day, simulator
+
+# Simulated composites are keyed by composite day alone, so a series never depends on the request date
+SERIES_EPOCH = date(2000, 1, 1)
+
+URBAN_CENTERS = [
+    (28.6139, 77.2090),  # Delhi
+    (19.0760, 72.8777),  # Mumbai
+    (13.0827, 80.2707),  # Chennai
+    (22.5726, 88.3639),  # Kolkata
+    (12.9716, 77.5946)   # Bangalore
+]
+
+def composite_days(start: date, end: date) -> np.ndarray:
+    """Start days of the MOD13Q1 16-day composites (day of year 1, 17, ..., 353) in [start, end]"""
+    years = np.arange(start.year, end.year + 1) - 1970
+    days = (years.astype("datetime64[Y]").astype("datetime64[D]")[:, None] + np.arange(0, 365, 16)).ravel()
+    return days[(days >= np.datetime64(start)) & (days <= np.datetime64(end))]
+
+
+def monthly_means(dates: np.ndarray, values: np.ndarray) -> tuple:
+    """Months and the (months, N) mean of the non-NaN composites in each; dates must be sorted"""
+    months = dates.astype("datetime64[M]")
+    keys, starts = np.unique(months, return_index=True)
+    valid = np.isfinite(values)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), starts, axis=0)
+    counts = np.add.reduceat(valid, starts, axis=0)
+    with np.errstate(invalid="ignore"):
+        return keys, sums / counts
+
 
 class MODISClient:
-    def __init__(self, api_key: str = NASA_API_KEY):
+    def __init__(self, api_key: str = NASA_API_KEY, http: Optional[NASAHttpClient] = None,
+                 cubes: Optional[CubeStore] = None, tiles: Optional[ModisTileStore] = None):
         self.api_key = api_key
+        self.http = http or get_http_client()
+        self.cubes = cubes or get_cube_store()
+        self.tiles = tiles or get_modis_tiles()
         self.base_url = "https://modis.gsfc.nasa.gov/data"
         
     async def get_ndvi_data(self, lat: float, lon: float) -> Dict:
@@ -27,27 +63,82 @@ class MODISClient:
         # Enhanced simulation based on MODIS characteristics
         return self._simulate_modis_data(lat, lon)
     
-    async def _fetch_real_modis_data(self, lat: float, lon: float) -> Optional[Dict]:
-        """Fetch real MODIS data from NASA servers"""
-        # This would require NASA Earthdata authentication
-        # For now, return None to use simulation
-        return None
+    async def _fetch_real_modis_data(self, lat: float, lon: float, day: DayLike = None) -> Optional[Dict]:
+        """Past year of ingested MOD13Q1/MYD13Q1 composites at the location: tile pixels first, then the NDVI cube"""
+        day = as_day(day)
+        start = day - timedelta(days=MODIS_TILES["window_days"])
+        tile = self._tile_series(lat, lon, start, day)
+        if tile is not None:
+            return tile
+        return self._cube_series(lat, lon, start, day)
+
+    def _tile_series(self, lat: float, lon: float, start: date, end: date) -> Optional[Dict]:
+        """NDVI/EVI at the location's pixel in each ingested tile composite, with the QA and cloud mask applied"""
+        series = self.tiles.point(lat, lon, start, end)
+        if series is None or not series["clear"].any():
+            return None
+        clear = np.flatnonzero(series["clear"])
+        latest = clear[-1]
+        product = series["products"][latest]
+        observed = series["reliability"] >= 0
+        return self._series_result(
+            lat, lon, series["days"][clear], series["ndvi"][clear],
+            evi=None if np.isnan(series["evi"][latest]) else round(float(series["evi"][latest]), 3),
+            satellite=MODIS_TILES["products"][product], product=product,
+            quality=RELIABILITY[int(series["reliability"][latest])],
+            cloud_cover=int(round(100 * series["cloudy"][observed].mean())) if observed.any() else None
+        )
+
+    def _cube_series(self, lat: float, lon: float, start: date, end: date) -> Optional[Dict]:
+        """NDVI/EVI from the gridded MODIS_NDVI cube (AppEEARS NetCDF already regridded to lat/lon)"""
+        ndvi = self.cubes.point("MODIS_NDVI", "ndvi", lat, lon, start=start, end=end)
+        if ndvi is None:
+            return None
+        valid = np.isfinite(ndvi["values"])
+        if not valid.any():
+            return None
+        times, values = ndvi["times"][valid], ndvi["values"][valid].astype(np.float64)
+        latest = times[-1].item()
+        evi = self.cubes.point("MODIS_NDVI", "evi", lat, lon, start=latest, end=latest)
+        evi_value = None
+        if evi is not None and len(evi["values"]) and np.isfinite(evi["values"][0]):
+            evi_value = round(float(evi["values"][0]), 3)
+        return self._series_result(lat, lon, times, values, evi=evi_value, satellite="MODIS Terra",
+                                   product="MOD13Q1", quality="Good", cloud_cover=None)
+
+    def _series_result(self, lat: float, lon: float, times: np.ndarray, values: np.ndarray, evi: Optional[float],
+                       satellite: str, product: str, quality: str, cloud_cover: Optional[int]) -> Dict:
+        """Response for observed composites: the latest value and monthly means of the 16-day composites"""
+        latest = times[-1].item()
+        months = times.astype("datetime64[M]")
+        keys, inverse = np.unique(months, return_inverse=True)
+        monthly = np.bincount(inverse, weights=values) / np.bincount(inverse)
+        return {
+            "location": {"lat": lat, "lon": lon},
+            "timestamp": datetime.combine(latest, datetime.min.time()).isoformat(),
+            "satellite": satellite,
+            "product": product,
+            "resolution": "250m",
+            "ndvi": round(float(values[-1]), 3),
+            "evi": evi,
+            "quality": quality,
+            "cloud_cover": cloud_cover,
+            "vegetation_type": self._classify_vegetation(values[-1]),
+            "phenology": self._get_phenology_stage(latest.month, lat),
+            "time_series": [
+                {"month": int(str(key)[5:7]), "ndvi": round(float(value), 3), "date": f"{key}-01"}
+                for key, value in zip(keys, monthly)
+            ]
+        }
     
-    def _simulate_modis_data(self, lat: float, lon: float) -> Dict:
-        """Simulate MODIS NDVI/EVI data based on location and season"""
-        
-        # Base NDVI varies by latitude (vegetation zones)
-        if lat > 30:  # Temperate/boreal
-            base_ndvi = 0.4
-        elif lat > 23.5:  # Subtropical
-            base_ndvi = 0.5
-        elif lat > -23.5:  # Tropical
-            base_ndvi = 0.7
-        else:  # Southern temperate
-            base_ndvi = 0.4
+    def _simulate_modis_data(self, lat: float, lon: float, day: DayLike = None) -> Dict:
+        """Simulate MODIS NDVI/EVI data based on location and season; deterministic per location and day"""
+        day = as_day(day)
+        sim = simulator.point("MOD13Q1", lat, lon, day)
+        base_ndvi = self._base_ndvi(lat)
             
         # Seasonal variation
-        month = datetime.now().month
+        month = day.month
         seasonal_factor = 0.3 * np.sin(2 * np.pi * (month - 3) / 12)
         
         # Urban vs rural factor
@@ -55,35 +146,117 @@ class MODISClient:
         if self._is_urban_area(lat, lon):
             urban_factor = 0.6  # Lower NDVI in urban areas
             
-        ndvi = max(0, min(1, base_ndvi + seasonal_factor * urban_factor + np.random.uniform(-0.1, 0.1)))
-        evi = ndvi * 0.8 + np.random.uniform(-0.05, 0.05)  # EVI typically lower than NDVI
+        ndvi = max(0, min(1, base_ndvi + seasonal_factor * urban_factor + sim.uniform("ndvi", -0.1, 0.1)))
+        evi = ndvi * 0.8 + sim.uniform("evi", -0.05, 0.05)  # EVI typically lower than NDVI
         
         return {
             "location": {"lat": lat, "lon": lon},
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.combine(day, datetime.min.time()).isoformat(),
             "satellite": "MODIS Terra/Aqua",
             "product": "MOD13Q1/MYD13Q1",
             "resolution": "250m",
-            "ndvi": round(ndvi, 3),
-            "evi": round(evi, 3),
+            "ndvi": round(float(ndvi), 3),
+            "evi": round(float(evi), 3),
             "quality": "Good",
-            "cloud_cover": np.random.randint(0, 30),
+            "cloud_cover": sim.integers("cloud_cover", 0, 30),
             "vegetation_type": self._classify_vegetation(ndvi),
             "phenology": self._get_phenology_stage(month, lat),
-            "time_series": self._generate_ndvi_time_series(base_ndvi, lat)
+            "time_series": self._generate_ndvi_time_series(base_ndvi, lat, lon, day)
         }
     
+    def _base_ndvi(self, lat: float) -> float:
+        """Base NDVI varies by latitude (vegetation zones)"""
+        if lat > 30:  # Temperate/boreal
+            return 0.4
+        elif lat > 23.5:  # Subtropical
+            return 0.5
+        elif lat > -23.5:  # Tropical
+            return 0.7
+        else:  # Southern temperate
+            return 0.4
+    
+    def _seasonal_ndvi(self, lat: np.ndarray, lon: np.ndarray, month) -> np.ndarray:
+        """Latitude base plus the urban-damped seasonal cycle, broadcast over points and months"""
+        base_ndvi = np.select([lat > 30, lat > 23.5, lat > -23.5], [0.4, 0.5, 0.7], default=0.4)
+        seasonal_factor = 0.3 * np.sin(2 * np.pi * (np.asarray(month) - 3) / 12)
+        urban = np.zeros(lat.shape, dtype=bool)
+        for urban_lat, urban_lon in URBAN_CENTERS:
+            urban |= (np.abs(lat - urban_lat) < 0.5) & (np.abs(lon - urban_lon) < 0.5)
+        urban_factor = np.where(urban, 0.6, 1.0)
+        return base_ndvi + seasonal_factor * urban_factor
+
+    def simulate_ndvi_batch(self, lat: np.ndarray, lon: np.ndarray, day: DayLike = None) -> Dict[str, np.ndarray]:
+        """Vectorized NDVI/EVI for many points at once; matches _simulate_modis_data point for point"""
+        day = as_day(day)
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        noise = simulator.uniform("MOD13Q1", "ndvi", lat, lon, day, -0.1, 0.1)
+        ndvi = np.clip(self._seasonal_ndvi(lat, lon, day.month) + noise, 0, 1)
+        evi = ndvi * 0.8 + simulator.uniform("MOD13Q1", "evi", lat, lon, day, -0.05, 0.05)
+        return {"ndvi": ndvi, "evi": evi}
+
+    def simulate_ndvi_series(self, lat: np.ndarray, lon: np.ndarray, days: np.ndarray) -> Dict[str, np.ndarray]:
+        """(T, N) NDVI/EVI for composite days, one broadcast over points and days; stable per point and composite"""
+        months = (days.astype("datetime64[M]").astype(np.int64) % 12 + 1)[:, None]
+        composite = (days - np.datetime64("2000-01-01")).astype(np.int64)[:, None]
+        noise = simulator.uniform("MOD13Q1", "ndvi_composite", lat, lon, SERIES_EPOCH, -0.1, 0.1, index=composite)
+        ndvi = np.clip(self._seasonal_ndvi(lat, lon, months) + noise, 0, 1)
+        evi = ndvi * 0.8 + simulator.uniform("MOD13Q1", "evi_composite", lat, lon, SERIES_EPOCH, -0.05, 0.05,
+                                             index=composite)
+        return {"ndvi": ndvi, "evi": evi}
+
+    def get_ndvi_batch(self, lat, lon, start: DayLike = None, end: DayLike = None) -> Dict:
+        """NDVI/EVI composites over [start, end] for many points as (T, N) arrays on one date axis
+
+        Each point comes from the first source that covers it: ingested
+        tiles, then the NDVI cube, then the simulation on the MOD13Q1 16-day
+        schedule. Masked or missing composites are NaN.
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        end = as_day(end)
+        start = as_day(start) if start is not None else end - timedelta(days=MODIS_TILES["window_days"])
+        remaining = np.arange(len(lat))
+        parts = []  # (source, points, days, ndvi, evi)
+
+        tiles = self.tiles.sample(lat, lon, start, end)
+        if tiles is not None and len(tiles["days"]):
+            decoded = self.tiles.decode(tiles["records"])
+            covered = decoded["clear"].any(axis=0)
+            parts.append(("tiles", np.flatnonzero(covered), tiles["days"],
+                          decoded["ndvi"][:, covered], decoded["evi"][:, covered]))
+            remaining = remaining[~covered]
+
+        if len(remaining):
+            ndvi = self.cubes.point("MODIS_NDVI", "ndvi", lat[remaining], lon[remaining], start=start, end=end)
+            if ndvi is not None and len(ndvi["times"]):
+                covered = np.isfinite(ndvi["values"]).any(axis=0)
+                evi = self.cubes.point("MODIS_NDVI", "evi", lat[remaining], lon[remaining], start=start, end=end)
+                evi_values = np.full(ndvi["values"].shape, np.nan)
+                if evi is not None and np.array_equal(evi["times"], ndvi["times"]):
+                    evi_values = evi["values"]
+                parts.append(("cube", remaining[covered], ndvi["times"],
+                              ndvi["values"][:, covered], evi_values[:, covered]))
+                remaining = remaining[~covered]
+
+        if len(remaining):
+            days = composite_days(start, end)
+            simulated = self.simulate_ndvi_series(lat[remaining], lon[remaining], days)
+            parts.append(("simulated", remaining, days, simulated["ndvi"], simulated["evi"]))
+
+        days = np.unique(np.concatenate([part[2] for part in parts]).astype("datetime64[D]"))
+        out = {name: np.full((len(days), len(lat)), np.nan) for name in ("ndvi", "evi")}
+        source = np.empty(len(lat), dtype=object)
+        for name, points, part_days, ndvi, evi in parts:
+            rows = np.searchsorted(days, part_days.astype("datetime64[D]"))[:, None]
+            out["ndvi"][rows, points] = ndvi
+            out["evi"][rows, points] = evi
+            source[points] = name
+        return {"dates": days, "ndvi": out["ndvi"], "evi": out["evi"], "source": source}
+    
     def _is_urban_area(self, lat: float, lon: float) -> bool:
         """Check if location is in urban area"""
-        urban_centers = [
-            (28.6139, 77.2090),  # Delhi
-            (19.0760, 72.8777),  # Mumbai
-            (13.0827, 80.2707),  # Chennai
-            (22.5726, 88.3639),  # Kolkata
-            (12.9716, 77.5946)   # Bangalore
-        ]
-        
-        for urban_lat, urban_lon in urban_centers:
+        for urban_lat, urban_lon in URBAN_CENTERS:
             if abs(lat - urban_lat) < 0.5 and abs(lon - urban_lon) < 0.5:
                 return True
         return False
@@ -116,23 +289,21 @@ class MODISClient:
             else:
                 return "Dry season"
     
-    def _generate_ndvi_time_series(self, base_ndvi: float, lat: float) -> List[Dict]:
+    def _generate_ndvi_time_series(self, base_ndvi: float, lat: float, lon: float, day: date) -> List[Dict]:
         """Generate 12-month NDVI time series"""
-        time_series = []
-        for month in range(1, 13):
-            seasonal_factor = 0.3 * np.sin(2 * np.pi * (month - 3) / 12)
-            monthly_ndvi = max(0, min(1, base_ndvi + seasonal_factor + np.random.uniform(-0.05, 0.05)))
-            
-            time_series.append({
-                "month": month,
-                "ndvi": round(monthly_ndvi, 3),
-                "date": f"2024-{month:02d}-01"
-            })
-        
-        return time_series
+        months = np.arange(1, 13)
+        seasonal_factor = 0.3 * np.sin(2 * np.pi * (months - 3) / 12)
+        noise = simulator.uniform("MOD13Q1", "ndvi_series", lat, lon, day, -0.05, 0.05, index=months)
+        monthly_ndvi = np.clip(base_ndvi + seasonal_factor + noise, 0, 1).round(3)
+        return [
+            {"month": int(month), "ndvi": float(value), "date": f"{day.year}-{month:02d}-01"}
+            for month, value in zip(months, monthly_ndvi)
+        ]
     
     async def get_land_cover_data(self, lat: float, lon: float) -> Dict:
         """Get MODIS land cover classification"""
+        # MCD12Q1 is annual, so the simulation is keyed by year rather than day
+        sim = simulator.point("MCD12Q1", lat, lon, date(2023, 1, 1))
         
         # Simulate land cover based on location
         land_cover_types = {
@@ -161,9 +332,9 @@ class MODISClient:
         elif lat > 25:  # Northern plains - agriculture
             primary_type = 12
         elif 15 < lat < 25:  # Central India - mixed
-            primary_type = np.random.choice([8, 9, 12, 14])
+            primary_type = sim.choice("primary_type", [8, 9, 12, 14])
         else:  # Southern India - forests/agriculture
-            primary_type = np.random.choice([2, 4, 12])
+            primary_type = sim.choice("primary_type", [2, 4, 12])
         
         return {
             "location": {"lat": lat, "lon": lon},
@@ -172,32 +343,29 @@ class MODISClient:
             "primary_land_cover": {
                 "type_id": primary_type,
                 "type_name": land_cover_types[primary_type],
-                "confidence": np.random.randint(70, 95)
+                "confidence": sim.integers("confidence", 70, 95)
             },
-            "land_cover_percentages": self._generate_land_cover_percentages(primary_type),
+            "land_cover_percentages": self._generate_land_cover_percentages(primary_type, sim),
             "change_detection": {
-                "changed_since_previous_year": np.random.choice([True, False]),
-                "change_type": "Cropland expansion" if np.random.random() > 0.5 else "Forest loss"
+                "changed_since_previous_year": sim.chance("changed", 0.5),
+                "change_type": "Cropland expansion" if sim.chance("change_type", 0.5) else "Forest loss"
             }
         }
     
-    def _generate_land_cover_percentages(self, primary_type: int) -> Dict:
+    def _generate_land_cover_percentages(self, primary_type: int, sim) -> Dict:
         """Generate land cover percentages for area"""
         percentages = {}
         
         # Primary type gets 40-70%
-        primary_percent = np.random.randint(40, 70)
+        primary_percent = sim.integers("primary_percent", 40, 70)
         percentages[primary_type] = primary_percent
         
-        # Distribute remaining percentage among 2-3 other types
+        # Distribute remaining percentage among 2 other types
         remaining = 100 - primary_percent
-        secondary_types = np.random.choice(range(1, 18), size=2, replace=False)
-        
-        for i, sec_type in enumerate(secondary_types):
-            if sec_type != primary_type:
-                if i == 0:
-                    percentages[sec_type] = np.random.randint(15, remaining - 10)
-                else:
-                    percentages[sec_type] = remaining - sum(percentages.values())
+        others = [t for t in range(1, 18) if t != primary_type]
+        first = sim.choice("secondary_1", others)
+        second = sim.choice("secondary_2", [t for t in others if t != first])
+        percentages[first] = sim.integers("secondary_percent", 15, remaining - 10)
+        percentages[second] = remaining - percentages[first]
         
-        return percentages
\ No newline at end of file
+        return percentages
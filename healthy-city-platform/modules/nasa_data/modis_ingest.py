@@ -0,0 +1,125 @@
+"""
+MOD13Q1/MYD13Q1 tile ingest
+Reads HDF-EOS tiles or native-projection GeoTIFF layers from local disk into the MODIS tile store
+
+    python -m modules.nasa_data.modis_ingest /data/modis/MOD13Q1.A2023177.h24v06.061.2023194030512.hdf
+    python -m modules.nasa_data.modis_ingest /data/appeears/MOD13Q1.061__250m_16_days_*_doy2023177_aid0001.tif
+"""
+
+import argparse
+import os
+import re
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import rasterio
+
+from config.nasa_apis import MODIS_TILES
+from .modis_tiles import (GRID_X_MIN, GRID_Y_MAX, PIXEL_DTYPE, TILE_SIZE_M, VI_FILL,
+                          ModisTileStore, get_modis_tiles)
+
+
+def composite_key(path: str) -> Tuple[str, date]:
+    """Product and composite start day from a MODIS or AppEEARS file name"""
+    name = os.path.basename(path)
+    product = next((p for p in MODIS_TILES["products"] if name.startswith(p)), None)
+    if product is None:
+        raise ValueError(f"'{name}' is not one of {', '.join(MODIS_TILES['products'])}")
+    for pattern in MODIS_TILES["date_patterns"]:
+        match = re.search(pattern, name)
+        if match:
+            return product, date(int(match["year"]), 1, 1) + timedelta(days=int(match["doy"]) - 1)
+    raise ValueError(f"no composite date in '{name}'")
+
+
+def layer_of(name: str) -> Optional[str]:
+    """Configured layer a subdataset or file name holds"""
+    name = name.replace(" ", "_")
+    return next((layer for layer, suffix in MODIS_TILES["layers"].items() if suffix in name), None)
+
+
+def tile_window(transform, shape: Tuple[int, int]) -> Tuple[int, int, int, Tuple[int, int]]:
+    """Tile (h, v), pixels per tile side and the window origin (row, col) for a sinusoidal raster
+
+    Rejects rasters that are not on the MODIS sinusoidal grid or that span
+    more than one tile, since lookups index pixels by arithmetic.
+    """
+    pixels = int(round(TILE_SIZE_M / transform.a))
+    size = TILE_SIZE_M / pixels
+    col = (transform.c - GRID_X_MIN) / size
+    row = (GRID_Y_MAX - transform.f) / size
+    if abs(transform.a - size) > 1e-6 * size or abs(-transform.e - size) > 1e-6 * size \
+            or abs(col - round(col)) > 1e-3 or abs(row - round(row)) > 1e-3:
+        raise ValueError("raster is not on the MODIS sinusoidal grid (reproject to geographic data for the cube store instead)")
+    row, col = int(round(row)), int(round(col))
+    h, v = col // pixels, row // pixels
+    if (row + shape[0] - 1) // pixels != v or (col + shape[1] - 1) // pixels != h:
+        raise ValueError("raster spans more than one MODIS tile")
+    return h, v, pixels, (row % pixels, col % pixels)
+
+
+def read_layers(path: str) -> List[Tuple[str, np.ndarray, object]]:
+    """(layer, raw values, transform) for each configured layer in an HDF tile or a GeoTIFF layer file"""
+    out = []
+    with rasterio.open(path) as src:
+        if src.subdatasets:
+            for name in src.subdatasets:
+                layer = layer_of(name.rsplit(":", 1)[-1])
+                if layer is not None:
+                    with rasterio.open(name) as sub:
+                        out.append((layer, sub.read(1), sub.transform))
+        else:
+            layer = layer_of(os.path.basename(path))
+            if layer is not None:
+                out.append((layer, src.read(1), src.transform))
+    return out
+
+
+def ingest(paths: List[str], store: Optional[ModisTileStore] = None) -> Dict:
+    """Store each composite's layers as one record array per tile window
+
+    Files are grouped by product and composite day, so the separate layer
+    files of a GeoTIFF export are combined and only one composite is held
+    in memory at a time.
+    """
+    store = store or get_modis_tiles()
+    groups: Dict[Tuple[str, date], List[str]] = defaultdict(list)
+    for path in paths:
+        groups[composite_key(path)].append(path)
+
+    stored = defaultdict(int)
+    for (product, day), files in sorted(groups.items()):
+        # (h, v, pixels, origin, shape) -> layer -> values
+        windows: Dict[tuple, Dict[str, np.ndarray]] = defaultdict(dict)
+        for path in files:
+            for layer, values, transform in read_layers(path):
+                windows[tile_window(transform, values.shape) + (values.shape,)][layer] = values
+        for (h, v, pixels, origin, shape), layers in windows.items():
+            if "ndvi" not in layers:
+                raise ValueError(f"{product} {day} h{h:02d}v{v:02d} has no NDVI layer")
+            records = np.empty(shape, dtype=PIXEL_DTYPE)
+            records["ndvi"] = layers["ndvi"]
+            records["evi"] = layers.get("evi", VI_FILL)
+            records["vi_quality"] = layers.get("vi_quality", 0)
+            # Without the reliability layer, trust every pixel with a value
+            records["reliability"] = layers.get("reliability", np.where(layers["ndvi"] == VI_FILL, -1, 0))
+            store.add(h, v, pixels, day, product, records, origin)
+            stored[f"h{h:02d}v{v:02d}"] += 1
+    if not stored:
+        raise ValueError(f"no MODIS vegetation index layers in {', '.join(paths)}")
+    return {"files": len(paths), "composites": sum(stored.values()), "tiles": dict(stored)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest MOD13Q1/MYD13Q1 HDF or GeoTIFF tiles into the MODIS tile store")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--root", default=MODIS_TILES["root"])
+    args = parser.parse_args()
+
+    print(ingest(sorted(args.files), ModisTileStore(args.root)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+MODIS vegetation index tile cache
+MOD13Q1/MYD13Q1 composites stored per sinusoidal tile as memory-mapped pixel records, looked up by direct pixel indexing
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from config.nasa_apis import MODIS_TILES
+from .files import file_identity
+from .simulation import DayLike, as_day
+
+# MODIS sinusoidal grid: sphere radius, tile side and the grid's upper-left corner (metres)
+EARTH_RADIUS_M = 6371007.181
+TILE_SIZE_M = 1111950.5197665233
+GRID_X_MIN = -20015109.355798
+GRID_Y_MAX = 10007554.677899
+
+# One record per pixel, so a lookup touches a single page per composite
+PIXEL_DTYPE = np.dtype([("ndvi", "<i2"), ("evi", "<i2"), ("vi_quality", "<u2"), ("reliability", "i1")])
+VI_FILL = -3000
+VI_SCALE = 0.0001
+RELIABILITY = {-1: "No data", 0: "Good", 1: "Marginal", 2: "Snow/Ice", 3: "Cloudy"}
+
+
+def sinusoidal(lat, lon) -> Tuple[np.ndarray, np.ndarray]:
+    """Geographic degrees to MODIS sinusoidal metres"""
+    lat_r = np.radians(np.asarray(lat, dtype=np.float64))
+    lon_r = np.radians(np.asarray(lon, dtype=np.float64))
+    return EARTH_RADIUS_M * lon_r * np.cos(lat_r), EARTH_RADIUS_M * lat_r
+
+
+def tile_pixels(lat, lon, pixels: int = 4800) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Tile (h, v) and pixel (row, col) within the tile for each location"""
+    x, y = sinusoidal(lat, lon)
+    size = TILE_SIZE_M / pixels
+    col = np.floor((x - GRID_X_MIN) / size).astype(np.int64)
+    row = np.floor((GRID_Y_MAX - y) / size).astype(np.int64)
+    return col // pixels, row // pixels, row % pixels, col % pixels
+
+
+def tile_name(h: int, v: int) -> str:
+    return f"h{int(h):02d}v{int(v):02d}"
+
+
+def cloud_mask(vi_quality: np.ndarray, reliability: np.ndarray) -> np.ndarray:
+    """Cloudy per the pixel reliability or the VI Quality bits (cloudy, mixed clouds, shadow)"""
+    quality = vi_quality.astype(np.uint16)
+    return ((reliability == 3) | ((quality & 0b11) == 2) | ((quality >> 10) & 1).astype(bool)
+            | ((quality >> 15) & 1).astype(bool))
+
+
+class TileCache:
+    """LRU of memory-mapped composites bounded by mapped bytes, with hit/miss counters"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._maps: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, path: str) -> np.ndarray:
+        """The composite's records, mapping it on first use"""
+        with self._lock:
+            records = self._maps.get(path)
+            if records is not None:
+                self._maps.move_to_end(path)
+                self.hits += 1
+                return records
+            self.misses += 1
+        # A plain ndarray view of the map skips np.memmap's per-indexing overhead
+        records = np.load(path, mmap_mode="r").view(np.ndarray)
+        with self._lock:
+            if path not in self._maps:
+                self._maps[path] = records
+                self.bytes += records.nbytes
+            while self.bytes > self.max_bytes and len(self._maps) > 1:
+                self.bytes -= self._maps.popitem(last=False)[1].nbytes
+                self.evictions += 1
+        return records
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"mapped": len(self._maps), "bytes": self.bytes, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
+
+
+class ModisTileStore:
+    """Ingested 16-day composites by tile
+
+    Layout: {root}/index.json lists each tile's composites (day, product,
+    file, window origin and shape) and {root}/<tile>/<file>.npy holds a
+    composite's PIXEL_DTYPE records. Composites may be whole tiles or the
+    subsets AppEEARS exports; a location maps to its tile and pixel by
+    arithmetic, so no spatial search is needed.
+    """
+
+    def __init__(self, root: str = MODIS_TILES["root"], settings: Optional[Dict] = None):
+        self.root = root
+        self.settings = {**MODIS_TILES, **(settings or {})}
+        self.cache = TileCache(int(self.settings["cache_mb"] * 2 ** 20))
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict] = {}
+        self._tiles: Dict[str, Dict] = {}
+        self._index_identity = None
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.root, "index.json")
+
+    def _load_index(self) -> Dict[str, Dict]:
+        """Per-tile composite arrays, re-read when another process has ingested"""
+        try:
+            identity = file_identity(self._index_path)
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            if identity != self._index_identity:
+                with open(self._index_path) as f:
+                    self._index = json.load(f)
+                self._tiles = {name: self._tile_arrays(name, tile) for name, tile in self._index.items()}
+                self._index_identity = identity
+            return self._tiles
+
+    def _tile_arrays(self, name: str, tile: Dict) -> Dict:
+        composites = sorted(tile["composites"], key=lambda c: (c["day"], c["product"]))
+        products = list(self.settings["products"])
+        return {
+            "pixels": tile["pixels"],
+            "days": np.array([c["day"] for c in composites], dtype="datetime64[D]"),
+            "products": [c["product"] for c in composites],
+            "paths": [os.path.join(self.root, name, c["file"]) for c in composites],
+            "origins": np.array([c["origin"] for c in composites], dtype=np.int64).reshape(-1, 2),
+            "shapes": np.array([c["shape"] for c in composites], dtype=np.int64).reshape(-1, 2),
+            "codes": np.array([products.index(c["product"]) for c in composites], dtype=np.int64),
+            "whole": [c["origin"] == [0, 0] and c["shape"] == [tile["pixels"]] * 2 for c in composites]
+        }
+
+    def add(self, h: int, v: int, pixels: int, day: date, product: str, records: np.ndarray,
+            origin: Tuple[int, int] = (0, 0)) -> str:
+        """Store one composite's records (a tile or a window of it), replacing the same day and product"""
+        name = tile_name(h, v)
+        os.makedirs(os.path.join(self.root, name), exist_ok=True)
+        file = f"{product}.A{day.year}{day.timetuple().tm_yday:03d}.{time.time_ns()}.npy"
+        path = os.path.join(self.root, name, file)
+        out = np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=PIXEL_DTYPE, shape=records.shape)
+        out[:] = records
+        out.flush()
+        del out
+        os.replace(path + ".tmp", path)
+
+        with self._lock:
+            try:
+                with open(self._index_path) as f:
+                    index = json.load(f)
+            except FileNotFoundError:
+                index = {}
+            tile = index.setdefault(name, {"pixels": pixels, "composites": []})
+            replaced = [c for c in tile["composites"]
+                        if c["day"] == day.isoformat() and c["product"] == product and c["origin"] == list(origin)]
+            tile["composites"] = [c for c in tile["composites"] if c not in replaced]
+            tile["composites"].append({"day": day.isoformat(), "product": product, "file": file,
+                                       "origin": list(origin), "shape": list(records.shape)})
+            with open(self._index_path + ".tmp", "w") as f:
+                json.dump(index, f)
+            os.replace(self._index_path + ".tmp", self._index_path)
+        # Readers that still map a replaced file keep a valid view until it is evicted
+        for c in replaced:
+            try:
+                os.remove(os.path.join(self.root, name, c["file"]))
+            except FileNotFoundError:
+                pass
+        return path
+
+    def sample(self, lat, lon, start: DayLike = None, end: DayLike = None) -> Optional[Dict]:
+        """Pixel values of every composite in [start, end] at many locations
+
+        Returns (T, N) arrays over the union of composite days; a location
+        outside a composite's window, or in a tile without that composite,
+        reads as fill. None when nothing is ingested.
+        """
+        tiles = self._load_index()
+        if not tiles:
+            return None
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+        end = np.datetime64(as_day(end))
+        start = np.datetime64(start) if start is not None else end - np.timedelta64(self.settings["window_days"], "D")
+
+        pixels = {tile["pixels"] for tile in tiles.values()}
+        located = {p: tile_pixels(lat, lon, p) for p in pixels}
+        products = list(self.settings["products"])
+        keys, columns = [], []
+        for name, tile in tiles.items():
+            h, v, row, col = located[tile["pixels"]]
+            in_tile = np.flatnonzero((h == int(name[1:3])) & (v == int(name[4:6])))
+            lo = np.searchsorted(tile["days"], start, side="left")
+            hi = np.searchsorted(tile["days"], end, side="right")
+            if len(in_tile) and hi > lo:
+                # One slot per (day, product), shared by every tile and window with that composite
+                keys.append(tile["days"][lo:hi].astype(np.int64) * len(products) + tile["codes"][lo:hi])
+                columns.append((tile, in_tile, row[in_tile], col[in_tile], lo, hi))
+        if not keys:
+            return {"days": np.empty(0, dtype="datetime64[D]"), "products": [],
+                    "records": np.zeros((0, len(lat)), dtype=PIXEL_DTYPE)}
+
+        slots, slot_of = np.unique(np.concatenate(keys), return_inverse=True)
+        records = np.zeros((len(slots), len(lat)), dtype=PIXEL_DTYPE)
+        records["ndvi"] = records["evi"] = VI_FILL
+        records["reliability"] = -1
+        offset = 0
+        for tile, points, rows, cols, lo, hi in columns:
+            for i, slot in zip(range(lo, hi), slot_of[offset:offset + hi - lo]):
+                if tile["whole"][i]:
+                    records[slot, points] = self.cache.get(tile["paths"][i])[rows, cols]
+                    continue
+                r = rows - tile["origins"][i, 0]
+                c = cols - tile["origins"][i, 1]
+                inside = (r >= 0) & (c >= 0) & (r < tile["shapes"][i, 0]) & (c < tile["shapes"][i, 1])
+                if inside.any():
+                    records[slot, points[inside]] = self.cache.get(tile["paths"][i])[r[inside], c[inside]]
+            offset += hi - lo
+        return {"days": (slots // len(products)).astype("datetime64[D]"),
+                "products": [products[code] for code in slots % len(products)], "records": records}
+
+    def point(self, lat: float, lon: float, start: DayLike = None, end: DayLike = None) -> Optional[Dict]:
+        """Scaled, masked NDVI/EVI series at one location; cloudy, snow and fill composites are NaN"""
+        sampled = self.sample(lat, lon, start, end)
+        if sampled is None:
+            return None
+        records = sampled["records"][:, 0]
+        return {"days": sampled["days"], "products": sampled["products"], **self.decode(records)}
+
+    @staticmethod
+    def decode(records: np.ndarray) -> Dict[str, np.ndarray]:
+        """Scaled NDVI/EVI with everything but good and marginal cloud-free pixels masked, plus the flags"""
+        cloudy = cloud_mask(records["vi_quality"], records["reliability"])
+        clear = np.isin(records["reliability"], (0, 1)) & ~cloudy & (records["ndvi"] != VI_FILL)
+        return {
+            "ndvi": np.where(clear, records["ndvi"] * VI_SCALE, np.nan),
+            "evi": np.where(clear & (records["evi"] != VI_FILL), records["evi"] * VI_SCALE, np.nan),
+            "clear": clear,
+            "cloudy": cloudy,
+            "reliability": records["reliability"]
+        }
+
+    def status(self) -> Dict:
+        """Ingested tiles and tile cache usage"""
+        tiles = self._load_index()
+        return {
+            "root": self.root,
+            "tiles": {name: {"composites": len(tile["days"]),
+                             "first_day": str(tile["days"][0]) if len(tile["days"]) else None,
+                             "last_day": str(tile["days"][-1]) if len(tile["days"]) else None}
+                      for name, tile in sorted(tiles.items())},
+            "cache": self.cache.stats()
+        }
+
+
+# Process-wide instance so every request shares the mapped tiles
+modis_tiles = ModisTileStore()
+
+
+def get_modis_tiles() -> ModisTileStore:
+    """Return the shared MODIS tile store"""
+    return modis_tiles
@@ -0,0 +1,294 @@
+"""
+Satellite pass prediction
+Propagates local TLE sets with SGP4 for many observers and time steps at once, cached per satellite, grid cell and day
+"""
+
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sgp4.api import Satrec, SatrecArray, jday
+
+from config.nasa_apis import SATELLITE_PASSES
+from .simulation import DayLike, as_day
+
+WGS84_A_KM = 6378.137
+WGS84_E2 = 6.69437999014e-3
+
+# Passes are computed over the day plus this margin on each side and kept when they culminate inside the day
+MARGIN_S = 1200
+
+# (satellite, rise, culmination, set, max elevation deg, azimuth at culmination deg); times are unix seconds
+Pass = Tuple[str, float, float, float, float, float]
+
+
+def load_tle(path: str) -> Dict[str, Satrec]:
+    """Satellite name -> Satrec from a TLE file (3-line sets, or 2-line sets named by catalog number)"""
+    with open(path) as f:
+        lines = [line.rstrip() for line in f if line.strip() and not line.startswith("#")]
+    satellites = {}
+    i = 0
+    while i < len(lines):
+        if lines[i].startswith("1 ") and i + 1 < len(lines) and lines[i + 1].startswith("2 "):
+            name, line1, line2 = lines[i][2:7].strip(), lines[i], lines[i + 1]
+            i += 2
+        else:
+            # CelesTrak 3LE files prefix names with "0 "
+            name = lines[i][2:] if lines[i].startswith("0 ") else lines[i]
+            line1, line2 = lines[i + 1], lines[i + 2]
+            i += 3
+        satellites[name.strip()] = Satrec.twoline2rv(line1, line2)
+    return satellites
+
+
+def gmst(jd_ut1: np.ndarray) -> np.ndarray:
+    """Greenwich mean sidereal time in radians (IAU 1982), the TEME -> Earth-fixed rotation angle"""
+    t = (jd_ut1 - 2451545.0) / 36525.0
+    seconds = 67310.54841 + (876600.0 * 3600 + 8640184.812866) * t + 0.093104 * t ** 2 - 6.2e-6 * t ** 3
+    return np.radians(np.mod(seconds / 240.0, 360.0))
+
+
+def observer_frame(lat, lon) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Earth-fixed position (km, WGS84 at sea level) and local up/east/north unit vectors, each (N, 3)"""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    sin_lat, cos_lat, sin_lon, cos_lon = np.sin(lat), np.cos(lat), np.sin(lon), np.cos(lon)
+    n = WGS84_A_KM / np.sqrt(1 - WGS84_E2 * sin_lat ** 2)
+    position = np.column_stack([n * cos_lat * cos_lon, n * cos_lat * sin_lon, n * (1 - WGS84_E2) * sin_lat])
+    up = np.column_stack([cos_lat * cos_lon, cos_lat * sin_lon, sin_lat])
+    east = np.column_stack([-sin_lon, cos_lon, np.zeros_like(lon)])
+    north = np.column_stack([-sin_lat * cos_lon, -sin_lat * sin_lon, cos_lat])
+    return position, up, east, north
+
+
+class PassPredictor:
+    """Batch pass prediction over a lat/lon cell grid
+
+    All satellites are propagated once per day on a shared time grid, then
+    elevation for every (time, observer) pair comes from two matrix products
+    per satellite. Observers in the same cell share the cell centre's passes,
+    so a batch of locations costs one computation per distinct cell and later
+    requests for that cell and day are dictionary lookups.
+    """
+
+    def __init__(self, settings: Optional[Dict] = None):
+        self.settings = {**SATELLITE_PASSES, **(settings or {})}
+        self._lock = threading.RLock()
+        self._tle_mtime: Optional[float] = None
+        self._satellites: Dict[str, Satrec] = {}
+        self._orbits: Dict[date, Tuple[np.ndarray, np.ndarray]] = {}
+        self._cache: Dict[Tuple[str, int, int, date], List[Pass]] = {}
+
+    def satellites(self) -> Dict[str, Satrec]:
+        """Configured satellites found in the TLE file; reloaded when the file changes"""
+        mtime = os.path.getmtime(self.settings["tle_file"])
+        with self._lock:
+            if mtime != self._tle_mtime:
+                loaded = load_tle(self.settings["tle_file"])
+                self._satellites = {name: loaded[name] for name in self.settings["satellites"] if name in loaded}
+                self._tle_mtime = mtime
+                self._orbits.clear()
+                self._cache.clear()
+            return self._satellites
+
+    def cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        size = self.settings["cell_deg"]
+        return int(np.floor((lat + 90) / size)), int(np.floor((lon + 180) / size))
+
+    def cell_centre(self, row: int, col: int) -> Tuple[float, float]:
+        size = self.settings["cell_deg"]
+        return min(90.0, -90 + (row + 0.5) * size), -180 + (col + 0.5) * size
+
+    def _orbit(self, day: date) -> Tuple[np.ndarray, np.ndarray]:
+        """Unix times (T,) and Earth-fixed satellite positions (S, T, 3) over the day and its margins"""
+        with self._lock:
+            cached = self._orbits.get(day)
+        if cached is not None:
+            return cached
+        satrecs = list(self.satellites().values())
+        step = self.settings["step_s"]
+        offsets = np.arange(-MARGIN_S, 86400 + MARGIN_S + step, step, dtype=np.float64)
+        jd0, fr0 = jday(day.year, day.month, day.day, 0, 0, 0)
+        jd = np.full(offsets.shape, jd0)
+        fr = fr0 + offsets / 86400.0
+        error, teme, _ = SatrecArray(satrecs).sgp4(jd, fr)
+        teme[error != 0] = np.nan
+
+        theta = gmst(jd + fr)
+        cos_t, sin_t = np.cos(theta), np.sin(theta)
+        ecef = np.empty_like(teme)
+        ecef[..., 0] = cos_t * teme[..., 0] + sin_t * teme[..., 1]
+        ecef[..., 1] = -sin_t * teme[..., 0] + cos_t * teme[..., 1]
+        ecef[..., 2] = teme[..., 2]
+
+        start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp()
+        orbit = (start + offsets, ecef)
+        with self._lock:
+            self._orbits = {d: o for d, o in self._orbits.items() if abs((d - day).days) <= self.settings["cache_days"]}
+            self._orbits[day] = orbit
+        return orbit
+
+    def predict(self, lat, lon, day: DayLike = None) -> List[Dict[str, List[Pass]]]:
+        """Passes culminating on the (UTC) day for each observer, per satellite; no caching"""
+        day = as_day(day)
+        names = list(self.satellites())
+        times, ecef = self._orbit(day)
+        lat, lon = np.atleast_1d(lat), np.atleast_1d(lon)
+        results: List[Dict[str, List[Pass]]] = [{name: [] for name in names} for _ in range(len(lat))]
+        batch = self.settings["batch_size"]
+        for start in range(0, len(lat), batch):
+            self._predict_batch(names, times, ecef, lat[start:start + batch], lon[start:start + batch],
+                                results[start:start + batch], day)
+        return results
+
+    def _predict_batch(self, names, times, ecef, lat, lon, results, day: date):
+        position, up, east, north = observer_frame(lat, lon)
+        threshold = np.sin(np.radians(self.settings["min_elevation_deg"]))
+        day_start = times[0] + MARGIN_S
+        up_height = (position * up).sum(axis=1)
+        obs_sq = (position ** 2).sum(axis=1)
+
+        for s, name in enumerate(names):
+            # Only steps where the satellite can be above the threshold for some observer in the batch
+            steps = self._candidate_steps(ecef[s], position)
+            if not len(steps):
+                continue
+            sat, times_c = ecef[s][steps], times[steps]
+            # sin(elevation) = (rho . up) / |rho| with rho = sat - observer, expanded into matrix products
+            dist = np.sqrt(np.maximum((sat ** 2).sum(axis=1)[None, :] + obs_sq[:, None] - 2 * position @ sat.T, 1e-9))
+            sin_el = ((up @ sat.T) - up_height[:, None]) / dist  # (N, T)
+            above = sin_el >= threshold
+            if not above.any():
+                continue
+
+            edges = np.diff(np.pad(above, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+            obs_idx, rise_idx = np.nonzero(edges == 1)
+            _, set_idx = np.nonzero(edges == -1)  # first step below the threshold again
+
+            # Culmination: the highest step of each run, found for all runs at once
+            flat = np.where(above, sin_el, -np.inf).ravel()
+            n_times = len(steps)
+            starts = obs_idx * n_times + rise_idx
+            peak = np.maximum.reduceat(flat, starts)
+            first = starts[0]
+            lengths = np.diff(np.append(starts, flat.size))
+            at_peak = np.where(flat[first:] == np.repeat(peak, lengths), np.arange(first, flat.size), flat.size)
+            peak_idx = np.minimum.reduceat(at_peak, starts - first) - obs_idx * n_times
+
+            culmination, max_sin = self._refine_peaks(times_c, sin_el, obs_idx, peak_idx)
+            rise = self._crossings(times_c, sin_el, obs_idx, rise_idx - 1, threshold)
+            set_ = self._crossings(times_c, sin_el, obs_idx, set_idx - 1, threshold)
+            rho = sat[peak_idx] - position[obs_idx]
+            azimuth = np.degrees(np.arctan2((rho * east[obs_idx]).sum(axis=1), (rho * north[obs_idx]).sum(axis=1))) % 360
+            max_el = np.degrees(np.arcsin(np.clip(max_sin, -1, 1)))
+
+            keep = np.flatnonzero((culmination >= day_start) & (culmination < day_start + 86400))
+            for o, r, c, e, el, az in zip(obs_idx[keep].tolist(), rise[keep].tolist(), culmination[keep].tolist(),
+                                          set_[keep].tolist(), max_el[keep].tolist(), azimuth[keep].tolist()):
+                results[o][name].append((name, r, c, e, el, az))
+
+    def _candidate_steps(self, sat: np.ndarray, position: np.ndarray) -> np.ndarray:
+        """Time steps within one step of the satellite's visibility circle touching the batch
+
+        The circle's Earth-central half-angle for the minimum elevation, plus
+        the batch's angular spread around its centre, bounds where any observer
+        can see the satellite. The extra step on each side keeps the samples
+        either side of every threshold crossing, so runs and interpolation are
+        the same as on the full time axis.
+        """
+        min_el = np.radians(self.settings["min_elevation_deg"])
+        centre = position.sum(axis=0)
+        centre /= np.linalg.norm(centre)
+        spread = np.arccos(np.clip((position @ centre / np.linalg.norm(position, axis=1)).min(), -1, 1))
+        radius = np.linalg.norm(sat, axis=1)
+        with np.errstate(invalid="ignore"):
+            reach = np.arccos(np.clip(WGS84_A_KM / radius * np.cos(min_el), -1, 1)) - min_el
+            near = np.arccos(np.clip(sat @ centre / radius, -1, 1)) <= reach + spread + 0.02  # ~1 degree slack
+        near[np.isnan(radius)] = False
+        near[1:] |= near[:-1].copy()
+        near[:-1] |= near[1:].copy()
+        return np.flatnonzero(near)
+
+    @staticmethod
+    def _crossings(times: np.ndarray, sin_el: np.ndarray, obs: np.ndarray, i: np.ndarray,
+                   threshold: float) -> np.ndarray:
+        """Times sin(elevation) crosses threshold between steps i and i + 1 (linear); clamped at the window ends"""
+        inside = (i >= 0) & (i + 1 < len(times))
+        lo = np.clip(i, 0, len(times) - 2)
+        e0, e1 = sin_el[obs, lo], sin_el[obs, lo + 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = times[lo] + (threshold - e0) / (e1 - e0) * (times[lo + 1] - times[lo])
+        return np.where(inside, t, times[np.clip(i + 1, 0, len(times) - 1)])
+
+    @staticmethod
+    def _refine_peaks(times: np.ndarray, sin_el: np.ndarray, obs: np.ndarray,
+                      m: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Parabolic fit through each highest step and its neighbours"""
+        inner = np.clip(m, 1, len(times) - 2)
+        a, b, c = sin_el[obs, inner - 1], sin_el[obs, inner], sin_el[obs, inner + 1]
+        curvature = a - 2 * b + c
+        ok = (m == inner) & (curvature < 0)
+        shift = np.where(ok, 0.5 * (a - c) / np.where(ok, curvature, -1.0), 0.0)
+        step = times[1] - times[0]
+        return times[m] + shift * step, np.where(ok, b - 0.25 * (a - c) * shift, sin_el[obs, m])
+
+    def passes(self, locations: Sequence[Tuple[float, float]], day: DayLike = None) -> List[List[Pass]]:
+        """Passes for each (lat, lon) on the day, time-ordered; uncached cells are computed in one batch"""
+        day = as_day(day)
+        names = list(self.satellites())
+        cells = [self.cell(lat, lon) for lat, lon in locations]
+        with self._lock:
+            missing = sorted({c for c in cells if any((name, c[0], c[1], day) not in self._cache for name in names)})
+        if missing:
+            centres = np.array([self.cell_centre(row, col) for row, col in missing])
+            computed = self.predict(centres[:, 0], centres[:, 1], day)
+            with self._lock:
+                self._prune(day)
+                for (row, col), per_satellite in zip(missing, computed):
+                    for name in names:
+                        self._cache[(name, row, col, day)] = per_satellite[name]
+        with self._lock:
+            return [sorted((p for name in names for p in self._cache.get((name, row, col, day), [])), key=lambda p: p[2])
+                    for row, col in cells]
+
+    def _prune(self, day: date):
+        keep = self.settings["cache_days"]
+        self._cache = {key: value for key, value in self._cache.items() if abs((key[3] - day).days) <= keep}
+
+    def next_passes(self, lat: float, lon: float, count: int = 4, now: Optional[datetime] = None) -> List[Pass]:
+        """The next count passes (by culmination) after now, looking ahead up to cache_days days"""
+        now = now or datetime.now(timezone.utc)
+        now_ts = now.timestamp()
+        upcoming: List[Pass] = []
+        for offset in range(self.settings["cache_days"] + 1):
+            day = (now.astimezone(timezone.utc) + timedelta(days=offset)).date()
+            upcoming += [p for p in self.passes([(lat, lon)], day)[0] if p[2] >= now_ts]
+            if len(upcoming) >= count:
+                break
+        return upcoming[:count]
+
+    def describe(self, p: Pass) -> Dict:
+        """JSON form of a pass"""
+        satellite = self.settings["satellites"].get(p[0], {"name": p[0], "instruments": []})
+        iso = lambda ts: datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat(timespec="seconds")
+        return {
+            "satellite": satellite["name"],
+            "pass_time": iso(p[2]),
+            "rise_time": iso(p[1]),
+            "set_time": iso(p[3]),
+            "duration_s": round(p[3] - p[1]),
+            "elevation": round(p[4], 1),
+            "azimuth": round(p[5], 1),
+            "instruments": satellite["instruments"]
+        }
+
+
+# Process-wide instance so every module shares the orbit and pass caches
+pass_predictor = PassPredictor()
+
+
+def get_pass_predictor() -> PassPredictor:
+    """Return the shared pass predictor"""
+    return pass_predictor
@@ -0,0 +1,120 @@
+"""
+Vectorized NO2 pollution grid engine
+Builds OMI-style NO2/AQI grids of any extent and resolution as whole arrays, with JSON and binary encodings
+"""
+
+import io
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from modules.weather_air_quality.aqi import compute_aqi, sub_index
+from .simulation import DayLike, as_day, grid, simulator
+
+# (lat, lon, NO2 multiplier, half-width in degrees); the first matching source wins
+URBAN_SOURCES = [
+    (28.6139, 77.2090, 3.5, 0.1),  # Delhi
+    (19.0760, 72.8777, 2.8, 0.1)   # Mumbai
+]
+
+# Binary layout: one NPY structured array, row-major from the north-west cell
+GRID_DTYPE = np.dtype([("no2", "<f4"), ("aqi", "<u2")])
+
+MAX_CELLS = 1000 * 1000
+
+
+class PollutionGridEngine:
+    """Simulated OMI NO2 over a regular lat/lon grid, computed in a handful of array operations"""
+
+    def __init__(self, sources: Optional[List[Tuple[float, float, float, float]]] = None,
+                 background_no2: float = 15.0):
+        self.sources = sources if sources is not None else URBAN_SOURCES
+        self.background_no2 = background_no2
+
+    def compute(self, bounds: Tuple[float, float, float, float], shape: Tuple[int, int],
+                day: DayLike = None) -> Dict[str, np.ndarray]:
+        """NO2 (ppb), AQI and heatmap intensity for bounds (min_lon, min_lat, max_lon, max_lat)
+
+        min_lon > max_lon is a box crossing the antimeridian; its columns run
+        east from min_lon through 180 and on from -180, and every longitude
+        is returned in [-180, 180).
+        """
+        rows, cols = shape
+        if rows * cols > MAX_CELLS:
+            raise ValueError(f"grid of {rows}x{cols} exceeds {MAX_CELLS} cells")
+        day = as_day(day)
+        min_lon, min_lat, max_lon, max_lat = bounds
+        if min_lon > max_lon:
+            max_lon += 360
+        lat, lon = grid((min_lon, min_lat, max_lon, max_lat), shape)
+        # Cells past +-180 (an antimeridian box, or a radius box near it) belong to the other side
+        lon = np.where(lon >= 180, lon - 360, np.where(lon < -180, lon + 360, lon))
+
+        urban_factor = np.ones(shape)
+        unmatched = np.ones(shape, dtype=bool)
+        for src_lat, src_lon, factor, half_width in self.sources:
+            inside = unmatched & (np.abs(lat - src_lat) < half_width) & (np.abs(lon - src_lon) < half_width)
+            urban_factor[inside] = factor
+            unmatched &= ~inside
+
+        no2 = self.background_no2 * urban_factor + simulator.uniform("OMI_NO2", "no2", lat, lon, day, -5, 15)
+        no2 = np.maximum(no2, 0)
+        aqi = np.rint(sub_index("no2", no2)).astype(np.int64)
+        return {
+            "lat": lat,
+            "lon": lon,
+            "no2": no2,
+            "aqi": aqi,
+            "intensity": np.minimum(1.0, aqi / 200)
+        }
+
+    def stations(self, lat: float, lon: float, day: DayLike = None) -> List[Dict]:
+        """Monitoring stations around a point, with AQI from their NO2 and PM2.5 readings"""
+        # (dlat, dlon, NO2 ppb range, PM2.5 ug/m3 range, type)
+        layout = [(0.02, 0.02, (40, 90), (55, 120), "Industrial"), (-0.01, 0.03, (20, 50), (25, 60), "Residential"),
+                  (0.03, -0.02, (60, 120), (60, 150), "Traffic"), (-0.02, -0.01, (10, 30), (10, 35), "Park")]
+        sim = simulator.point("OMI_STATIONS", lat, lon, day)
+        unit = sim.uniform("readings", size=2 * len(layout)).reshape(2, -1)
+        no2_range = np.array([row[2] for row in layout], dtype=np.float64)
+        pm25_range = np.array([row[3] for row in layout], dtype=np.float64)
+        no2 = no2_range[:, 0] + unit[0] * np.diff(no2_range)[:, 0]
+        pm25 = pm25_range[:, 0] + unit[1] * np.diff(pm25_range)[:, 0]
+        result = compute_aqi({"no2": no2, "pm25": pm25})
+        return [
+            {"lat": lat + dlat, "lon": lon + dlon, "aqi": int(result["aqi"][i]),
+             "dominant_pollutant": str(result["dominant"][i]), "no2": round(float(no2[i]), 2),
+             "pm25": round(float(pm25[i]), 2), "type": kind}
+            for i, (dlat, dlon, _, _, kind) in enumerate(layout)
+        ]
+
+    @staticmethod
+    def to_points(result: Dict[str, np.ndarray]) -> List[Dict]:
+        """Per-cell dicts, the original /api/nasa/pollution JSON layout"""
+        lat = np.round(result["lat"].ravel(), 5).tolist()
+        lon = np.round(result["lon"].ravel(), 5).tolist()
+        no2 = np.round(result["no2"].ravel(), 2).tolist()
+        intensity = np.round(result["intensity"].ravel(), 3).tolist()
+        return [
+            {"lat": la, "lon": lo, "no2": n, "aqi": a, "intensity": i}
+            for la, lo, n, a, i in zip(lat, lon, no2, result["aqi"].ravel().tolist(), intensity)
+        ]
+
+    @staticmethod
+    def to_columns(result: Dict[str, np.ndarray]) -> Dict[str, List]:
+        """Row/column coordinates plus flat row-major values; ~4x faster to encode than per-cell dicts"""
+        return {
+            "lat": np.round(result["lat"][:, 0], 5).tolist(),
+            "lon": np.round(result["lon"][0, :], 5).tolist(),
+            "no2": np.round(result["no2"].ravel(), 2).tolist(),
+            "aqi": result["aqi"].ravel().tolist()
+        }
+
+    @staticmethod
+    def to_npy(result: Dict[str, np.ndarray]) -> bytes:
+        """Compact binary encoding: 6 bytes per cell as an NPY structured array"""
+        packed = np.empty(result["no2"].shape, dtype=GRID_DTYPE)
+        packed["no2"] = result["no2"]
+        packed["aqi"] = result["aqi"]
+        buffer = io.BytesIO()
+        np.save(buffer, packed)
+        return buffer.getvalue()
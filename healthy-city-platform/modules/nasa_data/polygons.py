@@ -0,0 +1,52 @@
+"""
+Polygon rasterization
+Share of each cell of a regular lon/lat grid covered by a polygon, shared by the region masks and zone labels
+"""
+
+from typing import Sequence
+
+import numpy as np
+
+BAND_POINTS = 4_000_000              # lattice points rasterized at a time
+
+
+def polygon_coverage(rings: Sequence, grid: Sequence[float], samples: int) -> tuple:
+    """Flat cell indices and the fraction of each cell inside a polygon (even-odd over its rings)
+
+    Each cell is sampled on a samples x samples lattice (its centre when
+    samples is 1). Edges are crossed with every lattice row at once and the
+    crossings toggle insideness from that column onwards, so a band of rows
+    costs one pass over its points.
+    """
+    min_lon, min_lat, max_lon, max_lat, size = grid
+    n_rows, n_cols = int(round((max_lat - min_lat) / size)), int(round((max_lon - min_lon) / size))
+    edges = np.concatenate([np.hstack([np.asarray(ring, dtype=np.float64)[:-1, :2],
+                                       np.asarray(ring, dtype=np.float64)[1:, :2]]) for ring in rings])
+    x1, y1, x2, y2 = edges.T
+    r0 = max(0, int(np.floor((min(y1.min(), y2.min()) - min_lat) / size)))
+    r1 = min(n_rows, int(np.ceil((max(y1.max(), y2.max()) - min_lat) / size)))
+    c0 = max(0, int(np.floor((min(x1.min(), x2.min()) - min_lon) / size)))
+    c1 = min(n_cols, int(np.ceil((max(x1.max(), x2.max()) - min_lon) / size)))
+    if r1 <= r0 or c1 <= c0:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+
+    offsets = (np.arange(samples) + 0.5) / samples
+    px = min_lon + (np.arange(c0, c1)[:, None] + offsets).ravel() * size
+    width = c1 - c0
+    band = max(1, BAND_POINTS // (samples * len(px)))
+    cells, fractions = [], []
+    for b0 in range(r0, r1, band):
+        b1 = min(r1, b0 + band)
+        py = min_lat + (np.arange(b0, b1)[:, None] + offsets).ravel() * size
+        crosses = (y1 > py[:, None]) != (y2 > py[:, None])
+        row, edge = np.nonzero(crosses)
+        xc = x1[edge] + (py[row] - y1[edge]) * (x2[edge] - x1[edge]) / (y2[edge] - y1[edge])
+        toggles = np.bincount(row * (len(px) + 1) + np.searchsorted(px, xc),
+                              minlength=len(py) * (len(px) + 1)).astype(np.uint8)
+        inside = np.bitwise_xor.accumulate(toggles.reshape(len(py), -1)[:, :-1] & 1, axis=1)
+        fraction = inside.reshape(b1 - b0, samples, width, samples).sum(axis=(1, 3), dtype=np.float32).ravel() / samples ** 2
+        keep = np.flatnonzero(fraction)
+        rows, cols = np.divmod(keep, width)
+        cells.append((rows + b0) * n_cols + cols + c0)
+        fractions.append(fraction[keep])
+    return np.concatenate(cells), np.concatenate(fractions).astype(np.float64)
@@ -0,0 +1,177 @@
+"""
+Population exposure
+People per hazard class or zone from a local population raster, aligned to each hazard grid once through cached area weights
+"""
+
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from config.nasa_apis import POPULATION
+from .files import file_identity
+from .zonal import KM_PER_DEGREE, disk_zones
+
+
+def overlap_weights(edges: np.ndarray, size: int) -> Tuple[sparse.csr_matrix, Tuple[int, int]]:
+    """Share of each pixel [k, k + 1) inside each cell [edges[i], edges[i + 1]) along one axis
+
+    Edges are in pixel units of a raster `size` pixels long. Returns the
+    (cells, pixels) matrix over the span of pixels the cells touch and
+    that span; parts of cells off the raster get no pixels.
+    """
+    lo = int(np.clip(np.floor(edges.min()), 0, size))
+    hi = int(np.clip(np.ceil(edges.max()), lo, size))
+    # Every cell and pixel boundary splits the axis into pieces lying in one cell and one pixel
+    cuts = np.union1d(np.clip(edges, lo, hi), np.arange(lo, hi + 1))
+    length = np.diff(cuts)
+    middle = cuts[:-1] + length / 2
+    cell = np.searchsorted(edges, middle, side="right") - 1
+    keep = (length > 0) & (cell >= 0) & (cell < len(edges) - 1)
+    pixel = np.floor(middle[keep]).astype(np.int64) - lo
+    weights = sparse.csr_matrix((length[keep], (cell[keep], pixel)), shape=(len(edges) - 1, hi - lo))
+    return weights, (lo, hi)
+
+
+class PopulationRaster:
+    """An ingested population-count raster and its alignments to hazard grids
+
+    Layout: {root}/population.json holds the raster's metadata (source
+    file, lon/lat bounds, shape, total) and {root}/<version dir>/population.npy
+    the float32 people per pixel, north row first, 0 where the source has
+    no data. A hazard grid is aligned through a pair of sparse per-axis
+    overlap matrices, its people being rows @ window @ cols.T; the aligned
+    grid is kept per grid and raster version, so each is resampled once.
+    """
+
+    def __init__(self, root: str = POPULATION["root"], settings: Optional[Dict] = None):
+        self.root = root
+        self.settings = {**POPULATION, **(settings or {})}
+        self._lock = threading.Lock()
+        self._meta: Optional[Dict] = None
+        self._identity = None
+        self._values: Optional[np.ndarray] = None
+        self._grids: "OrderedDict[tuple, Dict]" = OrderedDict()
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.root, "population.json")
+
+    def meta(self) -> Optional[Dict]:
+        """Raster metadata, re-read when a new raster has been ingested; None before the first"""
+        try:
+            identity = file_identity(self._meta_path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if identity != self._identity:
+                with open(self._meta_path) as f:
+                    self._meta = json.load(f)
+                self._values = np.load(os.path.join(self.root, self._meta["dir"], "population.npy"),
+                                       mmap_mode="r").view(np.ndarray)
+                self._grids.clear()
+                self._identity = identity
+            return self._meta
+
+    def register(self, meta: Dict):
+        """Publish an ingested raster, replacing and removing the previous version"""
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock:
+            try:
+                with open(self._meta_path) as f:
+                    previous = json.load(f)
+            except FileNotFoundError:
+                previous = None
+            with open(self._meta_path + ".tmp", "w") as f:
+                json.dump(meta, f)
+            os.replace(self._meta_path + ".tmp", self._meta_path)
+        if previous and previous["dir"] != meta["dir"]:
+            shutil.rmtree(os.path.join(self.root, previous["dir"]), ignore_errors=True)
+
+    def grid(self, bounds: Sequence[float], shape: Tuple[int, int]) -> Optional[Dict]:
+        """People per cell of a north-up grid and the share of each cell the raster covers
+
+        None without a raster, or when the raster does not reach the grid.
+        """
+        meta = self.meta()
+        if meta is None:
+            return None
+        key = (self._identity, tuple(float(v) for v in bounds), tuple(shape))
+        with self._lock:
+            cached = self._grids.get(key)
+            if cached is not None:
+                self._grids.move_to_end(key)
+                return cached
+            values = self._values
+
+        min_lon, min_lat, max_lon, max_lat = bounds
+        rows, cols = shape
+        r_min_lon, r_min_lat, r_max_lon, r_max_lat = meta["bounds"]
+        r_rows, r_cols = meta["shape"]
+        pixel_h, pixel_w = (r_max_lat - r_min_lat) / r_rows, (r_max_lon - r_min_lon) / r_cols
+        # Cell edges in raster pixel units, rows counted south from the raster's north edge
+        row_w, (r0, r1) = overlap_weights((r_max_lat - np.linspace(max_lat, min_lat, rows + 1)) / pixel_h, r_rows)
+        col_w, (c0, c1) = overlap_weights((np.linspace(min_lon, max_lon, cols + 1) - r_min_lon) / pixel_w, r_cols)
+        window = np.asarray(values[r0:r1, c0:c1], dtype=np.float64)
+        people = (row_w @ (col_w @ window.T).T) if window.size else np.zeros(shape)
+        coverage = np.outer(np.asarray(row_w.sum(axis=1)).ravel() / ((max_lat - min_lat) / rows / pixel_h),
+                            np.asarray(col_w.sum(axis=1)).ravel() / ((max_lon - min_lon) / cols / pixel_w))
+        if not coverage.any():
+            return None
+        result = {"people": np.asarray(people).reshape(shape), "coverage": np.clip(coverage, 0, 1)}
+        with self._lock:
+            self._grids[key] = result
+            while len(self._grids) > self.settings["weight_entries"]:
+                self._grids.popitem(last=False)
+        return result
+
+    def zone_counts(self, labels: np.ndarray, zones: int, bounds: Sequence[float]) -> Optional[np.ndarray]:
+        """People in each zone 1..zones of a label raster on a grid; None without a raster covering it"""
+        aligned = self.grid(bounds, labels.shape)
+        if aligned is None:
+            return None
+        return np.bincount(labels.ravel(), weights=aligned["people"].ravel(), minlength=zones + 1)[1:zones + 1]
+
+    def class_counts(self, hazard: np.ndarray, bounds: Sequence[float], breaks: Sequence[float],
+                     right: bool = False) -> Optional[np.ndarray]:
+        """People per hazard class of a gridded layer, classed as np.digitize does, then those on cells with no data"""
+        classes = np.digitize(hazard, breaks, right=right)
+        classes[~np.isfinite(hazard)] = len(breaks) + 1
+        return self.zone_counts(classes + 1, len(breaks) + 2, bounds)
+
+    def within(self, centers: Sequence[Tuple[float, float]], radius_km) -> Optional[np.ndarray]:
+        """People within radius_km (one or one per centre) of each (lat, lon), the nearest centre taking overlaps"""
+        meta = self.meta()
+        if meta is None:
+            return None
+        if not len(centers):
+            return np.zeros(0)
+        centers = np.asarray(centers, dtype=np.float64)
+        radius = np.broadcast_to(np.asarray(radius_km, dtype=np.float64), len(centers))
+        d_lat = radius / KM_PER_DEGREE
+        d_lon = d_lat / np.cos(np.radians(centers[:, 0]))
+        bounds = ((centers[:, 1] - d_lon).min(), (centers[:, 0] - d_lat).min(),
+                  (centers[:, 1] + d_lon).max(), (centers[:, 0] + d_lat).max())
+        # Cells the size of the raster's pixels, so disks are cut as finely as the data allows
+        r_min_lon, r_min_lat, r_max_lon, r_max_lat = meta["bounds"]
+        pixel_h = (r_max_lat - r_min_lat) / meta["shape"][0]
+        pixel_w = (r_max_lon - r_min_lon) / meta["shape"][1]
+        cap = self.settings["max_local_cells"]
+        shape = (int(np.clip(np.ceil((bounds[3] - bounds[1]) / pixel_h), 1, cap)),
+                 int(np.clip(np.ceil((bounds[2] - bounds[0]) / pixel_w), 1, cap)))
+        zones = disk_zones(bounds, shape, [tuple(c) for c in centers], radius)
+        return self.zone_counts(zones.labels, len(centers), bounds)
+
+
+# Process-wide instance so every request shares the mapped raster and its alignments
+population_raster = PopulationRaster()
+
+
+def get_population_raster() -> PopulationRaster:
+    """Return the shared population raster"""
+    return population_raster
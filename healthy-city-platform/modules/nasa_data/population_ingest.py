@@ -0,0 +1,98 @@
+"""
+Population raster ingest
+Reads a WorldPop or GHSL people-per-pixel GeoTIFF into the population store, block by block, in geographic coordinates
+
+    python -m modules.nasa_data.population_ingest /data/worldpop/ind_ppp_2020_UNadj_constrained.tif
+    python -m modules.nasa_data.population_ingest /data/ghsl/GHS_POP_E2020_GLOBE_R2023A_54009_100_V1_0.tif --bounds 68 6 98 37
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+from rasterio.windows import Window, from_bounds
+from rasterio.windows import bounds as window_bounds
+
+from config.nasa_apis import POPULATION
+from .files import file_identity
+from .population import PopulationRaster, get_population_raster
+
+
+def ingest(path: str, bounds: Optional[Sequence[float]] = None, store: Optional[PopulationRaster] = None) -> Dict:
+    """Copy the raster (or its part within lon/lat bounds) into a new store version and publish it
+
+    Projected rasters such as GHSL's Mollweide grid are warped to lon/lat
+    with sum resampling, so pixel counts are redistributed rather than
+    interpolated. Nodata and negative values become 0 people.
+    """
+    store = store or get_population_raster()
+    with rasterio.open(path) as src:
+        if src.crs is None:
+            raise ValueError(f"'{path}' has no coordinate reference system")
+        reproject = not src.crs.is_geographic
+        source = WarpedVRT(src, crs="EPSG:4326", resampling=Resampling.sum) if reproject else src
+        try:
+            transform = source.transform
+            if transform.b or transform.d or transform.e >= 0:
+                raise ValueError(f"'{path}' is not a north-up raster")
+            window = Window(0, 0, source.width, source.height)
+            if bounds is not None:
+                window = from_bounds(*bounds, transform=transform).intersection(window)
+                window = window.round_offsets().round_lengths()
+            rows, cols = int(window.height), int(window.width)
+            if rows <= 0 or cols <= 0:
+                raise ValueError(f"'{path}' does not overlap {list(bounds)}")
+
+            version = f"population.{time.time_ns()}"
+            os.makedirs(os.path.join(store.root, version), exist_ok=True)
+            out = np.lib.format.open_memmap(os.path.join(store.root, version, "population.npy"), mode="w+",
+                                            dtype=np.float32, shape=(rows, cols))
+            total = 0.0
+            for r0 in range(0, rows, store.settings["block_rows"]):
+                n = min(store.settings["block_rows"], rows - r0)
+                block = source.read(1, window=Window(window.col_off, window.row_off + r0, cols, n), masked=True)
+                block = block.astype(np.float32).filled(0)
+                block[~np.isfinite(block) | (block < 0)] = 0
+                out[r0:r0 + n] = block
+                total += float(block.sum(dtype=np.float64))
+            out.flush()
+            del out
+            left, bottom, right, top = window_bounds(window, transform)
+        finally:
+            if reproject:
+                source.close()
+
+    meta = {
+        "source": os.path.abspath(path),
+        "identity": list(file_identity(path)),
+        "crs": str(src.crs),
+        "reprojected": reproject,
+        "bounds": [left, bottom, right, top],
+        "shape": [rows, cols],
+        "total": round(total),
+        "dir": version,
+        "ingested": datetime.utcnow().isoformat()
+    }
+    store.register(meta)
+    return meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest a WorldPop or GHSL population GeoTIFF into the population store")
+    parser.add_argument("file")
+    parser.add_argument("--bounds", nargs=4, type=float, metavar=("MIN_LON", "MIN_LAT", "MAX_LON", "MAX_LAT"),
+                        help="keep only this lon/lat box of the raster")
+    parser.add_argument("--root", default=POPULATION["root"])
+    args = parser.parse_args()
+
+    print(ingest(args.file, args.bounds, PopulationRaster(args.root)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Region masks for gridded products
+GeoJSON region polygons rasterized once per grid into area-weighted sparse masks, so a regional mean is one dot product
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from config.nasa_apis import REGIONS
+from .cube_store import GriddedCube
+from .files import file_identity
+from .polygons import polygon_coverage
+
+KM_PER_DEGREE = 111.195
+
+
+def load_regions(path: str = REGIONS["file"]) -> List[Dict]:
+    """Polygon and MultiPolygon features of a GeoJSON file as {"id", "name", "polygons": [[ring, ...], ...]}"""
+    with open(path) as f:
+        collection = json.load(f)
+    regions = []
+    for feature in collection.get("features", []):
+        geometry = feature.get("geometry") or {}
+        properties = feature.get("properties") or {}
+        if geometry.get("type") == "Polygon":
+            polygons = [geometry["coordinates"]]
+        elif geometry.get("type") == "MultiPolygon":
+            polygons = geometry["coordinates"]
+        else:
+            continue
+        region_id = str(properties.get("id") or feature.get("id") or properties.get("name"))
+        regions.append({"id": region_id, "name": properties.get("name", region_id), "polygons": polygons})
+    return regions
+
+
+class RegionMasks:
+    """Every region's mask on one grid as a sparse (region, cell) matrix of covered area in km²
+
+    Weights are the fraction of the cell inside the region times its area
+    (cos(latitude) scaled), held only over the cells some region touches.
+    A regional mean of a layer is then W @ values / W @ valid for all
+    regions and time steps in one product.
+    """
+
+    def __init__(self, grid: Sequence[float], path: str = REGIONS["file"], settings: Optional[Dict] = None):
+        self.grid = [float(v) for v in grid]
+        self.path = path
+        self.settings = {**REGIONS, **(settings or {})}
+        min_lon, min_lat, max_lon, max_lat, size = self.grid
+        self.shape = (int(round((max_lat - min_lat) / size)), int(round((max_lon - min_lon) / size)))
+        self.ids: List[str] = []
+        self.names: List[str] = []
+        self.support = np.empty(0, dtype=np.int64)
+        self.weights = csr_matrix((0, 0))
+        self.area_km2 = np.empty(0)
+
+    @property
+    def samples(self) -> int:
+        """Lattice points per cell side; grids finer than subsample_min_deg test cell centres only"""
+        return self.settings["subsamples"] if self.grid[4] >= self.settings["subsample_min_deg"] else 1
+
+    @property
+    def _cache_path(self) -> str:
+        key = json.dumps([self.grid, os.path.abspath(self.path), list(file_identity(self.path)), self.samples])
+        return os.path.join(self.settings["cache_dir"], hashlib.sha1(key.encode()).hexdigest()[:16] + ".npz")
+
+    def load(self) -> "RegionMasks":
+        """Read the masks from the disk cache, rasterizing and saving them first when missing"""
+        path = self._cache_path
+        if not os.path.exists(path):
+            self.build()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp.npz"
+            np.savez(tmp, ids=np.array(self.ids), names=np.array(self.names), support=self.support,
+                     data=self.weights.data, indices=self.weights.indices, indptr=self.weights.indptr)
+            os.replace(tmp, path)
+            return self
+        with np.load(path) as cached:
+            self.ids, self.names = cached["ids"].tolist(), cached["names"].tolist()
+            self.support = cached["support"]
+            self.weights = csr_matrix((cached["data"], cached["indices"], cached["indptr"]),
+                                      shape=(len(self.ids), len(self.support)))
+        self.area_km2 = np.asarray(self.weights.sum(axis=1)).ravel()
+        return self
+
+    def build(self):
+        """Rasterize every region with fractional coverage and cos(latitude) cell areas"""
+        min_lon, min_lat, max_lon, max_lat, size = self.grid
+        regions = load_regions(self.path)
+        region_idx, cells, fractions = [], [], []
+        for k, region in enumerate(regions):
+            for rings in region["polygons"]:
+                cell, fraction = polygon_coverage(rings, self.grid, self.samples)
+                region_idx.append(np.full(len(cell), k))
+                cells.append(cell)
+                fractions.append(fraction)
+        region_idx = np.concatenate(region_idx) if region_idx else np.empty(0, dtype=np.int64)
+        cells = np.concatenate(cells) if cells else np.empty(0, dtype=np.int64)
+        fractions = np.concatenate(fractions) if fractions else np.empty(0)
+
+        self.support, columns = np.unique(cells, return_inverse=True)
+        weights = csr_matrix((fractions, (region_idx, columns)), shape=(len(regions), len(self.support)))
+        weights.sum_duplicates()
+        np.minimum(weights.data, 1.0, out=weights.data)  # parts of a MultiPolygon that overlap
+        lat = min_lat + (self.support // self.shape[1] + 0.5) * size
+        cell_km2 = np.cos(np.radians(lat)) * (size * KM_PER_DEGREE) ** 2
+        self.weights = csr_matrix(weights.multiply(cell_km2[None, :]))
+        self.ids = [region["id"] for region in regions]
+        self.names = [region["name"] for region in regions]
+        self.area_km2 = np.asarray(self.weights.sum(axis=1)).ravel()
+
+    def index(self, region: str) -> Optional[int]:
+        """Row of a region in the mask matrix"""
+        return self.ids.index(region) if region in self.ids else None
+
+    def describe(self) -> List[Dict]:
+        """Region ids, names and covered area on this grid"""
+        return [{"id": region_id, "name": name, "area_km2": round(float(area), 1)}
+                for region_id, name, area in zip(self.ids, self.names, self.area_km2)]
+
+    def _weighted_mean(self, flat: np.ndarray) -> np.ndarray:
+        """(regions, T) area-weighted means of (support cells, T) values, leaving out NaN cells per time step"""
+        ok = np.isfinite(flat)
+        both = self.weights @ np.hstack([np.where(ok, flat, 0.0), ok])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return both[:, :flat.shape[1]] / both[:, flat.shape[1]:]
+
+    def means(self, values: np.ndarray) -> np.ndarray:
+        """Regional means of a (rows, cols) or (rows, cols, T) layer on this grid, south row first
+
+        Returns (regions,) or (regions, T). Only the masked cells are read, so
+        a memory-mapped layer pages in just the regions' footprint.
+        """
+        if values.shape[:2] != self.shape:
+            raise ValueError(f"layer grid {values.shape[:2]} does not match the mask grid {self.shape}")
+        flat = np.asarray(values.reshape(self.shape[0] * self.shape[1], -1)[self.support], dtype=np.float64)
+        out = self._weighted_mean(flat)
+        return out[:, 0] if values.ndim == 2 else out
+
+    def cube_means(self, cube: GriddedCube, slots: np.ndarray) -> np.ndarray:
+        """(regions, T) means over stored time slots of a cube on this grid, reading the regions' bounding window"""
+        if not np.allclose(cube.manifest["grid"], self.grid):
+            raise ValueError("cube grid does not match the mask grid")
+        if not len(self.support):
+            return np.full((len(self.ids), len(slots)), np.nan)
+        rows, cols = np.divmod(self.support, self.shape[1])
+        r0, c0 = rows.min(), cols.min()
+        width = cols.max() - c0 + 1
+        block = cube.read(np.arange(r0, rows.max() + 1), np.arange(c0, c0 + width), slots)
+        flat = block.reshape(len(slots), -1)[:, (rows - r0) * width + cols - c0].T
+        return self._weighted_mean(flat.astype(np.float64))
+
+
+_masks: Dict[tuple, RegionMasks] = {}
+_masks_lock = threading.Lock()
+
+
+def get_region_masks(grid: Sequence[float], path: Optional[str] = None) -> RegionMasks:
+    """Shared masks for a grid, rebuilt when the region file changes"""
+    path = path or REGIONS["file"]
+    key = (tuple(float(v) for v in grid), path, file_identity(path))
+    with _masks_lock:
+        masks = _masks.get(key)
+        if masks is None:
+            for stale in [k for k in _masks if k[:2] == key[:2]]:
+                del _masks[stale]
+            masks = _masks[key] = RegionMasks(grid, path).load()
+        return masks
@@ -0,0 +1,175 @@
+"""
+Deterministic simulation engine
+Hash-seeded, vectorized stand-in values for NASA products when live data is unavailable
+"""
+
+import hashlib
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+DayLike = Union[None, date, datetime, np.datetime64, str]
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MASK = (1 << 64) - 1
+
+
+def _mix(h: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer; a bijective avalanche over uint64"""
+    h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+
+def _mix_int(h: int) -> int:
+    """_mix for a single Python int; avoids NumPy call overhead on scalar draws"""
+    h = ((h ^ (h >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    h = ((h ^ (h >> 27)) * 0x94D049BB133111EB) & _MASK
+    return h ^ (h >> 31)
+
+
+@lru_cache(maxsize=1024)
+def _name_seed(seed: int, product: str, field: str) -> np.uint64:
+    digest = hashlib.blake2b(f"{seed}:{product}:{field}".encode(), digest_size=8).digest()
+    return np.uint64(int.from_bytes(digest, "little"))
+
+
+def as_day(day: DayLike = None) -> date:
+    """Simulation day; defaults to today (UTC)"""
+    if day is None:
+        return datetime.utcnow().date()
+    if isinstance(day, datetime):
+        return day.date()
+    if isinstance(day, date):
+        return day
+    return np.datetime64(day, "D").astype(date)
+
+
+class SimulationEngine:
+    """Pure-function noise keyed by (product, field, lat, lon, day, index)
+
+    Coordinates are quantized to `precision_deg` and hashed with the product,
+    field name and day, so a point gets the same value whether it is simulated
+    alone or inside a 1000x1000 grid, and repeated requests produce identical
+    responses that can be cached and served with an ETag. All inputs broadcast
+    like NumPy arrays; one call fills a whole grid or series.
+    """
+
+    def __init__(self, seed: int = 0, precision_deg: float = 1e-4):
+        self.seed = seed
+        self.precision_deg = precision_deg
+
+    def hash(self, product: str, field: str, lat, lon, day: DayLike = None, index=0) -> np.ndarray:
+        """uint64 hash per broadcast (lat, lon, index) element"""
+        lat_q = np.round(np.asarray(lat, dtype=np.float64) / self.precision_deg).astype(np.int64)
+        lon_q = np.round(np.asarray(lon, dtype=np.float64) / self.precision_deg).astype(np.int64)
+        day_n = np.int64(as_day(day).toordinal())
+        with np.errstate(over="ignore"):
+            h = np.full(np.broadcast_shapes(lat_q.shape, lon_q.shape, np.shape(index)),
+                        _name_seed(self.seed, product, field), dtype=np.uint64)
+            for part in (lat_q, lon_q, day_n, np.asarray(index, dtype=np.int64)):
+                h = _mix(h ^ (part.astype(np.uint64) * _GOLDEN))
+        return h
+
+    def hash_scalar(self, product: str, field: str, lat: float, lon: float, day: date, index: int = 0) -> int:
+        """hash() for one point, computed on Python ints; returns the same value"""
+        h = int(_name_seed(self.seed, product, field))
+        golden = int(_GOLDEN)
+        for part in (round(lat / self.precision_deg), round(lon / self.precision_deg), day.toordinal(), index):
+            h = _mix_int(h ^ ((part * golden) & _MASK))
+        return h
+
+    def uniform(self, product: str, field: str, lat, lon, day: DayLike = None,
+                low: float = 0.0, high: float = 1.0, index=0) -> np.ndarray:
+        unit = (self.hash(product, field, lat, lon, day, index) >> np.uint64(11)) * (1.0 / (1 << 53))
+        return low + (high - low) * unit
+
+    def normal(self, product: str, field: str, lat, lon, day: DayLike = None,
+               mean: float = 0.0, std: float = 1.0, index=0) -> np.ndarray:
+        """Box-Muller over two independent uniforms"""
+        u1 = self.uniform(product, field + "#n1", lat, lon, day, index=index)
+        u2 = self.uniform(product, field + "#n2", lat, lon, day, index=index)
+        return mean + std * np.sqrt(-2.0 * np.log1p(-u1)) * np.cos(2.0 * np.pi * u2)
+
+    def integers(self, product: str, field: str, lat, lon, day: DayLike = None,
+                 low: int = 0, high: int = 2, index=0) -> np.ndarray:
+        """Integers in [low, high)"""
+        return low + np.floor(self.uniform(product, field, lat, lon, day, 0.0, high - low, index)).astype(np.int64)
+
+    def choice(self, product: str, field: str, lat, lon, options: Sequence, day: DayLike = None,
+               p: Optional[Sequence[float]] = None, index=0) -> np.ndarray:
+        """Pick from options (uniformly, or with probabilities p)"""
+        weights = np.ones(len(options)) if p is None else np.asarray(p, dtype=np.float64)
+        cumulative = np.cumsum(weights / weights.sum())
+        picks = np.searchsorted(cumulative, self.uniform(product, field, lat, lon, day, index=index), side="right")
+        table = np.empty(len(options), dtype=object)
+        for i, option in enumerate(options):  # options may themselves be lists
+            table[i] = option
+        return table[np.minimum(picks, len(options) - 1)]
+
+    def smooth(self, product: str, field: str, lat, lon, day: DayLike = None, scale_deg: float = 0.25) -> np.ndarray:
+        """Spatially coherent noise in [0, 1): bilinear interpolation of hashed lattice values
+
+        Neighbouring points get similar values, which makes simulated grids look
+        like plumes and patches instead of per-pixel static.
+        """
+        lat = np.asarray(lat, dtype=np.float64) / scale_deg
+        lon = np.asarray(lon, dtype=np.float64) / scale_deg
+        lat0, lon0 = np.floor(lat), np.floor(lon)
+        ty, tx = lat - lat0, lon - lon0
+        # smoothstep removes visible lattice edges
+        ty, tx = ty * ty * (3 - 2 * ty), tx * tx * (3 - 2 * tx)
+        corner = lambda dy, dx: self.uniform(product, field, (lat0 + dy) * scale_deg, (lon0 + dx) * scale_deg, day)
+        top = corner(0, 0) * (1 - tx) + corner(0, 1) * tx
+        bottom = corner(1, 0) * (1 - tx) + corner(1, 1) * tx
+        return top * (1 - ty) + bottom * ty
+
+    def point(self, product: str, lat: float, lon: float, day: DayLike = None) -> "PointSimulation":
+        """Scalar helper bound to one location and day"""
+        return PointSimulation(self, product, lat, lon, as_day(day))
+
+
+class PointSimulation:
+    """Deterministic draws for one (product, location, day); returns plain Python values"""
+
+    def __init__(self, engine: SimulationEngine, product: str, lat: float, lon: float, day: date):
+        self.engine = engine
+        self.product = product
+        self.lat = lat
+        self.lon = lon
+        self.day = day
+
+    def uniform(self, field: str, low: float = 0.0, high: float = 1.0, size: Optional[int] = None):
+        if size is None:
+            unit = (self.engine.hash_scalar(self.product, field, self.lat, self.lon, self.day) >> 11) * (1.0 / (1 << 53))
+            return low + (high - low) * unit
+        return self.engine.uniform(self.product, field, self.lat, self.lon, self.day, low, high, np.arange(size))
+
+    def integers(self, field: str, low: int, high: int, size: Optional[int] = None):
+        if size is None:
+            return low + int(self.uniform(field, 0.0, high - low))
+        return self.engine.integers(self.product, field, self.lat, self.lon, self.day, low, high, np.arange(size))
+
+    def choice(self, field: str, options: Sequence, p: Optional[Sequence[float]] = None, size: Optional[int] = None):
+        if size is None and p is None:
+            return options[min(int(self.uniform(field, 0.0, len(options))), len(options) - 1)]
+        index = 0 if size is None else np.arange(size)
+        picks = self.engine.choice(self.product, field, self.lat, self.lon, options, self.day, p, index)
+        return picks if size is None else list(picks)
+
+    def chance(self, field: str, probability: float) -> bool:
+        return self.uniform(field) < probability
+
+
+simulator = SimulationEngine()
+
+
+def grid(bounds: Tuple[float, float, float, float], shape: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """Cell-centre lat/lon arrays for bounds (min_lon, min_lat, max_lon, max_lat) and shape (rows, cols)"""
+    min_lon, min_lat, max_lon, max_lat = bounds
+    rows, cols = shape
+    lat = max_lat - (np.arange(rows) + 0.5) * (max_lat - min_lat) / rows
+    lon = min_lon + (np.arange(cols) + 0.5) * (max_lon - min_lon) / cols
+    return np.meshgrid(lat, lon, indexing="ij")
@@ -0,0 +1,217 @@
+"""
+Zonal statistics
+Ward/district polygons rasterized once per city grid into a label raster, so any layer's per-zone statistics are one bincount pass
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config.nasa_apis import POLLUTION_MAP, ZONES
+from .files import file_identity
+from .polygons import polygon_coverage
+from .regions import load_regions
+from .simulation import grid
+
+KM_PER_DEGREE = 111.195
+SECTOR_NAMES = {3: [["North-West", "North", "North-East"], ["West", "Central", "East"],
+                    ["South-West", "South", "South-East"]]}
+
+
+def city_grid(city: str, n: Optional[int] = None) -> Tuple[Tuple[float, float, float, float], Tuple[int, int]]:
+    """Bounds (min_lon, min_lat, max_lon, max_lat) and n x n shape of a configured city's zone grid"""
+    cfg = POLLUTION_MAP["cities"][city]
+    half = cfg["half_width_deg"]
+    n = n or ZONES["grid_size"]
+    return (cfg["lon"] - half, cfg["lat"] - half, cfg["lon"] + half, cfg["lat"] + half), (n, n)
+
+
+def rasterize(regions: Sequence[Dict], bounds: Sequence[float], shape: Tuple[int, int]) -> np.ndarray:
+    """int32 labels, north row first: k + 1 where a cell's centre lies in region k, 0 elsewhere; later regions win"""
+    rows, cols = shape
+    size = (bounds[3] - bounds[1]) / rows
+    if not np.isclose(size, (bounds[2] - bounds[0]) / cols):
+        raise ValueError("zones need a grid of square cells")
+    labels = np.zeros(rows * cols, dtype=np.int32)
+    for k, region in enumerate(regions):
+        for rings in region["polygons"]:
+            cells, _ = polygon_coverage(rings, (*bounds, size), 1)
+            labels[cells] = k + 1
+    # polygon_coverage counts rows from the south
+    return labels.reshape(rows, cols)[::-1].copy()
+
+
+def sectors(city: str, n: int) -> List[Dict]:
+    """A city's bounds split into n x n rectangular districts, in the shape load_regions returns"""
+    cfg = POLLUTION_MAP["cities"][city]
+    (min_lon, min_lat, max_lon, max_lat), _ = city_grid(city)
+    lon = np.linspace(min_lon, max_lon, n + 1)
+    lat = np.linspace(max_lat, min_lat, n + 1)
+    regions = []
+    for i in range(n):
+        for j in range(n):
+            name = SECTOR_NAMES[n][i][j] if n in SECTOR_NAMES else f"Sector {i * n + j + 1}"
+            ring = [[lon[j], lat[i + 1]], [lon[j + 1], lat[i + 1]], [lon[j + 1], lat[i]], [lon[j], lat[i]],
+                    [lon[j], lat[i + 1]]]
+            regions.append({"id": f"{city}-{i * n + j + 1}", "name": f"{cfg['name']} {name} District",
+                            "polygons": [[ring]]})
+    return regions
+
+
+class ZoneLabels:
+    """Zones of one grid as a label raster
+
+    Counts and means of a layer for every zone are one bincount over the
+    labels; percentiles are one sort of the layer with each value offset
+    by its label, which groups the cells by zone in value order.
+    """
+
+    def __init__(self, labels: np.ndarray, ids: List[str], names: List[str], bounds: Sequence[float]):
+        self.labels = labels
+        self.ids, self.names = list(ids), list(names)
+        self.bounds = [float(v) for v in bounds]
+        self._flat = labels.ravel().astype(np.int64)
+        cells = np.bincount(self._flat, minlength=len(self.ids) + 1)
+        self.cells = cells[1:]
+        # Where each zone's run starts once cells are sorted by label
+        self._starts = np.cumsum(cells)[:-1]
+        lat, lon = grid(self.bounds, labels.shape)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.lat = np.bincount(self._flat, weights=lat.ravel(), minlength=len(self.ids) + 1)[1:] / self.cells
+            self.lon = np.bincount(self._flat, weights=lon.ravel(), minlength=len(self.ids) + 1)[1:] / self.cells
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.labels.shape
+
+    def stats(self, layers: Dict[str, np.ndarray], percentiles: Sequence[float] = ()) -> Dict[str, Dict[str, np.ndarray]]:
+        """Per-zone count of valid cells, mean and percentiles of each (rows, cols) layer on this grid
+
+        Returns {layer: {"count", "mean", "p<q>", ...}} of (zones,) arrays,
+        NaN where a zone has no valid cell.
+        """
+        bins = len(self.ids) + 1
+        out = {}
+        for name, layer in layers.items():
+            if layer.shape != self.shape:
+                raise ValueError(f"layer '{name}' grid {layer.shape} does not match the zone grid {self.shape}")
+            values = np.asarray(layer, dtype=np.float64).ravel()
+            valid = np.isfinite(values)
+            count = np.bincount(self._flat, weights=valid, minlength=bins)[1:]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                stats = {"count": count.astype(np.int64),
+                         "mean": np.bincount(self._flat, weights=np.where(valid, values, 0), minlength=bins)[1:] / count}
+
+            if len(percentiles) and valid.any():
+                # Values scaled into [0, 1] plus 2 x label sort into per-zone runs in value order;
+                # invalid cells (1.5) land after the valid ones of their zone
+                lo = values[valid].min()
+                span = values[valid].max() - lo or 1.0
+                keys = np.where(valid, (values - lo) / span, 1.5) + 2.0 * self._flat
+                keys.sort()
+                last = np.maximum(count - 1, 0)
+                offset = np.arange(1, bins) * 2.0
+                # Trailing zones without cells start at len(keys); clamped, and masked to NaN below
+                end = len(keys) - 1
+                for q in percentiles:
+                    position = self._starts + last * (q / 100)
+                    below = np.minimum(np.floor(position).astype(np.int64), end)
+                    above = np.minimum(below + 1, np.minimum((self._starts + last).astype(np.int64), end))
+                    value = (keys[below] - offset) + (keys[above] - keys[below]) * (position - below)
+                    stats[f"p{q:g}"] = np.where(count > 0, value * span + lo, np.nan)
+            elif len(percentiles):
+                stats.update({f"p{q:g}": np.full(bins - 1, np.nan) for q in percentiles})
+            out[name] = stats
+        return out
+
+    def describe(self) -> List[Dict]:
+        """Zone ids, names, cells and centroids on this grid"""
+        return [{"id": zone_id, "name": name, "cells": int(cells), "lat": round(float(lat), 5),
+                 "lon": round(float(lon), 5)}
+                for zone_id, name, cells, lat, lon in zip(self.ids, self.names, self.cells, self.lat, self.lon)]
+
+
+def disk_zones(bounds: Sequence[float], shape: Tuple[int, int], centers: Sequence[Tuple[float, float]],
+               radius_km) -> ZoneLabels:
+    """Zones of the cells within radius_km (one, or one per centre) of each (lat, lon) centre, the nearest centre winning overlaps"""
+    lat, lon = grid(bounds, shape)
+    best = np.full(shape, np.inf)
+    labels = np.zeros(shape, dtype=np.int32)
+    radii = np.broadcast_to(np.asarray(radius_km, dtype=np.float64), len(centers))
+    for k, (c_lat, c_lon) in enumerate(centers):
+        d = np.hypot((lat - c_lat) * KM_PER_DEGREE, (lon - c_lon) * KM_PER_DEGREE * np.cos(np.radians(c_lat)))
+        closer = (d <= radii[k]) & (d < best)
+        labels[closer] = k + 1
+        best[closer] = d[closer]
+    ids = [str(k + 1) for k in range(len(centers))]
+    return ZoneLabels(labels, ids, ids, bounds)
+
+
+class CityZones:
+    """Ward/district label rasters of the configured cities, cached on disk per grid and zones file"""
+
+    def __init__(self, settings: Optional[Dict] = None):
+        self.settings = {**ZONES, **(settings or {})}
+        self._lock = threading.Lock()
+        self._zones: Dict[str, Tuple[tuple, ZoneLabels]] = {}
+
+    def _key(self, city: str) -> tuple:
+        bounds, shape = city_grid(city, self.settings["grid_size"])
+        path = self.settings["file"]
+        source = (os.path.abspath(path), tuple(file_identity(path))) if path else ("sectors", self.settings["sectors"])
+        return tuple(bounds), tuple(shape), source
+
+    def get(self, city: str) -> ZoneLabels:
+        """A city's zones, rasterized on first use and again when the zones file changes"""
+        key = self._key(city)
+        with self._lock:
+            cached = self._zones.get(city)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+            digest = hashlib.sha1(json.dumps([city, *key]).encode()).hexdigest()[:16]
+            path = os.path.join(self.settings["cache_dir"], f"{city}-{digest}.npz")
+            if os.path.exists(path):
+                with np.load(path) as stored:
+                    zones = ZoneLabels(stored["labels"], stored["ids"].tolist(), stored["names"].tolist(), key[0])
+            else:
+                zones = self._build(city, key)
+                os.makedirs(self.settings["cache_dir"], exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp.npz"
+                np.savez(tmp, labels=zones.labels, ids=np.array(zones.ids), names=np.array(zones.names))
+                os.replace(tmp, path)
+            self._zones[city] = (key, zones)
+            return zones
+
+    def _build(self, city: str, key: tuple) -> ZoneLabels:
+        bounds, shape, _ = key
+        if self.settings["file"]:
+            min_lon, min_lat, max_lon, max_lat = bounds
+            regions = []
+            for region in load_regions(self.settings["file"]):
+                points = np.concatenate([np.asarray(ring, dtype=np.float64)[:, :2]
+                                         for polygon in region["polygons"] for ring in polygon])
+                if points[:, 0].max() >= min_lon and points[:, 0].min() <= max_lon \
+                        and points[:, 1].max() >= min_lat and points[:, 1].min() <= max_lat:
+                    regions.append(region)
+        else:
+            regions = sectors(city, self.settings["sectors"])
+        labels = rasterize(regions, bounds, shape)
+        # Zones too small to cover a cell centre are left out
+        present = np.bincount(labels.ravel(), minlength=len(regions) + 1)[1:] > 0
+        relabel = np.zeros(len(regions) + 1, dtype=np.int32)
+        relabel[1:][present] = np.arange(1, present.sum() + 1)
+        kept = [region for region, keep in zip(regions, present) if keep]
+        return ZoneLabels(relabel[labels], [r["id"] for r in kept], [r["name"] for r in kept], bounds)
+
+
+# Process-wide instance so every request shares the rasterized zones
+city_zones = CityZones()
+
+
+def get_city_zones() -> CityZones:
+    """Return the shared city zones"""
+    return city_zones
@@ -1,47 +1,58 @@
-from fastapi import APIRouter, HTTPException
-from typing import Dict, List
+from fastapi import APIRouter, HTTPException, Query, Request
+from typing import Dict, List, Optional
 import requests
 import numpy as np
 from datetime import datetime, timedelta
 from .models import AirQualityData, WeatherData
 from .services import WeatherService, AirQualityService
+from modules.http_cache import etag_json
+from config.nasa_apis import POLLUTION_MAP
 
 router = APIRouter()
 weather_service = WeatherService()
 air_quality_service = AirQualityService()
 
 @router.get("/air-quality/{lat}/{lon}")
-async def get_air_quality(lat: float, lon: float) -> Dict:
+async def get_air_quality(lat: float, lon: float, request: Request):
     """Get current air quality data for location"""
     try:
         data = await air_quality_service.get_air_quality(lat, lon)
-        return data
+        return etag_json(request, data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/weather/{lat}/{lon}")
-async def get_weather(lat: float, lon: float) -> Dict:
+async def get_weather(lat: float, lon: float, request: Request):
     """Get current weather data for location"""
     try:
         data = await weather_service.get_weather_data(lat, lon)
-        return data
+        return etag_json(request, data)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/pollution-map/{city}")
-async def get_pollution_map(city: str) -> Dict:
+async def get_pollution_map(city: str, request: Request,
+                            resolution: Optional[int] = Query(None, ge=2, le=POLLUTION_MAP["max_grid_size"],
+                                                              description="cells per side")):
     """Generate real-time pollution map for city"""
     try:
-        map_data = await air_quality_service.generate_pollution_map(city)
-        return map_data
+        map_data = await air_quality_service.generate_pollution_map(city, resolution)
+        return etag_json(request, map_data)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/air-quality-forecast/{lat}/{lon}")
-async def get_air_quality_forecast(lat: float, lon: float, days: int = 7) -> Dict:
+async def get_air_quality_forecast(lat: float, lon: float, request: Request, days: int = Query(7, ge=1, le=30)):
     """Get air quality forecast"""
     try:
         forecast = await air_quality_service.get_forecast(lat, lon, days)
-        return forecast
+        return etag_json(request, forecast)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/forecast-status")
+async def get_forecast_status():
+    """Forecast grid, refresh schedule and last refresh result"""
+    return air_quality_service.forecaster.status()
\ No newline at end of file
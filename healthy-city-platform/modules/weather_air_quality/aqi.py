@@ -0,0 +1,84 @@
+"""
+US EPA Air Quality Index
+Piecewise-linear breakpoint tables applied to pollutant concentration arrays of any shape
+"""
+
+from typing import Dict, Mapping
+
+import numpy as np
+
+# (C_lo, C_hi, I_lo, I_hi) per pollutant, in the units of the Pollutants model:
+# PM2.5/PM10 ug/m3 (24 h), NO2/SO2 ppb (1 h), CO ppm (8 h), O3 ppb (8 h).
+# PM2.5 uses the 2024 revision of the table.
+BREAKPOINTS = {
+    "pm25": [(0.0, 9.0, 0, 50), (9.1, 35.4, 51, 100), (35.5, 55.4, 101, 150),
+             (55.5, 125.4, 151, 200), (125.5, 225.4, 201, 300), (225.5, 325.4, 301, 500)],
+    "pm10": [(0, 54, 0, 50), (55, 154, 51, 100), (155, 254, 101, 150),
+             (255, 354, 151, 200), (355, 424, 201, 300), (425, 604, 301, 500)],
+    "no2": [(0, 53, 0, 50), (54, 100, 51, 100), (101, 360, 101, 150),
+            (361, 649, 151, 200), (650, 1249, 201, 300), (1250, 2049, 301, 500)],
+    "so2": [(0, 35, 0, 50), (36, 75, 51, 100), (76, 185, 101, 150),
+            (186, 304, 151, 200), (305, 604, 201, 300), (605, 1004, 301, 500)],
+    "co": [(0.0, 4.4, 0, 50), (4.5, 9.4, 51, 100), (9.5, 12.4, 101, 150),
+           (12.5, 15.4, 151, 200), (15.5, 30.4, 201, 300), (30.5, 50.4, 301, 500)],
+    # The 8-hour O3 table stops at 200 ppb; above it EPA uses the 1-hour table, whose rows from
+    # 205 ppb follow. 201-204 ppb stay at the 8-hour top (300), so the index steps down at 205.
+    "o3": [(0, 54, 0, 50), (55, 70, 51, 100), (71, 85, 101, 150),
+           (86, 105, 151, 200), (106, 200, 201, 300),
+           (205, 404, 201, 300), (405, 504, 301, 400), (505, 604, 401, 500)]
+}
+
+# Concentrations are truncated (not rounded) to the table's precision before lookup
+DECIMALS = {"pm25": 1, "pm10": 0, "no2": 0, "so2": 0, "co": 1, "o3": 0}
+
+DISPLAY_NAMES = {"pm25": "PM2.5", "pm10": "PM10", "no2": "NO2", "so2": "SO2", "co": "CO", "o3": "O3"}
+
+CATEGORY_LIMITS = [50, 100, 150, 200, 300]
+CATEGORIES = ["Good", "Moderate", "Unhealthy for Sensitive Groups", "Unhealthy", "Very Unhealthy", "Hazardous"]
+
+_TABLES = {name: np.asarray(rows, dtype=np.float64).T for name, rows in BREAKPOINTS.items()}
+
+
+def sub_index(pollutant: str, concentration) -> np.ndarray:
+    """Per-pollutant AQI (float, NaN where the concentration is NaN), capped at 500"""
+    c_lo, c_hi, i_lo, i_hi = _TABLES[pollutant]
+    scale = 10.0 ** DECIMALS[pollutant]
+    c = np.floor(np.maximum(np.asarray(concentration, dtype=np.float64), 0) * scale + 1e-9) / scale
+    row = np.clip(np.searchsorted(c_lo, c, side="right") - 1, 0, len(c_lo) - 1)
+    index = (i_hi[row] - i_lo[row]) / (c_hi[row] - c_lo[row]) * (np.minimum(c, c_hi[row]) - c_lo[row]) + i_lo[row]
+    return np.where(c > c_hi[-1], 500.0, index)
+
+
+def category(aqi) -> np.ndarray:
+    """Category name per AQI value"""
+    return np.asarray(CATEGORIES, dtype=object)[np.searchsorted(CATEGORY_LIMITS, aqi, side="left")]
+
+
+def compute_aqi(concentrations: Mapping[str, object]) -> Dict[str, np.ndarray]:
+    """Overall AQI (the highest sub-index), dominant pollutant and category for broadcastable arrays"""
+    names = [name for name in BREAKPOINTS if name in concentrations]
+    if not names:
+        raise ValueError(f"need at least one of {sorted(BREAKPOINTS)}")
+    stacked = np.stack(np.broadcast_arrays(*[sub_index(name, concentrations[name]) for name in names]))
+    # Missing pollutants (NaN) never win
+    dominant = np.argmax(np.nan_to_num(stacked, nan=-1.0), axis=0)
+    aqi = np.rint(np.take_along_axis(stacked, dominant[None], axis=0)[0])
+    aqi = np.nan_to_num(aqi, nan=0.0).astype(np.int64)
+    return {
+        "aqi": aqi,
+        "dominant": np.asarray([DISPLAY_NAMES[name] for name in names], dtype=object)[dominant],
+        "category": category(aqi),
+        "sub_indices": dict(zip(names, stacked))
+    }
+
+
+def aqi_summary(concentrations: Mapping[str, float]) -> Dict:
+    """compute_aqi for one location, as plain Python values"""
+    result = compute_aqi(concentrations)
+    return {
+        "value": int(result["aqi"]),
+        "category": str(result["category"]),
+        "dominant_pollutant": str(result["dominant"]),
+        "sub_indices": {DISPLAY_NAMES[name]: int(np.rint(value)) for name, value in result["sub_indices"].items()
+                        if not np.isnan(value)}
+    }
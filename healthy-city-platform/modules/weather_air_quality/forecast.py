@@ -0,0 +1,289 @@
+"""
+Precomputed air quality forecasts
+Fits seasonal exponential smoothing per grid cell on a schedule and serves the horizon from a disk cache
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from config.nasa_apis import AQ_FORECAST
+from modules.nasa_data.simulation import DayLike, as_day, grid
+from .aqi import DISPLAY_NAMES, category, compute_aqi
+
+POLLUTANTS = ["pm25", "pm10", "no2", "so2", "co", "o3"]
+POLLUTANT_NAMES = [DISPLAY_NAMES[name] for name in POLLUTANTS]
+
+# Cells fitted per batch; bounds the (season, candidates, cells, pollutants) state arrays
+FIT_CHUNK = 4096
+
+
+def holt_winters(series: np.ndarray, season: int, params: np.ndarray, phi: float,
+                 horizon: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Additive damped-trend Holt-Winters along axis 0, for every parameter set at once
+
+    series is (T, ...) with T >= 2 * season; params is (K, 3) rows of
+    (alpha, beta, gamma). Returns the forecast (horizon, K, ...) and the
+    one-step-ahead squared error (K, ...) of each parameter set.
+    """
+    extra = (1,) * (series.ndim - 1)
+    alpha, beta, gamma = (params[:, i].reshape((-1,) + extra) for i in range(3))
+    k = len(params)
+
+    first, second = series[:season].mean(axis=0), series[season:2 * season].mean(axis=0)
+    level = np.broadcast_to(first, (k,) + first.shape).copy()
+    trend = np.broadcast_to((second - first) / season, level.shape).copy()
+    seasonal = np.broadcast_to((series[:season] - first)[:, None], (season,) + level.shape).copy()
+    sse = np.zeros(level.shape)
+
+    for t in range(season, len(series)):
+        y, s = series[t], seasonal[t % season]
+        damped = level + phi * trend
+        sse += (y - damped - s) ** 2
+        new_level = alpha * (y - s) + (1 - alpha) * damped
+        trend = beta * (new_level - level) + (1 - beta) * phi * trend
+        seasonal[t % season] = gamma * (y - new_level) + (1 - gamma) * s
+        level = new_level
+
+    steps = np.arange(1, horizon + 1)
+    damping = np.cumsum(phi ** steps).reshape((-1,) + (1,) * level.ndim)
+    season_idx = (len(series) + steps - 1) % season
+    return level + damping * trend + seasonal[season_idx], sse
+
+
+class AirQualityForecaster:
+    """Scheduled per-cell forecasts over a fixed lat/lon grid, read back in constant time
+
+    Layout under cache_dir: observations.npy (days, cells, pollutants) holds
+    the daily history every current forecast was fitted on; forecast.npy
+    (horizon, cells, pollutants) holds the fitted horizon, and
+    forecast_aqi.npy / forecast_dominant.npy (1 + horizon, cells) its AQI
+    with the issue day's observed AQI in row 0; and
+    manifest.json records the days and grid. A refresh observes only the
+    days missing from the history, compares each cell's window with the
+    stored one and refits only the cells that differ, so hourly refreshes
+    within a day and restarts are no-ops.
+    """
+
+    def __init__(self, observe: Callable[[np.ndarray, np.ndarray, date], Dict[str, np.ndarray]],
+                 settings: Optional[Dict] = None):
+        self.observe = observe
+        self.settings = {**AQ_FORECAST, **(settings or {})}
+        min_lon, min_lat, max_lon, max_lat = self.settings["bounds"]
+        cell = self.settings["cell_deg"]
+        self.shape = (int(round((max_lat - min_lat) / cell)), int(round((max_lon - min_lon) / cell)))
+        self.root = self.settings["cache_dir"]
+        self._lock = threading.RLock()
+        self._state: Optional[Dict] = None
+        self._loaded = False
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[Dict] = None
+
+    def _grid_key(self) -> Dict:
+        """Settings the stored arrays depend on; a mismatch discards the cache"""
+        keys = ["bounds", "cell_deg", "history_days", "season_days", "horizon_days", "trend_damping",
+                "smoothing_candidates"]
+        return json.loads(json.dumps({key: self.settings[key] for key in keys}))
+
+    def cell_index(self, lat: float, lon: float) -> Optional[int]:
+        """Flat index of the cell containing (lat, lon), rows from the north; None outside the grid"""
+        min_lon, min_lat, max_lon, max_lat = self.settings["bounds"]
+        cell = self.settings["cell_deg"]
+        row = int(np.floor((max_lat - lat) / cell))
+        col = int(np.floor((lon - min_lon) / cell))
+        if not (0 <= row < self.shape[0] and 0 <= col < self.shape[1]):
+            return None
+        return row * self.shape[1] + col
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _load(self) -> Optional[Dict]:
+        """Cached arrays, memory-mapped so a lookup reads only its own cell"""
+        with self._lock:
+            if self._loaded:
+                return self._state
+            self._loaded = True
+            try:
+                with open(self._path("manifest.json")) as f:
+                    manifest = json.load(f)
+                if manifest["grid"] != self._grid_key():
+                    return None
+                self._state = {
+                    "days": [date.fromisoformat(d) for d in manifest["days"]],
+                    "fitted_at": manifest["fitted_at"],
+                    **{name: np.load(self._path(f"{name}.npy"), mmap_mode="r")
+                       for name in ("observations", "forecast", "forecast_aqi", "forecast_dominant")}
+                }
+            except FileNotFoundError:
+                pass
+            except (KeyError, ValueError) as e:
+                print(f"Air quality forecast cache unreadable, refitting: {e}")
+            return self._state
+
+    def _save_array(self, name: str, data: np.ndarray):
+        path = self._path(f"{name}.npy")
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, data)
+        os.replace(path + ".tmp", path)
+
+    def _observe_day(self, lat: np.ndarray, lon: np.ndarray, day: date) -> np.ndarray:
+        values = self.observe(lat, lon, day)
+        return np.stack([values[name] for name in POLLUTANTS], axis=-1).astype(np.float32)
+
+    def _fit(self, window: np.ndarray) -> np.ndarray:
+        """Horizon (H, cells, pollutants) from each cell's best smoothing parameters"""
+        params = np.asarray(self.settings["smoothing_candidates"], dtype=np.float64)
+        horizon = self.settings["horizon_days"]
+        out = np.empty((horizon,) + window.shape[1:], dtype=np.float32)
+        for start in range(0, window.shape[1], FIT_CHUNK):
+            chunk = window[:, start:start + FIT_CHUNK].astype(np.float64)
+            forecast, sse = holt_winters(chunk, self.settings["season_days"], params,
+                                         self.settings["trend_damping"], horizon)
+            best = np.broadcast_to(np.argmin(sse, axis=0)[None, None], (horizon, 1) + sse.shape[1:])
+            out[:, start:start + FIT_CHUNK] = np.take_along_axis(forecast, best, axis=1)[:, 0]
+        return np.maximum(out, 0)
+
+    def refresh(self, today: DayLike = None) -> Dict:
+        """Bring the history up to today and refit the cells whose window changed"""
+        started = time.perf_counter()
+        today = as_day(today)
+        history = self.settings["history_days"]
+        days = [today - timedelta(days=history - 1 - i) for i in range(history)]
+        cells = self.shape[0] * self.shape[1]
+        lat, lon = (a.ravel() for a in grid(self.settings["bounds"], self.shape))
+
+        old = self._load()
+        old_index = {d: i for i, d in enumerate(old["days"])} if old else {}
+        observations = np.empty((history, cells, len(POLLUTANTS)), dtype=np.float32)
+        added = 0
+        for i, day in enumerate(days):
+            if day in old_index:
+                observations[i] = old["observations"][old_index[day]]
+            else:
+                observations[i] = self._observe_day(lat, lon, day)
+                added += 1
+
+        if old and old["days"] == days:
+            changed = np.flatnonzero(np.any(observations != old["observations"], axis=(0, 2)))
+            forecast = np.array(old["forecast"])
+            forecast_aqi = np.array(old["forecast_aqi"])
+            forecast_dominant = np.array(old["forecast_dominant"])
+        else:
+            # A new day shifts every cell's window
+            changed = np.arange(cells)
+            horizon = self.settings["horizon_days"]
+            forecast = np.zeros((horizon, cells, len(POLLUTANTS)), dtype=np.float32)
+            forecast_aqi = np.zeros((horizon + 1, cells), dtype=np.int16)
+            forecast_dominant = np.zeros((horizon + 1, cells), dtype=np.uint8)
+
+        if len(changed):
+            fitted = self._fit(observations[:, changed])
+            # Row 0 is the issue day's observation, so lookups never compute AQI
+            series = np.concatenate([observations[-1:, changed], fitted])
+            result = compute_aqi({name: series[..., i] for i, name in enumerate(POLLUTANTS)})
+            forecast[:, changed] = fitted
+            forecast_aqi[:, changed] = result["aqi"]
+            forecast_dominant[:, changed] = np.argmax(np.stack([result["sub_indices"][name] for name in POLLUTANTS]), axis=0)
+
+            os.makedirs(self.root, exist_ok=True)
+            fitted_at = datetime.utcnow().isoformat()
+            with self._lock:
+                for name, data in (("observations", observations), ("forecast", forecast),
+                                   ("forecast_aqi", forecast_aqi), ("forecast_dominant", forecast_dominant)):
+                    self._save_array(name, data)
+                tmp = self._path("manifest.json.tmp")
+                with open(tmp, "w") as f:
+                    json.dump({"grid": self._grid_key(), "days": [d.isoformat() for d in days],
+                               "fitted_at": fitted_at, "shape": list(self.shape)}, f, indent=2)
+                os.replace(tmp, self._path("manifest.json"))
+                self._state = {"days": days, "fitted_at": fitted_at, "observations": observations,
+                               "forecast": forecast, "forecast_aqi": forecast_aqi, "forecast_dominant": forecast_dominant}
+
+        self.last_run = {
+            "issued": today.isoformat(),
+            "cells": cells,
+            "days_observed": added,
+            "cells_refit": int(len(changed)),
+            "seconds": round(time.perf_counter() - started, 3),
+            "finished_at": datetime.now().isoformat()
+        }
+        return self.last_run
+
+    def lookup(self, lat: float, lon: float, days: int) -> Optional[Dict]:
+        """Today onwards for the cell at (lat, lon); None when the cell or horizon is not cached"""
+        state = self._load()
+        cell = self.cell_index(lat, lon)
+        if state is None or cell is None:
+            return None
+        issued = state["days"][-1]
+        # Days since the last refresh; their forecasts now stand in for today
+        skip = (as_day() - issued).days
+        if skip < 0 or skip + days - 1 > len(state["forecast"]):
+            return None
+
+        forecast = []
+        aqi = state["forecast_aqi"][skip:skip + days, cell].tolist()
+        dominant = state["forecast_dominant"][skip:skip + days, cell].tolist()
+        categories = category(aqi).tolist()
+        for i in range(days):
+            forecast.append({
+                "date": (issued + timedelta(days=skip + i)).isoformat(),
+                "aqi": aqi[i],
+                "category": categories[i],
+                "dominant_pollutant": POLLUTANT_NAMES[dominant[i]],
+                "source": "observed" if skip + i == 0 else "forecast"
+            })
+
+        min_lon, _, _, max_lat = self.settings["bounds"]
+        size = self.settings["cell_deg"]
+        row, col = divmod(cell, self.shape[1])
+        return {
+            "forecast": forecast,
+            "model": "holt-winters",
+            "issued": issued.isoformat(),
+            "fitted_at": state["fitted_at"],
+            "cell": {"lat": round(max_lat - (row + 0.5) * size, 4), "lon": round(min_lon + (col + 0.5) * size, 4),
+                     "size_deg": size}
+        }
+
+    async def run(self, interval_s: float):
+        """Refresh forever; errors are logged and retried next interval"""
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Air quality forecast refresh error: {e}")
+                self.last_run = {"error": str(e), "finished_at": datetime.now().isoformat()}
+            await asyncio.sleep(interval_s)
+
+    def start(self):
+        """Start the scheduled refresh task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(self.settings["refresh_interval_s"]))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def status(self) -> Dict:
+        state = self._load()
+        return {
+            "running": self._task is not None,
+            "refresh_interval_s": self.settings["refresh_interval_s"],
+            "grid": {"bounds": list(self.settings["bounds"]), "cell_deg": self.settings["cell_deg"],
+                     "shape": list(self.shape)},
+            "issued": state["days"][-1].isoformat() if state else None,
+            "fitted_at": state["fitted_at"] if state else None,
+            "last_run": self.last_run
+        }
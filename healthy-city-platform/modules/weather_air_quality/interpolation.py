@@ -0,0 +1,75 @@
+"""
+Spatial interpolation of scattered air quality samples
+Blends station and satellite-pixel values onto a regular grid with KD-tree neighbour kernels
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+from scipy.ndimage import maximum_filter
+from scipy.spatial import cKDTree
+
+from modules.nasa_data.geo import to_xyz
+
+KERNELS = ("idw", "gaussian")
+
+
+class SpatialInterpolator:
+    """k-nearest-neighbour inverse-distance or Gaussian interpolation
+
+    The samples go into a KD-tree once; every grid cell then queries its k
+    nearest samples in one vectorized call, so a grid costs
+    O(cells * k * log samples) instead of O(cells * samples). Values may carry
+    several fields (columns), which share the same neighbours and weights.
+    """
+
+    def __init__(self, kernel: str = "idw", neighbours: int = 8, power: float = 2.0,
+                 bandwidth_km: float = 4.0):
+        if kernel not in KERNELS:
+            raise ValueError(f"kernel must be one of {KERNELS}")
+        self.kernel = kernel
+        self.neighbours = neighbours
+        self.power = power
+        self.bandwidth_km = bandwidth_km
+
+    def weights(self, dist_km: np.ndarray) -> np.ndarray:
+        """Kernel weight per (cell, neighbour) distance"""
+        if self.kernel == "gaussian":
+            return np.exp(-0.5 * (dist_km / self.bandwidth_km) ** 2)
+        # A cell sitting on a sample takes its value; 1 m floor keeps the weights finite
+        return 1.0 / np.maximum(dist_km, 1e-3) ** self.power
+
+    def interpolate(self, sample_lat, sample_lon, values, grid_lat, grid_lon,
+                    sample_weight: Optional[np.ndarray] = None) -> np.ndarray:
+        """Values (n,) or (n, fields) at samples -> grid_lat.shape (+ (fields,))"""
+        values = np.asarray(values, dtype=np.float64)
+        flat = values.reshape(len(values), -1)
+        grid_lat = np.asarray(grid_lat, dtype=np.float64)
+        k = min(self.neighbours, len(flat))
+
+        tree = cKDTree(to_xyz(sample_lat, sample_lon))
+        dist, idx = tree.query(to_xyz(grid_lat.ravel(), np.asarray(grid_lon).ravel()), k=k)
+        dist, idx = dist.reshape(-1, k), idx.reshape(-1, k)
+
+        w = self.weights(dist)
+        if sample_weight is not None:
+            w = w * np.asarray(sample_weight, dtype=np.float64)[idx]
+        total = w.sum(axis=1, keepdims=True)
+        # Far outside every Gaussian the weights underflow; fall back to the nearest sample
+        lost = total[:, 0] <= 1e-300
+        if lost.any():
+            w[lost] = 0.0
+            w[lost, 0] = 1.0
+            total[lost] = 1.0
+
+        out = np.einsum("gk,gkf->gf", w / total, flat[idx])
+        return out.reshape(grid_lat.shape + values.shape[1:])
+
+
+def local_maxima(surface: np.ndarray, window: int = 3, min_value: float = -np.inf,
+                 limit: Optional[int] = None) -> List[Dict]:
+    """Cells that are the maximum of their window x window neighbourhood, highest first"""
+    peaks = (surface == maximum_filter(surface, size=window, mode="nearest")) & (surface >= min_value)
+    rows, cols = np.nonzero(peaks)
+    order = np.argsort(-surface[rows, cols], kind="stable")[:limit]
+    return [{"row": int(rows[i]), "col": int(cols[i]), "value": float(surface[rows[i], cols[i]])} for i in order]
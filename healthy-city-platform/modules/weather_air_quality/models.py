@@ -18,6 +18,8 @@ class Pollutants(BaseModel):
 class AQI(BaseModel):
     value: int
     category: str
+    dominant_pollutant: Optional[str] = None
+    sub_indices: Dict[str, int] = {}
 
 class HealthImpact(BaseModel):
     risk_level: str
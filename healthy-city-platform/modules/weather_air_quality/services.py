@@ -1,15 +1,39 @@
-import requests
+import asyncio
 import numpy as np
-from datetime import datetime, timedelta
-from typing import Dict, List
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 import json
-from config.nasa_apis import DATASETS, NASA_API_KEY, REALTIME_ENDPOINTS, FIRMS
+import os
+from config.nasa_apis import DATASETS, NASA_API_KEY, POLLUTION_MAP, REALTIME_ENDPOINTS
+from modules.nasa_data.http_client import get_http_client
+from modules.nasa_data.passes import get_pass_predictor
+from modules.nasa_data.pollution_grid import PollutionGridEngine
+from modules.nasa_data.population import get_population_raster
+from modules.nasa_data.simulation import DayLike, as_day, grid, simulator
+from .aqi import CATEGORIES, CATEGORY_LIMITS, aqi_summary, compute_aqi
+from .forecast import AirQualityForecaster
+from .interpolation import SpatialInterpolator, local_maxima
+
+# Simulated monitoring stations are sited once and keep their positions
+STATION_SITING_DAY = date(2020, 1, 1)
 
 class AirQualityService:
     def __init__(self):
         self.base_url = "https://disc.gsfc.nasa.gov/api"
         self.nasa_api_key = NASA_API_KEY
+        self.http = get_http_client()
         self.omi_endpoint = "https://disc.gsfc.nasa.gov/datasets/OMNO2d_V003/summary"
+        self.omi_grid = PollutionGridEngine()
+        self.population = get_population_raster()
+        self.interpolator = SpatialInterpolator(
+            kernel=POLLUTION_MAP["kernel"],
+            neighbours=POLLUTION_MAP["neighbours"],
+            power=POLLUTION_MAP["idw_power"],
+            bandwidth_km=POLLUTION_MAP["gaussian_bandwidth_km"]
+        )
+        # (city, grid_size, hour) -> pollution map; only the current hour is kept
+        self._map_cache: Dict[Tuple[str, int, datetime], Dict] = {}
+        self.forecaster = AirQualityForecaster(self.simulate_pollutants)
     
     async def get_air_quality(self, lat: float, lon: float) -> Dict:
         """Fetch air quality data from NASA OMI and MODIS satellites"""
@@ -21,32 +45,39 @@ class AirQualityService:
         except Exception as e:
             print(f"NASA API error: {e}, using simulated data")
         
-        # Fallback to enhanced simulated data based on NASA datasets
+        # Fallback to enhanced simulated data based on NASA datasets; deterministic per location and day
+        day = as_day()
+        pollutants = self.simulate_pollutants(lat, lon, day)
         aqi_data = {
             "location": {"lat": lat, "lon": lon},
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.combine(day, datetime.min.time()).isoformat(),
             "data_source": "NASA OMI/MODIS (Simulated)",
-            "pollutants": {
-                "no2": self._simulate_no2_from_location(lat, lon),
-                "so2": self._simulate_so2_from_location(lat, lon), 
-                "co": np.random.uniform(0.1, 2.0),
-                "pm25": self._simulate_pm25_from_location(lat, lon),
-                "pm10": self._simulate_pm10_from_location(lat, lon),
-                "o3": np.random.uniform(20, 120),
-                "aerosol_optical_depth": self._simulate_aod_from_location(lat, lon)
-            },
-            "aqi": self._calculate_aqi(lat, lon),
+            "pollutants": pollutants,
+            "aqi": self._calculate_aqi(pollutants),
             "health_impact": self._assess_health_impact(lat, lon),
-            "nasa_satellite_passes": self._get_satellite_passes(lat, lon)
+            "nasa_satellite_passes": self._get_satellite_passes(lat, lon, day)
         }
         return aqi_data
     
-    def _calculate_aqi(self, lat: float, lon: float) -> Dict:
-        """Calculate Air Quality Index"""
-        # Simplified AQI calculation
-        base_aqi = np.random.randint(20, 180)
-        category = "Good" if base_aqi < 50 else "Moderate" if base_aqi < 100 else "Unhealthy"
-        return {"value": base_aqi, "category": category}
+    def simulate_pollutants(self, lat, lon, day: DayLike = None) -> Dict:
+        """Simulated surface concentrations in the units of the Pollutants model; lat/lon may be arrays"""
+        day = as_day(day)
+        values = {
+            "no2": self._simulate_no2_from_location(lat, lon, day),
+            "so2": self._simulate_so2_from_location(lat, lon, day), 
+            "co": simulator.uniform("OMI_AQ", "co", lat, lon, day, 0.1, 2.0),
+            "pm25": self._simulate_pm25_from_location(lat, lon, day),
+            "pm10": self._simulate_pm10_from_location(lat, lon, day),
+            "o3": simulator.uniform("OMI_AQ", "o3", lat, lon, day, 20, 120),
+            "aerosol_optical_depth": self._simulate_aod_from_location(lat, lon, day)
+        }
+        if np.ndim(lat) == 0 and np.ndim(lon) == 0:
+            return {name: float(value) for name, value in values.items()}
+        return values
+    
+    def _calculate_aqi(self, pollutants: Dict[str, float]) -> Dict:
+        """Calculate Air Quality Index from the EPA breakpoints of each pollutant"""
+        return aqi_summary(pollutants)
     
     def _assess_health_impact(self, lat: float, lon: float) -> Dict:
         """Assess health impact based on air quality"""
@@ -64,7 +95,7 @@ class AirQualityService:
         try:
             # NASA OMI NO2 data endpoint (example)
             url = f"https://disc.gsfc.nasa.gov/api/omi/no2?lat={lat}&lon={lon}&key={self.nasa_api_key}"
-            response = requests.get(url, timeout=10)
+            response = await self.http.get(url)
             if response.status_code == 200:
                 data = response.json()
                 return self._process_nasa_omi_response(data, lat, lon)
@@ -72,85 +103,258 @@ class AirQualityService:
             pass
         return None
     
-    def _simulate_no2_from_location(self, lat: float, lon: float) -> float:
+    def _simulate_no2_from_location(self, lat, lon, day: DayLike = None) -> np.ndarray:
         """Simulate NO2 based on location (urban vs rural)"""
         # Higher NO2 in urban areas
-        urban_factor = 1.0
-        if abs(lat - 28.6139) < 0.1 and abs(lon - 77.2090) < 0.1:  # Delhi area
-            urban_factor = 2.5
-        elif abs(lat - 19.0760) < 0.1 and abs(lon - 72.8777) < 0.1:  # Mumbai area
-            urban_factor = 2.2
-        return np.random.uniform(10, 40) * urban_factor
-    
-    def _simulate_so2_from_location(self, lat: float, lon: float) -> float:
+        delhi = (np.abs(lat - 28.6139) < 0.1) & (np.abs(lon - 77.2090) < 0.1)
+        mumbai = (np.abs(lat - 19.0760) < 0.1) & (np.abs(lon - 72.8777) < 0.1)
+        urban_factor = np.where(delhi, 2.5, np.where(mumbai, 2.2, 1.0))
+        return simulator.uniform("OMI_AQ", "no2", lat, lon, day, 10, 40) * urban_factor
+    
+    def _simulate_so2_from_location(self, lat, lon, day: DayLike = None) -> np.ndarray:
         """Simulate SO2 based on industrial activity"""
-        base_so2 = np.random.uniform(5, 25)
+        base_so2 = simulator.uniform("OMI_AQ", "so2", lat, lon, day, 5, 25)
         # Higher near industrial areas
-        return base_so2 * (1.5 if np.random.random() > 0.7 else 1.0)
+        industrial = simulator.uniform("OMI_AQ", "so2_industrial", lat, lon, day) < 0.3
+        return base_so2 * np.where(industrial, 1.5, 1.0)
     
-    def _simulate_pm25_from_location(self, lat: float, lon: float) -> float:
+    def _simulate_pm25_from_location(self, lat, lon, day: DayLike = None) -> np.ndarray:
         """Simulate PM2.5 based on location and season"""
-        base_pm25 = np.random.uniform(15, 80)
+        day = as_day(day)
+        base_pm25 = simulator.uniform("MODIS_AOD", "pm25", lat, lon, day, 15, 80)
         # Higher in winter months in North India
-        month = datetime.now().month
-        if month in [11, 12, 1, 2] and lat > 25:  # Winter in North India
-            base_pm25 *= 1.8
+        if day.month in [11, 12, 1, 2]:
+            base_pm25 = base_pm25 * np.where(np.asarray(lat) > 25, 1.8, 1.0)
         return base_pm25
     
-    def _simulate_pm10_from_location(self, lat: float, lon: float) -> float:
+    def _simulate_pm10_from_location(self, lat, lon, day: DayLike = None) -> np.ndarray:
         """Simulate PM10 based on dust and location"""
-        base_pm10 = np.random.uniform(25, 120)
-        # Higher in arid regions
-        if lat > 25 and lat < 30:  # North Indian plains
-            base_pm10 *= 1.4
-        return base_pm10
+        base_pm10 = simulator.uniform("MODIS_AOD", "pm10", lat, lon, day, 25, 120)
+        # Higher in arid regions: the North Indian plains
+        plains = (np.asarray(lat) > 25) & (np.asarray(lat) < 30)
+        return base_pm10 * np.where(plains, 1.4, 1.0)
     
-    def _simulate_aod_from_location(self, lat: float, lon: float) -> float:
+    def _simulate_aod_from_location(self, lat, lon, day: DayLike = None) -> np.ndarray:
         """Simulate Aerosol Optical Depth from MODIS"""
-        return np.random.uniform(0.1, 0.6)
-    
-    def _get_satellite_passes(self, lat: float, lon: float) -> List[Dict]:
-        """Get upcoming NASA satellite passes"""
-        satellites = ["Aqua", "Terra", "Suomi NPP", "NOAA-20"]
-        passes = []
-        for i, sat in enumerate(satellites):
-            pass_time = datetime.now() + timedelta(hours=i*6 + np.random.randint(1, 4))
-            passes.append({
-                "satellite": sat,
-                "pass_time": pass_time.isoformat(),
-                "elevation": np.random.uniform(15, 85),
-                "instruments": ["MODIS", "OMI", "AIRS"] if sat in ["Aqua", "Terra"] else ["VIIRS", "CrIS"]
-            })
-        return passes
+        return simulator.uniform("MODIS_AOD", "aod", lat, lon, day, 0.1, 0.6)
     
-    async def generate_pollution_map(self, city: str) -> Dict:
+    def _get_satellite_passes(self, lat: float, lon: float, day: DayLike = None) -> List[Dict]:
+        """Get NASA satellite passes over the location on the day, from the local TLE sets"""
+        predictor = get_pass_predictor()
+        try:
+            return [predictor.describe(p) for p in predictor.passes([(lat, lon)], day)[0]]
+        except (OSError, ValueError) as e:
+            print(f"Satellite pass prediction failed: {e}")
+            return []
+    
+    async def generate_pollution_map(self, city: str, grid_size: Optional[int] = None) -> Dict:
         """Generate pollution heatmap using NASA satellite data"""
-        # Enhanced pollution mapping with NASA data patterns
-        grid_size = 25
-        
+        key = city.strip().lower()
+        if key not in POLLUTION_MAP["cities"]:
+            raise KeyError(f"No pollution map configured for city '{city}'")
+        grid_size = grid_size or POLLUTION_MAP["grid_size"]
+        hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        cache_key = (key, grid_size, hour)
+        pollution_map = self._map_cache.get(cache_key)
+        if pollution_map is None:
+            pollution_map = await asyncio.to_thread(self._build_pollution_map, key, grid_size, hour)
+            self._map_cache = {k: v for k, v in self._map_cache.items() if k[2] == hour}
+            self._map_cache[cache_key] = pollution_map
+        return pollution_map
+    
+    def pollution_surface(self, city: str, grid_size: int, hour: datetime) -> Dict:
+        """Gridded NO2, PM2.5 and AQI arrays for a configured city and hour, as behind its pollution map"""
+        return self._generate_realistic_pollution_grid(city, grid_size, hour)
+    
+    def _build_pollution_map(self, city: str, grid_size: int, hour: datetime) -> Dict:
+        """Interpolated surface, hotspots and coverage for one city and hour"""
         # Create realistic pollution patterns based on city characteristics
-        pollution_grid = self._generate_realistic_pollution_grid(city, grid_size)
-        
+        surface = self._generate_realistic_pollution_grid(city, grid_size, hour)
+        coverage = self._get_satellite_coverage(city, surface)
+        clear = coverage["cloud_free_fraction"]
         return {
-            "city": city,
+            "city": POLLUTION_MAP["cities"][city]["name"],
             "data_source": "NASA OMI/MODIS Satellites",
-            "grid_data": pollution_grid.tolist(),
-            "hotspots": self._identify_pollution_hotspots(city),
-            "timestamp": datetime.now().isoformat(),
-            "satellite_coverage": self._get_satellite_coverage(city),
-            "data_quality": "High (Cloud-free)"
+            "bounds": surface["bounds"],
+            "shape": [grid_size, grid_size],
+            "grid_data": surface["aqi"].tolist(),
+            "dominant_pollutant": surface["dominant"].tolist(),
+            "pollutants": {
+                "no2": np.round(surface["no2"], 2).tolist(),
+                "pm25": np.round(surface["pm25"], 2).tolist()
+            },
+            "stations": surface["stations"],
+            "hotspots": self._identify_pollution_hotspots(surface),
+            "population_exposure": self._population_exposure(surface),
+            "timestamp": hour.isoformat(),
+            "satellite_coverage": coverage,
+            "interpolation": {"kernel": self.interpolator.kernel, "neighbours": self.interpolator.neighbours},
+            "data_quality": "High (Cloud-free)" if clear >= 0.8 else "Moderate (Partly cloudy)" if clear >= 0.5 else "Low (Cloudy)"
+        }
+    
+    def _generate_realistic_pollution_grid(self, city: str, grid_size: int, hour: datetime) -> Dict:
+        """Interpolate station and satellite samples onto a grid_size x grid_size city grid"""
+        cfg = POLLUTION_MAP["cities"][city]
+        half = cfg["half_width_deg"]
+        bounds = (cfg["lon"] - half, cfg["lat"] - half, cfg["lon"] + half, cfg["lat"] + half)
+        stations = self._simulate_city_stations(cfg, hour)
+        pixels = self._simulate_satellite_pixels(cfg, bounds, hour.date())
+        
+        lat = np.concatenate([stations["lat"], pixels["lat"]])
+        lon = np.concatenate([stations["lon"], pixels["lon"]])
+        values = np.column_stack([
+            np.concatenate([stations["no2"], pixels["no2"]]),
+            np.concatenate([stations["pm25"], pixels["pm25"]])
+        ])
+        weight = np.concatenate([np.ones(len(stations["lat"])),
+                                 np.full(len(pixels["lat"]), POLLUTION_MAP["satellite_weight"])])
+        grid_lat, grid_lon = grid(bounds, (grid_size, grid_size))
+        fields = self.interpolator.interpolate(lat, lon, values, grid_lat, grid_lon, weight)
+        no2, pm25 = fields[..., 0], fields[..., 1]
+        # Sample and grid AQI in one pass: the stations come first in the flattened batch
+        n_stations = len(stations["lat"])
+        aqi = compute_aqi({
+            "no2": np.concatenate([stations["no2"], no2.ravel()]),
+            "pm25": np.concatenate([stations["pm25"], pm25.ravel()])
+        })
+        station_aqi, station_dominant = aqi["aqi"][:n_stations], aqi["dominant"][:n_stations]
+        
+        return {
+            "bounds": list(bounds),
+            "lat": grid_lat,
+            "lon": grid_lon,
+            "no2": no2,
+            "pm25": pm25,
+            # Unrounded AQI keeps neighbouring cells from tying when hotspots are picked
+            "aqi_value": np.max(list(aqi["sub_indices"].values()), axis=0)[n_stations:].reshape(no2.shape),
+            "aqi": aqi["aqi"][n_stations:].reshape(no2.shape),
+            "dominant": aqi["dominant"][n_stations:].reshape(no2.shape),
+            "category": aqi["category"][n_stations:].reshape(no2.shape),
+            "stations": [
+                {"id": f"{city.upper()[:3]}-{i + 1:02d}", "lat": round(float(la), 5), "lon": round(float(lo), 5),
+                 "no2": round(float(n), 2), "pm25": round(float(p), 2), "aqi": int(a), "dominant_pollutant": str(d)}
+                for i, (la, lo, n, p, a, d) in enumerate(zip(stations["lat"], stations["lon"], stations["no2"],
+                                                             stations["pm25"], station_aqi, station_dominant))
+            ],
+            "satellite_pixels": len(pixels["lat"]),
+            "satellite_pixels_total": pixels["total"]
+        }
+    
+    def _simulate_city_stations(self, cfg: Dict, hour: datetime) -> Dict[str, np.ndarray]:
+        """Hourly NO2/PM2.5 at the city's simulated ground stations"""
+        index = np.arange(POLLUTION_MAP["stations_per_city"])
+        half = cfg["half_width_deg"]
+        lat = cfg["lat"] + simulator.uniform("AQ_STATIONS", "site_lat", cfg["lat"], cfg["lon"], STATION_SITING_DAY, -half, half, index)
+        lon = cfg["lon"] + simulator.uniform("AQ_STATIONS", "site_lon", cfg["lat"], cfg["lon"], STATION_SITING_DAY, -half, half, index)
+        
+        # Emissions fall off away from the centre and peak at the morning and evening rush hours
+        r = np.hypot(lat - cfg["lat"], lon - cfg["lon"]) / half
+        urban = 1 + (cfg["urban_factor"] - 1) * np.exp(-(r / 0.5) ** 2)
+        local_hour = (hour.hour + cfg["lon"] / 15) % 24
+        traffic = 1 + 0.35 * (np.exp(-((local_hour - 9) / 2) ** 2) + np.exp(-((local_hour - 19) / 2.5) ** 2))
+        day = hour.date()
+        winter = 1.8 if day.month in [11, 12, 1, 2] and cfg["lat"] > 25 else 1.0  # Winter in North India
+        no2 = 15 * urban * traffic + simulator.uniform("AQ_STATIONS", "no2", lat, lon, day, -5, 10, hour.hour)
+        pm25 = 25 * urban * winter + simulator.uniform("AQ_STATIONS", "pm25", lat, lon, day, -5, 15, hour.hour)
+        return {"lat": lat, "lon": lon, "no2": np.maximum(no2, 0), "pm25": np.maximum(pm25, 0)}
+    
+    def _simulate_satellite_pixels(self, cfg: Dict, bounds: Tuple[float, float, float, float], day: date) -> Dict:
+        """Cloud-free OMI NO2 and MODIS AOD-derived PM2.5 pixels over the city for the day's overpass"""
+        side = max(2, int(round((bounds[2] - bounds[0]) / POLLUTION_MAP["satellite_pixel_deg"])))
+        omi = self.omi_grid.compute(bounds, (side, side), day)
+        lat, lon = omi["lat"], omi["lon"]
+        aod = 0.1 + 0.5 * simulator.smooth("MODIS_AOD", "aod", lat, lon, day, scale_deg=0.1)
+        cloud_fraction = simulator.point("OMI_CLOUD", cfg["lat"], cfg["lon"], day).uniform("cloud_fraction", 0, 0.5)
+        clear = simulator.uniform("OMI_CLOUD", "cloud", lat, lon, day) >= cloud_fraction
+        return {
+            "lat": lat[clear],
+            "lon": lon[clear],
+            "no2": omi["no2"][clear],
+            "pm25": aod[clear] * 110,  # typical PM2.5/AOD ratio over the Indo-Gangetic plain
+            "total": lat.size
+        }
+    
+    def _population_exposure(self, surface: Dict) -> Optional[Dict]:
+        """People in each AQI category over the grid, from the population raster; None without one"""
+        try:
+            people = self.population.class_counts(surface["aqi"].astype(np.float64), surface["bounds"],
+                                                  CATEGORY_LIMITS, right=True)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Population exposure failed: {e}")
+            return None
+        if people is None:
+            return None
+        # The alignment is cached, so the people grid comes back without another resampling
+        grid_people = self.population.grid(surface["bounds"], surface["aqi"].shape)["people"]
+        total = float(grid_people.sum())
+        by_category = {name: int(round(n)) for name, n in zip(CATEGORIES, people)}
+        return {
+            "population": int(round(total)),
+            "by_category": by_category,
+            # Sensitive groups are affected from AQI 101
+            "exposed_above_moderate": sum(list(by_category.values())[2:]),
+            "population_weighted_aqi": round(float((grid_people * surface["aqi"]).sum() / total), 1) if total else None,
+            "source": os.path.basename(self.population.meta()["source"])
+        }
+    
+    def _identify_pollution_hotspots(self, surface: Dict) -> List[Dict]:
+        """Local AQI maxima of the interpolated surface"""
+        peaks = local_maxima(surface["aqi_value"], POLLUTION_MAP["hotspot_window"],
+                             POLLUTION_MAP["hotspot_min_aqi"], POLLUTION_MAP["max_hotspots"])
+        hotspots = []
+        for rank, peak in enumerate(peaks, 1):
+            r, c = peak["row"], peak["col"]
+            hotspots.append({
+                "rank": rank,
+                "lat": round(float(surface["lat"][r, c]), 5),
+                "lon": round(float(surface["lon"][r, c]), 5),
+                "aqi": int(surface["aqi"][r, c]),
+                "dominant_pollutant": str(surface["dominant"][r, c]),
+                "no2": round(float(surface["no2"][r, c]), 2),
+                "pm25": round(float(surface["pm25"][r, c]), 2),
+                "severity": str(surface["category"][r, c])
+            })
+        return hotspots
+    
+    def _get_satellite_coverage(self, city: str, surface: Dict) -> Dict:
+        """Satellite pixels and ground stations that went into the map"""
+        total = surface["satellite_pixels_total"]
+        return {
+            "instruments": [
+                {"satellite": "Aura", "instrument": "OMI", "product": "OMNO2d", "parameter": "NO2"},
+                {"satellite": "Terra/Aqua", "instrument": "MODIS", "product": "MOD04/MYD04", "parameter": "AOD"}
+            ],
+            "pixel_size_deg": POLLUTION_MAP["satellite_pixel_deg"],
+            "pixels_used": surface["satellite_pixels"],
+            "pixels_total": total,
+            "cloud_free_fraction": round(surface["satellite_pixels"] / total, 3) if total else 0.0,
+            "ground_stations": len(surface["stations"])
         }
     
     async def get_forecast(self, lat: float, lon: float, days: int) -> Dict:
         """Get air quality forecast"""
-        forecast_data = []
-        for i in range(days):
-            date = datetime.now() + timedelta(days=i)
-            forecast_data.append({
-                "date": date.isoformat(),
-                "aqi": np.random.randint(30, 120),
-                "dominant_pollutant": np.random.choice(["PM2.5", "NO2", "O3"])
-            })
+        # Precomputed per-cell forecasts; outside the forecast grid or horizon, extrapolate from today
+        cached = self.forecaster.lookup(lat, lon, days)
+        if cached is not None:
+            return cached
+        today = as_day()
+        current = self.simulate_pollutants(lat, lon, today)
+        # Each day drifts from today's concentrations; every day's AQI comes out of one vectorized pass
+        lead = np.arange(days)
+        drift = {
+            name: current[name] * (1 + simulator.uniform("AQ_FORECAST", name, lat, lon, today, -0.1, 0.1, lead) * np.sqrt(lead))
+            for name in ("no2", "so2", "co", "pm25", "pm10", "o3")
+        }
+        result = compute_aqi(drift)
+        forecast_data = [
+            {
+                "date": (today + timedelta(days=i)).isoformat(),
+                "aqi": int(result["aqi"][i]),
+                "category": str(result["category"][i]),
+                "dominant_pollutant": str(result["dominant"][i])
+            }
+            for i in range(days)
+        ]
         
         return {"forecast": forecast_data}
 
@@ -158,6 +362,7 @@ class WeatherService:
     def __init__(self):
         self.base_url = "https://airs.jpl.nasa.gov/api"
         self.nasa_api_key = NASA_API_KEY
+        self.http = get_http_client()
         self.airs_endpoint = "https://airs.jpl.nasa.gov/data"
     
     async def get_weather_data(self, lat: float, lon: float) -> Dict:
@@ -170,64 +375,60 @@ class WeatherService:
         except Exception as e:
             print(f"NASA AIRS API error: {e}, using enhanced simulation")
         
-        # Enhanced weather simulation based on NASA AIRS capabilities
+        # Enhanced weather simulation based on NASA AIRS capabilities; deterministic per location and day
+        day = as_day()
+        sim = simulator.point("AIRS", lat, lon, day)
         weather_data = {
             "location": {"lat": lat, "lon": lon},
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.combine(day, datetime.min.time()).isoformat(),
             "data_source": "NASA AIRS Satellite (Simulated)",
-            "temperature": self._simulate_temperature_from_location(lat, lon),
-            "humidity": self._simulate_humidity_from_location(lat, lon),
-            "pressure": self._simulate_pressure_from_location(lat, lon),
-            "wind_speed": np.random.uniform(2, 15),
-            "wind_direction": np.random.uniform(0, 360),
-            "precipitation": self._simulate_precipitation_from_season(lat),
-            "uv_index": self._simulate_uv_from_location(lat),
-            "co2_concentration": self._simulate_co2_from_airs(),
-            "methane_concentration": self._simulate_methane_from_airs(),
-            "cloud_cover": np.random.uniform(0, 100),
+            "temperature": float(self._simulate_temperature_from_location(lat, lon, day)),
+            "humidity": self._simulate_humidity_from_location(lat, lon, day),
+            "pressure": sim.uniform("pressure", 1008, 1018),
+            "wind_speed": sim.uniform("wind_speed", 2, 15),
+            "wind_direction": sim.uniform("wind_direction", 0, 360),
+            "precipitation": self._simulate_precipitation_from_season(lat, lon, day),
+            "uv_index": self._simulate_uv_from_location(lat, lon, day),
+            "co2_concentration": sim.uniform("co2", 410, 420),  # Current atmospheric CO2 levels
+            "methane_concentration": sim.uniform("methane", 1.85, 1.95),  # ppm
+            "cloud_cover": sim.uniform("cloud_cover", 0, 100),
             "satellite_quality": "Good"
         }
         return weather_data
     
+    def temperature_surface(self, lat, lon, day: DayLike = None) -> np.ndarray:
+        """Temperature (C) at arrays of locations for a day, as get_weather_data reports at a point"""
+        return self._simulate_temperature_from_location(lat, lon, day)
+    
     async def _fetch_nasa_airs_data(self, lat: float, lon: float) -> Dict:
         """Fetch real NASA AIRS atmospheric data"""
         # This would connect to real NASA AIRS API when available
         return None
     
-    def _simulate_temperature_from_location(self, lat: float, lon: float) -> float:
+    def _simulate_temperature_from_location(self, lat, lon, day: DayLike = None) -> np.ndarray:
         """Simulate temperature based on latitude and season"""
-        base_temp = 25 - abs(lat) * 0.5  # Cooler at higher latitudes
-        seasonal_variation = 10 * np.sin((datetime.now().month - 3) * np.pi / 6)
-        return base_temp + seasonal_variation + np.random.uniform(-5, 5)
+        day = as_day(day)
+        base_temp = 25 - np.abs(lat) * 0.5  # Cooler at higher latitudes
+        seasonal_variation = float(10 * np.sin((day.month - 3) * np.pi / 6))
+        return base_temp + seasonal_variation + simulator.uniform("AIRS", "temperature", lat, lon, day, -5, 5)
     
-    def _simulate_humidity_from_location(self, lat: float, lon: float) -> float:
+    def _simulate_humidity_from_location(self, lat: float, lon: float, day: DayLike = None) -> float:
         """Simulate humidity based on coastal proximity"""
         # Higher humidity near coasts
         coastal_factor = 1.0
         if abs(lon - 72.8777) < 2:  # Near Mumbai coast
             coastal_factor = 1.3
-        return np.random.uniform(40, 70) * coastal_factor
-    
-    def _simulate_pressure_from_location(self, lat: float, lon: float) -> float:
-        """Simulate atmospheric pressure"""
-        return np.random.uniform(1008, 1018)
+        return simulator.point("AIRS", lat, lon, day).uniform("humidity", 40, 70) * coastal_factor
     
-    def _simulate_precipitation_from_season(self, lat: float) -> float:
+    def _simulate_precipitation_from_season(self, lat: float, lon: float, day: DayLike = None) -> float:
         """Simulate precipitation based on monsoon patterns"""
-        month = datetime.now().month
-        if 6 <= month <= 9 and lat > 10 and lat < 30:  # Monsoon season in India
-            return np.random.uniform(5, 50)
-        return np.random.uniform(0, 5)
+        day = as_day(day)
+        sim = simulator.point("GPM", lat, lon, day)
+        if 6 <= day.month <= 9 and lat > 10 and lat < 30:  # Monsoon season in India
+            return sim.uniform("precipitation", 5, 50)
+        return sim.uniform("precipitation", 0, 5)
     
-    def _simulate_uv_from_location(self, lat: float) -> float:
+    def _simulate_uv_from_location(self, lat: float, lon: float, day: DayLike = None) -> float:
         """Simulate UV index based on latitude"""
         base_uv = 11 - abs(lat) * 0.2
-        return max(1, base_uv + np.random.uniform(-2, 2))
-    
-    def _simulate_co2_from_airs(self) -> float:
-        """Simulate CO2 concentration from AIRS data"""
-        return np.random.uniform(410, 420)  # Current atmospheric CO2 levels
-    
-    def _simulate_methane_from_airs(self) -> float:
-        """Simulate methane concentration from AIRS data"""
-        return np.random.uniform(1.85, 1.95)  # ppm
\ No newline at end of file
+        return max(1, base_uv + simulator.point("AIRS", lat, lon, day).uniform("uv", -2, 2))